@@ -10,6 +10,8 @@ from flask_cors import CORS
 
 from config import config
 from app.utils.redis_client import redis_client
+from app.utils.background import background_jobs
+from app.utils.negative_cache import negative_cache
 
 # 初始化扩展（但不绑定到特定应用）
 db = SQLAlchemy()
@@ -48,6 +50,12 @@ def create_app(config_name='default'):
     # 初始化 Redis
     redis_client.init_app(app)
     
+    # 初始化后台任务
+    background_jobs.init_app(app)
+    
+    # 初始化不存在 ID 的负缓存
+    negative_cache.init_app(app)
+    
     # 初始化 Flasgger（配置已在 config 中设置）
     swagger.init_app(app)
     
@@ -66,6 +74,10 @@ def create_app(config_name='default'):
     from app.commands.seed import register_commands
     register_commands(app)
     
+    # 初始化缓存预热（CACHE_WARMER_ENABLED 时启动后台预热线程，需要在注册蓝图之后）
+    from app.utils.cache_warmer import cache_warmer
+    cache_warmer.init_app(app)
+    
     # 创建数据库表（仅用于开发环境）
     with app.app_context():
         # 注意：生产环境应该使用 Flask-Migrate 进行数据库迁移
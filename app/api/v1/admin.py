@@ -2,7 +2,7 @@
 ç®¡çå API è·¯ç±
 å¤çç®¡çåç¸å³çè®¾å¤ç®¡çåè½
 """
-from flask import Blueprint, request
+from flask import Blueprint, request, g
 from flasgger import swag_from
 from app.services import equipment_service
 from app.api.v1.schemas.equipment_schema import (
@@ -16,7 +16,11 @@ from app.utils.response import success, fail
 from app.utils.exceptions import NotFoundError, ValidationError
 from app.utils.auth import admin_required, get_current_user
 from app.utils.audit import audit_log
-from app.utils.redis_client import redis_client
+from app.utils.redis_client import redis_client, cache_stats, equipment_tag
+from app.utils.response_cache import CachedView
+from app.utils.negative_cache import negative_cache
+from app.utils.redis_lock import lock_metrics
+from app.utils.background import background_jobs
 from app.services import timeslot_service, reservation_service, statistics_service
 from app.models.timeslot import TimeSlot
 
@@ -32,6 +36,21 @@ timeslot_create_schema = TimeSlotCreateSchema()
 timeslot_update_schema = TimeSlotUpdateSchema()
 
 
+def statistics_view():
+    """
+    统计数据的缓存定义（接口和缓存预热共用）
+    
+    5分钟过期，过期后 1 分钟内由一个请求刷新，其他请求返回旧数据
+    
+    Returns:
+        CachedView
+    """
+    return CachedView(
+        redis_client.ns_key('api:admin:statistics', 'all'), statistics_service.get_all_statistics,
+        ttl=300, stale_ttl=60, msg='查询成功', stat='admin_statistics', body=False
+    )
+
+
 @admin_bp.route('/equipments', methods=['POST'])
 @admin_required
 @audit_log('create_equipment', detail_func=lambda f, *a, **k: request.get_json())
@@ -355,9 +374,10 @@ def update_timeslot(slot_id):
 
         slot = timeslot_service.update_timeslot(slot_id, validated_data)
 
-        _clear_timeslot_cache(slot.equip_id)
         if old_equip_id and old_equip_id != slot.equip_id:
-            _clear_timeslot_cache(old_equip_id)
+            _clear_timeslot_cache(slot.equip_id, old_equip_id)
+        else:
+            _clear_timeslot_cache(slot.equip_id)
 
         data = timeslot_schema.dump(slot)
         return success(data=data, msg='æ´æ°æå')
@@ -411,19 +431,26 @@ def _clear_equipment_cache(equip_id=None):
     Args:
         equip_id: è®¾å¤IDï¼å¦ææä¾åæ¸é¤è¯¥è®¾å¤çè¯¦æç¼å­
     """
-    # æ¸é¤è¯¦æç¼å­
-    if equip_id:
-        redis_client.delete(f'api:equipment:detail:{equip_id}')
-    
-    # æ³¨æï¼Redis ä¸æ¯æééç¬¦å é¤ï¼åè¡¨ç¼å­ä¼å¨è¿æåèªå¨æ¸é¤
-    # å¦æéè¦ç«å³æ¸é¤ææåè¡¨ç¼å­ï¼å¯ä»¥ä½¿ç¨ Redis SCAN å½ä»¤éåå é¤
-    # è¿éç®åå¤çï¼è®©åè¡¨ç¼å­èªç¶è¿æï¼5åéï¼
+    with redis_client.pipeline() as pipe:
+        # 清除该设备的详情、时间段列表等缓存
+        if equip_id:
+            pipe.delete(f'api:equipment:detail:{equip_id}')
+            pipe.invalidate_tags(equipment_tag(equip_id))
+        
+        # 列表和排行缓存通过命名空间版本号失效，旧版本由 TTL 自然过期
+        pipe.bump_namespace('api:equipment:list', 'api:equipment:top')
 
-def _clear_timeslot_cache(equip_id):
+def _clear_timeslot_cache(*equip_ids):
     """
-    Çå³ýÊ±¼ä¶ÎÁÐ±í»º´æ
+    清除设备的时间段列表缓存
+    
+    Args:
+        *equip_ids: 设备ID（时间段改到其他设备时同时传入新旧设备）
     """
-    redis_client.delete(f'timeslot:list:{equip_id}')
+    with redis_client.pipeline() as pipe:
+        for equip_id in equip_ids:
+            pipe.delete(f'timeslot:list:{equip_id}')
+            pipe.invalidate_tags(equipment_tag(equip_id))
 
 
 @admin_bp.route('/reservations/<int:reservation_id>/approve', methods=['PUT'])
@@ -577,6 +604,126 @@ def reject_reservation(reservation_id):
         return fail(code=500, msg=f'审批失败: {str(e)}')
 
 
+def _bulk_review(status, msg):
+    """批量审批通过/拒绝的公共处理，成功更新的预约记入 g.audit_details 供审计日志批量写入"""
+    json_data = request.get_json() or {}
+    reservation_ids = json_data.get('ids')
+    if not isinstance(reservation_ids, list) or not all(
+        isinstance(reservation_id, int) and not isinstance(reservation_id, bool) for reservation_id in reservation_ids
+    ):
+        return fail(code=422, msg='数据验证失败', data={'ids': ['必须为预约ID列表']})
+    
+    reason = json_data.get('reason') or None
+    result = reservation_service.bulk_update_reservation_status(
+        reservation_ids,
+        status=status,
+        approver_id=get_current_user()['user_id'],
+        reason=reason if status == 2 else None
+    )
+    
+    g.audit_details = [
+        {'reservation_id': reservation.id, 'reason': reason} if status == 2 else {'reservation_id': reservation.id}
+        for reservation in result['updated']
+    ]
+    data = {
+        'updated': ReservationSchema(many=True).dump(result['updated']),
+        'failed': result['failed']
+    }
+    return success(data=data, msg=msg)
+
+
+_BULK_REVIEW_RESPONSES = {
+    200: {
+        'description': '处理完成（data.updated 为状态已更新的预约，data.failed 为未更新的预约及原因）',
+        'schema': {
+            'type': 'object',
+            'properties': {
+                'code': {'type': 'integer', 'example': 200},
+                'msg': {'type': 'string'},
+                'data': {
+                    'type': 'object',
+                    'properties': {
+                        'updated': {'type': 'array', 'items': {'type': 'object'}},
+                        'failed': {'type': 'array', 'items': {'type': 'object'}}
+                    }
+                }
+            }
+        }
+    },
+    403: {
+        'description': '需要管理员权限'
+    },
+    422: {
+        'description': '预约ID列表无效'
+    }
+}
+
+
+@admin_bp.route('/reservations/batch/approve', methods=['PUT'])
+@admin_required
+@audit_log('approve_reservation', detail_func=lambda f, *a, **k: g.get('audit_details', []))
+@swag_from({
+    'tags': ['管理员预约审批'],
+    'summary': '批量审批通过预约',
+    'description': '一次审批通过多个待审预约（需要管理员权限）。按设备分组检查与已通过预约及本批预约之间的冲突，冲突的预约保持待审；全部变更一次提交，每台设备只更新一次下次可用时间',
+    'security': [{'Bearer': []}],
+    'parameters': [{
+        'in': 'body',
+        'name': 'body',
+        'required': True,
+        'schema': {
+            'type': 'object',
+            'required': ['ids'],
+            'properties': {
+                'ids': {'type': 'array', 'items': {'type': 'integer'}, 'example': [1, 2, 3], 'description': '预约ID列表（最多 200 个）'}
+            }
+        }
+    }],
+    'responses': _BULK_REVIEW_RESPONSES
+})
+def bulk_approve_reservations():
+    """管理员批量审批通过预约"""
+    try:
+        return _bulk_review(status=1, msg='审批成功')
+    except ValidationError as e:
+        return fail(code=422, msg=e.message, data=e.payload)
+    except Exception as e:
+        return fail(code=500, msg=f'审批失败: {str(e)}')
+
+
+@admin_bp.route('/reservations/batch/reject', methods=['PUT'])
+@admin_required
+@audit_log('reject_reservation', detail_func=lambda f, *a, **k: g.get('audit_details', []))
+@swag_from({
+    'tags': ['管理员预约审批'],
+    'summary': '批量审批拒绝预约',
+    'description': '一次拒绝多个待审预约（需要管理员权限），全部变更一次提交',
+    'security': [{'Bearer': []}],
+    'parameters': [{
+        'in': 'body',
+        'name': 'body',
+        'required': True,
+        'schema': {
+            'type': 'object',
+            'required': ['ids'],
+            'properties': {
+                'ids': {'type': 'array', 'items': {'type': 'integer'}, 'example': [1, 2, 3], 'description': '预约ID列表（最多 200 个）'},
+                'reason': {'type': 'string', 'description': '拒绝理由（可选）'}
+            }
+        }
+    }],
+    'responses': _BULK_REVIEW_RESPONSES
+})
+def bulk_reject_reservations():
+    """管理员批量审批拒绝预约"""
+    try:
+        return _bulk_review(status=2, msg='已拒绝')
+    except ValidationError as e:
+        return fail(code=422, msg=e.message, data=e.payload)
+    except Exception as e:
+        return fail(code=500, msg=f'审批失败: {str(e)}')
+
+
 @admin_bp.route('/statistics', methods=['GET'])
 @admin_required
 @swag_from({
@@ -630,20 +777,93 @@ def reject_reservation(reservation_id):
 def get_statistics():
     """获取统计数据"""
     try:
-        # 构建缓存键
-        cache_key = 'api:admin:statistics'
-        
-        # 尝试从缓存获取（5分钟过期）
-        cached_data = redis_client.get(cache_key)
-        if cached_data is not None:
-            return success(data=cached_data, msg='查询成功')
-        
-        # 获取统计数据
-        statistics = statistics_service.get_all_statistics()
-        
-        # 存入缓存（5分钟过期）
-        redis_client.set(cache_key, statistics, ex=300)
-        
-        return success(data=statistics, msg='查询成功')
+        return statistics_view().respond()
+    except Exception as e:
+        return fail(code=500, msg=f'查询失败: {str(e)}')
+
+
+@admin_bp.route('/metrics', methods=['GET'])
+@admin_required
+@swag_from({
+    'tags': ['管理员统计'],
+    'summary': '获取运行指标',
+    'description': '获取当前实例的运行指标，包括预约锁的加锁耗时（需要管理员权限）',
+    'security': [{'Bearer': []}],
+    'responses': {
+        200: {
+            'description': '成功返回运行指标',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'code': {'type': 'integer', 'example': 200},
+                    'msg': {'type': 'string', 'example': '查询成功'},
+                    'data': {
+                        'type': 'object',
+                        'properties': {
+                            'booking_lock': {
+                                'type': 'object',
+                                'properties': {
+                                    'acquired': {'type': 'integer', 'example': 120},
+                                    'contended': {'type': 'integer', 'example': 8},
+                                    'timeouts': {'type': 'integer', 'example': 0},
+                                    'fallbacks': {'type': 'integer', 'example': 0},
+                                    'avg_wait_ms': {'type': 'number', 'example': 1.25},
+                                    'max_wait_ms': {'type': 'number', 'example': 35.2}
+                                }
+                            },
+                            'background_jobs': {
+                                'type': 'object',
+                                'properties': {
+                                    'submitted': {'type': 'integer', 'example': 50},
+                                    'coalesced': {'type': 'integer', 'example': 49},
+                                    'executed': {'type': 'integer', 'example': 1},
+                                    'failed': {'type': 'integer', 'example': 0},
+                                    'local_fallbacks': {'type': 'integer', 'example': 0},
+                                    'local_queued': {'type': 'integer', 'example': 0}
+                                }
+                            },
+                            'cache': {
+                                'type': 'object',
+                                'description': '按缓存名称统计的命中情况，如 reservation_list、equipment_detail',
+                                'example': {
+                                    'reservation_list': {'hits': 180, 'misses': 20, 'hit_ratio': 0.9}
+                                }
+                            },
+                            'cache_tiers': {
+                                'type': 'object',
+                                'description': '进程内缓存（l1，未启用时为 null）和 Redis（l2）的命中情况',
+                                'example': {
+                                    'l1': {'hits': 900, 'misses': 100, 'hit_ratio': 0.9, 'evictions': 0,
+                                           'entries': 85, 'bytes': 120000},
+                                    'l2': {'hits': 80, 'misses': 20, 'hit_ratio': 0.8}
+                                }
+                            },
+                            'negative_cache': {
+                                'type': 'object',
+                                'description': '不存在 ID 的负缓存命中次数、布隆过滤器拒绝次数和重建次数',
+                                'example': {'negative_hits': 120, 'marked': 15, 'bloom_rejects': 0,
+                                            'bloom_rebuilds': 0, 'bloom_size': None}
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        403: {
+            'description': '需要管理员权限'
+        }
+    }
+})
+def get_metrics():
+    """获取运行指标（进程内统计）"""
+    try:
+        data = {
+            'booking_lock': lock_metrics.snapshot(),
+            'background_jobs': background_jobs.snapshot(),
+            'cache': cache_stats.snapshot(),
+            'cache_tiers': redis_client.tier_snapshot(),
+            'negative_cache': negative_cache.snapshot()
+        }
+        return success(data=data, msg='查询成功')
     except Exception as e:
         return fail(code=500, msg=f'查询失败: {str(e)}')
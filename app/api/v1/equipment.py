@@ -9,7 +9,8 @@ from app.api.v1.schemas.equipment_schema import EquipmentSchema
 from app.utils.response import success, fail
 from app.utils.exceptions import NotFoundError
 from app.utils.auth import login_required
-from app.utils.redis_client import redis_client
+from app.utils.redis_client import redis_client, equipment_tag
+from app.utils.response_cache import CachedView
 from app.services import statistics_service
 
 # 创建蓝图
@@ -19,6 +20,69 @@ equipment_bp = Blueprint('equipment', __name__)
 equipment_schema = EquipmentSchema()
 
 
+def equipment_list_view(lab_id=None, keyword=None, category=None, status=None, page=1, page_size=9):
+    """
+    设备列表的缓存定义（接口和缓存预热共用）
+    
+    缓存编码好的响应体（5分钟过期，过期后 1 分钟内返回旧数据并由一个请求刷新）
+    
+    Returns:
+        CachedView
+    """
+    # 缓存键包含所有筛选条件和分页参数，带命名空间版本号
+    cache_key = redis_client.ns_key(
+        'api:equipment:list',
+        f'lab_{lab_id}:kw_{keyword}:cat_{category}:st_{status}:p_{page}:ps_{page_size}'
+    )
+    
+    def load():
+        # 查询设备列表
+        equipments, total = equipment_service.get_equipment_list(
+            lab_id=lab_id,
+            keyword=keyword,
+            category=category,
+            status=status,
+            page=page,
+            page_size=page_size
+        )
+        
+        # 序列化并构建返回数据
+        return {
+            'items': equipment_schema.dump(equipments, many=True),
+            'total': total
+        }
+    
+    return CachedView(cache_key, load, ttl=300, stale_ttl=60, msg='查询成功', stat='equipment_list')
+
+
+def equipment_detail_view(equip_id):
+    """
+    设备详情的缓存定义（10分钟过期），登记到设备标签下
+    
+    Returns:
+        CachedView
+    """
+    return CachedView(
+        f'api:equipment:detail:{equip_id}',
+        lambda: equipment_schema.dump(equipment_service.get_equipment_by_id(equip_id)),
+        ttl=600, msg='查询成功', tags=[equipment_tag(equip_id)], stat='equipment_detail'
+    )
+
+
+def top_equipments_view(time_range='week', limit=10):
+    """
+    热门设备排行的缓存定义（10分钟过期，过期后 2 分钟内返回旧数据并由一个请求刷新）
+    
+    Returns:
+        CachedView
+    """
+    return CachedView(
+        redis_client.ns_key('api:equipment:top', f'{time_range}:{limit}'),
+        lambda: statistics_service.get_top_equipment(time_range=time_range, limit=limit),
+        ttl=600, stale_ttl=120, msg='查询成功', stat='equipment_top'
+    )
+
+
 @equipment_bp.route('/', methods=['GET'])
 @equipment_bp.route('', methods=['GET'])  # 同时支持带斜杠和不带斜杠的 URL
 @login_required
@@ -128,37 +192,8 @@ def get_equipments():
         elif page_size > 100:
             page_size = 100  # 限制每页最大数量
         
-        # 构建缓存键（包含所有筛选条件和分页参数）
-        cache_key = f'api:equipment:list:lab_{lab_id}:kw_{keyword}:cat_{category}:st_{status}:p_{page}:ps_{page_size}'
-        
-        # 尝试从缓存获取
-        cached_data = redis_client.get(cache_key)
-        if cached_data is not None:
-            return success(data=cached_data, msg='查询成功')
-        
-        # 查询设备列表
-        equipments, total = equipment_service.get_equipment_list(
-            lab_id=lab_id,
-            keyword=keyword,
-            category=category,
-            status=status,
-            page=page,
-            page_size=page_size
-        )
-        
-        # 序列化
-        items = equipment_schema.dump(equipments, many=True)
-        
-        # 构建返回数据
-        data = {
-            'items': items,
-            'total': total
-        }
-        
-        # 存入缓存（5分钟过期）
-        redis_client.set(cache_key, data, ex=300)
-        
-        return success(data=data, msg='查询成功')
+        # 客户端缓存的数据未变化时返回 304
+        return equipment_list_view(lab_id, keyword, category, status, page, page_size).respond()
     except Exception as e:
         return fail(code=500, msg=f'查询失败: {str(e)}')
 
@@ -206,22 +241,7 @@ def get_equipments():
 def get_equipment(equip_id):
     """获取设备详情"""
     try:
-        # 尝试从缓存获取
-        cache_key = f'api:equipment:detail:{equip_id}'
-        cached_data = redis_client.get(cache_key)
-        if cached_data is not None:
-            return success(data=cached_data, msg='查询成功')
-        
-        # 查询设备
-        equipment = equipment_service.get_equipment_by_id(equip_id)
-        
-        # 序列化
-        data = equipment_schema.dump(equipment)
-        
-        # 存入缓存（10分钟过期）
-        redis_client.set(cache_key, data, ex=600)
-        
-        return success(data=data, msg='查询成功')
+        return equipment_detail_view(equip_id).respond()
     except NotFoundError as e:
         return fail(code=404, msg=e.message)
     except Exception as e:
@@ -289,24 +309,7 @@ def get_top_equipments():
         if limit < 1 or limit > 50:
             limit = 10
         
-        # 构建缓存键
-        cache_key = f'api:equipment:top:{time_range}:{limit}'
-        
-        # 尝试从缓存获取（10分钟过期）
-        cached_data = redis_client.get(cache_key)
-        if cached_data is not None:
-            return success(data=cached_data, msg='查询成功')
-        
-        # 获取热门设备数据
-        top_equipments = statistics_service.get_top_equipment(
-            time_range=time_range,
-            limit=limit
-        )
-        
-        # 存入缓存（10分钟过期）
-        redis_client.set(cache_key, top_equipments, ex=600)
-        
-        return success(data=top_equipments, msg='查询成功')
+        return top_equipments_view(time_range, limit).respond()
     except Exception as e:
         return fail(code=500, msg=f'查询失败: {str(e)}')
 
@@ -13,6 +13,7 @@ from app.utils.response import success, fail
 from app.utils.exceptions import NotFoundError, ValidationError
 from app.utils.auth import admin_required
 from app.utils.redis_client import redis_client
+from app.utils.response_cache import CachedView
 
 # 创建蓝图
 lab_bp = Blueprint('laboratory', __name__)
@@ -23,6 +24,22 @@ lab_create_schema = LaboratoryCreateSchema()
 lab_update_schema = LaboratoryUpdateSchema()
 
 
+def lab_list_view():
+    """
+    实验室列表的缓存定义（接口和缓存预热共用）
+    
+    缓存序列化后的数据（10分钟过期，过期后 1 分钟内返回旧数据）
+    
+    Returns:
+        CachedView
+    """
+    return CachedView(
+        redis_client.ns_key('api:lab:list', 'all'),
+        lambda: lab_schema.dump(lab_service.get_lab_list(), many=True),
+        ttl=600, stale_ttl=60, msg='查询成功', stat='lab_list', body=False
+    )
+
+
 @lab_bp.route('/', methods=['GET'])
 @swag_from({
     'tags': ['实验室管理'],
@@ -56,21 +73,9 @@ lab_update_schema = LaboratoryUpdateSchema()
 def get_labs():
     """获取所有实验室（带缓存）"""
     try:
-        # 尝试从缓存获取序列化后的数据
-        cache_key = 'api:lab:list'
-        cached_data = redis_client.get(cache_key)
-        if cached_data is not None:
-            # 缓存命中，直接返回（完全跳过数据库查询和序列化）
-            return success(data=cached_data, msg='查询成功')
-        
-        # 缓存未命中，查询数据库并序列化
-        labs = lab_service.get_lab_list()
-        data = lab_schema.dump(labs, many=True)
-        
-        # 存入缓存（10分钟过期）
-        redis_client.set(cache_key, data, ex=600)
-        
-        return success(data=data, msg='查询成功')
+        # 从缓存获取序列化后的数据，缓存命中时完全跳过数据库查询和序列化
+        # 缓存未命中时只有一个请求查询数据库；客户端缓存的数据未变化时返回 304
+        return lab_list_view().respond()
     except Exception as e:
         return fail(code=500, msg=f'查询失败: {str(e)}')
 
@@ -138,7 +143,7 @@ def create_lab():
         lab = lab_service.create_lab(validated_data)
         
         # 清除相关缓存
-        redis_client.delete('api:lab:list')
+        redis_client.bump_namespace('api:lab:list')
         
         # 序列化返回
         data = lab_schema.dump(lab)
@@ -223,7 +228,7 @@ def update_lab(lab_id):
         lab = lab_service.update_lab(lab_id, validated_data)
         
         # 清除相关缓存
-        redis_client.delete('api:lab:list')
+        redis_client.bump_namespace('api:lab:list')
         redis_client.delete(f'api:lab:detail:{lab_id}')
         
         # 序列化返回
@@ -276,7 +281,7 @@ def delete_lab(lab_id):
         lab_service.delete_lab(lab_id)
         
         # 清除相关缓存
-        redis_client.delete('api:lab:list')
+        redis_client.bump_namespace('api:lab:list')
         redis_client.delete(f'api:lab:detail:{lab_id}')
         
         return success(msg='删除成功')
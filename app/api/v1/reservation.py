@@ -6,12 +6,13 @@ from flask import Blueprint, request
 from flasgger import swag_from
 from app.services import reservation_service
 from app.api.v1.schemas.reservation_schema import (
-    ReservationSchema, ReservationCreateSchema, ReservationQuerySchema
+    ReservationSchema, ReservationCreateSchema, ReservationSeriesCreateSchema, ReservationQuerySchema
 )
 from app.utils.response import success, fail
 from app.utils.exceptions import NotFoundError, ValidationError
 from app.utils.auth import login_required, get_current_user
-from app.utils.redis_client import redis_client
+from app.utils.redis_client import reservation_user_tag
+from app.utils.response_cache import cached_success
 
 # 创建蓝图
 reservation_bp = Blueprint('reservation', __name__)
@@ -19,6 +20,7 @@ reservation_bp = Blueprint('reservation', __name__)
 # 实例化 Schema
 reservation_schema = ReservationSchema()
 reservation_create_schema = ReservationCreateSchema()
+reservation_series_create_schema = ReservationSeriesCreateSchema()
 reservation_query_schema = ReservationQuerySchema()
 
 
@@ -100,6 +102,89 @@ def create_reservation():
         return fail(code=500, msg=f'创建失败: {str(e)}')
 
 
+@reservation_bp.route('/series', methods=['POST'])
+@login_required
+@swag_from({
+    'tags': ['预约管理'],
+    'summary': '创建系列预约',
+    'description': '按重复规则一次创建多次预约，例如整个学期每周同一时间（需要登录）',
+    'security': [{'Bearer': []}],
+    'parameters': [{
+        'in': 'body',
+        'name': 'body',
+        'required': True,
+        'schema': {
+            'type': 'object',
+            'required': ['equip_id', 'start_time', 'end_time'],
+            'properties': {
+                'equip_id': {'type': 'integer', 'example': 1, 'description': '设备ID'},
+                'start_time': {'type': 'string', 'format': 'date-time', 'description': '第一次预约的开始时间'},
+                'end_time': {'type': 'string', 'format': 'date-time', 'description': '第一次预约的结束时间'},
+                'frequency': {'type': 'string', 'enum': ['daily', 'weekly'], 'example': 'weekly', 'description': '重复频率'},
+                'interval': {'type': 'integer', 'example': 1, 'description': '每隔几个周期重复一次'},
+                'count': {'type': 'integer', 'example': 16, 'description': '重复次数（最多 52 次）'},
+                'until': {'type': 'string', 'format': 'date', 'description': '最后一次预约的日期（包含）'},
+                'skip_conflicts': {'type': 'boolean', 'example': False, 'description': '跳过冲突的预约，只创建不冲突的部分'},
+                'description': {'type': 'string', 'description': '预约用途说明'}
+            }
+        }
+    }],
+    'responses': {
+        200: {
+            'description': '成功创建系列预约',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'code': {'type': 'integer', 'example': 200},
+                    'msg': {'type': 'string', 'example': '创建成功'},
+                    'data': {
+                        'type': 'object',
+                        'properties': {
+                            'reservations': {'type': 'array', 'items': {'type': 'object'}},
+                            'skipped': {
+                                'type': 'array',
+                                'description': '跳过的冲突预约（index 为在系列中的序号）',
+                                'items': {'type': 'object'}
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        401: {
+            'description': '未授权'
+        },
+        422: {
+            'description': '数据验证失败或存在冲突（data.occurrences 为每次冲突的详情）'
+        }
+    }
+})
+def create_reservation_series():
+    """创建系列预约"""
+    try:
+        json_data = request.get_json()
+        if not json_data:
+            return fail(code=400, msg='请求体不能为空')
+        
+        errors = reservation_series_create_schema.validate(json_data)
+        if errors:
+            return fail(code=422, msg='数据验证失败', data=errors)
+        
+        validated_data = reservation_series_create_schema.load(json_data)
+        
+        result = reservation_service.create_reservation_series(validated_data, get_current_user())
+        
+        data = {
+            'reservations': reservation_schema.dump(result['reservations'], many=True),
+            'skipped': result['skipped']
+        }
+        return success(data=data, msg='创建成功')
+    except ValidationError as e:
+        return fail(code=422, msg=e.message, data=e.payload)
+    except Exception as e:
+        return fail(code=500, msg=f'创建失败: {str(e)}')
+
+
 @reservation_bp.route('/', methods=['GET'])
 @login_required
 @swag_from({
@@ -162,29 +247,28 @@ def get_my_reservations():
         # 获取当前用户
         current_user = get_current_user()
         
-        # 构建缓存键
-        cache_key = f'api:reservation:list:user_{current_user["user_id"]}:type_{current_user["user_type"]}:equip_{equip_id}:status_{status}'
-        
-        # 尝试从缓存获取
-        cached_data = redis_client.get(cache_key)
-        if cached_data is not None:
-            return success(data=cached_data, msg='查询成功')
-        
-        # 查询预约列表
-        reservations = reservation_service.get_reservation_list(
-            user_id=current_user['user_id'],
-            user_type=current_user['user_type'],
-            equip_id=equip_id,
-            status=status
+        # 构建缓存键（只按用户标签失效，不需要命名空间版本号）
+        cache_key = (
+            f'api:reservation:list:user_{current_user["user_id"]}:type_{current_user["user_type"]}'
+            f':equip_{equip_id}:status_{status}'
         )
         
-        # 序列化
-        data = reservation_schema.dump(reservations, many=True)
+        def load():
+            # 查询预约列表并序列化
+            reservations = reservation_service.get_reservation_list(
+                user_id=current_user['user_id'],
+                user_type=current_user['user_type'],
+                equip_id=equip_id,
+                status=status
+            )
+            return reservation_schema.dump(reservations, many=True)
         
-        # 存入缓存（5分钟过期）
-        redis_client.set(cache_key, data, ex=300)
-        
-        return success(data=data, msg='查询成功')
+        # 缓存编码好的响应体（5分钟过期），登记到该用户的标签下，只有该用户的预约变化时才失效
+        return cached_success(
+            cache_key, load, ttl=300, msg='查询成功',
+            tags=[reservation_user_tag(current_user['user_type'], current_user['user_id'])],
+            stat='reservation_list'
+        )
     except Exception as e:
         return fail(code=500, msg=f'查询失败: {str(e)}')
 
@@ -232,22 +316,13 @@ def get_my_reservations():
 def get_reservation(reservation_id):
     """获取预约详情"""
     try:
-        # 尝试从缓存获取
+        # 缓存编码好的响应体（10分钟过期）
         cache_key = f'api:reservation:detail:{reservation_id}'
-        cached_data = redis_client.get(cache_key)
-        if cached_data is not None:
-            return success(data=cached_data, msg='查询成功')
-        
-        # 查询预约
-        reservation = reservation_service.get_reservation_by_id(reservation_id)
-        
-        # 序列化
-        data = reservation_schema.dump(reservation)
-        
-        # 存入缓存（10分钟过期）
-        redis_client.set(cache_key, data, ex=600)
-        
-        return success(data=data, msg='查询成功')
+        return cached_success(
+            cache_key,
+            lambda: reservation_schema.dump(reservation_service.get_reservation_by_id(reservation_id)),
+            ttl=600, msg='查询成功', stat='reservation_detail'
+        )
     except NotFoundError as e:
         return fail(code=404, msg=e.message)
     except Exception as e:
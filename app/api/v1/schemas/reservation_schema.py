@@ -41,6 +41,17 @@ class ReservationCreateSchema(BaseCreateSchema):
     description = fields.String(allow_none=True, validate=validate.Length(max=1000), description='预约用途说明')
 
 
+class ReservationSeriesCreateSchema(ReservationCreateSchema):
+    """创建系列预约 Schema（用于 POST 请求，start_time/end_time 为第一次预约的时间）"""
+    start_time = fields.DateTime(required=True, format='iso', description='第一次预约的开始时间')
+    end_time = fields.DateTime(required=True, format='iso', description='第一次预约的结束时间')
+    frequency = fields.String(missing='weekly', validate=validate.OneOf(['daily', 'weekly']), description='重复频率')
+    interval = fields.Integer(missing=1, validate=validate.Range(min=1), description='每隔几个周期重复一次')
+    count = fields.Integer(allow_none=True, validate=validate.Range(min=1), description='重复次数')
+    until = fields.Date(allow_none=True, description='最后一次预约的日期（包含）')
+    skip_conflicts = fields.Boolean(missing=False, description='是否跳过冲突的预约，只创建不冲突的部分')
+
+
 class ReservationUpdateSchema(BaseUpdateSchema):
     """更新预约 Schema（用于 PUT 请求）"""
     status = fields.Integer(validate=validate.OneOf([0, 1, 2, 3]), description='预约状态')
@@ -9,13 +9,28 @@ from app.api.v1.schemas.timeslot_schema import TimeSlotSchema
 from app.utils.response import success, fail
 from app.utils.auth import login_required
 from app.utils.exceptions import NotFoundError, ValidationError
-from app.utils.redis_client import redis_client
+from app.utils.redis_client import equipment_tag
+from app.utils.response_cache import CachedView
 
 timeslot_bp = Blueprint('timeslot', __name__)
 
 timeslot_schema = TimeSlotSchema()
 
 
+def timeslot_list_view(equip_id):
+    """
+    设备完整时间段列表的缓存定义（接口和缓存预热共用），1 小时过期，登记到设备标签下
+
+    Returns:
+        CachedView
+    """
+    return CachedView(
+        f'timeslot:list:{equip_id}',
+        lambda: timeslot_schema.dump(timeslot_service.get_timeslots_by_equipment(equip_id), many=True),
+        ttl=3600, msg='查询成功', tags=[equipment_tag(equip_id)], stat='timeslot_list', body=False
+    )
+
+
 @timeslot_bp.route('/equipment/<int:equip_id>', methods=['GET'])
 @login_required
 @swag_from({
@@ -69,20 +84,11 @@ def get_timeslots(equip_id):
     try:
         only_active = str(request.args.get('only_active', '')).lower() in ('true', '1')
 
-        # 仅对完整列表做缓存，only_active 时不使用缓存以避免歧义
-        cache_key = f'timeslot:list:{equip_id}'
+        # 仅对完整列表做缓存，only_active 时不使用缓存以避免歧义（ETag 根据数据计算）
         if not only_active:
-            cached_data = redis_client.get(cache_key)
-            if cached_data is not None:
-                return success(data=cached_data, msg='查询成功')
-
-        slots = timeslot_service.get_timeslots_by_equipment(equip_id, only_active=only_active)
-        data = timeslot_schema.dump(slots, many=True)
-
-        if not only_active:
-            redis_client.set(cache_key, data, ex=3600)
-
-        return success(data=data, msg='查询成功')
+            return timeslot_list_view(equip_id).respond()
+        slots = timeslot_service.get_timeslots_by_equipment(equip_id, only_active=True)
+        return success(data=timeslot_schema.dump(slots, many=True), msg='查询成功', etag=True)
     except NotFoundError as e:
         return fail(code=404, msg=e.message, data=e.payload)
     except ValidationError as e:
@@ -223,3 +229,197 @@ def get_available_dates(equip_id):
         return fail(code=422, msg=e.message, data=e.payload)
     except Exception as e:
         return fail(code=500, msg=f'查询失败: {str(e)}')
+
+
+@timeslot_bp.route('/availability', methods=['GET'])
+@login_required
+@swag_from({
+    'tags': ['时间段管理'],
+    'summary': '获取设备可用性矩阵',
+    'description': '一次返回实验室或类别下所有设备在日期范围内的可用情况，代替逐台查询可用日期。'
+                   'bitmap 的第 i 个字符表示 start_date 之后第 i 天是否有可用时间段（1 可用，0 不可用）。',
+    'security': [{'Bearer': []}],
+    'parameters': [
+        {
+            'in': 'query',
+            'name': 'lab_id',
+            'required': False,
+            'type': 'integer',
+            'description': '实验室ID（lab_id 和 category 至少提供一个）'
+        },
+        {
+            'in': 'query',
+            'name': 'category',
+            'required': False,
+            'type': 'integer',
+            'description': '设备类别 (1:学院, 2:实验室)'
+        },
+        {
+            'in': 'query',
+            'name': 'start_date',
+            'required': False,
+            'type': 'string',
+            'format': 'date',
+            'description': '开始日期（格式：YYYY-MM-DD），可选，默认为今天'
+        },
+        {
+            'in': 'query',
+            'name': 'days',
+            'required': False,
+            'type': 'integer',
+            'description': '查询天数（默认30天，最多90天）'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': '成功返回可用性矩阵',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'code': {'type': 'integer', 'example': 200},
+                    'msg': {'type': 'string', 'example': 'success'},
+                    'data': {
+                        'type': 'object',
+                        'properties': {
+                            'start_date': {'type': 'string', 'format': 'date', 'example': '2024-01-15'},
+                            'days': {'type': 'integer', 'example': 7},
+                            'items': {
+                                'type': 'array',
+                                'items': {
+                                    'type': 'object',
+                                    'properties': {
+                                        'equip_id': {'type': 'integer', 'example': 1},
+                                        'bitmap': {'type': 'string', 'example': '1101111'}
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        422: {
+            'description': '缺少筛选条件、日期格式错误或天数超出范围'
+        }
+    }
+})
+def get_availability_matrix():
+    try:
+        matrix = timeslot_service.get_availability_matrix(
+            lab_id=request.args.get('lab_id', type=int),
+            category=request.args.get('category', type=int),
+            start_date=request.args.get('start_date'),
+            days=request.args.get('days', type=int, default=30)
+        )
+        return success(data=matrix, msg='查询成功', etag=True)
+    except ValidationError as e:
+        return fail(code=422, msg=e.message, data=e.payload)
+    except Exception as e:
+        return fail(code=500, msg=f'查询失败: {str(e)}')
+
+
+@timeslot_bp.route('/search', methods=['GET'])
+@login_required
+@swag_from({
+    'tags': ['时间段管理'],
+    'summary': '搜索空闲设备',
+    'description': '在实验室或类别下的所有设备中，按开始时间返回最早能容纳指定时长的 (设备, 开始时间)。'
+                   '适用于不关心具体使用哪一台同类设备的预约。',
+    'security': [{'Bearer': []}],
+    'parameters': [
+        {
+            'in': 'query',
+            'name': 'lab_id',
+            'required': False,
+            'type': 'integer',
+            'description': '实验室ID（lab_id 和 category 至少提供一个）'
+        },
+        {
+            'in': 'query',
+            'name': 'category',
+            'required': False,
+            'type': 'integer',
+            'description': '设备类别 (1:学院, 2:实验室)'
+        },
+        {
+            'in': 'query',
+            'name': 'start_date',
+            'required': False,
+            'type': 'string',
+            'format': 'date',
+            'description': '开始日期（格式：YYYY-MM-DD），可选，默认为今天'
+        },
+        {
+            'in': 'query',
+            'name': 'days',
+            'required': False,
+            'type': 'integer',
+            'description': '查询天数（默认7天，最多30天）'
+        },
+        {
+            'in': 'query',
+            'name': 'duration',
+            'required': False,
+            'type': 'integer',
+            'description': '预约时长（分钟，默认60）'
+        },
+        {
+            'in': 'query',
+            'name': 'limit',
+            'required': False,
+            'type': 'integer',
+            'description': '最多返回的结果数（默认10，最多50）'
+        },
+        {
+            'in': 'query',
+            'name': 'per_equipment',
+            'required': False,
+            'type': 'integer',
+            'description': '每台设备最多返回的结果数（默认1）'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': '成功返回按开始时间排序的空闲设备',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'code': {'type': 'integer', 'example': 200},
+                    'msg': {'type': 'string', 'example': 'success'},
+                    'data': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'equip_id': {'type': 'integer', 'example': 1},
+                                'equip_name': {'type': 'string', 'example': '扫描电子显微镜'},
+                                'start_time': {'type': 'string', 'example': '2024-01-15T09:00:00'},
+                                'end_time': {'type': 'string', 'example': '2024-01-15T10:00:00'},
+                                'free_until': {'type': 'string', 'example': '2024-01-15T12:00:00'}
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        422: {
+            'description': '参数无效'
+        }
+    }
+})
+def search_free_equipment():
+    try:
+        results = timeslot_service.search_free_equipment(
+            lab_id=request.args.get('lab_id', type=int),
+            category=request.args.get('category', type=int),
+            start_date=request.args.get('start_date'),
+            days=request.args.get('days', type=int, default=7),
+            duration=request.args.get('duration', type=int, default=60),
+            limit=request.args.get('limit', type=int, default=10),
+            per_equipment=request.args.get('per_equipment', type=int, default=1)
+        )
+        return success(data=results, msg='查询成功')
+    except ValidationError as e:
+        return fail(code=422, msg=e.message, data=e.payload)
+    except Exception as e:
+        return fail(code=500, msg=f'查询失败: {str(e)}')
@@ -4,6 +4,7 @@
 """
 import click
 import random
+import time as time_module
 from werkzeug.security import generate_password_hash
 from flask.cli import with_appcontext
 from app import db
@@ -235,21 +236,19 @@ def seed_data(equipments, users, password):
         
         click.echo(f'\r  [OK] 设备数据生成完成（共 {equipments} 条，已包含时间段）')
         
+        # 通知各进程重建设备 ID 过滤器（启用 EQUIPMENT_ID_BLOOM 时）
+        from app.utils.negative_cache import EQUIPMENT_BLOOM_NAMESPACE
+        from app.utils.redis_client import redis_client
+        redis_client.bump_namespace(EQUIPMENT_BLOOM_NAMESPACE)
+        
         # 更新新生成设备的下次可用时间
         click.echo('  正在更新设备的下次可用时间...')
         try:
-            from app.services.reservation_service import _update_equipment_next_avail_time
-            # 只更新新生成的设备
-            new_equipments = Equipment.query.filter(Equipment.id > equipment_start_id).all()
-            updated_count = 0
-            for equipment in new_equipments:
-                try:
-                    _update_equipment_next_avail_time(equipment.id)
-                    updated_count += 1
-                except Exception:
-                    # 忽略单个设备的更新失败
-                    pass
-            click.echo(f'  [OK] 已更新 {updated_count} 个设备的下次可用时间')
+            from app.services.reservation_service import recompute_next_avail_times
+            # 只更新新生成的设备（批量计算，一次写回）
+            new_ids = [row.id for row in db.session.query(Equipment.id).filter(Equipment.id > equipment_start_id)]
+            stats = recompute_next_avail_times(equip_ids=new_ids)
+            click.echo(f'  [OK] 已更新 {stats["changed"]} 个设备的下次可用时间')
         except Exception as e:
             click.echo(f'  [WARN] 更新下次可用时间时出错: {str(e)}')
         
@@ -450,16 +449,9 @@ def seed_timeslots(equipments):
         # 更新所有设备的下次可用时间
         click.echo(f'\n  正在更新设备的下次可用时间...')
         try:
-            from app.services.reservation_service import _update_equipment_next_avail_time
-            updated_count = 0
-            for equipment in equipment_list:
-                try:
-                    _update_equipment_next_avail_time(equipment.id)
-                    updated_count += 1
-                except Exception as e:
-                    # 忽略单个设备的更新失败
-                    pass
-            click.echo(f'  [OK] 已更新 {updated_count} 个设备的下次可用时间')
+            from app.services.reservation_service import recompute_next_avail_times
+            stats = recompute_next_avail_times(equip_ids=[equipment.id for equipment in equipment_list])
+            click.echo(f'  [OK] 已更新 {stats["changed"]} 个设备的下次可用时间')
         except Exception as e:
             click.echo(f'  [WARN] 更新下次可用时间时出错: {str(e)}')
         
@@ -488,6 +480,8 @@ def clear_equipments(confirm):
     
     try:
         from app.models.reservation import Reservation
+        from app.models.reservation_claim import ReservationClaim
+        from app.models.slot_occupancy import SlotOccupancy
         from app.models.timeslot import TimeSlot
         
         # 统计数据
@@ -505,9 +499,11 @@ def clear_equipments(confirm):
             click.echo('操作已取消')
             return
         
-        # 删除预约记录
+        # 删除预约记录（先删除引用预约、时间段的占用记录）
         if reservation_count > 0:
             click.echo(f'\n正在删除 {reservation_count} 条预约记录...')
+            ReservationClaim.query.delete()
+            SlotOccupancy.query.delete()
             Reservation.query.delete()
             db.session.commit()
             click.echo('  [OK] 预约记录已删除')
@@ -545,10 +541,154 @@ def clear_equipments(confirm):
         raise click.Abort()
 
 
+@click.command('rebuild-claims')
+@with_appcontext
+def rebuild_claims():
+    """
+    根据现有的待审/已通过预约重建预约占用表（reservation_claim）
+    
+    将 RESERVATION_CONFLICT_MODE 切换为 claim 之前需要执行一次。
+    """
+    try:
+        from app.services.reservation_service import rebuild_reservation_claims
+        
+        click.echo('开始重建预约占用表...')
+        count = rebuild_reservation_claims()
+        click.echo(f'[OK] 已写入 {count} 条占用记录')
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f'\n[ERROR] 重建占用表失败: {str(e)}', err=True)
+        import traceback
+        traceback.print_exc()
+        raise click.Abort()
+
+
+@click.command('rebuild-occupancy')
+@with_appcontext
+def rebuild_occupancy():
+    """
+    根据现有的预约和时间段重建时间段占用表（slot_occupancy）
+    
+    将 AVAILABILITY_READ_MODEL 切换为 occupancy 之前、以及绕过服务层批量导入预约之后需要执行一次。
+    """
+    try:
+        from app.services.occupancy_service import rebuild_occupancy as rebuild
+        
+        click.echo('开始重建时间段占用表...')
+        count = rebuild()
+        click.echo(f'[OK] 已写入 {count} 条占用记录')
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f'\n[ERROR] 重建时间段占用表失败: {str(e)}', err=True)
+        import traceback
+        traceback.print_exc()
+        raise click.Abort()
+
+
+@click.command('check-occupancy')
+@click.option('--repair', is_flag=True, help='重新计算不一致的设备')
+@click.option('--limit', default=20, help='最多显示的不一致记录数量（默认：20）')
+@with_appcontext
+def check_occupancy(repair, limit):
+    """
+    检查时间段占用表与预约、时间段是否一致
+    
+    存在不一致时以非零状态退出（使用 --repair 修复后除外），可用于定时巡检。
+    """
+    try:
+        from app.services.occupancy_service import check_occupancy as check
+        
+        click.echo('开始检查时间段占用表...')
+        result = check(repair=repair)
+        mismatches = result['mismatches']
+        if not mismatches:
+            click.echo(f'[OK] 占用表一致（{result["rows"]} 条记录）')
+            return
+        
+        click.echo(f'[WARN] 发现 {len(mismatches)} 处不一致（状态 None 表示没有记录）：')
+        for item in mismatches[:limit]:
+            click.echo(f'  设备 {item["equip_id"]} {item["date"]} 时间段 {item["slot_id"]}: '
+                       f'应为 {item["expected"]}，实际 {item["actual"]}')
+        if len(mismatches) > limit:
+            click.echo(f'  ... 其余 {len(mismatches) - limit} 处省略')
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f'\n[ERROR] 检查时间段占用表失败: {str(e)}', err=True)
+        import traceback
+        traceback.print_exc()
+        raise click.Abort()
+    
+    if repair:
+        click.echo(f'[OK] 已重新计算 {result["repaired"]} 个设备的占用')
+    else:
+        click.echo('使用 flask check-occupancy --repair 修复')
+        click.get_current_context().exit(1)
+
+
+@click.command('recompute-next-avail')
+@click.option('--dry-run', is_flag=True, help='只计算并统计变化，不写入数据库')
+@click.option('--chunk-size', default=1000, help='每条 UPDATE 语句包含的设备数量（默认：1000）')
+@with_appcontext
+def recompute_next_avail(dry_run, chunk_size):
+    """
+    批量重新计算所有设备的下次可用时间
+    
+    用于夜间对账和批量导入之后：时间段和预约各一次查询，按设备分组计算，
+    只有发生变化的设备批量写回。
+    """
+    try:
+        from app.services.reservation_service import recompute_next_avail_times
+        
+        click.echo('开始重新计算设备的下次可用时间...')
+        started = time_module.perf_counter()
+        stats = recompute_next_avail_times(dry_run=dry_run, chunk_size=chunk_size)
+        elapsed = time_module.perf_counter() - started
+        action = '需要更新' if dry_run else '已更新'
+        click.echo(f'[OK] 共 {stats["equipments"]} 个设备，{action} {stats["changed"]} 个（耗时 {elapsed:.2f} 秒）')
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f'\n[ERROR] 重新计算下次可用时间失败: {str(e)}', err=True)
+        import traceback
+        traceback.print_exc()
+        raise click.Abort()
+
+
+@click.command('cache-warm')
+@click.option('--pages', default=None, type=int, help='每种筛选条件预热的设备列表页数（默认：CACHE_WARM_PAGES）')
+@click.option('--hot-devices', default=None, type=int, help='预热详情和时间段列表的热门设备数量（默认：CACHE_WARM_HOT_DEVICES）')
+@click.option('--lead', default=None, type=float, help='只预热缺失或在该秒数内过期的键（默认：全部重新计算）')
+@with_appcontext
+def cache_warm(pages, hot_devices, lead):
+    """
+    预热热点查询缓存
+    
+    部署或清空 Redis 后执行，预先计算实验室列表、设备列表前几页、热门设备排行、统计数据，
+    以及预约最多的设备的详情和时间段列表，通过流水线批量写入缓存。
+    """
+    try:
+        from app.utils.cache_warmer import cache_warmer
+        
+        click.echo('开始预热缓存...')
+        stats = cache_warmer.warm(pages=pages, hot_devices=hot_devices, lead=lead)
+        click.echo(f'[OK] 预热完成：共 {stats["total"]} 个缓存，写入 {stats["warmed"]} 个，'
+                   f'跳过 {stats["skipped"]} 个，失败 {stats["failed"]} 个')
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f'\n[ERROR] 缓存预热失败: {str(e)}', err=True)
+        import traceback
+        traceback.print_exc()
+        raise click.Abort()
+
+
 def register_commands(app):
     """注册CLI命令到Flask应用"""
     app.cli.add_command(init_users)
     app.cli.add_command(seed_data)
     app.cli.add_command(seed_timeslots)
     app.cli.add_command(clear_equipments)
+    app.cli.add_command(rebuild_claims)
+    app.cli.add_command(rebuild_occupancy)
+    app.cli.add_command(check_occupancy)
+    app.cli.add_command(recompute_next_avail)
+    app.cli.add_command(cache_warm)
 
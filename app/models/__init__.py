@@ -14,6 +14,8 @@ from app.models.student import Student
 from app.models.equipment import Equipment
 from app.models.timeslot import TimeSlot
 from app.models.reservation import Reservation
+from app.models.reservation_claim import ReservationClaim
+from app.models.slot_occupancy import SlotOccupancy
 from app.models.admin import Admin
 from app.models.auditlog import AuditLog
 
@@ -25,6 +27,8 @@ __all__ = [
     'Equipment',
     'TimeSlot',
     'Reservation',
+    'ReservationClaim',
+    'SlotOccupancy',
     'Admin',
     'AuditLog'
 ]
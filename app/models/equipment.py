@@ -18,6 +18,9 @@ class Equipment(db.Model, ToDictMixin):
     # 冗余字段
     next_avail_time = db.Column(db.DateTime, nullable=True, comment='下次可用时间（冗余字段）')
     
+    # 并发控制字段
+    booking_fence = db.Column(db.BigInteger, nullable=True, comment='最近一次预约提交使用的围栏令牌')
+    
     # 关系定义
     reservations = db.relationship('Reservation', backref='equipment', lazy='dynamic')
     time_slots = db.relationship('TimeSlot', backref='equipment', lazy='dynamic', cascade='all, delete-orphan')
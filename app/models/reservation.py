@@ -49,6 +49,8 @@ class Reservation(db.Model, ToDictMixin):
         db.Index('idx_reservation_equip_status', 'equip_id', 'status'),
         db.Index('idx_reservation_student_status', 'student_id', 'status'),
         db.Index('idx_reservation_teacher_status', 'teacher_id', 'status'),
+        # 范围索引：冲突检测按 (设备, 状态, 时间区间) 做窄范围扫描
+        db.Index('idx_reservation_equip_status_time', 'equip_id', 'status', 'start_time', 'end_time'),
     )
     
     def __repr__(self):
@@ -0,0 +1,26 @@
+"""
+预约占用模型
+"""
+from sqlalchemy import BigInteger, Integer
+from app import db
+from app.models.mixins import ToDictMixin
+
+
+class ReservationClaim(db.Model, ToDictMixin):
+    """预约占用表：记录每个预约占用的时间桶，唯一约束保证同一设备同一时间桶只能被一个预约占用"""
+    __tablename__ = 'reservation_claim'
+    
+    # 使用 with_variant 让 SQLite 使用 Integer（支持自动递增），其他数据库使用 BigInteger
+    id = db.Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True, comment='占用ID')
+    equip_id = db.Column(db.BigInteger, db.ForeignKey('equipment.id'), nullable=False, comment='设备ID')
+    bucket_start = db.Column(db.DateTime, nullable=False, comment='时间桶开始时间')
+    reservation_id = db.Column(db.BigInteger, db.ForeignKey('reservation.id'), nullable=False, comment='预约ID')
+    
+    # 添加约束和索引
+    __table_args__ = (
+        db.UniqueConstraint('equip_id', 'bucket_start', name='uq_reservation_claim_equip_bucket'),
+        db.Index('idx_reservation_claim_reservation_id', 'reservation_id'),
+    )
+    
+    def __repr__(self):
+        return f'<ReservationClaim {self.equip_id}@{self.bucket_start}: {self.reservation_id}>'
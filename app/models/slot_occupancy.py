@@ -0,0 +1,33 @@
+"""
+时间段占用读模型
+"""
+from app import db
+from app.models.mixins import ToDictMixin
+
+
+# 占用状态
+OCCUPANCY_PENDING = 1   # 只有待审预约
+OCCUPANCY_BOOKED = 2    # 有已通过预约
+
+
+class SlotOccupancy(db.Model, ToDictMixin):
+    """
+    时间段占用表：记录每个设备每天被待审/已通过预约占用的时间段
+
+    只保存被占用的时间段（不区分是否激活），由预约和时间段的变更在同一事务中维护，
+    可用时间段和可用日期查询直接按 (equip_id, date) 范围读取。
+    """
+    __tablename__ = 'slot_occupancy'
+
+    equip_id = db.Column(db.BigInteger, db.ForeignKey('equipment.id'), primary_key=True, comment='设备ID')
+    date = db.Column(db.Date, primary_key=True, comment='日期（预约开始时间所在的日期）')
+    slot_id = db.Column(db.BigInteger, db.ForeignKey('timeslot.slot_id'), primary_key=True, comment='时间段ID')
+    state = db.Column(db.Integer, nullable=False, comment='占用状态 (1:仅待审, 2:已通过)')
+
+    # 添加索引：时间段删除时按时间段清理
+    __table_args__ = (
+        db.Index('idx_slot_occupancy_slot_id', 'slot_id'),
+    )
+
+    def __repr__(self):
+        return f'<SlotOccupancy {self.equip_id}@{self.date} slot {self.slot_id}: {self.state}>'
@@ -3,6 +3,6 @@
 负责处理业务逻辑，与数据库模型和 API 路由解耦
 """
 # 导入服务模块（按需导入）
-from app.services import lab_service, equipment_service, timeslot_service, reservation_service, statistics_service, auditlog_service
+from app.services import lab_service, equipment_service, timeslot_service, reservation_service, statistics_service, auditlog_service, availability_service, occupancy_service
 
-__all__ = ['lab_service', 'equipment_service', 'timeslot_service', 'reservation_service', 'statistics_service', 'auditlog_service']
+__all__ = ['lab_service', 'equipment_service', 'timeslot_service', 'reservation_service', 'statistics_service', 'auditlog_service', 'availability_service', 'occupancy_service']
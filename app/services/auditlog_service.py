@@ -38,6 +38,37 @@ def create_audit_log(operator_id, action_type, detail=None, ip_address=None):
         raise Exception(f'创建审计日志失败: {str(e)}')
 
 
+def create_audit_logs(operator_id, action_type, details, ip_address=None):
+    """
+    批量创建审计日志记录（同一操作人的同一类操作，一条批量 INSERT、一次提交）
+    
+    Args:
+        operator_id: 操作人ID
+        action_type: 操作类型
+        details: 操作详情列表，每条详情一条记录
+        ip_address: IP地址
+    
+    Returns:
+        int: 创建的记录数量
+    """
+    action_time = datetime.utcnow()
+    rows = [
+        {'operator_id': operator_id, 'action_type': action_type, 'detail': detail,
+         'ip_address': ip_address, 'action_time': action_time}
+        for detail in details
+    ]
+    if not rows:
+        return 0
+    
+    try:
+        db.session.execute(AuditLog.__table__.insert(), rows)
+        db.session.commit()
+        return len(rows)
+    except Exception as e:
+        db.session.rollback()
+        raise Exception(f'创建审计日志失败: {str(e)}')
+
+
 def get_audit_log_list(operator_id=None, action_type=None, start_time=None, end_time=None, page=1, page_size=20):
     """
     获取审计日志列表（支持筛选和分页）
@@ -0,0 +1,309 @@
+"""
+可用时间计算服务
+预约服务和时间段服务共用的设备可用性计算引擎：
+将已通过预约合并为有序、互不重叠的忙碌区间，按时间顺序扫描每天的时间段窗口，
+用二分查找判断窗口是否被占用
+
+批量计算（calculate_all_next_avail_times）用两次查询读取全部设备的时间段和预约，
+按设备分组后逐台扫描，不再为每台设备单独查询
+
+空闲区间扫描（iter_free_intervals）把时间段窗口和忙碌区间归并为有序的空闲区间，
+供跨设备空闲搜索使用
+"""
+from bisect import bisect_right
+from collections import namedtuple
+from itertools import groupby
+from datetime import datetime, timedelta
+
+from app import db
+from app.models.reservation import Reservation
+from app.models.timeslot import TimeSlot
+
+
+# 向前查找可用时间的天数
+SEARCH_DAYS = 30
+
+# 预约状态变化对忙碌区间的影响：busy=True 表示新增占用（审批通过），False 表示释放占用（取消/删除）
+BusyChange = namedtuple('BusyChange', ['start', 'end', 'busy'])
+
+
+def merge_intervals(intervals):
+    """
+    合并重叠或相邻的区间
+    
+    Args:
+        intervals: (start, end) 元组的可迭代对象
+    
+    Returns:
+        list: 按开始时间排序、互不重叠的 (start, end) 列表
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def is_window_busy(window_start, window_end, busy, busy_ends):
+    """
+    判断时间窗口是否与忙碌区间重叠
+    
+    Args:
+        window_start: 窗口开始时间
+        window_end: 窗口结束时间
+        busy: merge_intervals 的结果
+        busy_ends: busy 中每个区间的结束时间列表（合并后结束时间同样有序）
+    
+    Returns:
+        bool: 是否被占用
+    """
+    # 第一个结束时间晚于窗口开始的忙碌区间
+    index = bisect_right(busy_ends, window_start)
+    return index < len(busy) and busy[index][0] < window_end
+
+
+def iter_slot_windows(time_slots, first_date, days):
+    """
+    按时间顺序生成每天每个时间段的窗口
+    
+    Args:
+        time_slots: 按开始时间排序的时间段列表（具有 start_time / end_time 属性）
+        first_date: 起始日期
+        days: 天数
+    
+    Yields:
+        tuple: (窗口开始 datetime, 窗口结束 datetime)
+    """
+    for day_offset in range(days):
+        check_date = first_date + timedelta(days=day_offset)
+        for slot in time_slots:
+            yield datetime.combine(check_date, slot.start_time), datetime.combine(check_date, slot.end_time)
+
+
+def iter_free_intervals(time_slots, busy, first_date, days, not_before=None):
+    """
+    按时间顺序生成时间段窗口中没有被占用的空闲区间
+    
+    窗口和合并后的忙碌区间都是有序的，忙碌区间的下标只向前移动，整个扫描是一次归并。
+    
+    Args:
+        time_slots: 按开始时间排序、互不重叠的激活时间段
+        busy: 合并后的忙碌区间
+        first_date: 起始日期
+        days: 天数
+        not_before: 早于该时间的部分不计入（可选，如当前时间）
+    
+    Yields:
+        tuple: (空闲开始 datetime, 空闲结束 datetime)，每个空闲区间都在一个时间段窗口内
+    """
+    index = 0
+    for window_start, window_end in iter_slot_windows(time_slots, first_date, days):
+        if not_before is not None:
+            if window_end <= not_before:
+                continue
+            window_start = max(window_start, not_before)
+        # 在窗口开始之前结束的忙碌区间不会再影响后面的窗口
+        while index < len(busy) and busy[index][1] <= window_start:
+            index += 1
+        cursor = window_start
+        position = index
+        while position < len(busy) and busy[position][0] < window_end:
+            if busy[position][0] > cursor:
+                yield cursor, busy[position][0]
+            cursor = max(cursor, busy[position][1])
+            position += 1
+        if cursor < window_end:
+            yield cursor, window_end
+
+
+def find_next_free_time(time_slots, busy, now, start_after=None, stop_before=None, days=SEARCH_DAYS):
+    """
+    扫描时间段窗口，返回第一个没有被占用的窗口的可用时间
+    
+    Args:
+        time_slots: 按开始时间排序的激活时间段
+        busy: 合并后的忙碌区间
+        now: 当前时间
+        start_after: 只考虑开始时间不早于该时间的窗口（增量计算时使用）
+        stop_before: 只考虑开始时间早于该时间的窗口（增量计算时使用）
+        days: 从今天起查找的天数
+    
+    Returns:
+        datetime: 下次可用时间；正处于空闲窗口内时返回当前时间；找不到返回 None
+    """
+    busy_ends = [end for _, end in busy]
+    for window_start, window_end in iter_slot_windows(time_slots, now.date(), days):
+        if window_end <= now:
+            continue
+        if start_after is not None and window_start < start_after:
+            continue
+        if stop_before is not None and window_start >= stop_before:
+            break
+        if not is_window_busy(window_start, window_end, busy, busy_ends):
+            return now if window_start < now else window_start
+    return None
+
+
+def get_active_time_slots(equip_id):
+    """获取设备按开始时间排序的激活时间段"""
+    return TimeSlot.query.filter(
+        TimeSlot.equip_id == equip_id,
+        TimeSlot.is_active == 1
+    ).order_by(TimeSlot.start_time).all()
+
+
+def load_busy_intervals(equip_id, window_start, window_end=None):
+    """
+    读取设备在时间窗口内的已通过预约，并合并为忙碌区间
+    只查询开始/结束两列，不构造 ORM 对象
+    
+    Args:
+        equip_id: 设备ID
+        window_start: 只读取结束时间晚于该时间的预约
+        window_end: 只读取开始时间早于该时间的预约（可选）
+    
+    Returns:
+        list: 合并后的忙碌区间
+    """
+    query = db.session.query(Reservation.start_time, Reservation.end_time).filter(
+        Reservation.equip_id == equip_id,
+        Reservation.status == 1,  # 已通过
+        Reservation.start_time.isnot(None),
+        Reservation.end_time.isnot(None),
+        Reservation.end_time > window_start
+    )
+    if window_end is not None:
+        query = query.filter(Reservation.start_time < window_end)
+    return merge_intervals(query.order_by(Reservation.start_time).all())
+
+
+def calculate_next_avail_time(equip_id, now=None):
+    """
+    完整计算设备的下次可用时间
+    
+    Args:
+        equip_id: 设备ID
+        now: 当前时间（默认 UTC 当前时间）
+    
+    Returns:
+        datetime: 下次可用时间，如果 30 天内没有可用时间则返回 None
+    """
+    time_slots = get_active_time_slots(equip_id)
+    if not time_slots:
+        return None
+    
+    now = now or datetime.utcnow()
+    busy = load_busy_intervals(equip_id, now, _search_horizon(now))
+    return find_next_free_time(time_slots, busy, now)
+
+
+def calculate_all_next_avail_times(equip_ids=None, now=None):
+    """
+    批量计算设备的下次可用时间
+    
+    一次查询读取激活时间段，一次查询读取查找范围内的已通过预约（都只读取需要的列并按设备排序），
+    然后按设备分组扫描，结果与逐台调用 calculate_next_avail_time 相同。
+    
+    Args:
+        equip_ids: 设备ID列表（默认全部设备）
+        now: 当前时间（默认 UTC 当前时间）
+    
+    Returns:
+        dict: {设备ID: 下次可用时间}，只包含有激活时间段的设备（其他设备的下次可用时间为 None）
+    """
+    now = now or datetime.utcnow()
+    slot_query = db.session.query(TimeSlot.equip_id, TimeSlot.start_time, TimeSlot.end_time).filter(
+        TimeSlot.is_active == 1
+    )
+    busy_query = db.session.query(Reservation.equip_id, Reservation.start_time, Reservation.end_time).filter(
+        Reservation.status == 1,  # 已通过
+        Reservation.start_time.isnot(None),
+        Reservation.end_time.isnot(None),
+        Reservation.end_time > now,
+        Reservation.start_time < _search_horizon(now)
+    )
+    if equip_ids is not None:
+        slot_query = slot_query.filter(TimeSlot.equip_id.in_(equip_ids))
+        busy_query = busy_query.filter(Reservation.equip_id.in_(equip_ids))
+    
+    slots_by_equipment = {
+        equip_id: list(rows)
+        for equip_id, rows in groupby(slot_query.order_by(TimeSlot.equip_id, TimeSlot.start_time), key=lambda row: row.equip_id)
+    }
+    busy_by_equipment = {
+        equip_id: merge_intervals((row.start_time, row.end_time) for row in rows)
+        for equip_id, rows in groupby(
+            busy_query.order_by(Reservation.equip_id, Reservation.start_time), key=lambda row: row.equip_id
+        )
+        if equip_id in slots_by_equipment
+    }
+    return {
+        equip_id: find_next_free_time(time_slots, busy_by_equipment.get(equip_id, []), now)
+        for equip_id, time_slots in slots_by_equipment.items()
+    }
+
+
+def _search_horizon(now):
+    """查找范围的结束时间（第 SEARCH_DAYS 天的零点）"""
+    return datetime.combine(now.date() + timedelta(days=SEARCH_DAYS), datetime.min.time())
+
+
+def _find_window(time_slots, moment):
+    """返回包含某一时刻的时间段窗口 (开始, 结束)，不存在时返回 None"""
+    for slot in time_slots:
+        if slot.start_time <= moment.time() < slot.end_time:
+            return datetime.combine(moment.date(), slot.start_time), datetime.combine(moment.date(), slot.end_time)
+    return None
+
+
+def next_avail_time_after_change(equip_id, current, change, now=None):
+    """
+    根据一次预约变化增量更新下次可用时间
+    
+    - 新增占用：只有当新预约与当前可用窗口重叠时，才从该窗口之后继续扫描
+    - 释放占用：只检查被释放区间覆盖、且早于当前可用窗口的那些窗口
+    其他情况（无法确定当前值是否有效）回退到完整计算。
+    
+    Args:
+        equip_id: 设备ID
+        current: 设备当前记录的下次可用时间
+        change: BusyChange，描述发生变化的预约区间
+        now: 当前时间（默认 UTC 当前时间）
+    
+    Returns:
+        datetime: 新的下次可用时间
+    """
+    now = now or datetime.utcnow()
+    if change is None or current is None or current < now or not change.start or not change.end:
+        return calculate_next_avail_time(equip_id, now)
+    
+    time_slots = get_active_time_slots(equip_id)
+    if not time_slots:
+        return None
+    
+    current_window = _find_window(time_slots, current)
+    if current_window is None:
+        return calculate_next_avail_time(equip_id, now)
+    window_start, window_end = current_window
+    
+    if change.busy:
+        # 新占用不影响当前可用窗口时，结果不变
+        if not (change.start < window_end and change.end > window_start):
+            return current
+        busy = load_busy_intervals(equip_id, window_end, _search_horizon(now))
+        return find_next_free_time(time_slots, busy, now, start_after=window_end)
+    
+    # 释放的区间不早于当前可用窗口，不会产生更早的可用时间
+    if change.start >= window_start:
+        return current
+    # 只有与释放区间重叠、并且早于当前可用窗口的窗口可能变为空闲，
+    # 更早的窗口在释放前后都处于占用状态，不需要再检查
+    freed_window = _find_window(time_slots, change.start)
+    scan_start = freed_window[0] if freed_window else change.start
+    scan_stop = min(window_start, change.end)
+    busy = load_busy_intervals(equip_id, scan_start, scan_stop + timedelta(days=1))
+    earlier = find_next_free_time(time_slots, busy, now, start_after=scan_start, stop_before=scan_stop)
+    return earlier or current
@@ -6,6 +6,7 @@ from app import db
 from app.models.equipment import Equipment
 from app.models.laboratory import Laboratory
 from app.utils.exceptions import NotFoundError, ValidationError
+from app.utils.negative_cache import negative_cache
 
 
 def get_equipment_list(lab_id=None, keyword=None, category=None, status=None, page=1, page_size=10):
@@ -72,9 +73,15 @@ def get_equipment_by_id(equip_id):
     """
     from sqlalchemy.orm import joinedload
     
+    # 最近查询过且不存在的 ID 不再访问数据库
+    if negative_cache.equipment_missing(equip_id):
+        raise NotFoundError('设备不存在')
+    
     equipment = Equipment.query.options(joinedload(Equipment.laboratory)).get(equip_id)
     if not equipment:
+        negative_cache.mark('equipment', equip_id)
         raise NotFoundError('设备不存在')
+    negative_cache.found('equipment', equip_id)
     return equipment
 
 
@@ -108,6 +115,7 @@ def create_equipment(data):
     try:
         db.session.add(equipment)
         db.session.commit()
+        negative_cache.equipment_added(equipment.id)
         return equipment
     except Exception as e:
         db.session.rollback()
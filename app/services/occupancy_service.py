@@ -0,0 +1,256 @@
+"""
+时间段占用读模型服务
+可用时间段和可用日期查询原本在每次请求时读取设备的全部预约，逐个时间段、逐个预约比较是否重叠。
+AVAILABILITY_READ_MODEL = 'occupancy' 时改为读取 slot_occupancy 表：
+表中记录每个设备每天被待审/已通过预约占用的时间段，预约创建、审批、删除以及时间段变更时
+在同一事务中刷新受影响的日期，查询只需按 (equip_id, date) 读取索引范围。
+
+占用规则与实时计算保持一致：预约归属于开始时间所在的日期，
+时间段与预约的时间部分重叠（slot.start < res.end.time() 且 slot.end > res.start.time()）即为占用。
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from app.models.reservation import Reservation
+from app.models.slot_occupancy import SlotOccupancy, OCCUPANCY_PENDING, OCCUPANCY_BOOKED
+from app.models.timeslot import TimeSlot
+
+
+def is_enabled():
+    """可用性查询是否读取占用表（AVAILABILITY_READ_MODEL = 'occupancy'）"""
+    return current_app.config.get('AVAILABILITY_READ_MODEL', 'live') == 'occupancy'
+
+
+def compute_occupancy(slots, reservations):
+    """
+    计算时间段占用
+
+    Args:
+        slots: 时间段列表（具有 slot_id、start_time、end_time 属性）
+        reservations: 待审/已通过预约列表（具有 start_time、end_time、status 属性）
+
+    Returns:
+        dict: {(date, slot_id): state}，只包含被占用的时间段
+    """
+    occupancy = {}
+    for res in reservations:
+        day = res.start_time.date()
+        res_start, res_end = res.start_time.time(), res.end_time.time()
+        state = OCCUPANCY_BOOKED if res.status == 1 else OCCUPANCY_PENDING
+        for slot in slots:
+            # 重叠条件：max(start1, start2) < min(end1, end2)
+            if slot.start_time < res_end and slot.end_time > res_start:
+                key = (day, slot.slot_id)
+                if occupancy.get(key, 0) < state:
+                    occupancy[key] = state
+    return occupancy
+
+
+def _slot_rows(equip_ids=None):
+    """读取时间段（只读取需要的列），按设备分组"""
+    query = db.session.query(TimeSlot.slot_id, TimeSlot.equip_id, TimeSlot.start_time, TimeSlot.end_time)
+    if equip_ids is not None:
+        query = query.filter(TimeSlot.equip_id.in_(equip_ids))
+    slots = defaultdict(list)
+    for slot in query:
+        slots[slot.equip_id].append(slot)
+    return slots
+
+
+def _reservation_query(*criteria):
+    """待审/已通过且时间完整的预约（只读取需要的列）"""
+    return db.session.query(
+        Reservation.equip_id, Reservation.start_time, Reservation.end_time, Reservation.status
+    ).filter(
+        Reservation.status.in_([0, 1]),
+        Reservation.start_time.isnot(None),
+        Reservation.end_time.isnot(None),
+        *criteria
+    )
+
+
+def _expected_occupancy(equip_ids=None):
+    """
+    根据预约和时间段重新计算占用
+
+    Returns:
+        dict: {(equip_id, date, slot_id): state}
+    """
+    slots = _slot_rows(equip_ids)
+    query = _reservation_query()
+    if equip_ids is not None:
+        query = query.filter(Reservation.equip_id.in_(equip_ids))
+    reservations = defaultdict(list)
+    for res in query:
+        reservations[res.equip_id].append(res)
+
+    expected = {}
+    for equip_id, items in reservations.items():
+        for (day, slot_id), state in compute_occupancy(slots.get(equip_id, []), items).items():
+            expected[(equip_id, day, slot_id)] = state
+    return expected
+
+
+def _insert_rows(occupancy):
+    """写入 {(equip_id, date, slot_id): state}"""
+    rows = [
+        {'equip_id': equip_id, 'date': day, 'slot_id': slot_id, 'state': state}
+        for (equip_id, day, slot_id), state in occupancy.items()
+    ]
+    if rows:
+        db.session.execute(SlotOccupancy.__table__.insert(), rows)
+    return len(rows)
+
+
+# ========== 维护（在调用方的事务中执行，不提交） ==========
+
+def refresh_occupancy(equip_id, dates):
+    """
+    重新计算设备在指定日期的占用
+
+    预约创建、状态变化、删除时调用，与预约的变更在同一事务中提交。
+
+    Args:
+        equip_id: 设备ID
+        dates: 受影响的日期（预约开始时间所在的日期）
+    """
+    dates = sorted(set(dates))
+    if not dates:
+        return
+    SlotOccupancy.query.filter(
+        SlotOccupancy.equip_id == equip_id,
+        SlotOccupancy.date.in_(dates)
+    ).delete(synchronize_session=False)
+
+    reservations = [
+        res for res in _reservation_query(
+            Reservation.equip_id == equip_id,
+            Reservation.start_time >= datetime.combine(dates[0], datetime.min.time()),
+            Reservation.start_time < datetime.combine(dates[-1] + timedelta(days=1), datetime.min.time())
+        )
+        if res.start_time.date() in dates
+    ]
+    if not reservations:
+        return
+    occupancy = compute_occupancy(_slot_rows([equip_id]).get(equip_id, []), reservations)
+    _insert_rows({(equip_id, day, slot_id): state for (day, slot_id), state in occupancy.items()})
+
+
+def refresh_equipment_occupancy(*equip_ids):
+    """
+    重新计算设备全部日期的占用（时间段新增、修改、删除时调用）
+
+    Args:
+        equip_ids: 设备ID
+    """
+    equip_ids = list(set(equip_ids))
+    SlotOccupancy.query.filter(
+        SlotOccupancy.equip_id.in_(equip_ids)
+    ).delete(synchronize_session=False)
+    _insert_rows(_expected_occupancy(equip_ids))
+
+
+# ========== 重建与一致性检查 ==========
+
+def rebuild_occupancy():
+    """
+    根据现有的预约和时间段重建占用表
+    切换到 occupancy 读模型之前、以及绕过服务层批量导入预约之后需要执行一次
+
+    Returns:
+        int: 写入的占用记录数量
+    """
+    try:
+        SlotOccupancy.query.delete(synchronize_session=False)
+        count = _insert_rows(_expected_occupancy())
+        db.session.commit()
+        return count
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def check_occupancy(repair=False):
+    """
+    比较占用表与根据预约和时间段实时计算的结果
+
+    Args:
+        repair: 为 True 时重新计算不一致的设备
+
+    Returns:
+        dict: {
+            'rows': 占用表记录数,
+            'mismatches': [{'equip_id', 'date', 'slot_id', 'expected', 'actual'}]（state 为 None 表示没有记录）,
+            'repaired': 修复的设备数量
+        }
+    """
+    expected = _expected_occupancy()
+    actual = {
+        (row.equip_id, row.date, row.slot_id): row.state
+        for row in db.session.query(
+            SlotOccupancy.equip_id, SlotOccupancy.date, SlotOccupancy.slot_id, SlotOccupancy.state
+        )
+    }
+    mismatches = []
+    for key in sorted(set(expected) | set(actual)):
+        if expected.get(key) != actual.get(key):
+            equip_id, day, slot_id = key
+            mismatches.append({
+                'equip_id': equip_id, 'date': day.isoformat(), 'slot_id': slot_id,
+                'expected': expected.get(key), 'actual': actual.get(key)
+            })
+
+    repaired = 0
+    if repair and mismatches:
+        equip_ids = {item['equip_id'] for item in mismatches}
+        try:
+            refresh_equipment_occupancy(*equip_ids)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        repaired = len(equip_ids)
+    return {'rows': len(actual), 'mismatches': mismatches, 'repaired': repaired}
+
+
+# ========== 查询 ==========
+
+def get_occupied_slot_ids(equip_id, target_date):
+    """
+    设备在某一天被占用的时间段ID
+
+    Returns:
+        set: 时间段ID集合
+    """
+    return {
+        row.slot_id for row in db.session.query(SlotOccupancy.slot_id).filter(
+            SlotOccupancy.equip_id == equip_id,
+            SlotOccupancy.date == target_date
+        )
+    }
+
+
+def get_full_dates(equip_id, slot_ids, start_date, end_date):
+    """
+    设备在日期范围内所有指定时间段都被占用的日期
+
+    Args:
+        equip_id: 设备ID
+        slot_ids: 激活的时间段ID
+        start_date: 开始日期（包含）
+        end_date: 结束日期（不包含）
+
+    Returns:
+        set: 日期集合
+    """
+    slot_ids = list(slot_ids)
+    rows = db.session.query(SlotOccupancy.date, db.func.count(SlotOccupancy.slot_id)).filter(
+        SlotOccupancy.equip_id == equip_id,
+        SlotOccupancy.date >= start_date,
+        SlotOccupancy.date < end_date,
+        SlotOccupancy.slot_id.in_(slot_ids)
+    ).group_by(SlotOccupancy.date)
+    return {day for day, count in rows if count >= len(slot_ids)}
@@ -2,16 +2,40 @@
 预约服务层
 处理预约相关的业务逻辑
 """
+import bisect
+import heapq
+from collections import defaultdict
 from datetime import datetime, timedelta, date, time
-from sqlalchemy import and_
+from flask import current_app
+from sqlalchemy import and_, or_, update, case
+from sqlalchemy.exc import IntegrityError
 from app import db
 from app.models.reservation import Reservation
+from app.models.reservation_claim import ReservationClaim
 from app.models.student import Student
 from app.models.teacher import Teacher
 from app.models.equipment import Equipment
 from app.models.timeslot import TimeSlot
+from app.services import availability_service, occupancy_service
+from app.services.availability_service import BusyChange, merge_intervals, iter_free_intervals
 from app.utils.exceptions import NotFoundError, ValidationError
-from app.utils.redis_client import redis_client
+from app.utils.redis_client import redis_client, reservation_user_tag
+from app.utils.background import background_jobs
+from app.utils.negative_cache import negative_cache
+from app.utils.redis_lock import RedisLock, LockUnavailableError, LockTimeoutError, lock_metrics
+
+# 单个预约的最大跨度：预约的开始和结束必须在同一天
+MAX_RESERVATION_SPAN = timedelta(days=1)
+
+# 系列预约的最大次数与重复规则（间隔天数）
+MAX_SERIES_OCCURRENCES = 52
+SERIES_FREQUENCIES = {'daily': 1, 'weekly': 7}
+
+# 批量审批一次最多处理的预约数量
+MAX_BULK_REVIEW = 200
+
+# 后台任务名称
+NEXT_AVAIL_TIME_JOB = 'equipment_next_avail_time'
 
 
 def _validate_time_range(start_time, end_time):
@@ -45,6 +69,9 @@ def _check_timeslot_availability(equip_id, start_time, end_time):
         start_time: 预约开始时间（datetime）
         end_time: 预约结束时间（datetime）
     
+    Returns:
+        list: 设备的激活时间段（冲突检测时用于计算备选时间）
+    
     Raises:
         ValidationError: 不在可用时间段内
     """
@@ -92,116 +119,564 @@ def _check_timeslot_availability(equip_id, start_time, end_time):
                 break
     
     if not found_valid_slot:
+        # 这条路径没有读取过预约，备选时间只按时间段计算，不为此增加查询（推荐的时间仍可能已被预约）
         raise ValidationError(
             '预约时间不在设备的可用时间段内',
             payload={'field': 'time_range', 'available_slots': [
                 {'start': str(slot.start_time), 'end': str(slot.end_time)}
                 for slot in time_slots
-            ]}
+            ], 'alternatives': _suggest_alternatives(time_slots, [], start_time, end_time)}
         )
+    
+    return time_slots
 
 
-def _check_reservation_conflict(equip_id, start_time, end_time, exclude_reservation_id=None):
+def _lock_equipment_guard(equip_id):
     """
-    检查预约时间是否与其他预约冲突
-    使用 SELECT ... FOR UPDATE 锁定相关行，防止并发冲突
+    锁定设备行，作为该设备所有预约写入的串行化守卫
     
-    注意：为了更严格地防止并发问题，我们锁定设备的所有待审/已通过预约，
-    而不仅仅是冲突的预约。这样可以确保在检查期间，其他事务无法插入新的预约。
+    同一设备的并发预约只会在这一行上排队，而不是锁住该设备的全部预约记录。
+    SQLite 不支持 FOR UPDATE，会自动忽略该子句（测试环境）。
+    
+    Args:
+        equip_id: 设备ID
+    """
+    db.session.query(Equipment.id).filter(
+        Equipment.id == equip_id
+    ).with_for_update(nowait=False).first()
+
+
+def _find_conflicting_reservations(equip_id, start_time, end_time, exclude_reservation_id=None):
+    """
+    在数据库中计算重叠条件，只返回真正冲突的预约
+    
+    重叠条件：start < :end AND end > :start
+    由于预约的开始和结束必须在同一天，额外加上 start > :start - 1天 的下界，
+    使查询在 (equip_id, status, start_time, end_time) 索引上只扫描一个很窄的区间。
     
     Args:
         equip_id: 设备ID
         start_time: 预约开始时间（datetime）
         end_time: 预约结束时间（datetime）
-        exclude_reservation_id: 排除的预约ID（用于更新预约时排除自己）
+        exclude_reservation_id: 排除的预约ID
     
-    Raises:
-        ValidationError: 时间冲突
+    Returns:
+        list: 冲突的预约列表
     """
-    # 策略：锁定设备的所有待审/已通过预约（不仅仅是冲突的）
-    # 这样可以防止在检查期间，其他事务插入新的预约
-    base_query = Reservation.query.filter(
+    query = Reservation.query.filter(
         Reservation.equip_id == equip_id,
-        Reservation.status.in_([0, 1])  # 待审或已通过
+        Reservation.status.in_([0, 1]),  # 待审或已通过
+        Reservation.start_time > start_time - MAX_RESERVATION_SPAN,
+        Reservation.start_time < end_time,
+        Reservation.end_time > start_time
     )
     
     if exclude_reservation_id:
-        base_query = base_query.filter(Reservation.id != exclude_reservation_id)
+        query = query.filter(Reservation.id != exclude_reservation_id)
+    
+    return query.order_by(Reservation.start_time).all()
+
+
+def _build_conflict_info(reservations):
+    """将冲突预约转换为错误信息中的冲突详情"""
+    return [
+        {
+            'id': r.id,
+            'start_time': r.start_time.isoformat() if r.start_time else None,
+            'end_time': r.end_time.isoformat() if r.end_time else None,
+            'status': r.status
+        }
+        for r in reservations
+    ]
+
+
+def _alternative_settings():
+    """备选时间的配置：(数量, 查找天数)"""
+    config = current_app.config
+    return config.get('RESERVATION_ALTERNATIVES', 3), config.get('RESERVATION_ALTERNATIVE_DAYS', 2)
+
+
+def _load_busy_intervals(equip_id, start_time, end_time, exclude_reservation_id=None):
+    """
+    读取计算备选时间需要的忙碌区间
+    
+    只在已经发现冲突后调用（仍在冲突检查的事务中），成功的预约不会执行这次查询。
+    读取从预约当天起 RESERVATION_ALTERNATIVE_DAYS 天内的待审/已通过预约，只选择开始和结束时间两列，
+    仍然是 (equip_id, status, start_time, end_time) 索引上的一个窄区间。
+    
+    Args:
+        equip_id: 设备ID
+        start_time: 预约开始时间（datetime）
+        end_time: 预约结束时间（datetime）
+        exclude_reservation_id: 排除的预约ID
+    
+    Returns:
+        list: 合并后的忙碌区间；不计算备选时间（RESERVATION_ALTERNATIVES = 0）时为 None
+    """
+    count, days = _alternative_settings()
+    if count <= 0 or days <= 0:
+        return None
+    
+    window_start = datetime.combine(start_time.date(), time.min)
+    window_end = max(window_start + timedelta(days=days), end_time)
+    query = db.session.query(Reservation.start_time, Reservation.end_time).filter(
+        Reservation.equip_id == equip_id,
+        Reservation.status.in_([0, 1]),  # 待审或已通过
+        Reservation.start_time > window_start - MAX_RESERVATION_SPAN,
+        Reservation.start_time < window_end,
+        Reservation.end_time > window_start
+    )
+    if exclude_reservation_id:
+        query = query.filter(Reservation.id != exclude_reservation_id)
     
-    # 先锁定所有相关预约（防止并发插入）
-    # 使用 with_for_update(nowait=False) 等待锁释放
-    locked_reservations = base_query.with_for_update(nowait=False).all()
+    return merge_intervals(query.order_by(Reservation.start_time).all())
+
+
+def _suggest_alternatives(time_slots, busy, start_time, end_time, now=None):
+    """
+    根据已读取的忙碌区间，计算同一设备上与请求时长相同、开始时间离请求最近的可行时间
+    
+    不访问数据库：时间段窗口减去忙碌区间得到空闲区间，每个能容纳请求时长的空闲区间
+    取离请求开始时间最近的开始时间，再取距离最小的 RESERVATION_ALTERNATIVES 个。
+    
+    Args:
+        time_slots: 设备的激活时间段
+        busy: _load_busy_intervals 返回的忙碌区间（为 None 时不计算）
+        start_time: 请求的开始时间
+        end_time: 请求的结束时间
+        now: 当前时间（默认 UTC 当前时间），不会推荐已经开始的时间
     
-    # 然后检查时间冲突：max(start1, start2) < min(end1, end2)
-    conflicting_reservations = [
-        r for r in locked_reservations
-        if r.start_time and r.end_time and
-        r.start_time < end_time and r.end_time > start_time
+    Returns:
+        list: [{'start_time': ISO 格式, 'end_time': ISO 格式}]，按离请求时间的距离排序
+    """
+    count, days = _alternative_settings()
+    if busy is None or not time_slots or count <= 0:
+        return []
+    
+    duration = end_time - start_time
+    now = now or datetime.utcnow()
+    # 从当前时间之后的下一个整分钟开始
+    not_before = now.replace(second=0, microsecond=0)
+    if not_before < now:
+        not_before += timedelta(minutes=1)
+    
+    candidates = []
+    time_slots = sorted(time_slots, key=lambda slot: slot.start_time)
+    for free_start, free_end in iter_free_intervals(time_slots, busy, start_time.date(), days, not_before):
+        if free_end - free_start >= duration:
+            candidates.append(min(max(start_time, free_start), free_end - duration))
+    
+    nearest = heapq.nsmallest(count, candidates, key=lambda candidate: (abs(candidate - start_time), candidate))
+    return [
+        {'start_time': candidate.isoformat(), 'end_time': (candidate + duration).isoformat()}
+        for candidate in nearest
     ]
+
+
+def _suggest_sibling_alternatives(equip_id, start_time, end_time):
+    """
+    同一实验室、同一类别的其他设备上从请求时间开始最早的可行时间（RESERVATION_ALTERNATIVES_SIBLINGS）
+    
+    需要额外两次查询（见 timeslot_service.search_free_equipment），默认不启用。
+    
+    Returns:
+        list: [{'equip_id', 'equip_name', 'start_time', 'end_time'}]
+    """
+    count, days = _alternative_settings()
+    if not current_app.config.get('RESERVATION_ALTERNATIVES_SIBLINGS', False) or count <= 0 or days <= 0:
+        return []
+    equipment = Equipment.query.get(equip_id)
+    if not equipment or equipment.lab_id is None:
+        return []
+    
+    # timeslot_service 依赖本模块，在这里导入避免循环导入
+    from app.services.timeslot_service import search_free_equipment
+    
+    minutes = -(-int((end_time - start_time).total_seconds()) // 60)
+    results = search_free_equipment(
+        lab_id=equipment.lab_id, category=equipment.category, start_date=start_time.date(), days=days,
+        duration=minutes, limit=count + 1, now=max(start_time, datetime.utcnow())
+    )
+    return [
+        {key: item[key] for key in ('equip_id', 'equip_name', 'start_time', 'end_time')}
+        for item in results if item['equip_id'] != equip_id
+    ][:count]
+
+
+def _conflict_error(equip_id, start_time, end_time, conflicts, time_slots=None, exclude_reservation_id=None):
+    """
+    构造预约冲突错误，附带冲突详情和备选时间
+    
+    计算备选时间时再读取一次忙碌区间（见 _load_busy_intervals），只有被拒绝的请求多这一次查询。
+    
+    Args:
+        equip_id: 设备ID
+        start_time: 请求的开始时间
+        end_time: 请求的结束时间
+        conflicts: 冲突的预约列表
+        time_slots: 设备的激活时间段（可选，没有时不计算同一设备的备选时间）
+        exclude_reservation_id: 读取忙碌区间时排除的预约ID
+    
+    Returns:
+        ValidationError
+    """
+    busy = _load_busy_intervals(equip_id, start_time, end_time, exclude_reservation_id) if time_slots else None
+    payload = {
+        'field': 'time_range',
+        'conflicts': _build_conflict_info(conflicts),
+        'alternatives': _suggest_alternatives(time_slots, busy, start_time, end_time)
+    }
+    siblings = _suggest_sibling_alternatives(equip_id, start_time, end_time)
+    if siblings:
+        payload['sibling_alternatives'] = siblings
+    return ValidationError('预约时间与已有预约冲突', payload=payload)
+
+
+def _check_reservation_conflict(equip_id, start_time, end_time, exclude_reservation_id=None, time_slots=None):
+    """
+    检查预约时间是否与其他预约冲突
+    
+    先对设备行加锁（SELECT ... FOR UPDATE），让同一设备的预约写入串行执行，
+    再由数据库计算重叠条件，只读取与本次预约重叠的行。
+    相比锁定设备的全部待审/已通过预约，锁集合恒定为一行，读取的数据量也与历史预约数无关。
+    
+    Args:
+        equip_id: 设备ID
+        start_time: 预约开始时间（datetime）
+        end_time: 预约结束时间（datetime）
+        exclude_reservation_id: 排除的预约ID（用于更新预约时排除自己）
+        time_slots: 设备的激活时间段（可选），提供时冲突错误中附带备选时间
+    
+    Raises:
+        ValidationError: 时间冲突，payload 中的 alternatives 为同一设备上离请求最近的可行时间
+    """
+    # 锁定设备守卫行（防止并发插入），锁会持有到事务提交或回滚
+    _lock_equipment_guard(equip_id)
+    
+    # 只读取与本次预约重叠的行；发现冲突后才读取备选时间需要的忙碌区间
+    conflicting_reservations = _find_conflicting_reservations(
+        equip_id, start_time, end_time, exclude_reservation_id
+    )
     
     if conflicting_reservations:
-        conflict_info = [
-            {
-                'id': r.id,
-                'start_time': r.start_time.isoformat() if r.start_time else None,
-                'end_time': r.end_time.isoformat() if r.end_time else None,
-                'status': r.status
-            }
-            for r in conflicting_reservations
-        ]
-        raise ValidationError(
-            '预约时间与已有预约冲突',
-            payload={'field': 'time_range', 'conflicts': conflict_info}
+        raise _conflict_error(
+            equip_id, start_time, end_time, conflicting_reservations, time_slots, exclude_reservation_id
         )
 
 
-def create_reservation(data, current_user):
+def _conflict_mode():
+    """当前的预约并发控制模式：lock / claim / redis_lock"""
+    return current_app.config.get('RESERVATION_CONFLICT_MODE', 'lock')
+
+
+def _iter_claim_buckets(start_time, end_time):
     """
-    创建预约（学生/教师）
+    计算预约占用的时间桶
+    
+    开始时间向下取整、结束时间向上取整到桶粒度，不足一个桶按整桶占用。
+    结束时间带秒或微秒时（时间段校验对边界秒数有容忍）同样向上取整，占用结束时间所在的桶，
+    之后从该分钟开始的预约才会与它竞争同一个桶。
+    默认粒度为 1 分钟，与预约的时间粒度一致，不重叠的相邻预约不会占用同一个桶。
     
     Args:
-        data: 预约数据字典
-        current_user: 当前用户信息
+        start_time: 预约开始时间（datetime）
+        end_time: 预约结束时间（datetime）
+    
+    Yields:
+        datetime: 每个时间桶的开始时间
+    """
+    bucket_minutes = current_app.config.get('RESERVATION_CLAIM_BUCKET_MINUTES', 1)
+    bucket = start_time.replace(second=0, microsecond=0)
+    bucket -= timedelta(minutes=bucket.minute % bucket_minutes)
+    step = timedelta(minutes=bucket_minutes)
+    while bucket < end_time:
+        yield bucket
+        bucket += step
+
+
+def _add_reservation_claims(reservation):
+    """
+    写入预约占用记录（与预约在同一事务中）
+    
+    并发预约同一时间桶时，后插入的一方会触发唯一约束错误（IntegrityError）。
+    
+    Args:
+        reservation: 已 flush、拥有 ID 的预约对象
+    """
+    if not reservation.start_time or not reservation.end_time:
+        return
+    rows = [
+        {'equip_id': reservation.equip_id, 'bucket_start': bucket, 'reservation_id': reservation.id}
+        for bucket in _iter_claim_buckets(reservation.start_time, reservation.end_time)
+    ]
+    if rows:
+        db.session.execute(ReservationClaim.__table__.insert(), rows)
+
+
+def _release_reservation_claims(reservation_id):
+    """
+    释放预约占用记录（取消、拒绝、删除时调用，在调用方的事务中执行）
+    
+    Args:
+        reservation_id: 预约ID
+    """
+    ReservationClaim.query.filter(
+        ReservationClaim.reservation_id == reservation_id
+    ).delete(synchronize_session=False)
+
+
+def _refresh_slot_occupancy(reservation):
+    """
+    刷新预约所在日期的时间段占用（AVAILABILITY_READ_MODEL = 'occupancy' 时，在调用方的事务中执行）
+    
+    Args:
+        reservation: 已加入会话（新增、修改或删除）的预约对象
+    """
+    if occupancy_service.is_enabled() and reservation.start_time and reservation.end_time:
+        occupancy_service.refresh_occupancy(reservation.equip_id, [reservation.start_time.date()])
+
+
+def _insert_with_claims(reservation, time_slots=None):
+    """
+    claim 模式下创建预约：预约和占用记录一起 INSERT，不加锁
+    
+    Args:
+        reservation: 待创建的预约对象
+        time_slots: 设备的激活时间段（可选，用于计算备选时间）
+    
+    Raises:
+        ValidationError: 时间冲突（唯一约束冲突）
+    """
+    try:
+        db.session.add(reservation)
+        db.session.flush()
+        _add_reservation_claims(reservation)
+        _refresh_slot_occupancy(reservation)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        conflicting_reservations = _find_conflicting_reservations(
+            reservation.equip_id, reservation.start_time, reservation.end_time
+        )
+        if not conflicting_reservations:
+            raise ValidationError('预约时间已被占用，请刷新后重试', payload={'field': 'time_range'})
+        raise _conflict_error(
+            reservation.equip_id, reservation.start_time, reservation.end_time,
+            conflicting_reservations, time_slots
+        )
+
+
+def _booking_lock(equip_id):
+    """设备级的预约 Redis 锁"""
+    return RedisLock(f'booking:equip:{equip_id}', ttl_ms=current_app.config.get('RESERVATION_LOCK_TTL_MS', 3000))
+
+
+def _committed_booking_fence(equip_id):
+    """设备上已提交的围栏令牌（没有时为 None）"""
+    return db.session.query(Equipment.booking_fence).filter(Equipment.id == equip_id).scalar()
+
+
+def _acquire_booking_lock(lock, equip_id):
+    """获取设备级预约锁，Redis 中的围栏计数器丢失时从数据库中已提交的令牌继续"""
+    return lock.acquire(
+        wait_ms=current_app.config.get('RESERVATION_LOCK_WAIT_MS', 2000),
+        fence_floor=lambda: _committed_booking_fence(equip_id)
+    )
+
+
+def _advance_booking_fence(equip_id, token):
+    """
+    检查冲突前校验并推进设备的围栏令牌（与 INSERT 在同一事务中，UPDATE 同时锁定设备行）
+    
+    只有令牌大于设备上记录的令牌时才会更新成功。更新失败说明本次持有的 Redis 锁已过期，
+    且更晚获得锁的请求已经提交过，此时必须放弃本次写入；也可能是 Redis 中的计数器回退到了
+    旧值，因此失败时把计数器抬高到已提交的令牌，重试即可恢复，而不是之后的预约一直失败。
+    
+    Args:
+        equip_id: 设备ID
+        token: 加锁时获得的围栏令牌
+    
+    Raises:
+        ValidationError: 令牌已过期
+    """
+    result = db.session.execute(
+        update(Equipment)
+        .where(
+            Equipment.id == equip_id,
+            or_(Equipment.booking_fence.is_(None), Equipment.booking_fence < token)
+        )
+        .values(booking_fence=token)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        committed = _committed_booking_fence(equip_id)
+        if committed is not None:
+            _booking_lock(equip_id).raise_fence(committed)
+        raise ValidationError('预约锁已失效，请重试', payload={'field': 'equip_id'})
+
+
+def _insert_with_redis_lock(reservation, time_slots=None):
+    """
+    redis_lock 模式下创建预约：持有设备级 Redis 锁期间检查冲突并插入
+    
+    先推进围栏令牌：这条 UPDATE 会锁定设备行，之后的冲突检查在行锁下读取。
+    租约已过期的旧持有者与新持有者因此在设备行上排队，后提交的一方一定能看到
+    先提交的预约；Redis 不可用时回退到同一设备行上的守卫行锁，与持锁写入同样互斥。
+    
+    因此事务仍是 UPDATE 设备行 + 冲突查询 + INSERT，持有与 lock 模式相同的设备行锁，
+    并不比 lock 模式短；Redis 锁只让同一设备的请求在进入数据库之前排队。
+    
+    Args:
+        reservation: 待创建的预约对象
+        time_slots: 设备的激活时间段（可选，用于计算备选时间）
+    
+    Raises:
+        ValidationError: 时间冲突、等待锁超时或锁已失效
+    """
+    lock = _booking_lock(reservation.equip_id)
+    try:
+        token = _acquire_booking_lock(lock, reservation.equip_id)
+    except LockUnavailableError as e:
+        lock_metrics.record_fallback()
+        current_app.logger.warning(f'Redis 锁不可用，回退到数据库锁: {e}')
+        _check_reservation_conflict(
+            reservation.equip_id, reservation.start_time, reservation.end_time, time_slots=time_slots
+        )
+        db.session.add(reservation)
+        _refresh_slot_occupancy(reservation)
+        db.session.commit()
+        return
+    except LockTimeoutError:
+        raise ValidationError('该设备正在被其他用户预约，请稍后重试', payload={'field': 'equip_id'})
+    
+    try:
+        _advance_booking_fence(reservation.equip_id, token)
+        conflicting_reservations = _find_conflicting_reservations(
+            reservation.equip_id, reservation.start_time, reservation.end_time
+        )
+        if conflicting_reservations:
+            raise _conflict_error(
+                reservation.equip_id, reservation.start_time, reservation.end_time,
+                conflicting_reservations, time_slots
+            )
+        db.session.add(reservation)
+        _refresh_slot_occupancy(reservation)
+        db.session.commit()
+    except Exception:
+        # 任何失败都在释放锁之前回滚，避免锁已释放而会话中仍留着未提交的写入
+        db.session.rollback()
+        raise
+    finally:
+        lock.release()
+
+
+def rebuild_reservation_claims():
+    """
+    根据现有的待审/已通过预约重建占用表
+    切换到 claim 模式之前需要执行一次，保证历史预约也参与唯一约束检查
     
     Returns:
-        Reservation: 创建的预约对象
+        int: 写入的占用记录数量
+    """
+    ReservationClaim.query.delete(synchronize_session=False)
+    reservations = Reservation.query.filter(
+        Reservation.status.in_([0, 1]),
+        Reservation.start_time.isnot(None),
+        Reservation.end_time.isnot(None)
+    ).order_by(Reservation.equip_id, Reservation.start_time).all()
+    
+    rows = []
+    claimed = set()
+    for r in reservations:
+        for bucket in _iter_claim_buckets(r.start_time, r.end_time):
+            # 历史数据中可能存在重叠预约，同一时间桶只保留最早的一个
+            if (r.equip_id, bucket) in claimed:
+                continue
+            claimed.add((r.equip_id, bucket))
+            rows.append({'equip_id': r.equip_id, 'bucket_start': bucket, 'reservation_id': r.id})
+    
+    try:
+        if rows:
+            db.session.execute(ReservationClaim.__table__.insert(), rows)
+        db.session.commit()
+        return len(rows)
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def _get_bookable_equipment(equip_id):
+    """
+    获取要预约的设备
     
     Raises:
-        ValidationError: 数据验证失败
+        ValidationError: 设备不存在
     """
-    # 验证设备是否存在
-    equipment = Equipment.query.get(data.get('equip_id'))
+    if negative_cache.equipment_missing(equip_id):
+        raise ValidationError('设备不存在', payload={'field': 'equip_id'})
+    equipment = Equipment.query.get(equip_id)
     if not equipment:
+        negative_cache.mark('equipment', equip_id)
         raise ValidationError('设备不存在', payload={'field': 'equip_id'})
+    negative_cache.found('equipment', equip_id)
+    return equipment
+
+
+def _resolve_booking_user(current_user):
+    """
+    根据当前用户确定预约人
+    
+    Args:
+        current_user: 当前用户信息
     
-    # 先检查用户类型（在检查时间段之前，确保错误消息正确）
+    Returns:
+        tuple: (student_id, teacher_id, user_name)
+    
+    Raises:
+        ValidationError: 用户不存在或用户类型不支持预约
+    """
     user_id = current_user['user_id']
     user_type = current_user['user_type']
     
-    # 填充冗余字段
-    user_name = None
     if user_type == 'student':
         student = Student.query.get(user_id)
         if not student:
             raise ValidationError('学生不存在')
-        user_name = student.name
-        data['student_id'] = user_id
-        data['teacher_id'] = None
-    elif user_type == 'teacher':
+        return user_id, None, student.name
+    if user_type == 'teacher':
         teacher = Teacher.query.get(user_id)
         if not teacher:
             raise ValidationError('教师不存在')
-        user_name = teacher.name
-        data['student_id'] = None
-        data['teacher_id'] = user_id
-    else:
-        raise ValidationError('用户类型不支持预约')
+        return None, user_id, teacher.name
+    raise ValidationError('用户类型不支持预约')
+
+
+def create_reservation(data, current_user):
+    """
+    创建预约（学生/教师）
+    
+    Args:
+        data: 预约数据字典
+        current_user: 当前用户信息
+    
+    Returns:
+        Reservation: 创建的预约对象
+    
+    Raises:
+        ValidationError: 数据验证失败
+    """
+    # 验证设备是否存在
+    equipment = _get_bookable_equipment(data.get('equip_id'))
+    
+    # 先检查用户类型（在检查时间段之前，确保错误消息正确），填充冗余字段
+    data['student_id'], data['teacher_id'], user_name = _resolve_booking_user(current_user)
     
     # 获取预约时间
     start_time = data.get('start_time')
     end_time = data.get('end_time')
     
     # 如果提供了时间，进行验证
+    time_slots = None
     if start_time and end_time:
         # 确保是 datetime 对象
         if isinstance(start_time, str):
@@ -219,7 +694,7 @@ def create_reservation(data, current_user):
         _validate_time_range(start_time, end_time)
         
         # 2. 检查是否在可用时间段内
-        _check_timeslot_availability(data.get('equip_id'), start_time, end_time)
+        time_slots = _check_timeslot_availability(data.get('equip_id'), start_time, end_time)
     
     # 创建预约对象（先不提交）
     reservation = Reservation(
@@ -237,19 +712,29 @@ def create_reservation(data, current_user):
     )
     
     try:
-        # 在事务中：先检查冲突（使用锁），然后创建预约
-        # 这样可以确保检查和创建是原子操作
-        if start_time and end_time:
-            # 3. 检查是否与其他预约冲突（在事务中，使用锁）
-            _check_reservation_conflict(data.get('equip_id'), start_time, end_time)
+        mode = _conflict_mode()
+        if start_time and end_time and mode == 'claim':
+            # 3. claim 模式：预约与占用记录一起插入，由唯一约束判定冲突
+            _insert_with_claims(reservation, time_slots)
+        elif start_time and end_time and mode == 'redis_lock':
+            # 3. redis_lock 模式：持有设备级 Redis 锁时检查冲突并插入
+            _insert_with_redis_lock(reservation, time_slots)
+        else:
+            # 在事务中：先检查冲突（使用锁），然后创建预约
+            # 这样可以确保检查和创建是原子操作
+            if start_time and end_time:
+                # 3. 检查是否与其他预约冲突（在事务中，使用锁）
+                _check_reservation_conflict(data.get('equip_id'), start_time, end_time, time_slots=time_slots)
+            
+            # 添加预约到会话（此时还在事务中）
+            db.session.add(reservation)
+            _refresh_slot_occupancy(reservation)
+            # 提交事务（释放锁）
+            db.session.commit()
         
-        # 添加预约到会话（此时还在事务中）
-        db.session.add(reservation)
-        # 提交事务（释放锁）
-        db.session.commit()
-        
-        # 清除相关缓存
-        _clear_reservation_cache()
+        # 清除相关缓存（新预约还没有详情缓存，但该 ID 可能在负缓存中）
+        _clear_reservation_cache(reservation, clear_detail=False)
+        negative_cache.forget('reservation', reservation.id)
         
         # 注意：创建预约时不需要更新 next_avail_time，因为状态是待审(0)
         # 只有审批通过后才会影响可用时间
@@ -263,6 +748,247 @@ def create_reservation(data, current_user):
         raise ValidationError(f'创建预约失败: {str(e)}')
 
 
+def _expand_series(start_time, end_time, frequency='weekly', interval=1, count=None, until=None):
+    """
+    按重复规则展开系列预约
+    
+    Args:
+        start_time: 第一次预约的开始时间（datetime）
+        end_time: 第一次预约的结束时间（datetime）
+        frequency: 重复频率（daily / weekly）
+        interval: 每隔几个周期重复一次
+        count: 重复次数
+        until: 最后一次预约的日期（包含），与 count 同时提供时取两者中较少的次数
+    
+    Returns:
+        list: [(start_time, end_time)]，按开始时间排序
+    
+    Raises:
+        ValidationError: 重复规则无效或次数超过 MAX_SERIES_OCCURRENCES
+    """
+    if frequency not in SERIES_FREQUENCIES:
+        raise ValidationError('重复频率必须是 daily 或 weekly', payload={'field': 'frequency'})
+    if not interval or interval < 1:
+        raise ValidationError('重复间隔必须为正整数', payload={'field': 'interval'})
+    if count is None and until is None:
+        raise ValidationError('重复次数和截止日期不能都为空', payload={'field': 'count'})
+    
+    step = timedelta(days=SERIES_FREQUENCIES[frequency] * interval)
+    occurrences = []
+    while count is None or len(occurrences) < count:
+        offset = step * len(occurrences)
+        if until is not None and (start_time + offset).date() > until:
+            break
+        if len(occurrences) >= MAX_SERIES_OCCURRENCES:
+            raise ValidationError(
+                f'系列预约最多 {MAX_SERIES_OCCURRENCES} 次', payload={'field': 'count'}
+            )
+        occurrences.append((start_time + offset, end_time + offset))
+    
+    if not occurrences:
+        raise ValidationError('截止日期早于第一次预约', payload={'field': 'until'})
+    return occurrences
+
+
+def _load_series_reservations(equip_id, occurrences):
+    """
+    一次查询读取可能与系列中任意一次预约冲突的待审/已通过预约
+    
+    每次预约对应 (equip_id, status, start_time, end_time) 索引上的一个窄区间，
+    只读取冲突判断和冲突详情需要的列。
+    
+    Returns:
+        list: 按开始时间排序的 (id, start_time, end_time, status) 行
+    """
+    windows = [
+        and_(Reservation.start_time > start - MAX_RESERVATION_SPAN, Reservation.start_time < end)
+        for start, end in occurrences
+    ]
+    return db.session.query(
+        Reservation.id, Reservation.start_time, Reservation.end_time, Reservation.status
+    ).filter(
+        Reservation.equip_id == equip_id,
+        Reservation.status.in_([0, 1]),  # 待审或已通过
+        Reservation.end_time > occurrences[0][0],
+        or_(*windows)
+    ).order_by(Reservation.start_time).all()
+
+
+def _match_series_conflicts(occurrences, existing):
+    """
+    在按开始时间排序的已有预约上为每次预约二分查找冲突
+    
+    预约不会跨天，所以与 [start, end) 冲突的预约开始时间一定落在 (start - 1天, end) 内，
+    两次二分得到候选区间后只需再比较结束时间。
+    
+    Args:
+        occurrences: [(start_time, end_time)]
+        existing: _load_series_reservations 返回的已有预约
+    
+    Returns:
+        list: 与 occurrences 一一对应的冲突预约列表
+    """
+    starts = [r.start_time for r in existing]
+    matches = []
+    for start, end in occurrences:
+        lo = bisect.bisect_right(starts, start - MAX_RESERVATION_SPAN)
+        hi = bisect.bisect_left(starts, end)
+        matches.append([r for r in existing[lo:hi] if r.end_time > start])
+    return matches
+
+
+def _insert_series(occurrences, fields):
+    """
+    一条批量 INSERT 写入系列预约，再读回带 ID 的预约对象（在调用方的事务中执行）
+    
+    MySQL 不支持 INSERT ... RETURNING，按设备、预约人、申请时间和开始时间读回本次写入的记录；
+    这些时间已经通过冲突检查，同一设备上不会有其他待审/已通过预约。
+    
+    Args:
+        occurrences: [(start_time, end_time)]
+        fields: 每条预约相同的字段（equip_id、student_id、teacher_id、apply_time 等）
+    
+    Returns:
+        list: 按开始时间排序的预约对象
+    """
+    rows = [dict(fields, start_time=start, end_time=end) for start, end in occurrences]
+    db.session.execute(Reservation.__table__.insert(), rows)
+    if fields['student_id']:
+        owner = Reservation.student_id == fields['student_id']
+    else:
+        owner = Reservation.teacher_id == fields['teacher_id']
+    return Reservation.query.filter(
+        Reservation.equip_id == fields['equip_id'],
+        owner,
+        Reservation.status == 0,
+        Reservation.apply_time == fields['apply_time'],
+        Reservation.start_time.in_([start for start, _ in occurrences])
+    ).order_by(Reservation.start_time).all()
+
+
+def _occurrence_info(index, occurrence, conflicts):
+    """系列中一次预约的冲突详情"""
+    start, end = occurrence
+    return {
+        'index': index,
+        'start_time': start.isoformat(),
+        'end_time': end.isoformat(),
+        'conflicts': _build_conflict_info(conflicts)
+    }
+
+
+def create_reservation_series(data, current_user):
+    """
+    创建系列预约（学生/教师），例如整个学期每周同一时间使用设备
+    
+    按重复规则展开后，在一次加锁的检查中完成全部预约的校验：
+    所有预约的时间部分相同，时间段只需校验一次；已有预约只读取一次，
+    每次预约在排序后的开始时间上二分查找冲突；最后用一条批量 INSERT 写入，一次提交。
+    
+    Args:
+        data: 预约数据字典（equip_id、start_time、end_time 为第一次预约的时间，
+              frequency、interval、count、until 为重复规则，skip_conflicts 为 True 时跳过冲突的预约）
+        current_user: 当前用户信息
+    
+    Returns:
+        dict: {
+            'reservations': 创建的预约对象列表,
+            'skipped': [{'index', 'start_time', 'end_time', 'conflicts'}] 跳过的冲突预约
+        }
+    
+    Raises:
+        ValidationError: 数据验证失败；存在冲突（不跳过冲突时，payload 的 occurrences 为每次冲突的详情）
+    """
+    equip_id = data.get('equip_id')
+    equipment = _get_bookable_equipment(equip_id)
+    student_id, teacher_id, user_name = _resolve_booking_user(current_user)
+    
+    # 1. 验证第一次预约的时间范围（第一次最早，之后的预约平移整天，同样有效）
+    _validate_time_range(data.get('start_time'), data.get('end_time'))
+    occurrences = _expand_series(
+        data['start_time'], data['end_time'],
+        frequency=data.get('frequency', 'weekly'), interval=data.get('interval', 1),
+        count=data.get('count'), until=data.get('until')
+    )
+    
+    # 2. 每次预约的时间部分相同，只需检查一次时间段
+    _check_timeslot_availability(equip_id, *occurrences[0])
+    
+    mode = _conflict_mode()
+    lock = token = None
+    if mode == 'redis_lock':
+        lock = _booking_lock(equip_id)
+        try:
+            token = _acquire_booking_lock(lock, equip_id)
+        except LockUnavailableError as e:
+            lock_metrics.record_fallback()
+            current_app.logger.warning(f'Redis 锁不可用，回退到数据库锁: {e}')
+            lock = None
+        except LockTimeoutError:
+            raise ValidationError('该设备正在被其他用户预约，请稍后重试', payload={'field': 'equip_id'})
+    
+    try:
+        # 3. 一次读取、逐次二分查找冲突（claim 模式不加锁，由唯一约束兜底）
+        #    redis_lock 模式先推进围栏令牌，读取在它锁定的设备行下进行；回退时使用同一行上的守卫行锁
+        if token is not None:
+            _advance_booking_fence(equip_id, token)
+        elif mode in ('lock', 'redis_lock'):
+            _lock_equipment_guard(equip_id)
+        matches = _match_series_conflicts(occurrences, _load_series_reservations(equip_id, occurrences))
+        skipped = [
+            _occurrence_info(index, occurrence, conflicts)
+            for index, (occurrence, conflicts) in enumerate(zip(occurrences, matches)) if conflicts
+        ]
+        if skipped and (not data.get('skip_conflicts') or len(skipped) == len(occurrences)):
+            raise ValidationError(
+                f'系列中有 {len(skipped)} 次预约与已有预约冲突',
+                payload={'field': 'time_range', 'occurrences': skipped}
+            )
+        
+        # 4. 一条批量 INSERT 写入不冲突的预约
+        reservations = _insert_series(
+            [occurrence for occurrence, conflicts in zip(occurrences, matches) if not conflicts],
+            {
+                'equip_id': equip_id, 'student_id': student_id, 'teacher_id': teacher_id, 'status': 0,
+                # 去掉微秒，与 MySQL DATETIME 的精度一致，保证能按申请时间读回
+                'apply_time': datetime.utcnow().replace(microsecond=0),
+                'user_name': user_name, 'equip_name': equipment.name,
+                'price': data.get('price'), 'description': data.get('description')
+            }
+        )
+        if mode == 'claim':
+            for reservation in reservations:
+                _add_reservation_claims(reservation)
+        if occupancy_service.is_enabled():
+            occupancy_service.refresh_occupancy(equip_id, [r.start_time.date() for r in reservations])
+        reservation_ids = [r.id for r in reservations]
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise ValidationError('预约时间已被占用，请刷新后重试', payload={'field': 'time_range'})
+    except ValidationError:
+        db.session.rollback()
+        raise
+    except Exception as e:
+        db.session.rollback()
+        raise ValidationError(f'创建预约失败: {str(e)}')
+    finally:
+        if lock is not None:
+            lock.release()
+    
+    # 提交后对象已过期，一次查询重新加载，避免逐个刷新
+    reservations = Reservation.query.filter(
+        Reservation.id.in_(reservation_ids)
+    ).order_by(Reservation.start_time).all()
+    
+    # 同一用户的预约列表缓存只需失效一次
+    _clear_reservation_cache(reservations[0], clear_detail=False)
+    for reservation_id in reservation_ids:
+        negative_cache.forget('reservation', reservation_id)
+    
+    return {'reservations': reservations, 'skipped': skipped}
+
+
 def get_reservation_list(user_id=None, equip_id=None, status=None, user_type=None):
     """
     获取预约列表（支持筛选）
@@ -312,9 +1038,15 @@ def get_reservation_by_id(reservation_id):
     Raises:
         NotFoundError: 预约不存在
     """
+    # 最近查询过且不存在的 ID 不再访问数据库
+    if negative_cache.is_missing('reservation', reservation_id):
+        raise NotFoundError('预约不存在')
+    
     reservation = Reservation.query.get(reservation_id)
     if not reservation:
+        negative_cache.mark('reservation', reservation_id)
         raise NotFoundError('预约不存在')
+    negative_cache.found('reservation', reservation_id)
     return reservation
 
 
@@ -353,6 +1085,13 @@ def update_reservation_status(reservation_id, status, approver_id=None):
     if status in [1, 2]:  # 审批通过或拒绝
         reservation.approver_id = approver_id
         reservation.approve_time = datetime.utcnow()
+    
+    # 拒绝或取消时释放占用记录
+    if status in [2, 3]:
+        _release_reservation_claims(reservation_id)
+    
+    # 刷新时间段占用（待审 → 已通过改变占用状态，拒绝/取消释放占用）
+    _refresh_slot_occupancy(reservation)
         
     # 更新设备状态
     equipment = Equipment.query.get(reservation.equip_id)
@@ -367,26 +1106,23 @@ def update_reservation_status(reservation_id, status, approver_id=None):
     try:
         db.session.commit()
         
-        # 更新设备的下次可用时间
-        # 当预约状态变化时（通过/取消），需要重新计算可用时间
-        if equipment and status in [1, 3]:  # 审批通过或取消
-            _update_equipment_next_avail_time(equipment.id)
+        # 更新设备的下次可用时间（后台执行，同一设备排队期间的多次变化合并为一次计算）
+        # 只有已通过预约的集合发生变化时（审批通过 / 取消已通过预约）才需要更新
+        if equipment and (status == 1 or old_status == 1):
+            _schedule_next_avail_time_update(
+                equipment.id,
+                BusyChange(reservation.start_time, reservation.end_time, status == 1)
+            )
         
         # 清除设备缓存，确保前端设备详情页能看到最新状态
         if equipment:
             redis_client.delete(f'api:equipment:detail:{equipment.id}')
             
-            # 清除设备列表缓存，确保设备列表页状态同步更新
-            try:
-                client = redis_client.get_client()
-                keys = client.keys('api:equipment:list:*')
-                if keys:
-                    redis_client.delete(*keys)
-            except Exception as e:
-                print(f"Clear equipment list cache failed: {e}")
+            # 设备列表缓存通过命名空间版本号失效，确保设备列表页状态同步更新
+            redis_client.bump_namespace('api:equipment:list')
             
         # 清除相关缓存
-        _clear_reservation_cache(reservation_id=reservation_id)
+        _clear_reservation_cache(reservation)
         
         return reservation
     except Exception as e:
@@ -394,6 +1130,186 @@ def update_reservation_status(reservation_id, status, approver_id=None):
         raise ValidationError(f'更新预约状态失败: {str(e)}')
 
 
+def bulk_update_reservation_status(reservation_ids, status, approver_id=None, reason=None):
+    """
+    批量审批预约（通过或拒绝待审预约）
+    
+    所有预约一次读取，按设备分组：审批通过时每台设备锁定一次守卫行、读取一次已通过预约，
+    按开始时间排序后依次判断，与已通过预约或本批中更早通过的预约重叠的预约保持待审并报告冲突。
+    全部变更在一个事务中提交；每台受影响的设备只提交一次下次可用时间的完整计算，缓存在一个流水线中失效。
+    
+    Args:
+        reservation_ids: 预约ID列表
+        status: 新状态（1: 通过, 2: 拒绝）
+        approver_id: 审批人ID
+        reason: 拒绝理由（可选）
+    
+    Returns:
+        dict: {
+            'updated': 状态已更新的预约对象列表,
+            'failed': [{'id', 'msg', 'conflicts'（冲突时）}] 未更新的预约
+        }
+    
+    Raises:
+        ValidationError: 参数无效或提交失败
+    """
+    if status not in (1, 2):
+        raise ValidationError('批量审批只支持通过(1)或拒绝(2)', payload={'field': 'status'})
+    reservation_ids = list(dict.fromkeys(reservation_ids or []))
+    if not reservation_ids:
+        raise ValidationError('预约ID列表不能为空', payload={'field': 'ids'})
+    if len(reservation_ids) > MAX_BULK_REVIEW:
+        raise ValidationError(f'一次最多审批 {MAX_BULK_REVIEW} 个预约', payload={'field': 'ids'})
+    
+    found = {r.id: r for r in Reservation.query.filter(Reservation.id.in_(reservation_ids))}
+    failed = []
+    candidates = defaultdict(list)
+    for reservation_id in reservation_ids:
+        reservation = found.get(reservation_id)
+        if reservation is None:
+            failed.append({'id': reservation_id, 'msg': '预约不存在'})
+        elif reservation.status != 0:
+            failed.append({'id': reservation_id, 'msg': f'无效的状态流转: {reservation.status} -> {status}'})
+        else:
+            candidates[reservation.equip_id].append(reservation)
+    
+    groups = {}
+    try:
+        for equip_id in sorted(candidates):
+            group = candidates[equip_id]
+            if status == 1:
+                # 按设备ID顺序加锁，避免并发的批量审批互相等待
+                _lock_equipment_guard(equip_id)
+                group, conflicts = _partition_approvable(equip_id, group)
+                failed.extend(conflicts)
+            if group:
+                groups[equip_id] = group
+        
+        updated_ids = [r.id for group in groups.values() for r in group]
+        if updated_ids:
+            # 所有预约写入相同的值，一条 UPDATE 完成
+            values = {'status': status, 'approver_id': approver_id, 'approve_time': datetime.utcnow()}
+            if status == 2 and reason:
+                values['reject_reason'] = reason
+            db.session.execute(
+                update(Reservation)
+                .where(Reservation.id.in_(updated_ids))
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+        
+        if occupancy_service.is_enabled():
+            for equip_id, group in groups.items():
+                occupancy_service.refresh_occupancy(
+                    equip_id, [r.start_time.date() for r in group if r.start_time and r.end_time]
+                )
+        
+        if status == 2 and updated_ids:
+            # 拒绝时一次释放全部占用记录
+            ReservationClaim.query.filter(
+                ReservationClaim.reservation_id.in_(updated_ids)
+            ).delete(synchronize_session=False)
+        
+        approved_equip_ids = sorted(groups) if status == 1 else []
+        if approved_equip_ids:
+            # 审批通过，将设备设为使用中 (2)
+            db.session.execute(
+                update(Equipment)
+                .where(Equipment.id.in_(approved_equip_ids))
+                .values(status=2)
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        raise ValidationError(f'批量更新预约状态失败: {str(e)}')
+    
+    # 每台设备只计算一次下次可用时间（负载为 None 表示完整计算）
+    for equip_id in approved_equip_ids:
+        background_jobs.submit(NEXT_AVAIL_TIME_JOB, equip_id)
+    
+    # 一次查询重新加载更新后的预约，按请求中的顺序返回
+    order = {reservation_id: index for index, reservation_id in enumerate(reservation_ids)}
+    updated = sorted(
+        Reservation.query.filter(Reservation.id.in_(updated_ids)).all() if updated_ids else [],
+        key=lambda r: order[r.id]
+    )
+    if updated:
+        _clear_bulk_review_cache(updated, approved_equip_ids)
+    
+    failed.sort(key=lambda item: order[item['id']])
+    return {'updated': updated, 'failed': failed}
+
+
+def _partition_approvable(equip_id, reservations):
+    """
+    从同一设备的待审预约中选出可以审批通过的预约
+    
+    已通过预约一次读取（覆盖本组预约的时间范围），在排序后的开始时间上二分查找冲突；
+    本组预约按开始时间依次处理，与更早通过的预约重叠时保持待审。
+    
+    Args:
+        equip_id: 设备ID
+        reservations: 该设备的待审预约
+    
+    Returns:
+        tuple: (可以通过的预约列表, [{'id', 'msg', 'conflicts'}] 冲突的预约)
+    """
+    timed = sorted(
+        (r for r in reservations if r.start_time and r.end_time),
+        key=lambda r: (r.start_time, r.id)
+    )
+    approvable = [r for r in reservations if not (r.start_time and r.end_time)]
+    if not timed:
+        return approvable, []
+    
+    existing = db.session.query(
+        Reservation.id, Reservation.start_time, Reservation.end_time, Reservation.status
+    ).filter(
+        Reservation.equip_id == equip_id,
+        Reservation.status == 1,
+        Reservation.start_time > timed[0].start_time - MAX_RESERVATION_SPAN,
+        Reservation.start_time < max(r.end_time for r in timed),
+        Reservation.end_time > timed[0].start_time
+    ).order_by(Reservation.start_time).all()
+    
+    matches = _match_series_conflicts([(r.start_time, r.end_time) for r in timed], existing)
+    conflicts = []
+    accepted = []
+    for reservation, overlapping in zip(timed, matches):
+        # 已通过的本组预约互不重叠且按开始时间排序，只可能与最后一个重叠
+        if accepted and accepted[-1].end_time > reservation.start_time:
+            overlapping = overlapping + [accepted[-1]]
+        if overlapping:
+            conflicts.append({
+                'id': reservation.id,
+                'msg': '预约时间与已通过的预约冲突',
+                'conflicts': _build_conflict_info(overlapping)
+            })
+        else:
+            accepted.append(reservation)
+    return approvable + accepted, conflicts
+
+
+def _clear_bulk_review_cache(reservations, equip_ids):
+    """
+    批量审批后在一个流水线中清除缓存
+    
+    Args:
+        reservations: 状态发生变化的预约
+        equip_ids: 状态发生变化的设备ID
+    """
+    with redis_client.pipeline() as pipe:
+        pipe.delete(*(f'api:reservation:detail:{r.id}' for r in reservations))
+        tags = {reservation_user_tag('student', r.student_id) for r in reservations if r.student_id}
+        tags |= {reservation_user_tag('teacher', r.teacher_id) for r in reservations if r.teacher_id}
+        if tags:
+            pipe.invalidate_tags(*sorted(tags))
+        if equip_ids:
+            pipe.delete(*(f'api:equipment:detail:{equip_id}' for equip_id in equip_ids))
+            pipe.bump_namespace('api:equipment:list')
+
+
 def delete_reservation(reservation_id):
     """
     删除预约
@@ -412,15 +1328,20 @@ def delete_reservation(reservation_id):
     equip_id = reservation.equip_id
     
     try:
+        _release_reservation_claims(reservation_id)
         db.session.delete(reservation)
+        _refresh_slot_occupancy(reservation)
         db.session.commit()
         
-        # 如果删除的是已通过的预约，需要更新设备的下次可用时间
+        # 如果删除的是已通过的预约，需要更新设备的下次可用时间（释放该预约占用的区间，后台执行）
         if reservation.status == 1:
-            _update_equipment_next_avail_time(equip_id)
+            _schedule_next_avail_time_update(
+                equip_id,
+                BusyChange(reservation.start_time, reservation.end_time, False)
+            )
         
         # 清除相关缓存
-        _clear_reservation_cache(reservation_id=reservation_id)
+        _clear_reservation_cache(reservation)
         
         return True
     except Exception as e:
@@ -430,12 +1351,7 @@ def delete_reservation(reservation_id):
 
 def _calculate_next_avail_time(equip_id):
     """
-    计算设备的下次可用时间
-    
-    算法：
-    1. 获取设备的所有激活时间段
-    2. 获取设备的所有已通过预约（status=1），按开始时间排序
-    3. 从当前时间开始，查找第一个没有被预约占用的时间段
+    计算设备的下次可用时间（由 availability_service 的扫描引擎完成）
     
     Args:
         equip_id: 设备ID
@@ -443,110 +1359,159 @@ def _calculate_next_avail_time(equip_id):
     Returns:
         datetime: 下次可用时间，如果没有可用时间则返回 None
     """
-    # 获取设备的激活时间段
-    time_slots = TimeSlot.query.filter(
-        TimeSlot.equip_id == equip_id,
-        TimeSlot.is_active == 1
-    ).order_by(TimeSlot.start_time).all()
-    
-    if not time_slots:
-        # 如果没有配置时间段，返回 None
-        return None
-    
-    # 获取设备的所有已通过预约（status=1），按开始时间排序
-    active_reservations = Reservation.query.filter(
-        Reservation.equip_id == equip_id,
-        Reservation.status == 1,  # 已通过
-        Reservation.start_time.isnot(None),
-        Reservation.end_time.isnot(None),
-        Reservation.end_time >= datetime.utcnow()  # 只考虑未来的预约
-    ).order_by(Reservation.start_time).all()
-    
-    now = datetime.utcnow()
-    today = now.date()
-    current_time = now.time()
-    
-    # 查找未来30天内的可用时间
-    for day_offset in range(30):
-        check_date = today + timedelta(days=day_offset)
-        
-        # 如果是今天，从当前时间开始查找；否则从当天的第一个时间段开始
-        for slot in time_slots:
-            slot_start_datetime = datetime.combine(check_date, slot.start_time)
-            slot_end_datetime = datetime.combine(check_date, slot.end_time)
-            
-            # 如果是今天且时间段已过，跳过
-            if day_offset == 0 and slot_end_datetime <= now:
-                continue
-            
-            # 检查这个时间段是否被预约占用
-            is_occupied = False
-            for reservation in active_reservations:
-                # 检查时间段是否与预约冲突
-                if reservation.start_time and reservation.end_time:
-                    # 时间段冲突：max(start1, start2) < min(end1, end2)
-                    if max(slot_start_datetime, reservation.start_time) < \
-                       min(slot_end_datetime, reservation.end_time):
-                        is_occupied = True
-                        break
-            
-            # 如果时间段没有被占用，这就是下次可用时间
-            if not is_occupied:
-                # 如果是今天且开始时间已过，返回当前时间；否则返回时间段开始时间
-                if day_offset == 0 and slot_start_datetime < now:
-                    return now
-                return slot_start_datetime
-    
-    # 如果30天内都没有可用时间，返回 None
-    return None
+    return availability_service.calculate_next_avail_time(equip_id)
 
 
-def _update_equipment_next_avail_time(equip_id):
+def _update_equipment_next_avail_time(equip_id, changed=None):
     """
     更新设备的下次可用时间
     
+    增量更新以读取到的旧值为前提，写入时比较旧值：如果期间已被其他任务修改，
+    改为完整计算，避免并发的后台任务用过期的结果覆盖新结果。
+    
     Args:
         equip_id: 设备ID
+        changed: BusyChange（可选），提供时根据这一次预约变化增量更新，否则完整计算
     """
     equipment = Equipment.query.get(equip_id)
     if not equipment:
         return
     
-    next_avail_time = _calculate_next_avail_time(equip_id)
-    equipment.next_avail_time = next_avail_time
-    
     try:
+        if changed is None:
+            equipment.next_avail_time = _calculate_next_avail_time(equip_id)
+        else:
+            current = equipment.next_avail_time
+            next_avail_time = availability_service.next_avail_time_after_change(equip_id, current, changed)
+            result = db.session.execute(
+                update(Equipment)
+                .where(
+                    Equipment.id == equip_id,
+                    Equipment.next_avail_time.is_(None) if current is None else Equipment.next_avail_time == current
+                )
+                .values(next_avail_time=next_avail_time)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 0:
+                db.session.expire(equipment)
+                equipment.next_avail_time = _calculate_next_avail_time(equip_id)
+        
         db.session.commit()
-        # 清除设备缓存
+        # 清除设备缓存（列表中同样展示下次可用时间）
         redis_client.delete(f'api:equipment:detail:{equip_id}')
+        redis_client.bump_namespace('api:equipment:list')
     except Exception as e:
         # 避免更新失败影响主业务
         print(f"Update next_avail_time failed: {e}")
         db.session.rollback()
 
 
-def _clear_reservation_cache(reservation_id=None):
+def recompute_next_avail_times(equip_ids=None, dry_run=False, chunk_size=1000):
     """
-    清除预约相关缓存
+    批量重新计算设备的下次可用时间（夜间对账、批量导入后使用）
+    
+    时间段和预约各一次查询，按设备分组计算（见 availability_service.calculate_all_next_avail_times），
+    只有发生变化的设备通过 UPDATE ... SET next_avail_time = CASE id WHEN ... END 批量写回，
+    每 chunk_size 台设备一条语句，全部在一个事务中提交。
     
     Args:
-        reservation_id: 预约ID，如果提供则清除该预约的详情缓存
+        equip_ids: 设备ID列表（默认全部设备）
+        dry_run: 只计算不写入
+        chunk_size: 每条 UPDATE 语句包含的设备数量
+    
+    Returns:
+        dict: {'equipments': 设备数量, 'changed': 下次可用时间发生变化的设备数量}
     """
-    # 清除详情缓存
-    if reservation_id:
-        redis_client.delete(f'api:reservation:detail:{reservation_id}')
+    query = db.session.query(Equipment.id, Equipment.next_avail_time)
+    if equip_ids is not None:
+        query = query.filter(Equipment.id.in_(equip_ids))
+    current = dict(query.all())
+    
+    computed = availability_service.calculate_all_next_avail_times(equip_ids=equip_ids)
+    # 没有激活时间段的设备没有可用时间
+    changed = sorted(
+        (equip_id, computed.get(equip_id)) for equip_id, value in current.items() if computed.get(equip_id) != value
+    )
+    stats = {'equipments': len(current), 'changed': len(changed)}
+    if dry_run or not changed:
+        return stats
     
-    # 清除列表缓存
     try:
-        client = redis_client.get_client()
-        # 清除用户预约列表缓存
-        keys = client.keys('api:reservation:list:*')
-        if keys:
-            redis_client.delete(*keys)
-        # 清除管理员预约列表缓存
-        admin_keys = client.keys('api:admin:reservation:list:*')
-        if admin_keys:
-            redis_client.delete(*admin_keys)
-    except Exception as e:
-        # 避免缓存操作失败影响主业务
-        print(f"Clear cache failed: {e}")
\ No newline at end of file
+        for i in range(0, len(changed), chunk_size):
+            chunk = dict(changed[i:i + chunk_size])
+            db.session.execute(
+                update(Equipment)
+                .where(Equipment.id.in_(list(chunk)))
+                .values(next_avail_time=case(chunk, value=Equipment.id))
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    
+    # 清除变化设备的详情缓存，列表缓存通过命名空间整体失效
+    with redis_client.pipeline() as pipe:
+        pipe.delete(*(f'api:equipment:detail:{equip_id}' for equip_id, _ in changed))
+        pipe.bump_namespace('api:equipment:list')
+    return stats
+
+
+def _schedule_next_avail_time_update(equip_id, changed):
+    """
+    提交设备下次可用时间的后台更新任务
+    
+    Args:
+        equip_id: 设备ID
+        changed: BusyChange，本次变化的预约区间
+    """
+    background_jobs.submit(NEXT_AVAIL_TIME_JOB, equip_id, [
+        changed.start.isoformat() if changed.start else None,
+        changed.end.isoformat() if changed.end else None,
+        changed.busy
+    ])
+
+
+@background_jobs.job(NEXT_AVAIL_TIME_JOB)
+def _next_avail_time_job(equip_id, payload):
+    """
+    后台任务：更新设备的下次可用时间
+    
+    Args:
+        equip_id: 设备ID
+        payload: [开始时间, 结束时间, 是否占用]；多次变化合并后为 None，此时完整计算
+    """
+    changed = None
+    if payload:
+        start, end, busy = payload
+        changed = BusyChange(
+            datetime.fromisoformat(start) if start else None,
+            datetime.fromisoformat(end) if end else None,
+            busy
+        )
+    _update_equipment_next_avail_time(int(equip_id), changed=changed)
+
+
+def _clear_reservation_cache(reservation, clear_detail=True):
+    """
+    清除预约相关缓存
+    
+    只失效预约所属学生/教师的预约列表缓存，其他用户的列表缓存不受影响
+    
+    Args:
+        reservation: 发生变化的预约
+        clear_detail: 是否清除该预约的详情缓存
+    """
+    # 详情删除和标签失效放在一个流水线中执行
+    with redis_client.pipeline() as pipe:
+        # 清除详情缓存
+        if clear_detail:
+            pipe.delete(f'api:reservation:detail:{reservation.id}')
+        
+        # 按标签清除该用户的预约列表缓存
+        if reservation.student_id:
+            pipe.invalidate_tags(reservation_user_tag('student', reservation.student_id))
+        if reservation.teacher_id:
+            pipe.invalidate_tags(reservation_user_tag('teacher', reservation.teacher_id))
+
+
@@ -1,6 +1,9 @@
 """
 时间段服务层，处理时间段相关的业务逻辑
 """
+import heapq
+from collections import defaultdict
+from itertools import groupby
 from datetime import time, datetime, date, timedelta
 from sqlalchemy import and_
 
@@ -8,8 +11,21 @@ from app import db
 from app.models.equipment import Equipment
 from app.models.timeslot import TimeSlot
 from app.models.reservation import Reservation
+from app.models.slot_occupancy import SlotOccupancy
+from app.services import occupancy_service
+from app.services.availability_service import merge_intervals, is_window_busy, iter_free_intervals
 from app.utils.exceptions import NotFoundError, ValidationError
 from app.utils.redis_client import redis_client
+from app.utils.negative_cache import negative_cache
+from app.services.reservation_service import _update_equipment_next_avail_time, MAX_RESERVATION_SPAN
+
+
+# 可用性矩阵一次最多查询的天数
+MAX_MATRIX_DAYS = 90
+
+# 空闲设备搜索的范围限制：最多查询的天数、最多返回的结果数
+MAX_SEARCH_DAYS = 30
+MAX_SEARCH_RESULTS = 50
 
 
 def _normalize_time(value):
@@ -60,9 +76,13 @@ def _check_overlap(equip_id, start_time, end_time, exclude_slot_id=None):
 
 
 def _check_equipment_exists(equip_id):
+    if negative_cache.equipment_missing(equip_id):
+        raise NotFoundError('设备不存在', payload={'field': 'equip_id'})
     equipment = Equipment.query.get(equip_id)
     if not equipment:
+        negative_cache.mark('equipment', equip_id)
         raise NotFoundError('设备不存在', payload={'field': 'equip_id'})
+    negative_cache.found('equipment', equip_id)
     return equipment
 
 
@@ -77,6 +97,51 @@ def get_timeslots_by_equipment(equip_id, only_active=False):
     return query.order_by(TimeSlot.start_time.asc()).all()
 
 
+def _load_reservation_times(equip_id, start_date, end_date):
+    """
+    读取设备在日期范围 [start_date, end_date) 内开始的待审/已通过预约，按开始日期分组
+    
+    只查询开始/结束两列，范围条件使用 (equip_id, status, start_time, end_time) 索引，
+    读取量与设备的历史预约总数无关。
+    
+    Returns:
+        dict: {date: [(开始时间, 结束时间)]}，时间为 time 对象
+    """
+    rows = db.session.query(Reservation.start_time, Reservation.end_time).filter(
+        Reservation.equip_id == equip_id,
+        Reservation.status.in_([0, 1]),
+        Reservation.end_time.isnot(None),
+        Reservation.start_time >= datetime.combine(start_date, datetime.min.time()),
+        Reservation.start_time < datetime.combine(end_date, datetime.min.time())
+    )
+    date_intervals = defaultdict(list)
+    for start, end in rows:
+        date_intervals[start.date()].append((start.time(), end.time()))
+    return date_intervals
+
+
+def _free_slots(time_slots, intervals):
+    """
+    返回没有被预约占用的时间段
+    
+    同一天的预约（只比较时间部分）先合并为有序、互不重叠的忙碌区间，
+    每个时间段二分查找一次，不再逐个预约比较。
+    
+    Args:
+        time_slots: 时间段列表
+        intervals: 同一天预约的 (开始时间, 结束时间) 列表
+    
+    Returns:
+        list: 可用的时间段（保持原顺序）
+    """
+    # 结束时间不晚于开始时间的区间（如结束于次日零点）不与任何时间段重叠
+    busy = merge_intervals((start, end) for start, end in intervals if start < end)
+    if not busy:
+        return list(time_slots)
+    busy_ends = [end for _, end in busy]
+    return [slot for slot in time_slots if not is_window_busy(slot.start_time, slot.end_time, busy, busy_ends)]
+
+
 def get_available_timeslots(equip_id, target_date=None):
     """
     获取设备可用时间段
@@ -108,44 +173,14 @@ def get_available_timeslots(equip_id, target_date=None):
         # 日期格式无效，返回所有激活时间段
         return time_slots
     
-    # 查询该日期上状态为待审(0)或已通过(1)的预约
-    reservations = Reservation.query.filter(
-        Reservation.equip_id == equip_id,
-        Reservation.status.in_([0, 1]),
-        Reservation.start_time.isnot(None),
-        Reservation.end_time.isnot(None)
-    ).all()
-    
-    # 过滤出该日期的预约
-    date_reservations = []
-    for res in reservations:
-        if res.start_time and res.start_time.date() == target_date:
-            date_reservations.append(res)
-    
-    # 如果没有该日期的预约，返回所有时间段
-    if not date_reservations:
-        return time_slots
+    if occupancy_service.is_enabled():
+        # 读模型：排除占用表中记录的该日期已被占用的时间段
+        occupied = occupancy_service.get_occupied_slot_ids(equip_id, target_date)
+        return [slot for slot in time_slots if slot.slot_id not in occupied]
     
-    # 排除已被预约的时间段
-    available_slots = []
-    for slot in time_slots:
-        is_available = True
-        for res in date_reservations:
-            # 检查时间段是否与预约冲突
-            # 预约的开始时间和结束时间的时间部分
-            res_start_time = res.start_time.time()
-            res_end_time = res.end_time.time()
-            
-            # 如果时间段与预约时间有重叠，则不可用
-            # 重叠条件：max(start1, start2) < min(end1, end2)
-            if slot.start_time < res_end_time and slot.end_time > res_start_time:
-                is_available = False
-                break
-        
-        if is_available:
-            available_slots.append(slot)
-    
-    return available_slots
+    # 只读取该日期内开始的预约，按忙碌区间排除被占用的时间段
+    date_intervals = _load_reservation_times(equip_id, target_date, target_date + timedelta(days=1))
+    return _free_slots(time_slots, date_intervals.get(target_date, []))
 
 
 def get_available_dates(equip_id, start_date=None, days=30):
@@ -178,147 +213,250 @@ def get_available_dates(equip_id, start_date=None, days=30):
         # 如果没有配置时间段，返回空列表
         return []
     
-    # 查询该设备在指定日期范围内的所有预约（待审或已通过）
     end_date = start_date + timedelta(days=days)
-    reservations = Reservation.query.filter(
-        Reservation.equip_id == equip_id,
-        Reservation.status.in_([0, 1]),
-        Reservation.start_time.isnot(None),
-        Reservation.end_time.isnot(None),
-        Reservation.start_time >= datetime.combine(start_date, datetime.min.time()),
-        Reservation.start_time < datetime.combine(end_date, datetime.min.time())
-    ).all()
     
-    # 按日期组织预约
-    date_reservations_map = {}
-    for res in reservations:
-        res_date = res.start_time.date()
-        if res_date not in date_reservations_map:
-            date_reservations_map[res_date] = []
-        date_reservations_map[res_date].append(res)
+    if occupancy_service.is_enabled():
+        # 读模型：所有激活时间段都被占用的日期不可用
+        full_dates = occupancy_service.get_full_dates(
+            equip_id, [slot.slot_id for slot in time_slots], start_date, end_date
+        )
+        available_dates = []
+        current_date = start_date
+        while current_date < end_date:
+            if current_date not in full_dates:
+                available_dates.append(current_date.isoformat())
+            current_date += timedelta(days=1)
+        return available_dates
     
-    # 遍历日期范围，检查每天是否有可用时间段
+    # 查询该设备在指定日期范围内的所有预约（待审或已通过），按日期分组
+    date_intervals = _load_reservation_times(equip_id, start_date, end_date)
+    
+    # 遍历日期范围，至少有一个时间段没有被占用的日期可用
     available_dates = []
     current_date = start_date
-    
     while current_date < end_date:
-        # 检查该日期是否有可用时间段
-        date_reservations = date_reservations_map.get(current_date, [])
-        
-        if not date_reservations:
-            # 如果该日期没有预约，说明所有时间段都可用
+        if _free_slots(time_slots, date_intervals.get(current_date, [])):
             available_dates.append(current_date.isoformat())
-        else:
-            # 检查是否有时间段没有被完全占用
-            for slot in time_slots:
-                is_slot_available = True
-                for res in date_reservations:
-                    res_start_time = res.start_time.time()
-                    res_end_time = res.end_time.time()
-                    
-                    # 如果时间段与预约时间有重叠，则该时间段不可用
-                    if slot.start_time < res_end_time and slot.end_time > res_start_time:
-                        is_slot_available = False
-                        break
-                
-                # 如果至少有一个时间段可用，该日期就可用
-                if is_slot_available:
-                    available_dates.append(current_date.isoformat())
-                    break
-        
         current_date += timedelta(days=1)
     
     return available_dates
 
 
-def check_slot_usage(slot_id):
+def get_availability_matrix(lab_id=None, category=None, start_date=None, days=30):
     """
-    预留：检查时间段是否已有预约占用
-    当前阶段返回 False，后续实现时用于阻止删除/修改时间范围
+    获取实验室或类别下所有设备在日期范围内的可用性矩阵
+    
+    设备浏览页一次请求代替逐台调用 get_available_dates：设备及其激活时间段一次查询，
+    日期范围内的待审/已通过预约一次查询。每台设备的时间段按开始时间编号，
+    每个预约换算为它占用的时间段位掩码，同一天的掩码按位或；掩码等于全部时间段的日期整天被占用。
+    结果与逐台调用 get_available_dates（实时计算）一致。
+    
+    Args:
+        lab_id: 实验室ID筛选（可选）
+        category: 设备类别筛选（可选），lab_id 和 category 至少提供一个
+        start_date: 开始日期（可选），默认为今天
+        days: 查询天数（默认30天，最多 MAX_MATRIX_DAYS 天）
+    
+    Returns:
+        dict: {
+            'start_date': 'YYYY-MM-DD',
+            'days': 天数,
+            'items': [{'equip_id': 设备ID, 'bitmap': '1101...'}]（按设备ID排序）
+        }
+        bitmap 的第 i 个字符表示 start_date 之后第 i 天是否可用（1 可用，0 不可用）
+    
+    Raises:
+        ValidationError: 没有筛选条件或天数超出范围
     """
-    return False
+    if lab_id is None and category is None:
+        raise ValidationError('必须指定实验室或设备类别', payload={'field': 'lab_id'})
+    if not 1 <= days <= MAX_MATRIX_DAYS:
+        raise ValidationError(f'查询天数必须在 1 到 {MAX_MATRIX_DAYS} 之间', payload={'field': 'days'})
+    
+    if not start_date:
+        start_date = datetime.now().date()
+    elif isinstance(start_date, str):
+        try:
+            start_date = datetime.fromisoformat(start_date).date()
+        except ValueError:
+            raise ValidationError('开始日期格式必须为 YYYY-MM-DD', payload={'field': 'start_date'})
+    end_date = start_date + timedelta(days=days)
+    
+    equipment_filters = []
+    if lab_id is not None:
+        equipment_filters.append(Equipment.lab_id == lab_id)
+    if category is not None:
+        equipment_filters.append(Equipment.category == category)
+    
+    # 1. 设备及其激活时间段（没有时间段的设备也返回一行）
+    slot_rows = db.session.query(Equipment.id, TimeSlot.start_time, TimeSlot.end_time).outerjoin(
+        TimeSlot, and_(TimeSlot.equip_id == Equipment.id, TimeSlot.is_active == 1)
+    ).filter(*equipment_filters).order_by(Equipment.id, TimeSlot.start_time)
+    slots = {}
+    for equip_id, slot_start, slot_end in slot_rows:
+        equip_slots = slots.setdefault(equip_id, [])
+        if slot_start is not None:
+            equip_slots.append((slot_start, slot_end))
+    
+    # 2. 日期范围内开始的待审/已通过预约
+    reservation_rows = db.session.query(
+        Reservation.equip_id, Reservation.start_time, Reservation.end_time
+    ).join(Equipment, Equipment.id == Reservation.equip_id).filter(
+        *equipment_filters,
+        Reservation.status.in_([0, 1]),
+        Reservation.end_time.isnot(None),
+        Reservation.start_time >= datetime.combine(start_date, datetime.min.time()),
+        Reservation.start_time < datetime.combine(end_date, datetime.min.time())
+    )
+    
+    # 每台设备每天被占用的时间段位掩码
+    occupied = defaultdict(int)
+    for equip_id, res_start, res_end in reservation_rows:
+        start_time, end_time = res_start.time(), res_end.time()
+        # 结束时间不晚于开始时间的区间不与任何时间段重叠（与 _free_slots 一致）
+        if start_time >= end_time:
+            continue
+        mask = 0
+        for index, (slot_start, slot_end) in enumerate(slots.get(equip_id, ())):
+            if slot_start < end_time and slot_end > start_time:
+                mask |= 1 << index
+        if mask:
+            occupied[(equip_id, (res_start.date() - start_date).days)] |= mask
+    
+    # 每台设备整天被占用的日期位集合
+    full_days = defaultdict(int)
+    for (equip_id, day), mask in occupied.items():
+        if mask == (1 << len(slots[equip_id])) - 1:
+            full_days[equip_id] |= 1 << day
+    
+    all_days = (1 << days) - 1
+    items = []
+    for equip_id, equip_slots in slots.items():
+        available = all_days & ~full_days[equip_id] if equip_slots else 0
+        # 二进制字符串的最低位在最右侧，反转后第 i 个字符对应第 i 天
+        items.append({'equip_id': equip_id, 'bitmap': format(available, f'0{days}b')[::-1]})
+    
+    return {'start_date': start_date.isoformat(), 'days': days, 'items': items}
 
 
-def _calculate_next_avail_time(equip_id):
+def search_free_equipment(lab_id=None, category=None, start_date=None, days=7, duration=60,
+                          limit=10, per_equipment=1, now=None):
     """
-    计算设备的下次可用时间（与 reservation_service 中的逻辑相同）
+    跨设备搜索空闲时间：在实验室或类别下的所有设备中，找出最早能容纳指定时长的 (设备, 开始时间)
+    
+    设备及其激活时间段一次查询，范围内的待审/已通过预约一次查询。每台设备的时间段窗口减去
+    合并后的忙碌区间得到有序的空闲区间，所有设备的空闲区间按开始时间用堆归并，
+    取到足够的结果后立即停止，后面的窗口不再计算。
     
     Args:
-        equip_id: 设备ID
+        lab_id: 实验室ID筛选（可选）
+        category: 设备类别筛选（可选），lab_id 和 category 至少提供一个
+        start_date: 开始日期（可选），默认为今天
+        days: 查询天数（默认7天，最多 MAX_SEARCH_DAYS 天）
+        duration: 预约时长（分钟）
+        limit: 最多返回的结果数（最多 MAX_SEARCH_RESULTS 个）
+        per_equipment: 每台设备最多返回的结果数（默认1，即每台设备只返回最早的开始时间）
+        now: 当前时间（默认 UTC 当前时间），早于当前时间的部分不参与搜索
     
     Returns:
-        datetime: 下次可用时间，如果没有可用时间则返回 None
+        list: [{'equip_id', 'equip_name', 'start_time', 'end_time', 'free_until'}]，按开始时间、设备ID排序
+              end_time 为开始时间加上预约时长，free_until 为该空闲区间的结束时间
+    
+    Raises:
+        ValidationError: 参数无效
     """
-    # 获取设备的激活时间段
-    time_slots = TimeSlot.query.filter(
-        TimeSlot.equip_id == equip_id,
-        TimeSlot.is_active == 1
-    ).order_by(TimeSlot.start_time).all()
+    if lab_id is None and category is None:
+        raise ValidationError('必须指定实验室或设备类别', payload={'field': 'lab_id'})
+    if not 1 <= days <= MAX_SEARCH_DAYS:
+        raise ValidationError(f'查询天数必须在 1 到 {MAX_SEARCH_DAYS} 之间', payload={'field': 'days'})
+    if not 0 < duration <= 24 * 60:
+        raise ValidationError('预约时长必须在 1 到 1440 分钟之间', payload={'field': 'duration'})
+    if not 1 <= limit <= MAX_SEARCH_RESULTS:
+        raise ValidationError(f'返回数量必须在 1 到 {MAX_SEARCH_RESULTS} 之间', payload={'field': 'limit'})
+    if per_equipment < 1:
+        raise ValidationError('每台设备的返回数量必须大于 0', payload={'field': 'per_equipment'})
     
-    if not time_slots:
-        return None
+    if not start_date:
+        start_date = datetime.now().date()
+    elif isinstance(start_date, str):
+        try:
+            start_date = datetime.fromisoformat(start_date).date()
+        except ValueError:
+            raise ValidationError('开始日期格式必须为 YYYY-MM-DD', payload={'field': 'start_date'})
+    now = now or datetime.utcnow()
+    # 从当前时间之后的下一个整分钟开始
+    not_before = now.replace(second=0, microsecond=0)
+    if not_before < now:
+        not_before += timedelta(minutes=1)
+    window_start = datetime.combine(start_date, datetime.min.time())
+    window_end = window_start + timedelta(days=days)
+    length = timedelta(minutes=duration)
     
-    # 获取设备的所有已通过预约（status=1），按开始时间排序
-    active_reservations = Reservation.query.filter(
-        Reservation.equip_id == equip_id,
-        Reservation.status == 1,  # 已通过
-        Reservation.start_time.isnot(None),
-        Reservation.end_time.isnot(None),
-        Reservation.end_time >= datetime.utcnow()  # 只考虑未来的预约
-    ).order_by(Reservation.start_time).all()
+    equipment_filters = []
+    if lab_id is not None:
+        equipment_filters.append(Equipment.lab_id == lab_id)
+    if category is not None:
+        equipment_filters.append(Equipment.category == category)
     
-    now = datetime.utcnow()
-    today = now.date()
+    # 1. 设备及其激活时间段（没有时间段的设备不可能有空闲时间）
+    slot_rows = db.session.query(
+        Equipment.id, Equipment.name, TimeSlot.start_time, TimeSlot.end_time
+    ).join(TimeSlot, TimeSlot.equip_id == Equipment.id).filter(
+        *equipment_filters, TimeSlot.is_active == 1
+    ).order_by(Equipment.id, TimeSlot.start_time)
+    equipments = {
+        equip_id: list(rows) for equip_id, rows in groupby(slot_rows, key=lambda row: row.id)
+    }
+    if not equipments:
+        return []
     
-    # 查找未来30天内的可用时间
-    for day_offset in range(30):
-        check_date = today + timedelta(days=day_offset)
-        
-        for slot in time_slots:
-            slot_start_datetime = datetime.combine(check_date, slot.start_time)
-            slot_end_datetime = datetime.combine(check_date, slot.end_time)
-            
-            # 如果是今天且时间段已过，跳过
-            if day_offset == 0 and slot_end_datetime <= now:
-                continue
-            
-            # 检查这个时间段是否被预约占用
-            is_occupied = False
-            for reservation in active_reservations:
-                if reservation.start_time and reservation.end_time:
-                    if max(slot_start_datetime, reservation.start_time) < \
-                       min(slot_end_datetime, reservation.end_time):
-                        is_occupied = True
-                        break
-            
-            # 如果时间段没有被占用，这就是下次可用时间
-            if not is_occupied:
-                if day_offset == 0 and slot_start_datetime < now:
-                    return now
-                return slot_start_datetime
-    
-    return None
-
-
-def _update_equipment_next_avail_time(equip_id):
-    """
-    更新设备的下次可用时间
-    """
-    equipment = Equipment.query.get(equip_id)
-    if not equipment:
-        return
+    # 2. 与范围重叠的待审/已通过预约，按设备合并为忙碌区间
+    reservation_rows = db.session.query(
+        Reservation.equip_id, Reservation.start_time, Reservation.end_time
+    ).join(Equipment, Equipment.id == Reservation.equip_id).filter(
+        *equipment_filters,
+        Reservation.status.in_([0, 1]),
+        Reservation.start_time > window_start - MAX_RESERVATION_SPAN,
+        Reservation.start_time < window_end,
+        Reservation.end_time > window_start
+    ).order_by(Reservation.equip_id, Reservation.start_time)
+    busy = {
+        equip_id: merge_intervals((row.start_time, row.end_time) for row in rows)
+        for equip_id, rows in groupby(reservation_rows, key=lambda row: row.equip_id)
+    }
     
-    next_avail_time = _calculate_next_avail_time(equip_id)
-    equipment.next_avail_time = next_avail_time
+    def candidates(equip_id, rows):
+        # 设备的空闲区间中能容纳预约时长的部分，按开始时间有序
+        for free_start, free_end in iter_free_intervals(rows, busy.get(equip_id, []), start_date, days, not_before):
+            if free_end - free_start >= length:
+                yield free_start, equip_id, free_end
     
-    try:
-        db.session.commit()
-        # 清除设备缓存
-        redis_client.delete(f'api:equipment:detail:{equip_id}')
-    except Exception as e:
-        # 避免更新失败影响主业务
-        print(f"Update next_avail_time failed: {e}")
-        db.session.rollback()
+    results = []
+    counts = defaultdict(int)
+    streams = [candidates(equip_id, rows) for equip_id, rows in equipments.items()]
+    for free_start, equip_id, free_end in heapq.merge(*streams):
+        if counts[equip_id] >= per_equipment:
+            continue
+        counts[equip_id] += 1
+        results.append({
+            'equip_id': equip_id,
+            'equip_name': equipments[equip_id][0].name,
+            'start_time': free_start.isoformat(),
+            'end_time': (free_start + length).isoformat(),
+            'free_until': free_end.isoformat()
+        })
+        # 结果已够，或者每台设备都已达到上限
+        if len(results) >= limit or len(results) == per_equipment * len(equipments):
+            break
+    return results
+
+
+def check_slot_usage(slot_id):
+    """
+    预留：检查时间段是否已有预约占用
+    当前阶段返回 False，后续实现时用于阻止删除/修改时间范围
+    """
+    return False
 
 
 def create_timeslot(data):
@@ -342,6 +480,8 @@ def create_timeslot(data):
     )
     try:
         db.session.add(slot)
+        if occupancy_service.is_enabled():
+            occupancy_service.refresh_equipment_occupancy(equip_id)
         db.session.commit()
         
         # 更新设备的下次可用时间（时间段变更可能影响可用时间）
@@ -365,6 +505,7 @@ def update_timeslot(slot_id, data):
     if check_slot_usage(slot_id):
         raise ValidationError('该时间段已有关联预约，禁止修改时间范围', payload={'slot_id': slot_id})
 
+    old_equip_id = slot.equip_id
     if 'equip_id' in data:
         equip_id = data.get('equip_id')
         _check_equipment_exists(equip_id)
@@ -389,6 +530,9 @@ def update_timeslot(slot_id, data):
         slot.is_active = data.get('is_active')
 
     try:
+        if occupancy_service.is_enabled():
+            # 时间段可能移动到其他设备，原设备和新设备都需要重新计算
+            occupancy_service.refresh_equipment_occupancy(old_equip_id, equip_id)
         db.session.commit()
         
         # 更新设备的下次可用时间（时间段变更可能影响可用时间）
@@ -414,6 +558,8 @@ def delete_timeslot(slot_id):
 
     try:
         equip_id = slot.equip_id
+        # 先删除引用该时间段的占用记录（其他时间段的占用不受影响）
+        SlotOccupancy.query.filter(SlotOccupancy.slot_id == slot_id).delete(synchronize_session=False)
         db.session.delete(slot)
         db.session.commit()
         
@@ -16,7 +16,8 @@ def audit_log(action_type, detail_func=None):
     
     Args:
         action_type: 操作类型（如：'create_equipment', 'update_equipment', 'delete_equipment', 'approve_reservation'等）
-        detail_func: 可选的详情生成函数，接收 (func, *args, **kwargs) 参数，返回详情字符串或字典
+        detail_func: 可选的详情生成函数，接收 (func, *args, **kwargs) 参数，返回详情字符串或字典；
+                     返回列表时（批量操作）每个元素记录一条日志，一次批量写入
     
     Usage:
         @audit_log('create_equipment')
@@ -56,10 +57,17 @@ def audit_log(action_type, detail_func=None):
                 
                 # 生成操作详情
                 detail = None
+                details = None
                 if detail_func:
                     try:
                         detail_data = detail_func(f, *args, **kwargs)
-                        if detail_data:
+                        if isinstance(detail_data, list):
+                            # 批量操作：每个元素一条日志
+                            details = [
+                                json.dumps(item, ensure_ascii=False) if isinstance(item, dict) else str(item)
+                                for item in detail_data
+                            ]
+                        elif detail_data:
                             if isinstance(detail_data, dict):
                                 detail = json.dumps(detail_data, ensure_ascii=False)
                             else:
@@ -83,13 +91,21 @@ def audit_log(action_type, detail_func=None):
                     except Exception:
                         pass
                 
-                # 创建审计日志
-                auditlog_service.create_audit_log(
-                    operator_id=operator_id,
-                    action_type=action_type,
-                    detail=detail,
-                    ip_address=ip_address
-                )
+                # 创建审计日志（批量操作一次写入全部记录）
+                if details is not None:
+                    auditlog_service.create_audit_logs(
+                        operator_id=operator_id,
+                        action_type=action_type,
+                        details=details,
+                        ip_address=ip_address
+                    )
+                else:
+                    auditlog_service.create_audit_log(
+                        operator_id=operator_id,
+                        action_type=action_type,
+                        detail=detail,
+                        ip_address=ip_address
+                    )
             except Exception as e:
                 # 审计日志记录失败不应该影响主业务逻辑
                 # 只记录错误，不抛出异常
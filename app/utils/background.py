@@ -0,0 +1,239 @@
+"""
+后台任务
+在进程内线程池中执行耗时的善后工作（重新计算设备可用时间、清理列表缓存等），
+任务按 (名称, 键) 去重合并：同一个键在排队期间重复提交只执行一次。
+优先使用 Redis 列表作为队列（多个进程共享去重状态），Redis 不可用时回退到进程内队列。
+"""
+import json
+import queue
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from flask import current_app
+
+from app.utils.redis_client import redis_client
+from app.utils.memory_redis import script_equivalent
+
+
+QUEUE_KEY = 'jobs:queue'
+PENDING_KEY = 'jobs:pending'
+
+# 原子地提交任务：已在排队时只把负载改为 null（合并），否则记录负载并入队
+SUBMIT_SCRIPT = """
+if redis.call('hexists', KEYS[1], ARGV[1]) == 1 then
+    redis.call('hset', KEYS[1], ARGV[1], 'null')
+    return 0
+end
+redis.call('hset', KEYS[1], ARGV[1], ARGV[2])
+redis.call('rpush', KEYS[2], ARGV[1])
+return 1
+"""
+
+
+@script_equivalent(SUBMIT_SCRIPT)
+def _submit_in_memory(client, keys, args):
+    """SUBMIT_SCRIPT 的内存后端实现"""
+    if client.hexists(keys[0], args[0]):
+        client.hset(keys[0], args[0], 'null')
+        return 0
+    client.hset(keys[0], args[0], args[1])
+    client.rpush(keys[1], args[0])
+    return 1
+
+
+class BackgroundJobs:
+    """
+    可合并的后台任务队列
+
+    任务处理函数签名为 handler(key, payload)。同一个键的任务在排队期间被多次提交时，
+    只保留一个任务，负载变为 None，处理函数需要据此执行完整（非增量）的处理。
+
+    Usage:
+        @background_jobs.job('equipment_next_avail_time')
+        def _next_avail_time_job(equip_id, payload):
+            ...
+
+        background_jobs.submit('equipment_next_avail_time', equip_id, payload)
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.handlers: Dict[str, Callable] = {}
+        self.eager = False
+        self.workers = 2
+        self.use_redis = True
+        self._local_queue: 'queue.Queue[str]' = queue.Queue()
+        self._local_pending: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stop = threading.Event()
+        self._stats = {'submitted': 0, 'coalesced': 0, 'executed': 0, 'failed': 0, 'local_fallbacks': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """读取配置（工作线程在第一次提交任务时启动）"""
+        self.app = app
+        self.eager = app.config.get('BACKGROUND_JOBS_EAGER', False)
+        self.workers = app.config.get('BACKGROUND_JOBS_WORKERS', 2)
+        self.use_redis = app.config.get('BACKGROUND_JOBS_QUEUE', 'redis') == 'redis'
+
+    def job(self, name: str):
+        """注册任务处理函数的装饰器"""
+        def decorator(func):
+            self.handlers[name] = func
+            return func
+        return decorator
+
+    # ========== 提交 ==========
+
+    def submit(self, name: str, key: Any, payload: Any = None) -> bool:
+        """
+        提交任务
+
+        Args:
+            name: 任务名称（已通过 job() 注册）
+            key: 去重键，同名同键的任务排队期间只执行一次
+            payload: 可 JSON 序列化的负载；与排队中的任务合并后变为 None
+
+        Returns:
+            bool: 是否新入队（False 表示与排队中的任务合并，或已在 eager 模式下直接执行）
+        """
+        if name not in self.handlers:
+            raise KeyError(f'未注册的后台任务: {name}')
+        member = f'{name}|{key}'
+        encoded = json.dumps(payload, ensure_ascii=False)
+        self._incr('submitted')
+
+        # eager 模式（测试）或尚未初始化时同步执行，负载同样经过序列化，保证与异步执行一致
+        if self.eager or self.app is None:
+            self._execute(member, encoded)
+            return False
+
+        self._ensure_workers()
+        if self.use_redis:
+            try:
+                client = redis_client.get_client()
+                queued = client.register_script(SUBMIT_SCRIPT)(keys=[PENDING_KEY, QUEUE_KEY], args=[member, encoded])
+                if not queued:
+                    self._incr('coalesced')
+                return bool(queued)
+            except Exception as e:
+                current_app.logger.warning(f'后台任务写入 Redis 队列失败，改用进程内队列: {e}')
+                self._incr('local_fallbacks')
+        return self._submit_local(member, encoded)
+
+    def _submit_local(self, member, encoded):
+        with self._lock:
+            if member in self._local_pending:
+                self._local_pending[member] = 'null'
+                self._stats['coalesced'] += 1
+                return False
+            self._local_pending[member] = encoded
+        self._local_queue.put(member)
+        return True
+
+    # ========== 执行 ==========
+
+    def _pop_local(self, timeout=None):
+        try:
+            member = self._local_queue.get(timeout=timeout) if timeout else self._local_queue.get_nowait()
+        except queue.Empty:
+            return None
+        with self._lock:
+            return member, self._local_pending.pop(member, 'null')
+
+    def _pop_redis(self, timeout=1):
+        client = redis_client.get_client()
+        item = client.blpop([QUEUE_KEY], timeout=timeout)
+        if not item:
+            return None
+        member = item[1]
+        # 取出负载后立即删除排队标记：执行期间的新提交会重新入队，不会丢失
+        pipe = client.pipeline(transaction=True)
+        pipe.hget(PENDING_KEY, member)
+        pipe.hdel(PENDING_KEY, member)
+        encoded, _ = pipe.execute()
+        return member, encoded or 'null'
+
+    def _execute(self, member, encoded):
+        """执行一个任务，异常只记录日志"""
+        name, _, key = member.partition('|')
+        handler = self.handlers.get(name)
+        if handler is None:
+            return
+        try:
+            handler(key, json.loads(encoded))
+            self._incr('executed')
+        except Exception as e:
+            self._incr('failed')
+            current_app.logger.error(f'后台任务 {member} 执行失败: {e}')
+
+    def _run_in_app(self, member, encoded):
+        # 应用上下文结束时 Flask-SQLAlchemy 会移除本线程的数据库会话
+        with self.app.app_context():
+            self._execute(member, encoded)
+
+    def _worker(self):
+        while not self._stop.is_set():
+            item = self._pop_local()
+            if item is None and self.use_redis:
+                try:
+                    item = self._pop_redis(timeout=1)
+                except Exception:
+                    item = self._pop_local(timeout=1)
+            elif item is None:
+                item = self._pop_local(timeout=1)
+            if item is not None:
+                self._run_in_app(*item)
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f'background-job-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def drain(self) -> int:
+        """
+        在当前线程中执行进程内队列里的全部任务（CLI 命令结束前或测试中使用）
+
+        Returns:
+            int: 执行的任务数量
+        """
+        count = 0
+        while True:
+            item = self._pop_local()
+            if item is None:
+                return count
+            self._execute(*item)
+            count += 1
+
+    def shutdown(self, timeout: float = 2.0):
+        """停止工作线程"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    # ========== 统计 ==========
+
+    def _incr(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def snapshot(self) -> dict:
+        """任务统计（进程内）"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['local_queued'] = len(self._local_pending)
+        return stats
+
+
+# 创建全局后台任务实例
+background_jobs = BackgroundJobs()
@@ -0,0 +1,196 @@
+"""
+缓存预热
+部署或 Redis 清空后，第一批请求会同时落到冷缓存上。预热按接口的缓存定义（CachedView）提前计算：
+实验室列表、常用筛选条件下设备列表的前几页、热门设备排行、统计数据，以及预约最多的设备的详情和时间段列表，
+结果按 get_or_compute 的缓存结构通过流水线批量写入，之后的请求直接命中。
+
+后台预热线程（CACHE_WARMER_ENABLED）定期检查这些键，在新鲜时间结束前 CACHE_WARMER_LEAD 秒内重新计算，
+热点缓存不会过期，也就不会有请求等待重新计算。
+"""
+import math
+import threading
+import time
+import uuid
+from typing import Optional
+
+from flask import current_app
+
+from app.utils.redis_client import redis_client
+
+
+# 多进程部署时每一轮只由一个进程执行后台预热
+WARMER_LOCK_KEY = 'lock:cache-warmer'
+
+
+class CacheWarmer:
+    """
+    缓存预热
+
+    Usage:
+        cache_warmer.warm()            # 全部重新计算（flask cache-warm）
+        cache_warmer.warm(lead=60)     # 只重新计算缺失或 60 秒内过期的键
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.pages = 3
+        self.hot_devices = 20
+        self.page_size = 9
+        self.interval = 30
+        self.lead = 60
+        self.batch_size = 100
+        self._thread = None
+        self._stop = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """读取配置，CACHE_WARMER_ENABLED 时启动后台预热线程"""
+        self.app = app
+        self.pages = app.config.get('CACHE_WARM_PAGES', 3)
+        self.hot_devices = app.config.get('CACHE_WARM_HOT_DEVICES', 20)
+        self.page_size = app.config.get('CACHE_WARM_PAGE_SIZE', 9)
+        self.interval = app.config.get('CACHE_WARMER_INTERVAL', 30)
+        self.lead = app.config.get('CACHE_WARMER_LEAD', 60)
+        if app.config.get('CACHE_WARMER_ENABLED', False):
+            self.start()
+
+    # ========== 预热目标 ==========
+
+    def views(self, pages: Optional[int] = None, hot_devices: Optional[int] = None) -> list:
+        """
+        需要预热的缓存定义
+
+        Args:
+            pages: 每种筛选条件预热的设备列表页数，默认 CACHE_WARM_PAGES
+            hot_devices: 预热详情和时间段列表的热门设备数量，默认 CACHE_WARM_HOT_DEVICES
+
+        Returns:
+            list: CachedView 列表
+        """
+        # 接口模块依赖本包，在这里导入避免循环导入
+        from app import db
+        from app.models.equipment import Equipment
+        from app.services import statistics_service
+        from app.api.v1.admin import statistics_view
+        from app.api.v1.equipment import equipment_list_view, equipment_detail_view, top_equipments_view
+        from app.api.v1.laboratory import lab_list_view
+        from app.api.v1.timeslot import timeslot_list_view
+
+        pages = self.pages if pages is None else pages
+        hot_devices = self.hot_devices if hot_devices is None else hot_devices
+
+        views = [lab_list_view(), statistics_view()]
+        views.extend(top_equipments_view(time_range, 10) for time_range in ('week', 'month'))
+
+        # 设备列表：不筛选，以及按实验室筛选（前端默认每页 9 条），没有数据的页不预热
+        counts = dict(db.session.query(Equipment.lab_id, db.func.count(Equipment.id)).group_by(Equipment.lab_id).all())
+        filters = [(None, sum(counts.values()))] + [(lab_id, count) for lab_id, count in counts.items() if lab_id]
+        for lab_id, count in filters:
+            for page in range(1, min(pages, math.ceil(count / self.page_size)) + 1):
+                views.append(equipment_list_view(lab_id=lab_id, page=page, page_size=self.page_size))
+
+        # 近一个月预约最多的设备
+        if hot_devices > 0:
+            for item in statistics_service.get_top_equipment(time_range='month', limit=hot_devices):
+                views.append(equipment_detail_view(item['id']))
+                views.append(timeslot_list_view(item['id']))
+        return views
+
+    # ========== 预热 ==========
+
+    def warm(self, pages: Optional[int] = None, hot_devices: Optional[int] = None,
+             lead: Optional[float] = None) -> dict:
+        """
+        计算并写入预热目标（需要应用上下文）
+
+        Args:
+            pages: 见 views()
+            hot_devices: 见 views()
+            lead: 为 None 时全部重新计算；否则只计算缺失、或新鲜时间在 lead 秒内结束的键
+
+        Returns:
+            dict: {'total': 目标数, 'warmed': 写入数, 'skipped': 仍然新鲜而跳过的数量, 'failed': 计算失败数}
+        """
+        views = self.views(pages, hot_devices)
+        stats = {'total': len(views), 'warmed': 0, 'skipped': 0, 'failed': 0}
+        if lead is not None:
+            views = self._expiring(views, lead)
+            stats['skipped'] = stats['total'] - len(views)
+
+        for i in range(0, len(views), self.batch_size):
+            with redis_client.pipeline() as pipe:
+                for view in views[i:i + self.batch_size]:
+                    try:
+                        started = time.time()
+                        value = view.compute()
+                        finished = time.time()
+                    except Exception as e:
+                        stats['failed'] += 1
+                        current_app.logger.warning(f'缓存预热失败 {view.key}: {e}')
+                        continue
+                    entry = redis_client.make_entry(value, view.ttl, finished - started, finished)
+                    pipe.set(view.key, entry, ex=view.ttl + view.stale_ttl, tags=view.tags)
+                    stats['warmed'] += 1
+        return stats
+
+    def _expiring(self, views: list, lead: float) -> list:
+        """返回缓存缺失或新鲜时间在 lead 秒内结束的目标（一次 MGET）"""
+        deadline = time.time() + lead
+        entries = redis_client.mget([view.key for view in views])
+        return [
+            view for view, entry in zip(views, entries)
+            if not (isinstance(entry, dict) and entry.get('_swr') == 1 and entry['expires'] > deadline)
+        ]
+
+    # ========== 后台预热 ==========
+
+    def start(self):
+        """启动后台预热线程（重复调用无效）"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='cache-warmer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """停止后台预热线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def run_once(self) -> Optional[dict]:
+        """
+        执行一轮后台预热（需要应用上下文）；其他进程正在执行本轮时跳过
+
+        Returns:
+            dict: warm() 的统计；跳过时返回 None
+        """
+        try:
+            # 不主动释放，锁在一个周期后过期，各进程合起来每个周期只执行一轮
+            acquired = redis_client.get_client().set(
+                WARMER_LOCK_KEY, uuid.uuid4().hex, nx=True, px=int(self.interval * 1000)
+            )
+        except Exception as e:
+            current_app.logger.warning(f'缓存预热跳过，Redis 不可用: {e}')
+            return None
+        if not acquired:
+            return None
+        return self.warm(lead=self.lead)
+
+    def _loop(self):
+        # 启动后立即执行一轮（部署后预热），之后每 interval 秒检查一次
+        while True:
+            # 应用上下文结束时 Flask-SQLAlchemy 会移除本线程的数据库会话
+            with self.app.app_context():
+                try:
+                    self.run_once()
+                except Exception as e:
+                    current_app.logger.error(f'后台缓存预热失败: {e}')
+            if self._stop.wait(self.interval):
+                return
+
+
+# 创建全局缓存预热实例
+cache_warmer = CacheWarmer()
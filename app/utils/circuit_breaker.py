@@ -0,0 +1,171 @@
+"""
+Redis 熔断器
+连续失败达到阈值后熔断：冷却期内的 Redis 调用直接失败，不再等待 socket 超时；
+由后台线程在冷却期结束后探测，探测成功才恢复访问，业务请求不承担探测的等待时间。
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+from redis import Redis
+from redis.client import Pipeline
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+
+# 只有连接类错误计入失败；命令错误（如 NOSCRIPT、WRONGTYPE）说明 Redis 本身可用
+FAILURE_ERRORS = (RedisConnectionError, RedisTimeoutError, OSError)
+
+
+class CircuitOpenError(RedisConnectionError):
+    """熔断期间的 Redis 调用（继承 ConnectionError，已有的异常处理无需修改）"""
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    Args:
+        failure_threshold: 连续失败多少次后熔断
+        cooldown: 熔断后多少秒开始探测，探测失败时再等待一个冷却期
+        probe: 探测函数，成功返回、失败抛出异常；为 None 时冷却期结束直接恢复
+        logger: 日志记录器（可选）
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 10.0,
+                 probe: Optional[Callable[[], object]] = None, logger=None):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.probe = probe
+        self.logger = logger
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+        self._prober: Optional[threading.Thread] = None
+        self._stats = {'trips': 0, 'short_circuited': 0, 'probes': 0, 'probe_failures': 0}
+
+    def allow(self) -> bool:
+        """是否允许调用（熔断期间返回 False 并计数）"""
+        if self.state == STATE_CLOSED:
+            return True
+        with self._lock:
+            self._stats['short_circuited'] += 1
+        return False
+
+    def call(self, func: Callable, *args, **kwargs):
+        """
+        通过熔断器调用
+
+        Raises:
+            CircuitOpenError: 熔断期间
+        """
+        if not self.allow():
+            raise CircuitOpenError('Redis 熔断中，跳过调用')
+        try:
+            result = func(*args, **kwargs)
+        except FAILURE_ERRORS as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    def record_success(self):
+        """记录成功调用"""
+        if self.consecutive_failures:
+            with self._lock:
+                self.consecutive_failures = 0
+
+    def record_failure(self, error: Exception):
+        """记录失败调用，连续失败达到阈值时熔断"""
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == STATE_OPEN or self.consecutive_failures < self.failure_threshold:
+                return
+            self.state = STATE_OPEN
+            self.opened_at = time.monotonic()
+            self._stats['trips'] += 1
+        self._log('warning', f'Redis 连续失败 {self.failure_threshold} 次，熔断 {self.cooldown} 秒: {error}')
+        self._start_prober()
+
+    def reset(self):
+        """恢复访问"""
+        with self._lock:
+            self.state = STATE_CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+
+    # ========== 后台探测 ==========
+
+    def _start_prober(self):
+        with self._lock:
+            if self._prober is not None and self._prober.is_alive():
+                return
+            self._prober = threading.Thread(target=self._probe_loop, name='redis-circuit-probe', daemon=True)
+            self._prober.start()
+
+    def _probe_loop(self):
+        while self.state == STATE_OPEN:
+            wait = self.opened_at + self.cooldown - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            with self._lock:
+                self._stats['probes'] += 1
+            try:
+                if self.probe is not None:
+                    self.probe()
+            except Exception as e:
+                with self._lock:
+                    self._stats['probe_failures'] += 1
+                    self.opened_at = time.monotonic()
+                self._log('warning', f'Redis 探测失败，继续熔断: {e}')
+                continue
+            self.reset()
+            self._log('info', 'Redis 探测成功，恢复访问')
+
+    def _log(self, level, message):
+        if self.logger is not None:
+            getattr(self.logger, level)(message)
+
+    def snapshot(self) -> dict:
+        """熔断器状态"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['state'] = self.state
+            stats['consecutive_failures'] = self.consecutive_failures
+            stats['retry_in'] = (
+                round(max(0.0, self.opened_at + self.cooldown - time.monotonic()), 3)
+                if self.state == STATE_OPEN else 0.0
+            )
+        return stats
+
+
+class GuardedPipeline(Pipeline):
+    """execute() 经过熔断器的流水线"""
+
+    breaker: CircuitBreaker = None
+
+    def execute(self, raise_on_error=True):
+        return self.breaker.call(super().execute, raise_on_error)
+
+
+class GuardedRedis(Redis):
+    """
+    所有命令经过熔断器的 Redis 客户端
+
+    单条命令（包括 Lua 脚本的 EVALSHA）经过 execute_command，流水线经过 GuardedPipeline.execute
+    """
+
+    def __init__(self, *args, breaker: CircuitBreaker = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.breaker = breaker or CircuitBreaker()
+
+    def execute_command(self, *args, **options):
+        return self.breaker.call(super().execute_command, *args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None) -> Pipeline:
+        pipe = GuardedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+        pipe.breaker = self.breaker
+        return pipe
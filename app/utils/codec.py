@@ -0,0 +1,162 @@
+"""
+缓存值编解码
+把缓存值编码为带类型标记的字节串：MARKER + 格式 + 压缩方式 + 数据，解码时按标记处理，不再逐个尝试。
+
+格式：
+- J: JSON（可选使用 orjson 加速，编码结果与标准库 json 兼容）
+- M: MessagePack（需要安装 msgpack）
+- S: 普通字符串（UTF-8）
+- B: 字节串（原样保存）
+- E: 值为字节串的 get_or_compute 缓存结构：4 字节头部长度 + 头部 JSON + 值（原样保存）
+压缩（超过阈值时，B / E 不压缩，字节串由调用方决定是否压缩）：
+- '-': 不压缩
+- 'z': zlib
+- 'Z': zstd（需要安装 zstandard）
+
+orjson / msgpack / zstandard 都是可选依赖，未安装时回退到标准库实现。
+"""
+import json
+import struct
+import zlib
+from typing import Any, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 取决于环境
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - 取决于环境
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 取决于环境
+    zstandard = None
+
+
+# 记录分隔符不会出现在 JSON 文本开头，用来区分带标记的值和旧版本写入的纯 JSON 文本
+MARKER = b'\x1e'
+
+FORMAT_JSON = b'J'
+FORMAT_MSGPACK = b'M'
+FORMAT_STR = b'S'
+FORMAT_BYTES = b'B'
+FORMAT_ENVELOPE = b'E'
+
+COMPRESS_NONE = b'-'
+COMPRESS_ZLIB = b'z'
+COMPRESS_ZSTD = b'Z'
+
+
+class CodecError(Exception):
+    """无法解码的缓存值"""
+
+
+class CacheCodec:
+    """
+    缓存值编解码器
+
+    Args:
+        serializer: json / orjson / msgpack；依赖未安装时回退到 json
+        compression: none / zlib / zstd；zstd 未安装时回退到 zlib
+        threshold: 编码后超过该字节数才压缩
+        level: 压缩级别（zlib 1-9，zstd 1-22）
+    """
+
+    def __init__(self, serializer: str = 'json', compression: str = 'zlib', threshold: int = 1024, level: int = 3):
+        if serializer == 'orjson' and orjson is None:
+            serializer = 'json'
+        if serializer == 'msgpack' and msgpack is None:
+            serializer = 'json'
+        if compression == 'zstd' and zstandard is None:
+            compression = 'zlib'
+        self.serializer = serializer
+        self.compression = compression
+        self.threshold = threshold
+        self.level = level
+        self._zstd_compressor = zstandard.ZstdCompressor(level=level) if compression == 'zstd' else None
+        self._zstd_decompressor = zstandard.ZstdDecompressor() if zstandard is not None else None
+
+    def encode(self, value: Any) -> bytes:
+        """
+        编码缓存值
+
+        Args:
+            value: dict / list / 数字等可序列化对象、字符串、字节串，或 'v' 为字节串的缓存结构
+
+        Returns:
+            bytes: 带类型标记的字节串
+        """
+        if isinstance(value, bytes):
+            return MARKER + FORMAT_BYTES + COMPRESS_NONE + value
+        if isinstance(value, dict) and isinstance(value.get('v'), bytes):
+            header = json.dumps({k: v for k, v in value.items() if k != 'v'}, separators=(',', ':')).encode('utf-8')
+            return MARKER + FORMAT_ENVELOPE + COMPRESS_NONE + struct.pack('>I', len(header)) + header + value['v']
+        if isinstance(value, str):
+            fmt, body = FORMAT_STR, value.encode('utf-8')
+        elif self.serializer == 'msgpack':
+            fmt, body = FORMAT_MSGPACK, msgpack.packb(value, use_bin_type=True)
+        elif self.serializer == 'orjson':
+            fmt, body = FORMAT_JSON, orjson.dumps(value)
+        else:
+            fmt, body = FORMAT_JSON, json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+        compress = COMPRESS_NONE
+        if len(body) > self.threshold:
+            if self.compression == 'zstd':
+                compress, body = COMPRESS_ZSTD, self._zstd_compressor.compress(body)
+            elif self.compression == 'zlib':
+                compress, body = COMPRESS_ZLIB, zlib.compress(body, self.level)
+        return MARKER + fmt + compress + body
+
+    def decode(self, data: bytes) -> Any:
+        """
+        解码缓存值；没有类型标记的值按旧版本规则处理（尝试 JSON，失败时返回字符串）
+
+        Args:
+            data: Redis 返回的字节串（字符串会先按 UTF-8 编码）
+
+        Raises:
+            CodecError: 标记无法识别或所需依赖未安装
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if not data.startswith(MARKER):
+            text = data.decode('utf-8')
+            try:
+                return json.loads(text)
+            except ValueError:
+                return text
+
+        fmt, compress, body = data[1:2], data[2:3], data[3:]
+        if compress == COMPRESS_ZLIB:
+            body = zlib.decompress(body)
+        elif compress == COMPRESS_ZSTD:
+            if self._zstd_decompressor is None:
+                raise CodecError('缓存值使用 zstd 压缩，但未安装 zstandard')
+            body = self._zstd_decompressor.decompress(body)
+        elif compress != COMPRESS_NONE:
+            raise CodecError(f'未知的压缩方式: {compress!r}')
+
+        if fmt == FORMAT_STR:
+            return body.decode('utf-8')
+        if fmt == FORMAT_BYTES:
+            return body
+        if fmt == FORMAT_ENVELOPE:
+            size = struct.unpack('>I', body[:4])[0]
+            value = json.loads(body[4:4 + size])
+            value['v'] = body[4 + size:]
+            return value
+        if fmt == FORMAT_JSON:
+            return orjson.loads(body) if orjson is not None else json.loads(body)
+        if fmt == FORMAT_MSGPACK:
+            if msgpack is None:
+                raise CodecError('缓存值使用 msgpack 编码，但未安装 msgpack')
+            return msgpack.unpackb(body, raw=False)
+        raise CodecError(f'未知的编码格式: {fmt!r}')
+
+    def describe(self) -> Tuple[str, str, int]:
+        """实际使用的 (序列化方式, 压缩方式, 压缩阈值)"""
+        return self.serializer, self.compression, self.threshold
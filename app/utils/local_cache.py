@@ -0,0 +1,121 @@
+"""
+进程内缓存（L1）
+位于 Redis（L2）之前的 LRU 缓存：按条目数和估算字节数限制内存，每个条目有独立的过期时间。
+跨进程的失效通过 Redis pub/sub 广播（见 RedisClient），本模块只负责进程内的存取。
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+
+class LocalCache:
+    """
+    线程安全的 TTL LRU 缓存
+
+    缓存的是反序列化后的对象，调用方不能修改取到的对象。
+
+    Usage:
+        cache = LocalCache(max_entries=1024, max_bytes=16 * 1024 * 1024, default_ttl=60)
+        epoch = cache.epoch
+        hit, value = cache.get('key')
+        if not hit:
+            value = load()
+            cache.set('key', value, size=len(raw), ttl=30, epoch=epoch)
+    """
+
+    def __init__(self, max_entries: int = 2048, max_bytes: int = 32 * 1024 * 1024, default_ttl: int = 60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._data: 'OrderedDict[Hashable, Tuple[float, int, Any]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # 每次失效加一；读取 L2 前记录，写入 L1 时如果期间发生过失效就放弃写入，
+        # 避免把失效之前读到的旧值放进 L1
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        读取缓存
+
+        Returns:
+            tuple: (是否命中, 值)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, entry[2]
+
+    def set(self, key: Hashable, value: Any, size: int = 1, ttl: Optional[int] = None,
+            epoch: Optional[int] = None) -> bool:
+        """
+        写入缓存
+
+        Args:
+            key: 键
+            value: 值
+            size: 估算的字节数（一般取序列化后的长度）
+            ttl: 过期时间（秒），不超过 default_ttl
+            epoch: 读取数据前的 epoch；期间发生过失效时不写入
+
+        Returns:
+            bool: 是否写入
+        """
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return False
+        ttl = min(ttl, self.default_ttl) if ttl else self.default_ttl
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return False
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+            return True
+
+    def delete(self, *keys: Hashable) -> None:
+        """删除缓存"""
+        with self._lock:
+            self.epoch += 1
+            for key in keys:
+                if key in self._data:
+                    self._remove(key)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self.epoch += 1
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def snapshot(self) -> dict:
+        """命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._data),
+                'bytes': self._bytes
+            }
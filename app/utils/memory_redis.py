@@ -0,0 +1,487 @@
+"""
+进程内 Redis 兼容后端
+纯 Python 实现 RedisClient 及锁、后台任务用到的 Redis 命令子集：带过期时间的字符串、INCR、
+哈希、列表（含 BLPOP）、集合、键操作、流水线、pub/sub，以及 Lua 脚本的 Python 等价实现。
+
+通过 REDIS_BACKEND=memory 启用，适用于本地开发、测试和单进程部署（省去一次网络往返）。
+数据只存在于当前进程中，多个进程/多台机器之间不共享，重启后丢失。
+
+Lua 脚本没有解释器，使用脚本的模块需要用 script_equivalent() 注册 Python 等价实现，
+执行时持有存储锁，与 Lua 脚本一样是原子的。
+"""
+import fnmatch
+import heapq
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+from redis.exceptions import DataError, ResponseError
+
+
+WRONGTYPE = 'WRONGTYPE Operation against a key holding the wrong kind of value'
+
+# 脚本源码 -> Python 等价实现 func(client, keys, args)
+_SCRIPTS: Dict[str, Callable] = {}
+
+
+def script_equivalent(source: str):
+    """
+    为 Lua 脚本注册 Python 等价实现的装饰器
+
+    Usage:
+        @script_equivalent(RELEASE_SCRIPT)
+        def _release(client, keys, args):
+            ...
+    """
+    def decorator(func):
+        _SCRIPTS[source.strip()] = func
+        return func
+    return decorator
+
+
+def _encode(value) -> bytes:
+    """与 redis-py 的编码规则一致：bytes 原样，str 按 UTF-8，数字转为字符串"""
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, bool):
+        raise DataError('Invalid input of type: bool')
+    if isinstance(value, (int, float)):
+        return repr(value).encode('utf-8')
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    raise DataError(f'Invalid input of type: {type(value).__name__}')
+
+
+def _key(name) -> str:
+    return name.decode('utf-8') if isinstance(name, bytes) else str(name)
+
+
+class MemoryStore:
+    """
+    共享的数据存储
+
+    同一个存储可以被多个 MemoryRedis 视图共享（例如解码和不解码响应的两个客户端），
+    对应同一个 Redis 服务器上的两个连接池。
+    """
+
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        self.expires: Dict[str, float] = {}
+        self.lock = threading.RLock()
+        self.pushed = threading.Condition(self.lock)
+        self.channels: Dict[str, list] = {}
+        self._expire_heap = []
+
+    def alive(self, key: str):
+        """返回未过期的值，已过期的键顺便删除"""
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.remove(key)
+            return None
+        return self.data.get(key)
+
+    def remove(self, key: str) -> bool:
+        self.expires.pop(key, None)
+        return self.data.pop(key, None) is not None
+
+    def set_expire(self, key: str, seconds: Optional[float]):
+        if seconds is None:
+            self.expires.pop(key, None)
+            return
+        deadline = time.monotonic() + seconds
+        self.expires[key] = deadline
+        heapq.heappush(self._expire_heap, (deadline, key))
+
+    def purge_expired(self):
+        """删除已过期的键（写操作时调用，过期但不再访问的键不会一直占用内存）"""
+        now = time.monotonic()
+        heap = self._expire_heap
+        while heap and heap[0][0] <= now:
+            deadline, key = heapq.heappop(heap)
+            if self.expires.get(key) == deadline:
+                self.remove(key)
+
+
+class MemoryPubSub:
+    """pub/sub 订阅对象，接口与 redis-py 的 PubSub 一致（只支持精确频道名）"""
+
+    def __init__(self, store: MemoryStore, decode_responses: bool):
+        self.store = store
+        self.decode_responses = decode_responses
+        self.channels = set()
+        self._messages: 'queue.Queue[dict]' = queue.Queue()
+
+    def _out(self, value):
+        return value.decode('utf-8') if self.decode_responses and isinstance(value, bytes) else value
+
+    def subscribe(self, *channels):
+        with self.store.lock:
+            for channel in channels:
+                channel = _key(channel)
+                self.channels.add(channel)
+                self.store.channels.setdefault(channel, []).append(self)
+                self._messages.put({
+                    'type': 'subscribe', 'pattern': None,
+                    'channel': self._out(_encode(channel)), 'data': len(self.channels)
+                })
+
+    def unsubscribe(self, *channels):
+        with self.store.lock:
+            for channel in [_key(c) for c in channels] or list(self.channels):
+                self.channels.discard(channel)
+                subscribers = self.store.channels.get(channel, [])
+                if self in subscribers:
+                    subscribers.remove(self)
+
+    def deliver(self, channel: str, data: bytes):
+        self._messages.put({
+            'type': 'message', 'pattern': None,
+            'channel': self._out(_encode(channel)), 'data': self._out(data)
+        })
+
+    def get_message(self, ignore_subscribe_messages: bool = False, timeout: float = 0.0):
+        deadline = time.monotonic() + (timeout or 0)
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                message = self._messages.get(timeout=remaining) if remaining > 0 else self._messages.get_nowait()
+            except queue.Empty:
+                return None
+            if ignore_subscribe_messages and message['type'] == 'subscribe':
+                continue
+            return message
+
+    def listen(self):
+        while self.channels:
+            yield self._messages.get()
+
+    def close(self):
+        self.unsubscribe()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MemoryScript:
+    """register_script() 的返回值"""
+
+    def __init__(self, client: 'MemoryRedis', source: str):
+        self.client = client
+        self.source = source
+
+    def __call__(self, keys=(), args=(), client=None):
+        func = _SCRIPTS.get(self.source.strip())
+        if func is None:
+            raise ResponseError('NOSCRIPT 内存后端没有该 Lua 脚本的 Python 实现')
+        target = client or self.client
+        if isinstance(target, MemoryPipeline):
+            # 在流水线中调用时排队，execute() 时执行
+            target._commands.append((lambda: func(target.client, list(keys), list(args)), (), {}))
+            return target
+        with target.store.lock:
+            return func(target, list(keys), list(args))
+
+
+class MemoryPipeline:
+    """流水线：命令先记录，execute() 时持有存储锁依次执行（因此同时具备事务的原子性）"""
+
+    def __init__(self, client: 'MemoryRedis'):
+        self.client = client
+        self._commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        def queue_command(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+        return queue_command
+
+    def execute(self, raise_on_error: bool = True) -> list:
+        commands, self._commands = self._commands, []
+        results = []
+        with self.client.store.lock:
+            for method, args, kwargs in commands:
+                try:
+                    results.append(method(*args, **kwargs))
+                except ResponseError as e:
+                    if raise_on_error:
+                        raise
+                    results.append(e)
+        return results
+
+    def reset(self):
+        self._commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.reset()
+
+
+class MemoryRedis:
+    """
+    与 redis.Redis 接口兼容的进程内客户端（命令子集）
+
+    Args:
+        store: 共享存储，为 None 时新建
+        decode_responses: 是否把返回的字节串解码为字符串
+    """
+
+    def __init__(self, store: Optional[MemoryStore] = None, decode_responses: bool = False):
+        self.store = store or MemoryStore()
+        self.decode_responses = decode_responses
+
+    def _out(self, value):
+        if self.decode_responses and isinstance(value, bytes):
+            return value.decode('utf-8')
+        return value
+
+    def _typed(self, key: str, kind: type, create: bool = False):
+        """返回指定类型的值；键不存在时返回 None 或新建，类型不符时抛出 WRONGTYPE"""
+        value = self.store.alive(key)
+        if value is None:
+            if not create:
+                return None
+            value = kind()
+            self.store.data[key] = value
+        elif not isinstance(value, kind):
+            raise ResponseError(WRONGTYPE)
+        return value
+
+    # ========== 连接 ==========
+
+    def ping(self) -> bool:
+        return True
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> MemoryPipeline:
+        return MemoryPipeline(self)
+
+    def register_script(self, script: str) -> MemoryScript:
+        return MemoryScript(self, script)
+
+    def pubsub(self, **kwargs) -> MemoryPubSub:
+        return MemoryPubSub(self.store, self.decode_responses)
+
+    def publish(self, channel, message) -> int:
+        data = _encode(message)
+        with self.store.lock:
+            subscribers = list(self.store.channels.get(_key(channel), []))
+        for subscriber in subscribers:
+            subscriber.deliver(_key(channel), data)
+        return len(subscribers)
+
+    # ========== 字符串 ==========
+
+    def get(self, name):
+        with self.store.lock:
+            return self._out(self._typed(_key(name), bytes))
+
+    def mget(self, keys, *args) -> list:
+        keys = list(keys) if isinstance(keys, (list, tuple)) else [keys]
+        with self.store.lock:
+            result = []
+            for name in [*keys, *args]:
+                value = self.store.alive(_key(name))
+                result.append(self._out(value) if isinstance(value, bytes) else None)
+            return result
+
+    def set(self, name, value, ex=None, px=None, nx: bool = False, xx: bool = False, keepttl: bool = False):
+        key = _key(name)
+        data = _encode(value)
+        with self.store.lock:
+            self.store.purge_expired()
+            exists = self.store.alive(key) is not None
+            if (nx and exists) or (xx and not exists):
+                return None
+            self.store.data[key] = data
+            if ex is not None:
+                self.store.set_expire(key, float(ex))
+            elif px is not None:
+                self.store.set_expire(key, float(px) / 1000.0)
+            elif not keepttl:
+                self.store.set_expire(key, None)
+            return True
+
+    def incr(self, name, amount: int = 1) -> int:
+        return self.incrby(name, amount)
+
+    def incrby(self, name, amount: int = 1) -> int:
+        key = _key(name)
+        with self.store.lock:
+            current = self._typed(key, bytes)
+            try:
+                value = int(current or 0) + amount
+            except ValueError:
+                raise ResponseError('value is not an integer or out of range')
+            self.store.data[key] = _encode(value)
+            return value
+
+    # ========== 键 ==========
+
+    def delete(self, *names) -> int:
+        with self.store.lock:
+            return sum(1 for name in names if self.store.alive(_key(name)) is not None and self.store.remove(_key(name)))
+
+    def unlink(self, *names) -> int:
+        return self.delete(*names)
+
+    def exists(self, *names) -> int:
+        with self.store.lock:
+            return sum(1 for name in names if self.store.alive(_key(name)) is not None)
+
+    def expire(self, name, time_) -> bool:
+        key = _key(name)
+        with self.store.lock:
+            if self.store.alive(key) is None:
+                return False
+            self.store.set_expire(key, float(time_))
+            return True
+
+    def pexpire(self, name, time_ms) -> bool:
+        return self.expire(name, float(time_ms) / 1000.0)
+
+    def ttl(self, name) -> int:
+        key = _key(name)
+        with self.store.lock:
+            if self.store.alive(key) is None:
+                return -2
+            deadline = self.store.expires.get(key)
+            if deadline is None:
+                return -1
+            return max(0, int(round(deadline - time.monotonic())))
+
+    def keys(self, pattern='*') -> list:
+        pattern = _key(pattern)
+        with self.store.lock:
+            return [
+                self._out(_encode(key)) for key in list(self.store.data)
+                if self.store.alive(key) is not None and fnmatch.fnmatchcase(key, pattern)
+            ]
+
+    def flushdb(self) -> bool:
+        with self.store.lock:
+            self.store.data.clear()
+            self.store.expires.clear()
+            return True
+
+    # ========== 哈希 ==========
+
+    def hset(self, name, key=None, value=None, mapping=None) -> int:
+        items = dict(mapping or {})
+        if key is not None:
+            items[key] = value
+        with self.store.lock:
+            hash_ = self._typed(_key(name), dict, create=True)
+            added = 0
+            for field, item in items.items():
+                field = _encode(field)
+                added += field not in hash_
+                hash_[field] = _encode(item)
+            return added
+
+    def hget(self, name, key):
+        with self.store.lock:
+            hash_ = self._typed(_key(name), dict)
+            return self._out(hash_.get(_encode(key))) if hash_ else None
+
+    def hgetall(self, name) -> dict:
+        with self.store.lock:
+            hash_ = self._typed(_key(name), dict) or {}
+            return {self._out(field): self._out(value) for field, value in hash_.items()}
+
+    def hexists(self, name, key) -> bool:
+        with self.store.lock:
+            return _encode(key) in (self._typed(_key(name), dict) or {})
+
+    def hdel(self, name, *keys) -> int:
+        with self.store.lock:
+            hash_ = self._typed(_key(name), dict)
+            if not hash_:
+                return 0
+            removed = sum(1 for key in keys if hash_.pop(_encode(key), None) is not None)
+            if not hash_:
+                self.store.remove(_key(name))
+            return removed
+
+    # ========== 列表 ==========
+
+    def lpush(self, name, *values) -> int:
+        with self.store.lock:
+            items = self._typed(_key(name), deque, create=True)
+            for value in values:
+                items.appendleft(_encode(value))
+            self.store.pushed.notify_all()
+            return len(items)
+
+    def rpush(self, name, *values) -> int:
+        with self.store.lock:
+            items = self._typed(_key(name), deque, create=True)
+            items.extend(_encode(value) for value in values)
+            self.store.pushed.notify_all()
+            return len(items)
+
+    def lpop(self, name):
+        with self.store.lock:
+            items = self._typed(_key(name), deque)
+            if not items:
+                return None
+            value = items.popleft()
+            if not items:
+                self.store.remove(_key(name))
+            return self._out(value)
+
+    def llen(self, name) -> int:
+        with self.store.lock:
+            return len(self._typed(_key(name), deque) or ())
+
+    def lrange(self, name, start: int, end: int) -> list:
+        with self.store.lock:
+            items = list(self._typed(_key(name), deque) or ())
+        end = len(items) if end == -1 else end + 1
+        return [self._out(value) for value in items[start:end]]
+
+    def blpop(self, keys, timeout: float = 0):
+        """阻塞弹出，timeout 为 0 时一直等待"""
+        keys = [keys] if isinstance(keys, (str, bytes)) else list(keys)
+        deadline = time.monotonic() + timeout if timeout else None
+        with self.store.pushed:
+            while True:
+                for name in keys:
+                    value = self.lpop(name)
+                    if value is not None:
+                        return self._out(_encode(_key(name))), value
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.store.pushed.wait(remaining)
+
+    # ========== 集合 ==========
+
+    def sadd(self, name, *values) -> int:
+        with self.store.lock:
+            members = self._typed(_key(name), set, create=True)
+            before = len(members)
+            members.update(_encode(value) for value in values)
+            return len(members) - before
+
+    def srem(self, name, *values) -> int:
+        with self.store.lock:
+            members = self._typed(_key(name), set)
+            if not members:
+                return 0
+            before = len(members)
+            members.difference_update(_encode(value) for value in values)
+            if not members:
+                self.store.remove(_key(name))
+            return before - len(members)
+
+    def smembers(self, name) -> set:
+        with self.store.lock:
+            return {self._out(value) for value in (self._typed(_key(name), set) or ())}
@@ -0,0 +1,212 @@
+"""
+不存在 ID 的快速拒绝
+爬虫和前端的失效链接会持续请求不存在的设备、预约，每次都要查询数据库才能返回 404。
+
+- 负缓存：查询不到的 ID 写入短时标记（missing:{kind}:{id}，NEGATIVE_CACHE_TTL 秒），
+  标记存在期间直接判定不存在；创建对象后立即删除对应标记
+- 设备 ID 布隆过滤器（可选，EQUIPMENT_ID_BLOOM）：进程内保存全部设备 ID 的布隆过滤器，
+  不在过滤器中的 ID 一定不存在，不需要访问 Redis 和数据库。
+  过滤器每 EQUIPMENT_ID_BLOOM_REBUILD 秒重建一次；新建设备时递增 Redis 中的版本号，
+  其他进程发现版本变化后重建，Redis 不可用时最多在一个重建周期内把新设备误判为不存在
+- 存在的 ID：查询到的 ID 在进程内记录 KNOWN_TTL 秒，期间跳过上面两项检查，
+  只有未知的 ID 才需要读取 Redis，存在的热门 ID 不为负缓存多付一次往返
+"""
+import hashlib
+import math
+import threading
+import time
+from typing import Any, Optional
+
+from flask import current_app
+
+from app.utils.local_cache import LocalCache
+from app.utils.redis_client import redis_client
+
+
+# 设备 ID 布隆过滤器的版本号（命名空间版本号，见 RedisClient.bump_namespace）
+EQUIPMENT_BLOOM_NAMESPACE = 'bloom:equipment'
+
+# 进程内记录的存在 ID：过期时间（秒）和最大条目数。记录过期前对象被删除时，
+# 只是多查询一次数据库（查询不到后立即写入负缓存并移除记录），不会返回错误结果
+KNOWN_TTL = 60
+KNOWN_MAX_ENTRIES = 4096
+
+
+def missing_key(kind: str, item_id: Any) -> str:
+    """不存在标记的键名，如 missing:equipment:42"""
+    return f'missing:{kind}:{item_id}'
+
+
+class BloomFilter:
+    """
+    布隆过滤器（双重哈希）
+
+    Args:
+        capacity: 预计元素数量
+        error_rate: 元素数量不超过 capacity 时的误判率
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(str(item).encode('utf-8'), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class NegativeCache:
+    """
+    不存在 ID 的负缓存和设备 ID 布隆过滤器
+
+    Usage:
+        if negative_cache.equipment_missing(equip_id):
+            raise NotFoundError('设备不存在')
+        equipment = Equipment.query.get(equip_id)
+        if not equipment:
+            negative_cache.mark('equipment', equip_id)
+            raise NotFoundError('设备不存在')
+        negative_cache.found('equipment', equip_id)
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 30
+        self.use_bloom = False
+        self.bloom_rebuild = 300
+        self.bloom_error_rate = 0.01
+        self._bloom: Optional[BloomFilter] = None
+        self._bloom_version = None
+        self._bloom_built = 0.0
+        self._lock = threading.Lock()
+        self._known = LocalCache(max_entries=KNOWN_MAX_ENTRIES, default_ttl=KNOWN_TTL)
+        self._stats = {'negative_hits': 0, 'marked': 0, 'bloom_rejects': 0, 'bloom_rebuilds': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """读取配置"""
+        self.ttl = app.config.get('NEGATIVE_CACHE_TTL', 30)
+        self.use_bloom = app.config.get('EQUIPMENT_ID_BLOOM', False)
+        self.bloom_rebuild = app.config.get('EQUIPMENT_ID_BLOOM_REBUILD', 300)
+        self.bloom_error_rate = app.config.get('EQUIPMENT_ID_BLOOM_ERROR_RATE', 0.01)
+        self.reset()
+
+    def reset(self):
+        """丢弃进程内的布隆过滤器、存在的 ID 和统计"""
+        self._known = LocalCache(max_entries=KNOWN_MAX_ENTRIES, default_ttl=KNOWN_TTL)
+        with self._lock:
+            self._bloom = None
+            self._bloom_version = None
+            self._stats = dict.fromkeys(self._stats, 0)
+
+    # ========== 负缓存 ==========
+
+    def is_missing(self, kind: str, item_id: Any) -> bool:
+        """ID 是否在负缓存中（最近查询过且不存在）；进程内记录为存在的 ID 不读取 Redis"""
+        if self.ttl <= 0 or self._is_known(kind, item_id):
+            return False
+        if redis_client.get(missing_key(kind, item_id)) == 1:
+            self._incr('negative_hits')
+            return True
+        return False
+
+    def mark(self, kind: str, item_id: Any):
+        """记录 ID 不存在"""
+        self._known.delete((kind, item_id))
+        if self.ttl > 0 and redis_client.set(missing_key(kind, item_id), 1, ex=self.ttl):
+            self._incr('marked')
+
+    def forget(self, kind: str, *item_ids: Any):
+        """对象已创建，删除不存在标记"""
+        if self.ttl > 0 and item_ids:
+            redis_client.delete(*(missing_key(kind, item_id) for item_id in item_ids))
+
+    def found(self, kind: str, item_id: Any):
+        """查询到对象后调用：在进程内记录 ID 存在，之后的查询跳过负缓存和布隆过滤器"""
+        self._known.set((kind, item_id), True)
+
+    def _is_known(self, kind: str, item_id: Any) -> bool:
+        hit, _ = self._known.get((kind, item_id))
+        return hit
+
+    # ========== 设备 ==========
+
+    def equipment_missing(self, equip_id: Any) -> bool:
+        """
+        设备是否一定不存在（布隆过滤器判定不存在，或在负缓存中）
+
+        Returns:
+            bool: True 表示可以直接返回不存在；False 表示需要查询数据库
+        """
+        if self._is_known('equipment', equip_id):
+            return False
+        bloom = self._equipment_bloom() if self.use_bloom else None
+        if bloom is not None and equip_id not in bloom:
+            self._incr('bloom_rejects')
+            return True
+        return self.is_missing('equipment', equip_id)
+
+    def equipment_added(self, equip_id: Any):
+        """新建设备后调用：删除不存在标记，加入本进程的过滤器并通知其他进程重建"""
+        self.forget('equipment', equip_id)
+        if not self.use_bloom:
+            return
+        redis_client.bump_namespace(EQUIPMENT_BLOOM_NAMESPACE)
+        version = redis_client.namespace_version(EQUIPMENT_BLOOM_NAMESPACE)
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(equip_id)
+                # 只有自己递增了版本号时才沿用本进程的过滤器，否则其他进程也新建了设备，需要重建
+                if self._bloom_version is not None and version == self._bloom_version + 1:
+                    self._bloom_version = version
+
+    def _equipment_bloom(self) -> Optional[BloomFilter]:
+        """返回当前的设备 ID 过滤器，过期或版本变化时重建；重建失败时返回 None（不使用过滤器）"""
+        version = redis_client.namespace_version(EQUIPMENT_BLOOM_NAMESPACE)
+        with self._lock:
+            if (self._bloom is not None and version == self._bloom_version
+                    and time.monotonic() - self._bloom_built < self.bloom_rebuild):
+                return self._bloom
+            try:
+                from app import db
+                from app.models.equipment import Equipment
+
+                ids = [row[0] for row in db.session.query(Equipment.id)]
+            except Exception as e:
+                current_app.logger.error(f'重建设备 ID 过滤器失败: {e}')
+                return None
+            # 留出余量，重建周期内新建的设备加入后误判率不会明显上升
+            bloom = BloomFilter(max(len(ids) * 2, 1024), self.bloom_error_rate)
+            for equip_id in ids:
+                bloom.add(equip_id)
+            self._bloom, self._bloom_version, self._bloom_built = bloom, version, time.monotonic()
+            self._stats['bloom_rebuilds'] += 1
+            return bloom
+
+    # ========== 统计 ==========
+
+    def _incr(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def snapshot(self) -> dict:
+        """统计（进程内）"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['bloom_size'] = self._bloom.size if self._bloom is not None else None
+        stats['known_hits'] = self._known.hits
+        return stats
+
+
+# 创建全局负缓存实例
+negative_cache = NegativeCache()
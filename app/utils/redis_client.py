@@ -1,12 +1,52 @@
 """
 Redis 客户端工具类
 提供 Redis 连接和常用操作方法
+缓存读写可以在 Redis（L2）前加一层进程内缓存（L1），L1 的跨进程失效通过 Redis pub/sub 广播
+缓存值由 CacheCodec 编码为带类型标记的字节串，通过不解码响应的连接（raw_client）读写
+所有命令经过熔断器（CircuitBreaker），Redis 故障期间直接失败，不再让每个请求等待 socket 超时
 """
 import json
-from typing import Any, Optional, Union
+import math
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Union
 from redis import Redis, ConnectionPool
 from flask import current_app
 
+from app.utils.circuit_breaker import CircuitBreaker, GuardedRedis
+from app.utils.codec import CacheCodec, CodecError
+from app.utils.local_cache import LocalCache
+from app.utils.memory_redis import MemoryRedis, MemoryStore, script_equivalent
+from app.utils.response import make_etag
+
+
+# 写入缓存并登记标签；同一标签下的缓存过期时间可能不同，标签集合的过期时间只延长不缩短
+SET_TAGGED_SCRIPT = """
+redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[2])
+for i = 2, #KEYS do
+    redis.call('sadd', KEYS[i], KEYS[1])
+    if redis.call('ttl', KEYS[i]) < tonumber(ARGV[2]) then
+        redis.call('expire', KEYS[i], ARGV[2])
+    end
+end
+return 1
+"""
+
+
+@script_equivalent(SET_TAGGED_SCRIPT)
+def _set_tagged_in_memory(client, keys, args):
+    """SET_TAGGED_SCRIPT 的内存后端实现"""
+    ex = int(args[1])
+    client.set(keys[0], args[0], ex=ex)
+    for tag in keys[1:]:
+        client.sadd(tag, keys[0])
+        if client.ttl(tag) < ex:
+            client.expire(tag, ex)
+    return 1
+
 
 class RedisClient:
     """Redis 客户端封装类"""
@@ -14,12 +54,62 @@ class RedisClient:
     def __init__(self, app=None):
         self.redis_client: Optional[Redis] = None
         self.pool: Optional[ConnectionPool] = None
+        self.raw_client: Optional[Redis] = None
+        self.backend = 'redis'
+        self.codec = CacheCodec()
+        self.breaker = CircuitBreaker()
+        self.local: Optional[LocalCache] = None
+        self.tier_stats = _CacheStats()
+        self._compute_counts = {'computed': 0, 'stale': 0, 'early_refresh': 0, 'lock_wait': 0}
+        self._compute_lock = threading.Lock()
+        self.invalidation_channel = 'cache:invalidate'
+        self._logger = None
+        self._subscriber: Optional[threading.Thread] = None
+        self._subscriber_lock = threading.Lock()
+        self._subscribed = threading.Event()
         if app is not None:
             self.init_app(app)
     
     def init_app(self, app):
         """初始化 Redis 连接"""
         config = app.config
+        self._logger = app.logger
+        self.invalidation_channel = config.get('CACHE_INVALIDATION_CHANNEL', 'cache:invalidate')
+        self.codec = CacheCodec(
+            serializer=config.get('CACHE_SERIALIZER', 'orjson'),
+            compression=config.get('CACHE_COMPRESSION', 'zlib'),
+            threshold=config.get('CACHE_COMPRESSION_THRESHOLD', 1024)
+        )
+        self.backend = config.get('REDIS_BACKEND', 'redis')
+        
+        if self.backend == 'memory':
+            # 进程内后端：两个客户端共享同一份数据，不会出现连接故障，不需要熔断器；
+            # 数据本身就在进程内，不再启用 L1
+            store = MemoryStore()
+            self.pool = None
+            self.redis_client = MemoryRedis(store, decode_responses=config.get('REDIS_DECODE_RESPONSES', True))
+            self.raw_client = MemoryRedis(store, decode_responses=False)
+            self.breaker = CircuitBreaker()
+            self.local = None
+            app.logger.info('Redis 使用进程内后端（REDIS_BACKEND=memory）')
+            return
+        
+        # 熔断器：两个连接访问同一个 Redis，共用一个熔断器；探测使用短超时的独立连接
+        probe_timeout = config.get('REDIS_BREAKER_PROBE_TIMEOUT', 1)
+        probe_client = Redis(
+            host=config.get('REDIS_HOST', 'localhost'),
+            port=config.get('REDIS_PORT', 6379),
+            password=config.get('REDIS_PASSWORD'),
+            db=config.get('REDIS_DB', 0),
+            socket_timeout=probe_timeout,
+            socket_connect_timeout=probe_timeout
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold=config.get('REDIS_BREAKER_FAILURE_THRESHOLD', 3),
+            cooldown=config.get('REDIS_BREAKER_COOLDOWN', 10),
+            probe=probe_client.ping,
+            logger=app.logger
+        )
         
         # 创建连接池
         self.pool = ConnectionPool(
@@ -34,14 +124,30 @@ class RedisClient:
         )
         
         # 创建 Redis 客户端
-        self.redis_client = Redis(connection_pool=self.pool)
+        self.redis_client = GuardedRedis(connection_pool=self.pool, breaker=self.breaker)
         
-        # 测试连接
-        try:
-            self.redis_client.ping()
-            app.logger.info('Redis 连接成功')
-        except Exception as e:
-            app.logger.error(f'Redis 连接失败: {e}')
+        # 缓存值是二进制编码，使用不解码响应的连接池
+        self.raw_client = GuardedRedis(breaker=self.breaker, connection_pool=ConnectionPool(
+            host=config.get('REDIS_HOST', 'localhost'),
+            port=config.get('REDIS_PORT', 6379),
+            password=config.get('REDIS_PASSWORD'),
+            db=config.get('REDIS_DB', 0),
+            decode_responses=False,
+            socket_timeout=config.get('REDIS_SOCKET_TIMEOUT', 5),
+            socket_connect_timeout=config.get('REDIS_SOCKET_CONNECT_TIMEOUT', 5),
+            max_connections=50
+        ))
+        
+        # 进程内缓存（L1），条目数为 0 时不启用
+        max_entries = config.get('CACHE_L1_MAX_ENTRIES', 0)
+        self.local = LocalCache(
+            max_entries=max_entries,
+            max_bytes=config.get('CACHE_L1_MAX_BYTES', 32 * 1024 * 1024),
+            default_ttl=config.get('CACHE_L1_TTL', 60)
+        ) if max_entries > 0 else None
+        
+        # 连接池在第一次执行命令时才建立连接，启动时不再阻塞在 ping 上；
+        # Redis 不可用时由熔断器记录失败并在后台探测
     
     def get_client(self) -> Redis:
         """获取 Redis 客户端实例"""
@@ -64,9 +170,11 @@ class RedisClient:
             bool: 是否设置成功
         """
         try:
-            if isinstance(value, (dict, list)):
-                value = json.dumps(value, ensure_ascii=False)
-            return self.redis_client.set(key, value, ex=ex)
+            data = self.codec.encode(value)
+            result = self.raw_client.set(key, data, ex=ex)
+            if result:
+                self._store_local(key, value, data, ex)
+            return result
         except Exception as e:
             current_app.logger.error(f'Redis set 失败: {e}')
             return False
@@ -82,16 +190,27 @@ class RedisClient:
         Returns:
             值（会自动反序列化）
         """
+        # 先查进程内缓存，记录 epoch 以便丢弃读取期间被失效的值
+        epoch = None
+        if self.local is not None:
+            epoch = self.local.epoch
+            hit, value = self.local.get(key)
+            if hit:
+                return value
+        
         try:
-            value = self.redis_client.get(key)
-            if value is None:
+            raw = self.raw_client.get(key)
+            self.tier_stats.record('l2', raw is not None)
+            if raw is None:
                 return default
             
-            # 尝试解析 JSON
-            try:
-                return json.loads(value)
-            except (json.JSONDecodeError, TypeError):
-                return value
+            # 按类型标记解码
+            value = self.codec.decode(raw)
+            self._store_local(key, value, raw, epoch=epoch)
+            return value
+        except CodecError as e:
+            current_app.logger.warning(f'缓存值无法解码，按未命中处理: {key}: {e}')
+            return default
         except Exception as e:
             current_app.logger.error(f'Redis get 失败: {e}')
             return default
@@ -111,6 +230,124 @@ class RedisClient:
         except Exception as e:
             current_app.logger.error(f'Redis delete 失败: {e}')
             return 0
+        finally:
+            self._evict_local(keys)
+    
+    def unlink(self, *keys: str, chunk_size: int = 500) -> int:
+        """
+        删除键（UNLINK：值的内存由 Redis 后台线程释放，删除大键时不阻塞其他命令）
+        
+        键较多时按 chunk_size 分批，放在一个流水线中一次往返完成
+        
+        Args:
+            *keys: 要删除的键名
+            chunk_size: 每条 UNLINK 命令包含的键数量
+        
+        Returns:
+            int: 删除的键数量
+        """
+        if not keys:
+            return 0
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for i in range(0, len(keys), chunk_size):
+                pipe.unlink(*keys[i:i + chunk_size])
+            return sum(pipe.execute())
+        except Exception as e:
+            current_app.logger.error(f'Redis unlink 失败: {e}')
+            return 0
+        finally:
+            self._evict_local(keys)
+    
+    # ========== 批量操作 ==========
+    
+    def mget(self, keys: List[str], default: Any = None) -> list:
+        """
+        批量获取键值（一次往返），L1 命中的键不再访问 Redis
+        
+        Args:
+            keys: 键名列表
+            default: 不存在或无法解码的键对应的值
+        
+        Returns:
+            list: 与 keys 顺序一致的值列表
+        """
+        results = [default] * len(keys)
+        epoch = None
+        if self.local is not None:
+            epoch = self.local.epoch
+            missing = []
+            for i, key in enumerate(keys):
+                hit, value = self.local.get(key)
+                if hit:
+                    results[i] = value
+                else:
+                    missing.append(i)
+        else:
+            missing = list(range(len(keys)))
+        if not missing:
+            return results
+        
+        try:
+            raws = self.raw_client.mget([keys[i] for i in missing])
+        except Exception as e:
+            current_app.logger.error(f'Redis mget 失败: {e}')
+            return results
+        
+        for i, raw in zip(missing, raws):
+            self.tier_stats.record('l2', raw is not None)
+            if raw is None:
+                continue
+            try:
+                value = self.codec.decode(raw)
+            except CodecError as e:
+                current_app.logger.warning(f'缓存值无法解码，按未命中处理: {keys[i]}: {e}')
+                continue
+            results[i] = value
+            self._store_local(keys[i], value, raw, epoch=epoch)
+        return results
+    
+    def mset_with_ttl(self, mapping: Dict[str, Any], ex: Optional[int] = None) -> bool:
+        """
+        批量设置键值并设置过期时间（MSET 不支持过期时间，这里用流水线中的多条 SET EX，一次往返）
+        
+        Args:
+            mapping: {键名: 值}
+            ex: 过期时间（秒）
+        
+        Returns:
+            bool: 是否全部设置成功
+        """
+        if not mapping:
+            return True
+        try:
+            encoded = [(key, value, self.codec.encode(value)) for key, value in mapping.items()]
+            pipe = self.raw_client.pipeline(transaction=False)
+            for key, _, data in encoded:
+                pipe.set(key, data, ex=ex)
+            results = pipe.execute()
+            for (key, value, data), result in zip(encoded, results):
+                if result:
+                    self._store_local(key, value, data, ex)
+            return all(results)
+        except Exception as e:
+            current_app.logger.error(f'Redis mset_with_ttl 失败: {e}')
+            return False
+    
+    @contextmanager
+    def pipeline(self):
+        """
+        批量缓存操作，with 块正常结束时一起执行；块内抛出异常时不执行
+        
+        Usage:
+            with redis_client.pipeline() as pipe:
+                pipe.delete(f'api:reservation:detail:{reservation_id}')
+                pipe.invalidate_tags(reservation_user_tag('student', student_id))
+                pipe.bump_namespace('api:equipment:list')
+        """
+        pipe = CachePipeline(self)
+        yield pipe
+        pipe.execute()
     
     def exists(self, key: str) -> bool:
         """检查键是否存在"""
@@ -128,18 +365,337 @@ class RedisClient:
             current_app.logger.error(f'Redis expire 失败: {e}')
             return False
     
+    # ========== 进程内缓存（L1） ==========
+    
+    def _store_local(self, key, value, raw, ex=None, epoch=None):
+        """
+        写入进程内缓存
+        
+        只有订阅到失效频道后才写入，否则其他进程的删除无法通知到本进程
+        """
+        if self.local is None:
+            return
+        self._ensure_subscriber()
+        if self._subscribed.is_set():
+            size = len(raw) if isinstance(raw, (str, bytes)) else 64
+            self.local.set(key, value, size=size, ttl=ex, epoch=epoch)
+    
+    def _evict_local(self, keys):
+        """删除本进程的 L1 缓存并广播给其他进程"""
+        if self.local is None or not keys:
+            return
+        self.local.delete(*keys)
+        try:
+            self.redis_client.publish(self.invalidation_channel, json.dumps(list(keys), ensure_ascii=False))
+        except Exception as e:
+            # 广播失败时其他进程的 L1 缓存依靠 TTL 过期
+            self._logger.warning(f'缓存失效广播失败: {e}')
+    
+    def _ensure_subscriber(self):
+        """启动订阅失效频道的后台线程（每个进程一个）"""
+        if self._subscriber is not None:
+            return
+        with self._subscriber_lock:
+            if self._subscriber is None:
+                self._subscriber = threading.Thread(
+                    target=self._subscribe_loop, name='cache-invalidation', daemon=True
+                )
+                self._subscriber.start()
+    
+    def _subscribe_loop(self, retry_seconds=5):
+        """接收失效广播；断线期间可能漏掉消息，因此每次（重新）订阅成功时清空 L1"""
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.redis_client.pubsub()
+                pubsub.subscribe(self.invalidation_channel)
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if not message:
+                        continue
+                    if message['type'] == 'subscribe':
+                        self.local.clear()
+                        self._subscribed.set()
+                    elif message['type'] == 'message':
+                        self._handle_invalidation(message['data'])
+            except Exception as e:
+                if self._subscribed.is_set():
+                    self._logger.warning(f'缓存失效频道断开: {e}')
+                self._subscribed.clear()
+                self.local.clear()
+                time.sleep(retry_seconds)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+    
+    def _handle_invalidation(self, data):
+        """处理一条失效广播：键列表，或 "*" 表示清空"""
+        keys = json.loads(data)
+        if keys == '*':
+            self.local.clear()
+        else:
+            self.local.delete(*keys)
+    
+    def tier_snapshot(self) -> dict:
+        """各级缓存的命中统计（进程内）"""
+        l2 = self.tier_stats.snapshot().get('l2', {'hits': 0, 'misses': 0, 'hit_ratio': 0.0})
+        with self._compute_lock:
+            compute = dict(self._compute_counts)
+        return {
+            'l1': self.local.snapshot() if self.local is not None else None,
+            'l2': l2,
+            # 重新计算次数、返回旧值次数、提前刷新次数、等待其他请求计算的次数
+            'compute': compute,
+            # 实际使用的缓存值编码（可选依赖未安装时会回退）
+            'codec': dict(zip(('serializer', 'compression', 'threshold'), self.codec.describe()))
+        }
+    
+    # ========== 缓存命名空间 ==========
+    
+    def namespace_version(self, namespace: str) -> int:
+        """
+        获取缓存命名空间的当前版本号
+        
+        Args:
+            namespace: 命名空间，如 'api:lab:list'
+        
+        Returns:
+            int: 版本号（从未失效过为 0）
+        """
+        key = f'ns:{namespace}'
+        epoch = None
+        if self.local is not None:
+            epoch = self.local.epoch
+            hit, version = self.local.get(key)
+            if hit:
+                return version
+        try:
+            raw = self.redis_client.get(key)
+            version = int(raw or 0)
+            self._store_local(key, version, str(version), epoch=epoch)
+            return version
+        except Exception as e:
+            current_app.logger.error(f'Redis 读取命名空间版本失败: {e}')
+            return 0
+    
+    def ns_key(self, namespace: str, key: str) -> str:
+        """
+        生成带版本号的缓存键：{namespace}:v{version}:{key}
+        
+        Args:
+            namespace: 命名空间
+            key: 命名空间内的键
+        
+        Returns:
+            str: 缓存键
+        """
+        return f'{namespace}:v{self.namespace_version(namespace)}:{key}'
+    
+    def bump_namespace(self, *namespaces: str) -> bool:
+        """
+        使命名空间内的全部缓存失效（版本号加一）
+        
+        旧版本的缓存不再被读取，由 TTL 自然过期，不需要 KEYS/SCAN 遍历删除。
+        版本号键不设置过期时间，避免计数器重置后读到旧版本的缓存。
+        
+        Args:
+            *namespaces: 要失效的命名空间
+        
+        Returns:
+            bool: 是否成功
+        """
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for namespace in namespaces:
+                pipe.incr(f'ns:{namespace}')
+            pipe.execute()
+            return True
+        except Exception as e:
+            current_app.logger.error(f'Redis 命名空间失效失败: {e}')
+            return False
+        finally:
+            self._evict_local([f'ns:{namespace}' for namespace in namespaces])
+    
+    # ========== 缓存标签 ==========
+    
+    def set_tagged(self, key: str, value: Any, ex: int, tags: list) -> bool:
+        """
+        设置缓存并登记到标签集合，之后可以按标签精确失效
+        
+        Args:
+            key: 键名
+            value: 值（会自动序列化）
+            ex: 过期时间（秒），标签集合的过期时间只延长不缩短
+            tags: 标签列表，如 [reservation_user_tag('student', 'S001')]
+        
+        Returns:
+            bool: 是否设置成功
+        """
+        try:
+            data = self.codec.encode(value)
+            self.raw_client.register_script(SET_TAGGED_SCRIPT)(keys=[key, *tags], args=[data, ex])
+            self._store_local(key, value, data, ex)
+            return True
+        except Exception as e:
+            current_app.logger.error(f'Redis set_tagged 失败: {e}')
+            return False
+    
+    def invalidate_tags(self, *tags: str) -> int:
+        """
+        删除标签下登记的全部缓存以及标签集合本身
+        
+        Args:
+            *tags: 标签
+        
+        Returns:
+            int: 删除的键数量
+        """
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for tag in tags:
+                pipe.smembers(tag)
+            keys = set()
+            for members in pipe.execute():
+                keys.update(members)
+            return self.delete(*keys, *tags)
+        except Exception as e:
+            current_app.logger.error(f'Redis invalidate_tags 失败: {e}')
+            return 0
+    
+    # ========== 防击穿读取 ==========
+    
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: int, stale_ttl: int = 0,
+                       tags: Optional[list] = None, stat: Optional[str] = None,
+                       beta: float = 1.0, lock_ms: int = 5000, meta: Optional[dict] = None) -> Any:
+        """
+        读取缓存，未命中或需要刷新时只由一个请求重新计算
+        
+        - 单飞：重新计算前获取短时 Redis 锁（lock:compute:{key}），其他请求不会同时计算
+        - 软过期：缓存在 ttl 秒后过期但在 Redis 中再保留 stale_ttl 秒，
+          期间一个请求刷新，其他请求直接返回旧值
+        - 概率提前过期（XFetch）：越接近过期、计算越慢，越可能提前刷新，
+          刷新时间被分散开，不会在同一时刻集中过期
+        
+        Args:
+            key: 缓存键
+            compute: 计算函数（无参数），返回可 JSON 序列化的值；抛出的异常原样向上抛出
+            ttl: 新鲜时间（秒）
+            stale_ttl: 过期后仍可返回旧值的时间（秒）
+            tags: 缓存标签（可选，见 set_tagged）
+            stat: 命中统计名称（可选，见 cache_stats）
+            beta: 提前过期系数，越大越早刷新，0 表示不提前
+            lock_ms: 计算锁的过期时间（毫秒），也是未命中时等待其他请求计算的最长时间
+            meta: 传入 dict 时写入 etag（值的摘要，计算时生成并随缓存保存）和 last_modified（计算时间戳），
+                  可直接传给 success() 做条件请求
+        
+        Returns:
+            缓存或新计算的值
+        """
+        entry = self.get(key)
+        if not (isinstance(entry, dict) and entry.get('_swr') == 1):
+            entry = None
+        if stat:
+            cache_stats.record(stat, entry is not None)
+        
+        if entry is not None:
+            now = time.time()
+            # XFetch：now - delta * beta * ln(rand) >= 过期时间 时刷新（ln(rand) <= 0）
+            if now - entry['delta'] * beta * math.log(random.random() or 1e-12) < entry['expires']:
+                return self._unwrap(entry, meta)
+            if now >= entry['expires']:
+                self._count_compute('stale')
+            else:
+                self._count_compute('early_refresh')
+        
+        lock_key = f'lock:compute:{key}'
+        token = uuid.uuid4().hex
+        try:
+            locked = bool(self.redis_client.set(lock_key, token, nx=True, px=lock_ms))
+        except Exception:
+            # Redis 不可用时直接计算
+            return self._unwrap({'v': compute(), 'at': time.time()}, meta)
+        
+        if not locked:
+            if entry is not None:
+                # 其他请求正在刷新，返回旧值
+                return self._unwrap(entry, meta)
+            # 没有旧值时等待其他请求写入结果，超时后自己计算
+            self._count_compute('lock_wait')
+            deadline = time.monotonic() + lock_ms / 1000.0
+            while time.monotonic() < deadline:
+                time.sleep(0.025)
+                entry = self.get(key)
+                if isinstance(entry, dict) and entry.get('_swr') == 1:
+                    return self._unwrap(entry, meta)
+            return self._unwrap({'v': compute(), 'at': time.time()}, meta)
+        
+        try:
+            started = time.time()
+            value = compute()
+            finished = time.time()
+            self._count_compute('computed')
+            envelope = self.make_entry(value, ttl, finished - started, finished)
+            if tags:
+                self.set_tagged(key, envelope, ex=ttl + stale_ttl, tags=tags)
+            else:
+                self.set(key, envelope, ex=ttl + stale_ttl)
+            # 其他进程的 L1 中可能还有旧值
+            self._evict_local([key])
+            return self._unwrap(envelope, meta)
+        finally:
+            try:
+                from app.utils.redis_lock import RELEASE_SCRIPT
+                self.redis_client.register_script(RELEASE_SCRIPT)(keys=[lock_key], args=[token])
+            except Exception:
+                # 释放失败时锁在 lock_ms 后自动过期
+                pass
+    
+    @staticmethod
+    def make_entry(value: Any, ttl: int, delta: float, at: Optional[float] = None) -> dict:
+        """
+        构造 get_or_compute 的缓存结构（缓存预热直接写入同样的结构）
+        
+        Args:
+            value: 缓存的值
+            ttl: 新鲜时间（秒）
+            delta: 计算耗时（秒），用于概率提前过期
+            at: 计算完成的时间戳，默认当前时间
+        
+        Returns:
+            dict: 缓存结构
+        """
+        at = time.time() if at is None else at
+        return {'_swr': 1, 'v': value, 'expires': at + ttl, 'delta': delta, 'etag': make_etag(value), 'at': at}
+    
+    def _unwrap(self, entry, meta):
+        """返回缓存结构中的值，需要时把 ETag 和最后修改时间写入 meta"""
+        if meta is not None:
+            # 旧版本写入的缓存没有 etag / at
+            meta['etag'] = entry.get('etag') or make_etag(entry['v'])
+            meta['last_modified'] = entry.get('at')
+        return entry['v']
+    
+    def _count_compute(self, name):
+        with self._compute_lock:
+            self._compute_counts[name] += 1
+    
     # ========== 缓存装饰器 ==========
     
-    def cache(self, timeout: int = 300, key_prefix: str = 'cache:'):
+    def cache(self, timeout: int = 300, key_prefix: str = 'cache:', stale_ttl: int = 0, beta: float = 1.0):
         """
-        缓存装饰器
+        缓存装饰器（防击穿，见 get_or_compute）
         
         Args:
-            timeout: 缓存过期时间（秒）
+            timeout: 缓存新鲜时间（秒）
             key_prefix: 键前缀
+            stale_ttl: 过期后仍可返回旧值的时间（秒）
+            beta: 提前过期系数
         
         Usage:
-            @redis_client.cache(timeout=600)
+            @redis_client.cache(timeout=600, stale_ttl=60)
             def get_lab_list():
                 return Lab.query.all()
         """
@@ -147,16 +703,10 @@ class RedisClient:
             def wrapper(*args, **kwargs):
                 # 生成缓存键
                 cache_key = f"{key_prefix}{func.__name__}:{str(args)}:{str(kwargs)}"
-                
-                # 尝试从缓存获取
-                cached_value = self.get(cache_key)
-                if cached_value is not None:
-                    return cached_value
-                
-                # 执行函数并缓存结果
-                result = func(*args, **kwargs)
-                self.set(cache_key, result, ex=timeout)
-                return result
+                return self.get_or_compute(
+                    cache_key, lambda: func(*args, **kwargs),
+                    ttl=timeout, stale_ttl=stale_ttl, beta=beta
+                )
             
             wrapper.__name__ = func.__name__
             return wrapper
@@ -231,5 +781,140 @@ class RedisClient:
             return []
 
 
+def reservation_user_tag(user_type: str, user_id: str) -> str:
+    """某个用户的预约列表缓存标签"""
+    return f'tag:reservation:user:{user_type}:{user_id}'
+
+
+def equipment_tag(equip_id: int) -> str:
+    """某台设备相关视图（设备详情、时间段列表）的缓存标签"""
+    return f'tag:equipment:{equip_id}'
+
+
+class _CacheStats:
+    """缓存命中统计（进程内），按缓存名称分别计数"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+    
+    def record(self, name: str, hit: bool):
+        with self._lock:
+            counter = self._counters.setdefault(name, {'hits': 0, 'misses': 0})
+            counter['hits' if hit else 'misses'] += 1
+    
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    'hits': counter['hits'],
+                    'misses': counter['misses'],
+                    'hit_ratio': round(counter['hits'] / (counter['hits'] + counter['misses']), 4)
+                }
+                for name, counter in self._counters.items()
+            }
+
+
+cache_stats = _CacheStats()
+
+
+class CachePipeline:
+    """
+    批量缓存操作（通过 RedisClient.pipeline() 使用）
+    
+    操作先记录下来，execute() 时放进一个流水线：删除使用 UNLINK，写入值使用与 set() 相同的编码。
+    标签成员需要先读取，因此有 invalidate_tags 时是两次往返，否则一次往返。
+    与单键方法一样，Redis 异常只记录日志；涉及的键无论成功与否都会从 L1 中清除并广播。
+    """
+    
+    def __init__(self, client: RedisClient):
+        self.client = client
+        self._reset()
+    
+    def _reset(self):
+        self._sets = []
+        self._deletes = []
+        self._tags = []
+        self._namespaces = []
+        self._expires = []
+    
+    def set(self, key: str, value: Any, ex: Optional[int] = None, tags: Optional[list] = None) -> 'CachePipeline':
+        """设置键值，传入 tags 时同时登记到标签集合（与 set_tagged 相同，此时 ex 必填）"""
+        self._sets.append((key, value, ex, tags))
+        return self
+    
+    def delete(self, *keys: str) -> 'CachePipeline':
+        """删除键"""
+        self._deletes.extend(keys)
+        return self
+    
+    def invalidate_tags(self, *tags: str) -> 'CachePipeline':
+        """删除标签下登记的缓存和标签集合本身"""
+        self._tags.extend(tags)
+        return self
+    
+    def bump_namespace(self, *namespaces: str) -> 'CachePipeline':
+        """使命名空间内的缓存失效"""
+        self._namespaces.extend(namespaces)
+        return self
+    
+    def expire(self, key: str, time: int) -> 'CachePipeline':
+        """设置过期时间"""
+        self._expires.append((key, time))
+        return self
+    
+    def execute(self) -> bool:
+        """
+        执行记录的操作
+        
+        Returns:
+            bool: 是否执行成功
+        """
+        client = self.client
+        deletes = list(self._deletes)
+        ns_keys = [f'ns:{namespace}' for namespace in self._namespaces]
+        encoded = []
+        ok = True
+        try:
+            if self._tags:
+                pipe = client.redis_client.pipeline(transaction=False)
+                for tag in self._tags:
+                    pipe.smembers(tag)
+                for members in pipe.execute():
+                    deletes.extend(members)
+                deletes.extend(self._tags)
+            
+            encoded = [(key, value, client.codec.encode(value), ex, tags) for key, value, ex, tags in self._sets]
+            if deletes or ns_keys or encoded or self._expires:
+                pipe = client.raw_client.pipeline(transaction=False)
+                if deletes:
+                    pipe.unlink(*deletes)
+                for key in ns_keys:
+                    pipe.incr(key)
+                set_tagged = client.raw_client.register_script(SET_TAGGED_SCRIPT) if any(
+                    tags for *_, tags in encoded) else None
+                for key, _, data, ex, tags in encoded:
+                    if tags:
+                        set_tagged(keys=[key, *tags], args=[data, ex], client=pipe)
+                    else:
+                        pipe.set(key, data, ex=ex)
+                for key, time_ in self._expires:
+                    pipe.expire(key, time_)
+                pipe.execute()
+        except Exception as e:
+            current_app.logger.error(f'Redis 批量操作失败: {e}')
+            ok = False
+        
+        client._evict_local(deletes + ns_keys + [key for key, *_ in self._sets])
+        if ok:
+            for key, value, data, ex, _ in encoded:
+                client._store_local(key, value, data, ex)
+        self._reset()
+        return ok
+
 # 创建全局 Redis 客户端实例
 redis_client = RedisClient()
\ No newline at end of file
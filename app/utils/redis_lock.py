@@ -0,0 +1,244 @@
+"""
+Redis 分布式锁
+基于 RedisClient 实现的短时互斥锁：SET NX PX 加锁、Lua 脚本比较后删除解锁，
+并为每次加锁发放单调递增的围栏令牌（fencing token），用于在提交时识别过期的锁持有者
+"""
+import time
+import threading
+import uuid
+from typing import Callable, Optional
+
+from flask import current_app
+
+from app.utils.redis_client import redis_client
+from app.utils.memory_redis import script_equivalent
+
+
+# 只有锁的值与自己持有的值相同时才删除，避免误删其他实例在锁过期后重新获得的锁
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+else
+    return 0
+end
+"""
+
+
+@script_equivalent(RELEASE_SCRIPT)
+def _release_in_memory(client, keys, args):
+    """RELEASE_SCRIPT 的内存后端实现"""
+    if client.get(keys[0]) == args[0]:
+        return client.delete(keys[0])
+    return 0
+
+
+# 计数器存在时才递增；不存在（Redis 被清空、故障切换或重启丢失数据）时返回 nil，由调用方先补种
+INCR_EXISTING_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return redis.call('incr', KEYS[1])
+end
+return false
+"""
+
+# 只把计数器往大调，不会让已经发放的令牌回退
+RAISE_FENCE_SCRIPT = """
+local current = tonumber(redis.call('get', KEYS[1]) or '0')
+if current < tonumber(ARGV[1]) then
+    redis.call('set', KEYS[1], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+
+@script_equivalent(INCR_EXISTING_SCRIPT)
+def _incr_existing_in_memory(client, keys, args):
+    """INCR_EXISTING_SCRIPT 的内存后端实现"""
+    if client.exists(keys[0]):
+        return client.incr(keys[0])
+    return None
+
+
+@script_equivalent(RAISE_FENCE_SCRIPT)
+def _raise_fence_in_memory(client, keys, args):
+    """RAISE_FENCE_SCRIPT 的内存后端实现"""
+    if int(client.get(keys[0]) or 0) < int(args[0]):
+        client.set(keys[0], args[0])
+        return 1
+    return 0
+
+
+class LockUnavailableError(Exception):
+    """Redis 不可用，无法使用分布式锁"""
+
+
+class LockTimeoutError(Exception):
+    """在等待时间内未能获得锁"""
+
+
+class _LockMetrics:
+    """加锁耗时统计（进程内）"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self.acquired = 0
+            self.contended = 0
+            self.timeouts = 0
+            self.fallbacks = 0
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+    
+    def record_acquire(self, wait_ms, attempts):
+        with self._lock:
+            self.acquired += 1
+            if attempts > 1:
+                self.contended += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+    
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+    
+    def record_fallback(self):
+        with self._lock:
+            self.fallbacks += 1
+    
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'acquired': self.acquired,
+                'contended': self.contended,
+                'timeouts': self.timeouts,
+                'fallbacks': self.fallbacks,
+                'avg_wait_ms': round(self.total_wait_ms / self.acquired, 3) if self.acquired else 0.0,
+                'max_wait_ms': round(self.max_wait_ms, 3)
+            }
+
+
+lock_metrics = _LockMetrics()
+
+
+class RedisLock:
+    """
+    Redis 互斥锁
+    
+    围栏计数器只保存在 Redis 中，数据丢失后会从 1 重新开始，小于数据库中已提交的令牌。
+    因此 acquire() 在计数器不存在时用 fence_floor 返回的已提交令牌补种，
+    计数器回退到旧值（例如从旧快照恢复）时由调用方通过 raise_fence() 抬高。
+    
+    Usage:
+        lock = RedisLock('booking:equip:1', ttl_ms=3000)
+        token = lock.acquire(wait_ms=2000, fence_floor=lambda: committed_token)
+        try:
+            ...  # 提交时校验 token
+        finally:
+            lock.release()
+    """
+    
+    def __init__(self, name: str, ttl_ms: int = 3000, retry_ms: int = 20):
+        self.key = f'lock:{name}'
+        self.fence_key = f'lock:fence:{name}'
+        self.ttl_ms = ttl_ms
+        self.retry_ms = retry_ms
+        self.value = uuid.uuid4().hex
+        self.token: Optional[int] = None
+    
+    def _client(self):
+        try:
+            return redis_client.get_client()
+        except RuntimeError as e:
+            raise LockUnavailableError(str(e))
+    
+    def acquire(self, wait_ms: int = 2000, fence_floor: Optional[Callable[[], Optional[int]]] = None) -> int:
+        """
+        获取锁
+        
+        Args:
+            wait_ms: 最长等待时间（毫秒）
+            fence_floor: 返回已提交的最大令牌的函数，只在围栏计数器不存在时调用
+        
+        Returns:
+            int: 围栏令牌（每次成功加锁单调递增）
+        
+        Raises:
+            LockUnavailableError: Redis 不可用
+            LockTimeoutError: 等待超时
+        """
+        client = self._client()
+        started = time.perf_counter()
+        deadline = started + wait_ms / 1000.0
+        attempts = 0
+        try:
+            while True:
+                attempts += 1
+                if client.set(self.key, self.value, nx=True, px=self.ttl_ms):
+                    # 加锁成功后再发放令牌，保证令牌顺序与持锁顺序一致
+                    try:
+                        self.token = self._next_token(client, fence_floor)
+                    except Exception:
+                        # 没有拿到令牌时调用方不会 release()，立即删除锁，避免其他实例等待整个 TTL
+                        self._discard(client)
+                        raise
+                    lock_metrics.record_acquire((time.perf_counter() - started) * 1000, attempts)
+                    return self.token
+                if time.perf_counter() >= deadline:
+                    lock_metrics.record_timeout()
+                    raise LockTimeoutError(self.key)
+                time.sleep(self.retry_ms / 1000.0)
+        except LockTimeoutError:
+            raise
+        except Exception as e:
+            raise LockUnavailableError(str(e))
+    
+    def _discard(self, client):
+        """删除本次加上但未能使用的锁（尽力而为，失败时等待 TTL 到期）"""
+        try:
+            client.register_script(RELEASE_SCRIPT)(keys=[self.key], args=[self.value])
+        except Exception as e:
+            current_app.logger.warning(f'Redis 锁释放失败: {e}')
+    
+    def _next_token(self, client, fence_floor) -> int:
+        """发放下一个围栏令牌，计数器不存在时先从已提交的令牌补种"""
+        token = client.register_script(INCR_EXISTING_SCRIPT)(keys=[self.fence_key])
+        if token is None:
+            floor = fence_floor() if fence_floor else None
+            client.set(self.fence_key, int(floor or 0), nx=True)
+            token = client.incr(self.fence_key)
+        return int(token)
+    
+    def raise_fence(self, value: int) -> bool:
+        """
+        把围栏计数器抬高到已提交的令牌（计数器已经更大时不变）
+        
+        Args:
+            value: 已提交的令牌
+        
+        Returns:
+            bool: 是否调整了计数器；Redis 不可用时返回 False
+        """
+        try:
+            raised = self._client().register_script(RAISE_FENCE_SCRIPT)(keys=[self.fence_key], args=[int(value)])
+            return bool(raised)
+        except Exception as e:
+            current_app.logger.warning(f'Redis 围栏计数器调整失败: {e}')
+            return False
+    
+    def release(self) -> bool:
+        """释放锁（仅当锁仍由自己持有时才删除）"""
+        if self.token is None:
+            return False
+        try:
+            client = self._client()
+            released = client.register_script(RELEASE_SCRIPT)(keys=[self.key], args=[self.value])
+            return bool(released)
+        except Exception as e:
+            # 释放失败时锁会在 TTL 到期后自动失效
+            current_app.logger.warning(f'Redis 锁释放失败: {e}')
+            return False
+        finally:
+            self.token = None
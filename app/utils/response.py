@@ -4,17 +4,89 @@
 
 标准 JSON 结构: {'code': 200, 'msg': 'success', 'data': ...}
 """
-from flask import jsonify
-from typing import Any, Dict, Optional
+import hashlib
+import json
+from datetime import datetime, timezone
+from flask import Response, current_app, jsonify, request
+from typing import Any, Callable, Dict, Optional, Union
 
 
-def success(data: Any = None, msg: str = 'success') -> tuple:
+def make_etag(data: Any) -> str:
+    """
+    计算数据的强 ETag（键排序后的 JSON 摘要，同样的数据总是得到同样的 ETag）
+    
+    Args:
+        data: 可 JSON 序列化的数据，或已编码的响应体（字节串直接计算摘要）
+    
+    Returns:
+        str: 32 位十六进制摘要（不含引号）
+    """
+    if isinstance(data, bytes):
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+    encoded = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(encoded.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _not_modified(etag: Optional[str], last_modified: Optional[datetime]) -> bool:
+    """按 RFC 7232 判断条件请求：有 If-None-Match 时只比较 ETag，否则比较 If-Modified-Since"""
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.if_none_match:
+        return etag is not None and request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional_response(build: Callable[[], Response], etag: Optional[str] = None,
+                         last_modified: Union[float, datetime, None] = None,
+                         headers: Optional[Dict[str, str]] = None) -> tuple:
+    """
+    支持条件请求的响应：客户端缓存的版本未变化时返回 304 空响应，不调用 build()
+    
+    Args:
+        build: 生成 200 响应的函数
+        etag: 数据的 ETag
+        last_modified: 数据的最后修改时间（时间戳或 datetime）
+        headers: 200 和 304 都要带上的响应头（例如 Vary，304 缺少它时共享缓存会把不同编码的版本混用）
+    
+    Returns:
+        (response, status_code) 元组
+    """
+    if isinstance(last_modified, (int, float)):
+        last_modified = datetime.fromtimestamp(last_modified, timezone.utc)
+    if last_modified is not None:
+        # HTTP 日期精确到秒
+        last_modified = last_modified.replace(microsecond=0)
+    
+    if _not_modified(etag, last_modified):
+        response, status = current_app.response_class(status=304), 304
+    else:
+        response, status = build(), 200
+    if etag is not None:
+        response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    if headers:
+        response.headers.update(headers)
+    # 允许浏览器缓存，但每次使用前都要重新验证
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response, status
+
+
+def success(data: Any = None, msg: str = 'success', etag: Union[str, bool, None] = None,
+            last_modified: Union[float, datetime, None] = None) -> tuple:
     """
     成功响应
     
+    传入 etag 或 last_modified 时支持条件请求（见 conditional_response），304 时不再序列化数据。
+    ETag 通常来自 redis_client.get_or_compute(..., meta=meta)，缓存命中时不需要重新计算。
+    
     Args:
         data: 响应数据
         msg: 响应消息
+        etag: 数据的 ETag；True 表示根据 data 计算（仍需编码一次，只节省传输）
+        last_modified: 数据的最后修改时间（时间戳或 datetime）
     
     Returns:
         (response, status_code) 元组
@@ -24,7 +96,11 @@ def success(data: Any = None, msg: str = 'success') -> tuple:
         'msg': msg,
         'data': data
     }
-    return jsonify(response), 200
+    if etag is None and last_modified is None:
+        return jsonify(response), 200
+    if etag is True:
+        etag = make_etag(data)
+    return conditional_response(lambda: jsonify(response), etag, last_modified)
 
 
 def fail(code: int = 400, msg: str = '操作失败', data: Any = None) -> tuple:
@@ -0,0 +1,131 @@
+"""
+响应缓存
+缓存最终编码好的响应体（可选 gzip 压缩），缓存命中时直接返回字节串，
+不再经过 缓存解码 -> 对象 -> jsonify 重新编码 的过程。
+
+缓存结构与 get_or_compute 相同（单飞、软过期、标签、命中统计都可用），只是值为响应体字节串，
+缓存键与原来的数据缓存相同，已有的失效逻辑（删除详情键、标签、命名空间版本号）无需修改。
+"""
+import gzip
+from typing import Any, Callable, Optional
+
+from flask import current_app, jsonify, request
+
+from app.utils.redis_client import redis_client
+from app.utils.response import conditional_response, success
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def encode_body(data: Any, msg: str, compress: bool, min_size: int) -> bytes:
+    """
+    把数据编码为与 success() 相同结构的响应体
+
+    Args:
+        data: 响应数据
+        msg: 响应消息
+        compress: 是否 gzip 压缩
+        min_size: 响应体不小于该字节数时才压缩
+
+    Returns:
+        bytes: 响应体（压缩时以 gzip 魔数开头）
+    """
+    # 与 success() 走同一个 JSON provider，保证响应体逐字节一致
+    body = jsonify({'code': 200, 'msg': msg, 'data': data}).get_data()
+    if compress and len(body) >= min_size:
+        # mtime=0 保证同样的内容得到同样的字节串（ETag 稳定）
+        body = gzip.compress(body, compresslevel=5, mtime=0)
+    return body
+
+
+class CachedView:
+    """
+    一个带缓存的查询接口：缓存键、加载函数和缓存参数
+
+    接口和缓存预热（app.utils.cache_warmer）共用同一个定义，保证预热写入的键和值与接口读取的一致。
+
+    Args:
+        key: 缓存键
+        load: 加载数据的函数（无参数），返回可 JSON 序列化的数据；抛出的异常原样向上抛出
+        ttl: 新鲜时间（秒）
+        msg: 响应消息
+        stale_ttl: 过期后仍可返回旧值的时间（秒）
+        tags: 缓存标签（可选）
+        stat: 命中统计名称（可选）
+        body: 为 True 时缓存编码好的响应体，否则缓存数据本身
+    """
+
+    def __init__(self, key: str, load: Callable[[], Any], ttl: int, msg: str = 'success', stale_ttl: int = 0,
+                 tags: Optional[list] = None, stat: Optional[str] = None, body: bool = True):
+        self.key = key
+        self.load = load
+        self.ttl = ttl
+        self.msg = msg
+        self.stale_ttl = stale_ttl
+        self.tags = tags
+        self.stat = stat
+        self.body = body
+
+    def compute(self) -> Any:
+        """计算要写入缓存的值（响应体字节串或数据）"""
+        if not self.body:
+            return self.load()
+        config = current_app.config
+        return encode_body(
+            self.load(), self.msg,
+            config.get('RESPONSE_CACHE_GZIP', True), config.get('RESPONSE_CACHE_GZIP_MIN_SIZE', 1024)
+        )
+
+    def respond(self):
+        """
+        读取缓存（未命中时计算）并返回响应
+
+        缓存命中时直接返回缓存的响应体；客户端 ETag / 最后修改时间匹配时返回 304。
+        客户端不接受 gzip 时在返回前解压。gzip 和未压缩的响应体是不同的表示，
+        gzip 响应的 ETag 加上 -gzip 后缀，两种编码不会共用同一个强 ETag。
+
+        Returns:
+            (response, status_code) 元组
+        """
+        meta = {}
+        value = redis_client.get_or_compute(
+            self.key, self.compute, ttl=self.ttl, stale_ttl=self.stale_ttl, tags=self.tags, stat=self.stat, meta=meta
+        )
+        if not isinstance(value, bytes):
+            # 缓存数据本身，或旧版本缓存的是数据本身
+            return success(data=value, msg=self.msg, **meta)
+
+        compressed = value.startswith(GZIP_MAGIC)
+        send_gzip = compressed and 'gzip' in request.accept_encodings
+        etag = f"{meta['etag']}-gzip" if send_gzip else meta['etag']
+
+        def build():
+            response = current_app.response_class(value, mimetype='application/json')
+            if send_gzip:
+                response.headers['Content-Encoding'] = 'gzip'
+            elif compressed:
+                response.set_data(gzip.decompress(value))
+            return response
+
+        return conditional_response(build, etag, meta['last_modified'], headers={'Vary': 'Accept-Encoding'})
+
+
+def cached_success(key: str, load: Callable[[], Any], ttl: int, msg: str = 'success', stale_ttl: int = 0,
+                   tags: Optional[list] = None, stat: Optional[str] = None):
+    """
+    带响应缓存的成功响应（缓存编码好的响应体，见 CachedView.respond）
+
+    Args:
+        key: 缓存键
+        load: 加载数据的函数（无参数），返回可 JSON 序列化的数据；抛出的异常原样向上抛出
+        ttl: 新鲜时间（秒）
+        msg: 响应消息
+        stale_ttl: 过期后仍可返回旧值的时间（秒）
+        tags: 缓存标签（可选）
+        stat: 命中统计名称（可选）
+
+    Returns:
+        (response, status_code) 元组
+    """
+    return CachedView(key, load, ttl, msg=msg, stale_ttl=stale_ttl, tags=tags, stat=stat).respond()
@@ -0,0 +1,94 @@
+"""
+基准测试公共工具
+创建测试应用并批量生成设备、用户、时间段和预约数据
+"""
+import os
+import tempfile
+from datetime import datetime, timedelta, time
+
+# 默认使用临时 SQLite 文件（多线程场景下 :memory: 每个连接是独立的库）
+# 设置 TEST_DATABASE_URI 可以在 MySQL/TiDB 上运行
+if not os.getenv('TEST_DATABASE_URI'):
+    _fd, _path = tempfile.mkstemp(prefix='bench_', suffix='.db')
+    os.close(_fd)
+    os.environ['TEST_DATABASE_URI'] = f'sqlite:///{_path}'
+
+from app import create_app, db
+from app.models.equipment import Equipment
+from app.models.student import Student
+from app.models.timeslot import TimeSlot
+from app.models.reservation import Reservation
+
+
+DEFAULT_SLOTS = [(time(9, 0), time(12, 0)), (time(14, 0), time(17, 0)), (time(19, 0), time(22, 0))]
+
+
+def create_bench_app():
+    """创建基准测试应用并重建所有表"""
+    app = create_app('testing')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def seed_equipment(equip_count=1, slots=DEFAULT_SLOTS, student_id='B0001'):
+    """
+    生成设备、时间段和一个学生
+
+    Returns:
+        list: 设备ID列表
+    """
+    if not Student.query.get(student_id):
+        db.session.add(Student(id=student_id, name='基准学生', dept='本院', lab_id=None))
+    equip_ids = []
+    # equipment.id 为 BigInteger，SQLite 下不会自增，这里显式分配
+    next_id = (db.session.query(db.func.max(Equipment.id)).scalar() or 0) + 1
+    for i in range(equip_count):
+        equipment = Equipment(id=next_id + i, name=f'基准设备{i}', category=1, status=1)
+        db.session.add(equipment)
+        db.session.flush()
+        equip_ids.append(equipment.id)
+        for start, end in slots:
+            db.session.add(TimeSlot(equip_id=equipment.id, start_time=start, end_time=end, is_active=1))
+    db.session.commit()
+    return equip_ids
+
+
+def seed_reservations(equip_id, count, start_day, status=1, slots=DEFAULT_SLOTS, student_id='B0001'):
+    """
+    为设备批量生成预约：从 start_day 开始，每个时间段内放一个 1 小时的预约
+
+    Args:
+        equip_id: 设备ID
+        count: 预约数量
+        start_day: 起始日期（date），可以是过去的日期以模拟历史数据
+        status: 预约状态
+    """
+    rows = []
+    day = start_day
+    while len(rows) < count:
+        for start, _ in slots:
+            if len(rows) >= count:
+                break
+            begin = datetime.combine(day, start)
+            rows.append({
+                'equip_id': equip_id,
+                'student_id': student_id,
+                'status': status,
+                'apply_time': datetime.utcnow(),
+                'start_time': begin,
+                'end_time': begin + timedelta(hours=1),
+            })
+        day += timedelta(days=1)
+    db.session.execute(Reservation.__table__.insert(), rows)
+    db.session.commit()
+
+
+def percentile(values, pct):
+    """计算百分位数（values 不需要预先排序）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
@@ -0,0 +1,88 @@
+"""
+可用时间段查询基准测试
+
+对比两种实现：
+- legacy: 旧实现，读取设备全部待审/已通过预约的 ORM 对象，在 Python 中按日期过滤，
+          再对每个时间段逐个预约比较
+- range:  timeslot_service.get_available_timeslots，按 [当天, 次日) 范围只读取该日期的开始/结束两列，
+          合并忙碌区间后每个时间段二分查找一次
+
+设备从多年前开始每个时间段都有一个已通过的历史预约（默认 50000 条），查询明天的可用时间段。
+旧实现的耗时和内存随历史预约数量增长，新实现只与当天的预约数量有关。
+
+Usage:
+    python -m benchmarks.bench_available_timeslots --reservations 50000 --repeat 20
+"""
+import argparse
+import time as _time
+from datetime import date, timedelta
+
+from benchmarks._common import create_bench_app, seed_equipment, seed_reservations, percentile, DEFAULT_SLOTS
+from app.models.reservation import Reservation
+from app.services import timeslot_service
+
+
+def legacy_available_timeslots(equip_id, target_date):
+    """旧实现：读取全部历史预约后在 Python 中过滤日期，时间段 × 预约双重循环"""
+    time_slots = timeslot_service.get_timeslots_by_equipment(equip_id, only_active=True)
+    reservations = Reservation.query.filter(
+        Reservation.equip_id == equip_id,
+        Reservation.status.in_([0, 1]),
+        Reservation.start_time.isnot(None),
+        Reservation.end_time.isnot(None)
+    ).all()
+    date_reservations = [res for res in reservations if res.start_time.date() == target_date]
+    available_slots = []
+    for slot in time_slots:
+        is_available = True
+        for res in date_reservations:
+            if slot.start_time < res.end_time.time() and slot.end_time > res.start_time.time():
+                is_available = False
+                break
+        if is_available:
+            available_slots.append(slot)
+    return available_slots
+
+
+def timed(func, repeat):
+    """执行 repeat 次，返回 (耗时列表, 最后一次结果)"""
+    costs, result = [], None
+    for _ in range(repeat):
+        t0 = _time.perf_counter()
+        result = func()
+        costs.append((_time.perf_counter() - t0) * 1000)
+    return costs, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='可用时间段查询基准测试')
+    parser.add_argument('--reservations', type=int, default=50000, help='设备的历史预约数量')
+    parser.add_argument('--repeat', type=int, default=20, help='每种实现的执行次数')
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        equip_id = seed_equipment(1)[0]
+        # 历史预约截止到今天，明天的上午时间段也被占用
+        history_days = -(-args.reservations // len(DEFAULT_SLOTS))
+        seed_reservations(equip_id, args.reservations, date.today() - timedelta(days=history_days - 1))
+        target = date.today() + timedelta(days=1)
+        seed_reservations(equip_id, 1, target)
+
+        strategies = (
+            ('legacy', lambda: legacy_available_timeslots(equip_id, target)),
+            ('range', lambda: timeslot_service.get_available_timeslots(equip_id, target)),
+        )
+        print(f'设备历史预约数: {args.reservations}, 执行次数: {args.repeat}')
+        print(f'{"strategy":<8} {"avg_ms":>10} {"p95_ms":>10} {"max_ms":>10}  available')
+        results = []
+        for name, func in strategies:
+            costs, result = timed(func, args.repeat)
+            results.append([slot.slot_id for slot in result])
+            print(f'{name:<8} {sum(costs) / len(costs):>10.3f} {percentile(costs, 95):>10.3f} '
+                  f'{max(costs):>10.3f}  {len(result)}')
+        assert results[0] == results[1]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+缓存值编码基准测试
+
+使用真实接口返回的数据（设备列表、预约列表，经 Schema 序列化并包装为 get_or_compute 的缓存结构），
+对比各编码方式写入 Redis 的字节数和编码/解码耗时：
+- legacy:       旧实现，json.dumps(ensure_ascii=False) 文本，读取时先尝试 json.loads
+- json:         CacheCodec 标准库 json，不压缩
+- json+zlib:    CacheCodec 标准库 json，超过阈值时 zlib 压缩
+- orjson+zlib / msgpack+zlib / orjson+zstd: 对应可选依赖已安装时才参与对比
+
+Usage:
+    python -m benchmarks.bench_cache_codec --equipments 100 --reservations 200 --repeat 200
+"""
+import argparse
+import json
+import time as _time
+from datetime import date, timedelta
+
+from benchmarks._common import create_bench_app, seed_equipment, seed_reservations, percentile
+from app.api.v1.schemas.equipment_schema import EquipmentSchema
+from app.api.v1.schemas.reservation_schema import ReservationSchema
+from app.models.equipment import Equipment
+from app.services import reservation_service
+from app.utils import codec as codec_module
+from app.utils.codec import CacheCodec
+
+
+class LegacyCodec:
+    """旧实现：JSON 文本，读取时猜测格式"""
+
+    def encode(self, value):
+        return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+    def decode(self, data):
+        text = data.decode('utf-8')
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text
+
+
+def build_codecs():
+    """返回 (名称, 编解码器) 列表，跳过未安装依赖的组合"""
+    codecs = [
+        ('legacy', LegacyCodec()),
+        ('json', CacheCodec('json', 'none')),
+        ('json+zlib', CacheCodec('json', 'zlib')),
+    ]
+    if codec_module.orjson is not None:
+        codecs.append(('orjson+zlib', CacheCodec('orjson', 'zlib')))
+    if codec_module.msgpack is not None:
+        codecs.append(('msgpack+zlib', CacheCodec('msgpack', 'zlib')))
+    if codec_module.orjson is not None and codec_module.zstandard is not None:
+        codecs.append(('orjson+zstd', CacheCodec('orjson', 'zstd')))
+    return codecs
+
+
+def envelope(value):
+    """与 get_or_compute 写入的缓存结构一致"""
+    return {'_swr': 1, 'v': value, 'expires': _time.time() + 300, 'delta': 0.0123}
+
+
+def timed_us(func, repeat):
+    """执行 repeat 次，返回每次耗时（微秒）"""
+    costs = []
+    for _ in range(repeat):
+        t0 = _time.perf_counter()
+        func()
+        costs.append((_time.perf_counter() - t0) * 1e6)
+    return costs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='缓存值编码基准测试')
+    parser.add_argument('--equipments', type=int, default=100, help='设备数量（设备列表取 9 条和 100 条两种分页）')
+    parser.add_argument('--reservations', type=int, default=200, help='学生的预约数量（预约列表）')
+    parser.add_argument('--repeat', type=int, default=200, help='每种编码的执行次数')
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        equip_ids = seed_equipment(args.equipments)
+        seed_reservations(equip_ids[0], args.reservations, date.today() - timedelta(days=30))
+
+        equipment_schema = EquipmentSchema()
+        reservation_schema = ReservationSchema()
+        equipments = Equipment.query.order_by(Equipment.id).all()
+        payloads = [
+            ('equipment_list(9)', {'items': equipment_schema.dump(equipments[:9], many=True), 'total': len(equipments)}),
+            ('equipment_list(100)', {'items': equipment_schema.dump(equipments[:100], many=True), 'total': len(equipments)}),
+            ('reservation_list', reservation_schema.dump(
+                reservation_service.get_reservation_list(user_id='B0001', user_type='student'), many=True
+            )),
+        ]
+
+    codecs = build_codecs()
+    print(f'执行次数: {args.repeat}')
+    for payload_name, payload in payloads:
+        value = envelope(payload)
+        print(f'\n{payload_name}')
+        print(f'{"codec":<14} {"bytes":>9} {"enc_avg_us":>11} {"enc_p95_us":>11} {"dec_avg_us":>11} {"dec_p95_us":>11}')
+        for name, codec in codecs:
+            data = codec.encode(value)
+            assert codec.decode(data) == json.loads(json.dumps(value))
+            enc = timed_us(lambda: codec.encode(value), args.repeat)
+            dec = timed_us(lambda: codec.decode(data), args.repeat)
+            print(f'{name:<14} {len(data):>9} {sum(enc) / len(enc):>11.1f} {percentile(enc, 95):>11.1f} '
+                  f'{sum(dec) / len(dec):>11.1f} {percentile(dec, 95):>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
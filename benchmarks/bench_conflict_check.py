@@ -0,0 +1,100 @@
+"""
+预约冲突检测并发基准测试
+
+对比两种实现：
+- legacy: 锁定设备全部待审/已通过预约（SELECT ... FOR UPDATE），在 Python 中过滤重叠
+- sql:    锁定设备守卫行，由数据库计算重叠条件，只读取重叠的预约
+
+多个线程同时对同一台设备发起冲突检测，统计锁等待时间（含读取）和每次读取的行数。
+在 SQLite 上 FOR UPDATE 会被忽略，锁等待对比需要在 MySQL/TiDB 上运行：
+
+    TEST_DATABASE_URI=mysql+pymysql://... python -m benchmarks.bench_conflict_check
+
+Usage:
+    python -m benchmarks.bench_conflict_check --reservations 5000 --threads 8 --attempts 50
+"""
+import argparse
+import threading
+import time as _time
+from datetime import date, datetime, timedelta
+
+from benchmarks._common import create_bench_app, seed_equipment, seed_reservations, percentile
+from app import db
+from app.models.reservation import Reservation
+from app.services import reservation_service
+
+
+def legacy_check(equip_id, start_time, end_time):
+    """旧实现：锁定设备全部待审/已通过预约后在 Python 中过滤"""
+    locked = Reservation.query.filter(
+        Reservation.equip_id == equip_id,
+        Reservation.status.in_([0, 1])
+    ).with_for_update(nowait=False).all()
+    conflicts = [
+        r for r in locked
+        if r.start_time and r.end_time and r.start_time < end_time and r.end_time > start_time
+    ]
+    return len(locked), conflicts
+
+
+def sql_check(equip_id, start_time, end_time):
+    """新实现：锁定守卫行，重叠条件下推到数据库"""
+    reservation_service._lock_equipment_guard(equip_id)
+    conflicts = reservation_service._find_conflicting_reservations(equip_id, start_time, end_time)
+    return len(conflicts), conflicts
+
+
+def run(app, strategy, equip_id, threads, attempts, hold_ms):
+    """并发执行冲突检测，返回 (锁等待耗时列表, 读取行数列表)"""
+    waits, rows = [], []
+    guard = threading.Lock()
+    target = datetime.combine(date.today() + timedelta(days=3), datetime.min.time()).replace(hour=10)
+
+    def worker():
+        with app.app_context():
+            for i in range(attempts):
+                start_time = target + timedelta(days=i % 30)
+                end_time = start_time + timedelta(hours=1)
+                t0 = _time.perf_counter()
+                read, _ = strategy(equip_id, start_time, end_time)
+                elapsed = (_time.perf_counter() - t0) * 1000
+                # 模拟持锁期间的 INSERT + COMMIT
+                if hold_ms:
+                    _time.sleep(hold_ms / 1000.0)
+                db.session.rollback()
+                with guard:
+                    waits.append(elapsed)
+                    rows.append(read)
+            db.session.remove()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return waits, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='预约冲突检测并发基准测试')
+    parser.add_argument('--reservations', type=int, default=5000, help='设备已有的待审/已通过预约数量')
+    parser.add_argument('--threads', type=int, default=8, help='并发线程数')
+    parser.add_argument('--attempts', type=int, default=50, help='每个线程的检测次数')
+    parser.add_argument('--hold-ms', type=float, default=1.0, help='检测后持锁时间（毫秒）')
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        equip_id = seed_equipment(1)[0]
+        seed_reservations(equip_id, args.reservations, date.today() - timedelta(days=args.reservations // 6))
+
+    print(f'设备预约数: {args.reservations}, 线程数: {args.threads}, 每线程次数: {args.attempts}')
+    print(f'{"strategy":<8} {"avg_ms":>10} {"p95_ms":>10} {"max_ms":>10} {"rows/check":>12}')
+    for name, strategy in (('legacy', legacy_check), ('sql', sql_check)):
+        waits, rows = run(app, strategy, equip_id, args.threads, args.attempts, args.hold_ms)
+        print(f'{name:<8} {sum(waits) / len(waits):>10.3f} {percentile(waits, 95):>10.3f} '
+              f'{max(waits):>10.3f} {sum(rows) / len(rows):>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+跨设备空闲搜索基准测试
+
+对比两种方式找出实验室内每台设备最早的空闲时间段：
+- poll:   客户端逐台、逐天调用 get_available_timeslots，直到找到第一个可用时间段
+- search: timeslot_service.search_free_equipment，两次查询后按开始时间堆归并
+
+前 --full-days 天每台设备的时间段被完全占满，之后有 --reservations 个已通过预约（每个时间段开头一个 1 小时预约）。
+可用时间段接口只返回整段空闲的时间段，所以 poll 要一直查到预约结束之后；
+search 在时间段内按时长查找，占满的日期之后第一天就能找到（两者的 earliest 不同是预期的）。
+
+Usage:
+    python -m benchmarks.bench_free_search --equipments 300 --reservations 30 --full-days 3
+"""
+import argparse
+import time as _time
+from datetime import date, datetime, timedelta
+
+from benchmarks._common import create_bench_app, seed_equipment, seed_reservations, DEFAULT_SLOTS
+from app import db
+from app.models.equipment import Equipment
+from app.models.reservation import Reservation
+from app.services import timeslot_service
+
+
+def poll(equip_ids, start_date, days):
+    """逐台、逐天查询可用时间段"""
+    results = []
+    for equip_id in equip_ids:
+        for offset in range(days):
+            day = start_date + timedelta(days=offset)
+            slots = timeslot_service.get_available_timeslots(equip_id, day)
+            if slots:
+                results.append((datetime.combine(day, slots[0].start_time), equip_id))
+                break
+    return sorted(results)
+
+
+def fill_days(equip_ids, start_date, days, student_id='B0001'):
+    """用已通过预约占满每台设备前 days 天的全部时间段"""
+    rows = [
+        {'equip_id': equip_id, 'student_id': student_id, 'status': 1, 'apply_time': datetime.utcnow(),
+         'start_time': datetime.combine(start_date + timedelta(days=offset), start),
+         'end_time': datetime.combine(start_date + timedelta(days=offset), end)}
+        for equip_id in equip_ids for offset in range(days) for start, end in DEFAULT_SLOTS
+    ]
+    if rows:
+        db.session.execute(Reservation.__table__.insert(), rows)
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='跨设备空闲搜索基准测试')
+    parser.add_argument('--equipments', type=int, default=300, help='设备数量')
+    parser.add_argument('--reservations', type=int, default=30, help='每台设备的 1 小时已通过预约数量')
+    parser.add_argument('--full-days', type=int, default=3, help='前几天的时间段被完全占满')
+    parser.add_argument('--days', type=int, default=14, help='搜索天数')
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        equip_ids = seed_equipment(args.equipments)
+        db.session.query(Equipment).update({Equipment.lab_id: 1})
+        db.session.commit()
+        start_date = date.today() + timedelta(days=1)
+        fill_days(equip_ids, start_date, args.full_days)
+        for equip_id in equip_ids:
+            seed_reservations(equip_id, args.reservations, start_date + timedelta(days=args.full_days))
+
+        t0 = _time.perf_counter()
+        polled = poll(equip_ids, start_date, args.days)
+        poll_s = _time.perf_counter() - t0
+
+        t0 = _time.perf_counter()
+        found = timeslot_service.search_free_equipment(
+            lab_id=1, start_date=start_date, days=args.days, duration=60, limit=50
+        )
+        search_s = _time.perf_counter() - t0
+
+    print(f'设备数量: {args.equipments}，占满天数: {args.full_days}，搜索天数: {args.days}')
+    print(f'{"strategy":<8} {"ms":>10} {"results":>8}  earliest')
+    print(f'{"poll":<8} {poll_s * 1000:>10.1f} {len(polled):>8}  {polled[0][0] if polled else None}')
+    print(f'{"search":<8} {search_s * 1000:>10.1f} {len(found):>8}  {found[0]["start_time"] if found else None}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+批量计算下次可用时间基准测试
+
+对比为全部设备重新计算下次可用时间的两种方式：
+- per_device: 逐台调用（每台设备两次查询 + 扫描；写回时每台一次 UPDATE 和提交）
+- batch:      时间段和预约各一次查询，按设备分组扫描；写回时只更新变化的设备，CASE 批量 UPDATE
+
+每台设备从今天起有 --reservations 个已通过预约（每个时间段一个 1 小时预约）。
+
+Usage:
+    python -m benchmarks.bench_next_avail_batch --equipments 500 --reservations 30
+"""
+import argparse
+import time as _time
+from datetime import date
+
+from benchmarks._common import create_bench_app, seed_equipment, seed_reservations
+from app import db
+from app.models.equipment import Equipment
+from app.services import availability_service, reservation_service
+
+
+def timed(func):
+    """执行一次，返回 (结果, 耗时秒)"""
+    t0 = _time.perf_counter()
+    result = func()
+    return result, _time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量计算下次可用时间基准测试')
+    parser.add_argument('--equipments', type=int, default=500, help='设备数量')
+    parser.add_argument('--reservations', type=int, default=30, help='每台设备的已通过预约数量')
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        equip_ids = seed_equipment(args.equipments)
+        for equip_id in equip_ids:
+            seed_reservations(equip_id, args.reservations, date.today())
+
+        # 只计算
+        per_device, per_device_s = timed(
+            lambda: {equip_id: availability_service.calculate_next_avail_time(equip_id) for equip_id in equip_ids}
+        )
+        batch, batch_s = timed(availability_service.calculate_all_next_avail_times)
+        assert batch == per_device
+
+        # 计算并写回（两次都从 NULL 开始，所有设备都需要写入）
+        def per_device_update():
+            for equip_id in equip_ids:
+                reservation_service._update_equipment_next_avail_time(equip_id)
+
+        def reset():
+            db.session.query(Equipment).update({Equipment.next_avail_time: None})
+            db.session.commit()
+
+        reset()
+        _, per_device_write_s = timed(per_device_update)
+        reset()
+        stats, batch_write_s = timed(reservation_service.recompute_next_avail_times)
+        # 数据没有变化时的对账
+        unchanged, reconcile_s = timed(reservation_service.recompute_next_avail_times)
+
+    print(f'设备数量: {args.equipments}，每台预约数量: {args.reservations}')
+    print(f'{"case":<26} {"per_device_s":>13} {"batch_s":>9} {"speedup":>8}')
+    print(f'{"compute":<26} {per_device_s:>13.3f} {batch_s:>9.3f} {per_device_s / batch_s:>7.1f}x')
+    print(f'{"compute + write":<26} {per_device_write_s:>13.3f} {batch_write_s:>9.3f} '
+          f'{per_device_write_s / batch_write_s:>7.1f}x')
+    print(f'batch 写回 {stats["changed"]} 个设备；无变化时对账耗时 {reconcile_s:.3f}s（写回 {unchanged["changed"]} 个）')
+
+
+if __name__ == '__main__':
+    main()
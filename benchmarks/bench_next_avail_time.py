@@ -0,0 +1,102 @@
+"""
+下次可用时间计算基准测试
+
+对比三种实现：
+- legacy:      旧实现，读取全部未来已通过预约的 ORM 对象，对每个时间段窗口线性扫描所有预约
+- engine:      availability_service 完整计算，只读取查找范围内的开始/结束两列，合并区间后二分查找
+- incremental: 审批通过一个不影响当前可用窗口的预约后增量更新
+
+设备从后天起每个时间段都有已通过预约（查找范围内所有窗口都被占用，是旧实现的最坏情况之一），
+明天保持空闲。
+
+Usage:
+    python -m benchmarks.bench_next_avail_time --reservations 10000 --repeat 20
+"""
+import argparse
+import time as _time
+from datetime import date, datetime, timedelta
+
+from benchmarks._common import create_bench_app, seed_equipment, seed_reservations, percentile
+from app.models.reservation import Reservation
+from app.models.timeslot import TimeSlot
+from app.services import availability_service
+from app.services.availability_service import BusyChange
+
+
+def legacy_calculate(equip_id):
+    """旧实现：30 天 × 每个时间段 × 全部未来预约的三重循环"""
+    time_slots = TimeSlot.query.filter(
+        TimeSlot.equip_id == equip_id,
+        TimeSlot.is_active == 1
+    ).order_by(TimeSlot.start_time).all()
+    if not time_slots:
+        return None
+    active_reservations = Reservation.query.filter(
+        Reservation.equip_id == equip_id,
+        Reservation.status == 1,
+        Reservation.start_time.isnot(None),
+        Reservation.end_time.isnot(None),
+        Reservation.end_time >= datetime.utcnow()
+    ).order_by(Reservation.start_time).all()
+    now = datetime.utcnow()
+    today = now.date()
+    for day_offset in range(30):
+        check_date = today + timedelta(days=day_offset)
+        for slot in time_slots:
+            slot_start = datetime.combine(check_date, slot.start_time)
+            slot_end = datetime.combine(check_date, slot.end_time)
+            if day_offset == 0 and slot_end <= now:
+                continue
+            is_occupied = False
+            for reservation in active_reservations:
+                if max(slot_start, reservation.start_time) < min(slot_end, reservation.end_time):
+                    is_occupied = True
+                    break
+            if not is_occupied:
+                if day_offset == 0 and slot_start < now:
+                    return now
+                return slot_start
+    return None
+
+
+def timed(func, repeat):
+    """执行 repeat 次，返回 (耗时列表, 最后一次结果)"""
+    costs, result = [], None
+    for _ in range(repeat):
+        t0 = _time.perf_counter()
+        result = func()
+        costs.append((_time.perf_counter() - t0) * 1000)
+    return costs, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='下次可用时间计算基准测试')
+    parser.add_argument('--reservations', type=int, default=10000, help='设备未来已通过预约数量')
+    parser.add_argument('--repeat', type=int, default=20, help='每种实现的执行次数')
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        equip_id = seed_equipment(1)[0]
+        seed_reservations(equip_id, args.reservations, date.today() + timedelta(days=2))
+
+        current = availability_service.calculate_next_avail_time(equip_id)
+        # 审批通过一个 20 天后的预约：不影响当前可用窗口
+        far = datetime.combine(date.today() + timedelta(days=20), datetime.min.time()).replace(hour=10)
+        change = BusyChange(far, far + timedelta(hours=1), True)
+
+        strategies = (
+            ('legacy', lambda: legacy_calculate(equip_id)),
+            ('engine', lambda: availability_service.calculate_next_avail_time(equip_id)),
+            ('incremental', lambda: availability_service.next_avail_time_after_change(equip_id, current, change)),
+        )
+        print(f'设备未来预约数: {args.reservations}, 执行次数: {args.repeat}')
+        print(f'{"strategy":<12} {"avg_ms":>10} {"p95_ms":>10} {"max_ms":>10}  result')
+        for name, func in strategies:
+            costs, result = timed(func, args.repeat)
+            print(f'{name:<12} {sum(costs) / len(costs):>10.3f} {percentile(costs, 95):>10.3f} '
+                  f'{max(costs):>10.3f}  {result}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+响应缓存基准测试
+
+以 100 条设备的设备列表页为例，对比缓存命中时每个请求的 CPU 耗时：
+- data:          旧实现，get_or_compute 取出数据 -> success() 经 jsonify 重新编码
+- body:          cached_success 取出编码好的响应体直接返回（客户端不接受 gzip，返回前解压）
+- body+gzip:     cached_success，客户端接受 gzip，直接返回压缩后的响应体
+
+两种缓存都先预热，只统计命中路径（含读取缓存、构造 Response、取出响应体）。
+
+Usage:
+    python -m benchmarks.bench_response_cache --equipments 100 --repeat 500
+"""
+import argparse
+import time as _time
+
+from benchmarks._common import create_bench_app, seed_equipment, percentile
+from app.api.v1.schemas.equipment_schema import EquipmentSchema
+from app.models.equipment import Equipment
+from app.utils.redis_client import redis_client
+from app.utils.response import success
+from app.utils.response_cache import cached_success
+
+
+def timed_us(func, repeat):
+    """执行 repeat 次，返回每次耗时（微秒）"""
+    costs = []
+    for _ in range(repeat):
+        t0 = _time.perf_counter()
+        func()
+        costs.append((_time.perf_counter() - t0) * 1e6)
+    return costs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='响应缓存基准测试')
+    parser.add_argument('--equipments', type=int, default=100, help='设备数量（全部放在一页）')
+    parser.add_argument('--repeat', type=int, default=500, help='每种方式的执行次数')
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    with app.app_context():
+        seed_equipment(args.equipments)
+        equipment_schema = EquipmentSchema()
+
+        def load():
+            equipments = Equipment.query.order_by(Equipment.id).all()
+            return {'items': equipment_schema.dump(equipments, many=True), 'total': len(equipments)}
+
+        def data_hit():
+            data = redis_client.get_or_compute('bench:data', load, ttl=600)
+            response, _ = success(data=data, msg='查询成功')
+            return response.get_data()
+
+        def body_hit():
+            response, _ = cached_success('bench:body', load, ttl=600, msg='查询成功')
+            return response.get_data()
+
+        cases = [('data', {}, data_hit), ('body', {}, body_hit), ('body+gzip', {'Accept-Encoding': 'gzip'}, body_hit)]
+
+        print(f'设备数量: {args.equipments}，执行次数: {args.repeat}')
+        print(f'{"path":<11} {"bytes":>8} {"avg_us":>9} {"p50_us":>9} {"p95_us":>9}')
+        baseline = None
+        for name, headers, hit in cases:
+            with app.test_request_context(headers=headers):
+                size = len(hit())  # 预热缓存
+                costs = timed_us(hit, args.repeat)
+            avg = sum(costs) / len(costs)
+            baseline = baseline or avg
+            print(f'{name:<11} {size:>8} {avg:>9.1f} {percentile(costs, 50):>9.1f} {percentile(costs, 95):>9.1f}'
+                  f'  ({baseline / avg:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
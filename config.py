@@ -80,7 +80,44 @@ class Config:
         ]
     }
 
+    # 预约并发控制配置
+    # lock: 锁定设备守卫行后在数据库中检查重叠（默认）
+    # claim: 写入 reservation_claim 占用表，依靠唯一约束防止重复预约，并发预约不互相阻塞
+    # redis_lock: 使用 Redis 设备级分布式锁 + 围栏令牌。数据库事务先推进设备行上的围栏令牌（UPDATE 锁定设备行，
+    #   与 lock 模式持有同一行锁），再在行锁下检查重叠并 INSERT；Redis 锁让同一设备的请求在进入数据库前排队，
+    #   并不缩短事务，反而多一次 Redis 往返。Redis 不可用时回退到 lock
+    RESERVATION_CONFLICT_MODE = os.getenv('RESERVATION_CONFLICT_MODE', 'lock')
+    # claim 模式下的时间桶粒度（分钟），预约按桶占用，不足一个桶按整桶计算
+    # 默认与预约的分钟粒度一致；更粗的粒度会让不重叠但落在同一个桶内的相邻预约互相冲突
+    RESERVATION_CLAIM_BUCKET_MINUTES = int(os.getenv('RESERVATION_CLAIM_BUCKET_MINUTES', 1))
+    # redis_lock 模式下锁的过期时间与最长等待时间（毫秒）
+    RESERVATION_LOCK_TTL_MS = int(os.getenv('RESERVATION_LOCK_TTL_MS', 3000))
+    RESERVATION_LOCK_WAIT_MS = int(os.getenv('RESERVATION_LOCK_WAIT_MS', 2000))
+    # 预约冲突或不在时间段内时，在错误信息中附带同一设备上离请求最近的 RESERVATION_ALTERNATIVES 个可行时间
+    # （从请求当天起 RESERVATION_ALTERNATIVE_DAYS 天内查找，只在发现冲突后多读取一次忙碌区间；0 表示不计算）
+    RESERVATION_ALTERNATIVES = int(os.getenv('RESERVATION_ALTERNATIVES', 3))
+    RESERVATION_ALTERNATIVE_DAYS = int(os.getenv('RESERVATION_ALTERNATIVE_DAYS', 2))
+    # 同时推荐同一实验室、同一类别的其他设备（需要额外两次查询）
+    RESERVATION_ALTERNATIVES_SIBLINGS = os.getenv('RESERVATION_ALTERNATIVES_SIBLINGS', 'False').lower() == 'true'
+
+    # 可用时间段/可用日期查询的数据来源
+    # live: 每次请求读取设备的预约，逐个时间段计算是否被占用（默认）
+    # occupancy: 读取 slot_occupancy 占用表，预约和时间段变更时在同一事务中维护
+    #            （切换前执行 flask rebuild-occupancy，flask check-occupancy 检查一致性）
+    AVAILABILITY_READ_MODEL = os.getenv('AVAILABILITY_READ_MODEL', 'live')
+
+    # 后台任务配置
+    # 审批/删除预约后的可用时间重算与列表缓存清理在后台执行，同一设备的任务排队期间会合并
+    # BACKGROUND_JOBS_QUEUE: redis（多进程共享队列，Redis 不可用时回退到进程内队列）或 local
+    BACKGROUND_JOBS_QUEUE = os.getenv('BACKGROUND_JOBS_QUEUE', 'redis')
+    BACKGROUND_JOBS_WORKERS = int(os.getenv('BACKGROUND_JOBS_WORKERS', 2))
+    # 同步执行任务（测试环境使用）
+    BACKGROUND_JOBS_EAGER = os.getenv('BACKGROUND_JOBS_EAGER', 'False').lower() == 'true'
+
     # Redis 配置
+    # REDIS_BACKEND=memory 时使用进程内后端（app/utils/memory_redis.py），不需要 Redis 服务器；
+    # 数据不在进程间共享，只适用于本地开发、测试和单进程部署
+    REDIS_BACKEND = os.getenv('REDIS_BACKEND', 'redis')
     REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
     REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
     REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', None)
@@ -91,6 +128,12 @@ class Config:
     REDIS_SOCKET_TIMEOUT = int(os.getenv('REDIS_SOCKET_TIMEOUT', 5))
     REDIS_SOCKET_CONNECT_TIMEOUT = int(os.getenv('REDIS_SOCKET_CONNECT_TIMEOUT', 5))
     
+    # Redis 熔断器：连续失败 REDIS_BREAKER_FAILURE_THRESHOLD 次后熔断，
+    # 熔断期间 Redis 调用直接失败，每 REDIS_BREAKER_COOLDOWN 秒在后台探测一次，成功后恢复
+    REDIS_BREAKER_FAILURE_THRESHOLD = int(os.getenv('REDIS_BREAKER_FAILURE_THRESHOLD', 3))
+    REDIS_BREAKER_COOLDOWN = float(os.getenv('REDIS_BREAKER_COOLDOWN', 10))
+    REDIS_BREAKER_PROBE_TIMEOUT = float(os.getenv('REDIS_BREAKER_PROBE_TIMEOUT', 1))
+    
     # Redis 缓存配置
     CACHE_TYPE = 'redis'
     CACHE_REDIS_HOST = REDIS_HOST
@@ -98,6 +141,43 @@ class Config:
     CACHE_REDIS_PASSWORD = REDIS_PASSWORD
     CACHE_REDIS_DB = REDIS_DB
     CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 300))  # 默认5分钟
+    
+    # 进程内缓存（L1）配置：位于 Redis 之前，按条目数和估算字节数限制内存
+    # CACHE_L1_MAX_ENTRIES 为 0 时不启用；条目过期时间取 Redis 过期时间与 CACHE_L1_TTL 的较小值
+    CACHE_L1_MAX_ENTRIES = int(os.getenv('CACHE_L1_MAX_ENTRIES', 2048))
+    CACHE_L1_MAX_BYTES = int(os.getenv('CACHE_L1_MAX_BYTES', 32 * 1024 * 1024))
+    CACHE_L1_TTL = int(os.getenv('CACHE_L1_TTL', 60))
+    # L1 跨进程失效广播频道
+    CACHE_INVALIDATION_CHANNEL = os.getenv('CACHE_INVALIDATION_CHANNEL', 'cache:invalidate')
+    
+    # 缓存值编码：CACHE_SERIALIZER 可选 json / orjson / msgpack，CACHE_COMPRESSION 可选 none / zlib / zstd
+    # orjson、msgpack、zstandard 未安装时回退到 json / zlib（默认的 orjson 与 json 编码结果兼容）；编码后超过 CACHE_COMPRESSION_THRESHOLD 字节才压缩
+    CACHE_SERIALIZER = os.getenv('CACHE_SERIALIZER', 'orjson')
+    CACHE_COMPRESSION = os.getenv('CACHE_COMPRESSION', 'zlib')
+    CACHE_COMPRESSION_THRESHOLD = int(os.getenv('CACHE_COMPRESSION_THRESHOLD', 1024))
+    
+    # 响应缓存：缓存编码好的响应体，不小于 RESPONSE_CACHE_GZIP_MIN_SIZE 字节时以 gzip 压缩保存，
+    # 支持 gzip 的客户端直接收到压缩后的响应体
+    RESPONSE_CACHE_GZIP = os.getenv('RESPONSE_CACHE_GZIP', 'True').lower() == 'true'
+    RESPONSE_CACHE_GZIP_MIN_SIZE = int(os.getenv('RESPONSE_CACHE_GZIP_MIN_SIZE', 1024))
+    
+    # 不存在 ID 的负缓存：查询不到的设备/预约 ID 在 NEGATIVE_CACHE_TTL 秒内直接返回不存在（0 表示不启用）
+    NEGATIVE_CACHE_TTL = int(os.getenv('NEGATIVE_CACHE_TTL', 30))
+    # 设备 ID 布隆过滤器（进程内）：不在过滤器中的设备 ID 不访问 Redis 和数据库，每 EQUIPMENT_ID_BLOOM_REBUILD 秒重建
+    EQUIPMENT_ID_BLOOM = os.getenv('EQUIPMENT_ID_BLOOM', 'False').lower() == 'true'
+    EQUIPMENT_ID_BLOOM_REBUILD = int(os.getenv('EQUIPMENT_ID_BLOOM_REBUILD', 300))
+    EQUIPMENT_ID_BLOOM_ERROR_RATE = float(os.getenv('EQUIPMENT_ID_BLOOM_ERROR_RATE', 0.01))
+    
+    # 缓存预热（flask cache-warm）：设备列表每种筛选条件预热前 CACHE_WARM_PAGES 页，
+    # 近一个月预约最多的 CACHE_WARM_HOT_DEVICES 台设备预热详情和时间段列表
+    CACHE_WARM_PAGES = int(os.getenv('CACHE_WARM_PAGES', 3))
+    CACHE_WARM_PAGE_SIZE = int(os.getenv('CACHE_WARM_PAGE_SIZE', 9))
+    CACHE_WARM_HOT_DEVICES = int(os.getenv('CACHE_WARM_HOT_DEVICES', 20))
+    # 后台预热：每 CACHE_WARMER_INTERVAL 秒检查一次，重新计算缺失或 CACHE_WARMER_LEAD 秒内过期的缓存
+    # （CACHE_WARMER_LEAD 需要小于最短的缓存时间 300 秒，大于 CACHE_WARMER_INTERVAL）
+    CACHE_WARMER_ENABLED = os.getenv('CACHE_WARMER_ENABLED', 'False').lower() == 'true'
+    CACHE_WARMER_INTERVAL = int(os.getenv('CACHE_WARMER_INTERVAL', 30))
+    CACHE_WARMER_LEAD = int(os.getenv('CACHE_WARMER_LEAD', 60))
 
 
 class DevelopmentConfig(Config):
@@ -115,6 +195,12 @@ class TestingConfig(Config):
     )
     # SQLite 不支持连接池参数，需要覆盖父类的配置
     SQLALCHEMY_ENGINE_OPTIONS = {}
+    # 测试中后台任务同步执行
+    BACKGROUND_JOBS_EAGER = True
+    # 测试中不启用进程内缓存
+    CACHE_L1_MAX_ENTRIES = 0
+    # 测试中使用进程内 Redis 后端，每个测试应用一份独立的数据
+    REDIS_BACKEND = os.getenv('TEST_REDIS_BACKEND', 'memory')
 
 
 class ProductionConfig(Config):
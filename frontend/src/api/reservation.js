@@ -16,6 +16,18 @@ export function createReservation(data) {
   })
 }
 
+/**
+ * 创建系列预约（按重复规则一次创建多次预约）
+ * @param {object} data - 预约数据 (equip_id, start_time, end_time, frequency, interval, count, until, skip_conflicts)
+ */
+export function createReservationSeries(data) {
+  return request({
+    url: '/reservations/series',
+    method: 'post',
+    data
+  })
+}
+
 /**
  * 获取预约列表
  * @param {object} params - 查询参数 (page, page_size, status, equipment_id, etc.)
@@ -74,4 +86,29 @@ export function rejectReservation(id, data = {}) {
     method: 'put',
     data
   })
+}
+
+/**
+ * 批量审批通过（管理员）
+ * @param {number[]} ids - 预约ID列表
+ */
+export function bulkApproveReservations(ids) {
+  return request({
+    url: '/admin/reservations/batch/approve',
+    method: 'put',
+    data: { ids }
+  })
+}
+
+/**
+ * 批量审批拒绝（管理员）
+ * @param {number[]} ids - 预约ID列表
+ * @param {string} reason - 拒绝理由 (可选)
+ */
+export function bulkRejectReservations(ids, reason) {
+  return request({
+    url: '/admin/reservations/batch/reject',
+    method: 'put',
+    data: { ids, reason }
+  })
 }
\ No newline at end of file
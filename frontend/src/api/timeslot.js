@@ -55,3 +55,22 @@ export function getAvailableDates(equipId, startDate = null, days = 30) {
     params
   })
 }
+
+/**
+ * 获取实验室或类别下所有设备的可用性矩阵（一次请求代替逐台查询可用日期）
+ * @param {Object} filters - 筛选条件 { lab_id, category }，至少提供一个
+ * @param {string} startDate - 开始日期（可选，格式：YYYY-MM-DD），默认为今天
+ * @param {number} days - 查询天数（可选，默认30天，最多90天）
+ * @returns data.items[i].bitmap 的第 j 个字符表示第 j 天是否可用（'1' 可用）
+ */
+export function getAvailabilityMatrix(filters, startDate = null, days = 30) {
+  const params = { ...filters, days }
+  if (startDate) {
+    params.start_date = startDate
+  }
+  return request({
+    url: '/timeslots/availability',
+    method: 'get',
+    params
+  })
+}
@@ -0,0 +1,39 @@
+"""Add reservation_claim table - 添加预约占用表
+
+Revision ID: add_resv_claim
+Revises: add_resv_range_idx
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_resv_claim'
+down_revision = 'add_resv_range_idx'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # ### 创建 reservation_claim 表 ###
+    # (equip_id, bucket_start) 唯一约束：并发预约在 INSERT 时竞争，失败方立即收到唯一约束错误
+    op.create_table('reservation_claim',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False, comment='占用ID'),
+    sa.Column('equip_id', sa.BigInteger(), nullable=False, comment='设备ID'),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False, comment='时间桶开始时间'),
+    sa.Column('reservation_id', sa.BigInteger(), nullable=False, comment='预约ID'),
+    sa.ForeignKeyConstraint(['equip_id'], ['equipment.id'], ),
+    sa.ForeignKeyConstraint(['reservation_id'], ['reservation.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('equip_id', 'bucket_start', name='uq_reservation_claim_equip_bucket')
+    )
+    op.create_index('idx_reservation_claim_reservation_id', 'reservation_claim', ['reservation_id'],
+                    unique=False)
+
+
+def downgrade():
+    # ### 删除 reservation_claim 表 ###
+    op.drop_index('idx_reservation_claim_reservation_id', table_name='reservation_claim')
+    op.drop_table('reservation_claim')
@@ -0,0 +1,30 @@
+"""Add reservation range index - 添加预约时间区间范围索引
+
+Revision ID: add_resv_range_idx
+Revises: fa98e6e70c2d
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_resv_range_idx'
+down_revision = 'fa98e6e70c2d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # ### 为 reservation 表添加范围索引 ###
+    # 冲突检测在数据库中计算重叠条件 start_time < :end AND end_time > :start，
+    # 该索引让查询只扫描目标设备、目标状态下很窄的时间区间
+    op.create_index('idx_reservation_equip_status_time', 'reservation',
+                    ['equip_id', 'status', 'start_time', 'end_time'],
+                    unique=False)
+
+
+def downgrade():
+    # ### 删除范围索引 ###
+    op.drop_index('idx_reservation_equip_status_time', table_name='reservation')
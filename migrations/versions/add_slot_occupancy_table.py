@@ -0,0 +1,37 @@
+"""Add slot_occupancy table - 添加时间段占用表
+
+Revision ID: add_slot_occupancy
+Revises: add_equip_booking_fence
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_slot_occupancy'
+down_revision = 'add_equip_booking_fence'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # ### 创建 slot_occupancy 表 ###
+    # 已有预约的占用需要执行一次 flask rebuild-occupancy 写入
+    op.create_table('slot_occupancy',
+    sa.Column('equip_id', sa.BigInteger(), nullable=False, comment='设备ID'),
+    sa.Column('date', sa.Date(), nullable=False, comment='日期（预约开始时间所在的日期）'),
+    sa.Column('slot_id', sa.BigInteger(), nullable=False, comment='时间段ID'),
+    sa.Column('state', sa.Integer(), nullable=False, comment='占用状态 (1:仅待审, 2:已通过)'),
+    sa.ForeignKeyConstraint(['equip_id'], ['equipment.id'], ),
+    sa.ForeignKeyConstraint(['slot_id'], ['timeslot.slot_id'], ),
+    sa.PrimaryKeyConstraint('equip_id', 'date', 'slot_id')
+    )
+    op.create_index('idx_slot_occupancy_slot_id', 'slot_occupancy', ['slot_id'], unique=False)
+
+
+def downgrade():
+    # ### 删除 slot_occupancy 表 ###
+    op.drop_index('idx_slot_occupancy_slot_id', table_name='slot_occupancy')
+    op.drop_table('slot_occupancy')
@@ -0,0 +1,423 @@
+"""
+测试可用时间计算服务
+包括：
+- merge_intervals / find_next_free_time / iter_free_intervals: 区间合并、窗口扫描与空闲区间
+- next_avail_time_after_change: 增量更新结果与完整计算一致
+- calculate_all_next_avail_times / recompute_next_avail_times: 批量计算与逐台计算一致、只写回变化的设备
+- get_available_timeslots / get_available_dates: 只读取日期范围内的预约，合并忙碌区间后排除时间段
+- get_availability_matrix: 可用性矩阵与逐台查询可用日期一致、只执行两次查询
+- search_free_equipment: 跨设备搜索最早的空闲时间
+"""
+import pytest
+from datetime import datetime, timedelta, time
+from sqlalchemy import event
+from app import db
+from app.services.availability_service import (
+    BusyChange,
+    merge_intervals,
+    find_next_free_time,
+    iter_free_intervals,
+    calculate_next_avail_time,
+    calculate_all_next_avail_times,
+    next_avail_time_after_change
+)
+from app.services.reservation_service import recompute_next_avail_times
+from app.services.timeslot_service import (
+    get_available_timeslots,
+    get_available_dates,
+    get_availability_matrix,
+    search_free_equipment
+)
+from app.utils.auth import generate_token
+from app.utils.exceptions import ValidationError
+from app.models.equipment import Equipment
+from app.models.timeslot import TimeSlot
+from app.models.reservation import Reservation
+from app.utils.redis_client import redis_client
+
+
+class TestEngineHelpers:
+    """测试区间合并和窗口扫描"""
+
+    def test_merge_intervals(self):
+        """测试重叠和相邻区间会被合并"""
+        base = datetime(2030, 1, 1, 9, 0)
+        intervals = [
+            (base + timedelta(hours=2), base + timedelta(hours=3)),
+            (base, base + timedelta(hours=1)),
+            (base + timedelta(hours=1), base + timedelta(hours=2)),
+            (base + timedelta(hours=5), base + timedelta(hours=6)),
+        ]
+        assert merge_intervals(intervals) == [
+            (base, base + timedelta(hours=3)),
+            (base + timedelta(hours=5), base + timedelta(hours=6)),
+        ]
+
+    def test_find_next_free_time(self):
+        """测试跳过被占用的窗口，当前处于空闲窗口时返回当前时间"""
+        slots = [
+            TimeSlot(start_time=time(9, 0), end_time=time(12, 0)),
+            TimeSlot(start_time=time(14, 0), end_time=time(17, 0)),
+        ]
+        now = datetime(2030, 1, 1, 10, 0)
+        busy = [(datetime(2030, 1, 1, 10, 30), datetime(2030, 1, 1, 11, 0))]
+
+        assert find_next_free_time(slots, busy, now) == datetime(2030, 1, 1, 14, 0)
+        assert find_next_free_time(slots, [], now) == now
+        assert find_next_free_time(slots, busy, now, days=0) is None
+
+    def test_iter_free_intervals(self):
+        """测试空闲区间：忙碌区间跨越窗口边界、从 not_before 开始"""
+        slots = [
+            TimeSlot(start_time=time(9, 0), end_time=time(12, 0)),
+            TimeSlot(start_time=time(14, 0), end_time=time(17, 0)),
+        ]
+        day = datetime(2030, 1, 1)
+        busy = [(day.replace(hour=10), day.replace(hour=15)), (day.replace(hour=16), day.replace(hour=16, minute=30))]
+
+        assert list(iter_free_intervals(slots, busy, day.date(), 1)) == [
+            (day.replace(hour=9), day.replace(hour=10)),
+            (day.replace(hour=15), day.replace(hour=16)),
+            (day.replace(hour=16, minute=30), day.replace(hour=17)),
+        ]
+        assert list(iter_free_intervals(slots, busy, day.date(), 2, not_before=day.replace(hour=16, minute=45)))[:2] == [
+            (day.replace(hour=16, minute=45), day.replace(hour=17)),
+            (day.replace(day=2, hour=9), day.replace(day=2, hour=12)),
+        ]
+
+
+class TestNextAvailTimeAfterChange:
+    """测试增量更新下次可用时间"""
+
+    @pytest.fixture
+    def add_approved(self, db_session, sample_equipment, sample_student):
+        """创建已通过预约"""
+        def _add(start_time, end_time):
+            reservation = Reservation(
+                equip_id=sample_equipment.id,
+                student_id=sample_student.id,
+                status=1,
+                start_time=start_time,
+                end_time=end_time,
+                apply_time=datetime.utcnow(),
+                user_name=sample_student.name,
+                equip_name=sample_equipment.name
+            )
+            db_session.add(reservation)
+            db_session.commit()
+            return reservation
+        return _add
+
+    @pytest.fixture
+    def day(self):
+        """明天零点（时间段 09:00-17:00 在明天整段位于未来）"""
+        return datetime.combine(datetime.utcnow().date() + timedelta(days=1), time(0, 0))
+
+    def test_busy_change_outside_current_window(
+        self, app, db_session, sample_equipment, sample_timeslot, add_approved, day
+    ):
+        """测试新占用不影响当前可用窗口时结果不变"""
+        add_approved(day + timedelta(hours=9), day + timedelta(hours=10))
+        current = calculate_next_avail_time(sample_equipment.id)
+
+        reservation = add_approved(day + timedelta(days=3, hours=9), day + timedelta(days=3, hours=10))
+        change = BusyChange(reservation.start_time, reservation.end_time, True)
+        result = next_avail_time_after_change(sample_equipment.id, current, change)
+
+        assert result == current
+        assert result == calculate_next_avail_time(sample_equipment.id)
+
+    def test_busy_change_in_current_window(
+        self, app, db_session, sample_equipment, sample_timeslot, add_approved, day
+    ):
+        """测试新占用当前可用窗口时从下一个窗口继续查找"""
+        add_approved(day + timedelta(days=-1, hours=9), day + timedelta(days=-1, hours=17))
+        add_approved(day + timedelta(hours=9), day + timedelta(hours=17))
+        now = datetime.utcnow()
+        current = calculate_next_avail_time(sample_equipment.id, now)
+        assert current == day + timedelta(days=1, hours=9)
+
+        reservation = add_approved(day + timedelta(days=1, hours=12), day + timedelta(days=1, hours=13))
+        change = BusyChange(reservation.start_time, reservation.end_time, True)
+        result = next_avail_time_after_change(sample_equipment.id, current, change, now)
+
+        assert result == day + timedelta(days=2, hours=9)
+        assert result == calculate_next_avail_time(sample_equipment.id, now)
+
+    def test_freed_change_before_current_window(
+        self, app, db_session, sample_equipment, sample_timeslot, add_approved, day
+    ):
+        """测试释放早于当前可用窗口的占用后得到更早的可用时间"""
+        add_approved(day + timedelta(days=-1, hours=9), day + timedelta(days=-1, hours=17))
+        reservation = add_approved(day + timedelta(hours=9), day + timedelta(hours=17))
+        now = datetime.utcnow()
+        current = calculate_next_avail_time(sample_equipment.id, now)
+        assert current == day + timedelta(days=1, hours=9)
+
+        change = BusyChange(reservation.start_time, reservation.end_time, False)
+        db_session.delete(reservation)
+        db_session.commit()
+        result = next_avail_time_after_change(sample_equipment.id, current, change, now)
+
+        assert result == day + timedelta(hours=9)
+        assert result == calculate_next_avail_time(sample_equipment.id, now)
+
+    def test_stale_current_falls_back_to_full_calculation(
+        self, app, db_session, sample_equipment, sample_timeslot, day
+    ):
+        """测试当前记录为空或已过期时回退到完整计算"""
+        change = BusyChange(day + timedelta(hours=9), day + timedelta(hours=10), False)
+        expected = calculate_next_avail_time(sample_equipment.id)
+
+        assert next_avail_time_after_change(sample_equipment.id, None, change) == expected
+        assert next_avail_time_after_change(
+            sample_equipment.id, datetime.utcnow() - timedelta(days=2), change
+        ) == expected
+
+
+class TestBatchNextAvailTime:
+    """测试批量计算下次可用时间"""
+
+    @pytest.fixture
+    def fleet(self, db_session, sample_equipment, sample_timeslot, sample_student):
+        """设备 1 空闲；设备 2 明天和后天整天已被预约；设备 3 没有时间段"""
+        day = datetime.combine(datetime.utcnow().date() + timedelta(days=1), time(0, 0))
+        db_session.add_all([
+            Equipment(id=2, name='设备2', lab_id=1, category=1, status=1),
+            Equipment(id=3, name='设备3', lab_id=1, category=1, status=1),
+            TimeSlot(equip_id=2, start_time=time(9, 0), end_time=time(12, 0), is_active=1),
+            TimeSlot(equip_id=2, start_time=time(14, 0), end_time=time(17, 0), is_active=1),
+            TimeSlot(equip_id=2, start_time=time(19, 0), end_time=time(20, 0), is_active=0),
+        ])
+        for offset in range(-1, 2):
+            db_session.add(Reservation(
+                equip_id=2, student_id=sample_student.id, status=1,
+                start_time=day + timedelta(days=offset, hours=9), end_time=day + timedelta(days=offset, hours=17)
+            ))
+        db_session.commit()
+        return day
+
+    def test_matches_per_device(self, app, fleet):
+        """测试批量计算结果与逐台计算一致，没有时间段的设备不在结果中"""
+        now = datetime.utcnow()
+        result = calculate_all_next_avail_times(now=now)
+
+        assert set(result) == {1, 2}
+        assert result == {equip_id: calculate_next_avail_time(equip_id, now) for equip_id in (1, 2)}
+        assert result[2] == fleet + timedelta(days=2, hours=9)
+        assert calculate_all_next_avail_times(equip_ids=[2], now=now) == {2: result[2]}
+
+    def test_recompute_writes_changed_only(self, app, db_session, fleet):
+        """测试只写回变化的设备并清除其详情缓存，再次执行时没有变化"""
+        stale = datetime(2000, 1, 1)
+        db_session.query(Equipment).update({Equipment.next_avail_time: stale})
+        db_session.commit()
+        redis_client.set('api:equipment:detail:2', {'id': 2}, ex=60)
+
+        assert recompute_next_avail_times(dry_run=True) == {'equipments': 3, 'changed': 3}
+        assert Equipment.query.get(2).next_avail_time == stale
+
+        assert recompute_next_avail_times(chunk_size=2) == {'equipments': 3, 'changed': 3}
+        db_session.expire_all()
+        assert Equipment.query.get(2).next_avail_time == fleet + timedelta(days=2, hours=9)
+        assert Equipment.query.get(3).next_avail_time is None
+        assert redis_client.get('api:equipment:detail:2') is None
+
+        assert recompute_next_avail_times()['changed'] <= 1  # 设备 1 正处于空闲窗口时结果是当前时间
+
+    def test_cli(self, app, fleet):
+        """测试 flask recompute-next-avail 命令"""
+        result = app.test_cli_runner().invoke(args=['recompute-next-avail', '--dry-run'])
+        assert result.exit_code == 0
+        assert '共 3 个设备，需要更新 2 个' in result.output
+
+
+class TestAvailableTimeslots:
+    """测试可用时间段和可用日期查询"""
+
+    @pytest.fixture
+    def day(self, db_session, sample_equipment, sample_student):
+        """上午、下午两个时间段；目标日期前后和一年前的同一时间都有预约"""
+        day = datetime.utcnow().date() + timedelta(days=3)
+        db_session.add_all([
+            TimeSlot(equip_id=1, start_time=time(9, 0), end_time=time(12, 0), is_active=1),
+            TimeSlot(equip_id=1, start_time=time(14, 0), end_time=time(17, 0), is_active=1),
+        ])
+        for offset in (-365, -1, 1):
+            start = datetime.combine(day + timedelta(days=offset), time(9, 0))
+            db_session.add(Reservation(
+                equip_id=1, student_id=sample_student.id, status=1,
+                start_time=start, end_time=start.replace(hour=17)
+            ))
+        db_session.commit()
+        return day
+
+    def _add(self, db_session, student, day, start, end, status=0):
+        db_session.add(Reservation(
+            equip_id=1, student_id=student.id, status=status,
+            start_time=datetime.combine(day, start), end_time=datetime.combine(day, end)
+        ))
+        db_session.commit()
+
+    def test_other_days_ignored(self, app, day):
+        """测试其他日期（包括前一天整天）的预约不影响目标日期"""
+        assert len(get_available_timeslots(1, day)) == 2
+        assert len(get_available_timeslots(1, day.isoformat())) == 2
+
+    def test_merged_busy_intervals(self, app, db_session, sample_student, day):
+        """测试相接的待审预约合并后占用两个时间段，已拒绝的预约不占用"""
+        self._add(db_session, sample_student, day, time(11, 0), time(13, 0))
+        self._add(db_session, sample_student, day, time(13, 0), time(14, 30))
+        self._add(db_session, sample_student, day, time(9, 0), time(10, 0), status=2)
+        assert get_available_timeslots(1, day) == []
+        assert day.isoformat() not in get_available_dates(1, day - timedelta(days=1), days=3)
+
+    def test_reservation_ending_at_midnight(self, app, db_session, sample_student, day):
+        """测试结束于次日零点的预约只比较时间部分，与原有规则一致不占用时间段"""
+        db_session.add(Reservation(
+            equip_id=1, student_id=sample_student.id, status=1,
+            start_time=datetime.combine(day, time(8, 0)), end_time=datetime.combine(day + timedelta(days=1), time(0, 0))
+        ))
+        db_session.commit()
+        assert len(get_available_timeslots(1, day)) == 2
+
+    def test_available_dates(self, app, day):
+        """测试整天被占用的日期不可用"""
+        assert get_available_dates(1, day - timedelta(days=1), days=3) == [day.isoformat()]
+
+
+class TestAvailabilityMatrix:
+    """测试可用性矩阵"""
+
+    @pytest.fixture
+    def lab(self, db_session, sample_equipment, sample_student):
+        """实验室 1：设备 1 有两个时间段，设备 2 没有时间段；设备 3 属于实验室 2"""
+        day = datetime.utcnow().date() + timedelta(days=1)
+        db_session.add_all([
+            Equipment(id=2, name='设备2', lab_id=1, category=2, status=1),
+            Equipment(id=3, name='设备3', lab_id=2, category=1, status=1),
+            TimeSlot(equip_id=1, start_time=time(9, 0), end_time=time(12, 0), is_active=1),
+            TimeSlot(equip_id=1, start_time=time(14, 0), end_time=time(17, 0), is_active=1),
+            TimeSlot(equip_id=1, start_time=time(19, 0), end_time=time(20, 0), is_active=0),
+            TimeSlot(equip_id=3, start_time=time(9, 0), end_time=time(12, 0), is_active=1),
+        ])
+        # 设备 1：第 0 天两个时间段都被占用（一个待审、一个已通过），第 2 天只占用上午，已拒绝的预约不占用
+        for offset, start, end, status in ((0, 9, 10, 0), (0, 15, 16, 1), (2, 9, 12, 1), (3, 9, 17, 2)):
+            db_session.add(Reservation(
+                equip_id=1, student_id=sample_student.id, status=status,
+                start_time=datetime.combine(day + timedelta(days=offset), time(start)),
+                end_time=datetime.combine(day + timedelta(days=offset), time(end))
+            ))
+        db_session.commit()
+        return day
+
+    def test_matches_available_dates(self, app, lab):
+        """测试矩阵与逐台调用 get_available_dates 的结果一致"""
+        matrix = get_availability_matrix(lab_id=1, start_date=lab.isoformat(), days=5)
+
+        assert matrix['start_date'] == lab.isoformat()
+        assert matrix['items'] == [{'equip_id': 1, 'bitmap': '01111'}, {'equip_id': 2, 'bitmap': '00000'}]
+        for item in matrix['items']:
+            expected = get_available_dates(item['equip_id'], lab, days=5)
+            assert [(lab + timedelta(days=i)).isoformat() for i, bit in enumerate(item['bitmap']) if bit == '1'] == expected
+
+        assert [item['equip_id'] for item in get_availability_matrix(category=1, start_date=lab, days=1)['items']] == [1, 3]
+
+    def test_two_queries(self, app, lab):
+        """测试无论设备数量多少只执行两次查询"""
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            get_availability_matrix(lab_id=1, start_date=lab, days=30)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        assert len(statements) == 2
+
+    def test_validation(self, app):
+        """测试缺少筛选条件、天数超出范围、日期格式错误"""
+        with pytest.raises(ValidationError):
+            get_availability_matrix()
+        with pytest.raises(ValidationError):
+            get_availability_matrix(lab_id=1, days=91)
+        with pytest.raises(ValidationError):
+            get_availability_matrix(lab_id=1, start_date='tomorrow')
+
+    def test_endpoint(self, app, client, lab):
+        """测试可用性矩阵接口"""
+        headers = {'Authorization': f'Bearer {generate_token("S001", "student")}'}
+        response = client.get(f'/api/v1/timeslots/availability?lab_id=1&start_date={lab.isoformat()}&days=3',
+                              headers=headers)
+        assert response.status_code == 200
+        assert response.get_json()['data']['items'][0] == {'equip_id': 1, 'bitmap': '011'}
+        assert client.get('/api/v1/timeslots/availability', headers=headers).status_code == 422
+
+
+class TestSearchFreeEquipment:
+    """测试跨设备空闲搜索"""
+
+    @pytest.fixture
+    def day(self, db_session, sample_equipment, sample_student):
+        """设备 1（9-12、14-17）明天 9-11 待审、11:30-12 已通过；设备 2（9-12）明天整段已通过；设备 3 属于实验室 2"""
+        day = datetime.combine(datetime.utcnow().date() + timedelta(days=1), time(0, 0))
+        db_session.add_all([
+            Equipment(id=2, name='设备2', lab_id=1, category=1, status=1),
+            Equipment(id=3, name='设备3', lab_id=2, category=1, status=1),
+            TimeSlot(equip_id=1, start_time=time(9, 0), end_time=time(12, 0), is_active=1),
+            TimeSlot(equip_id=1, start_time=time(14, 0), end_time=time(17, 0), is_active=1),
+            TimeSlot(equip_id=2, start_time=time(9, 0), end_time=time(12, 0), is_active=1),
+            TimeSlot(equip_id=3, start_time=time(9, 0), end_time=time(12, 0), is_active=1),
+        ])
+        for equip_id, start, end, status in ((1, 9, 11, 0), (1, 11.5, 12, 1), (2, 9, 12, 1), (2, 9, 10, 2)):
+            db_session.add(Reservation(
+                equip_id=equip_id, student_id=sample_student.id, status=status,
+                start_time=day + timedelta(hours=start), end_time=day + timedelta(hours=end)
+            ))
+        db_session.commit()
+        return day
+
+    def _search(self, day, **kwargs):
+        kwargs.setdefault('lab_id', 1)
+        kwargs.setdefault('now', day - timedelta(hours=1))
+        return [(item['equip_id'], item['start_time']) for item in search_free_equipment(start_date=day.date(), **kwargs)]
+
+    def test_earliest_per_equipment(self, app, day):
+        """测试每台设备返回能容纳时长的最早开始时间，按开始时间排序"""
+        assert self._search(day, duration=60) == [
+            (1, (day + timedelta(hours=14)).isoformat()),
+            (2, (day + timedelta(days=1, hours=9)).isoformat()),
+        ]
+        assert self._search(day, duration=30)[0] == (1, (day + timedelta(hours=11)).isoformat())
+        assert self._search(day, duration=60, category=1, lab_id=None)[0] == (3, (day + timedelta(hours=9)).isoformat())
+
+    def test_limit_and_per_equipment(self, app, day):
+        """测试每台设备返回多个结果时按开始时间归并，达到数量上限后停止"""
+        assert self._search(day, duration=60, per_equipment=3, limit=4) == [
+            (1, (day + timedelta(hours=14)).isoformat()),
+            (1, (day + timedelta(days=1, hours=9)).isoformat()),
+            (2, (day + timedelta(days=1, hours=9)).isoformat()),
+            (1, (day + timedelta(days=1, hours=14)).isoformat()),
+        ]
+        assert len(self._search(day, duration=60, days=1, per_equipment=5)) == 1
+
+    def test_not_before_now(self, app, day):
+        """测试从当前时间之后的下一个整分钟开始搜索"""
+        now = day + timedelta(hours=14, minutes=20, seconds=30)
+        result = search_free_equipment(lab_id=1, start_date=day.date(), duration=60, now=now)
+        assert result[0]['start_time'] == (day + timedelta(hours=14, minutes=21)).isoformat()
+        assert result[0]['free_until'] == (day + timedelta(hours=17)).isoformat()
+
+    def test_validation(self, app):
+        """测试缺少筛选条件、时长和范围超出限制"""
+        for kwargs in ({}, {'lab_id': 1, 'duration': 0}, {'lab_id': 1, 'days': 31}, {'lab_id': 1, 'limit': 51}):
+            with pytest.raises(ValidationError):
+                search_free_equipment(**kwargs)
+
+    def test_endpoint(self, app, client, day):
+        """测试空闲设备搜索接口"""
+        headers = {'Authorization': f'Bearer {generate_token("S001", "student")}'}
+        response = client.get(f'/api/v1/timeslots/search?lab_id=1&start_date={day.date().isoformat()}&duration=60',
+                              headers=headers)
+        assert response.status_code == 200
+        assert [item['equip_id'] for item in response.get_json()['data']] == [1, 2]
+        assert client.get('/api/v1/timeslots/search', headers=headers).status_code == 422
@@ -0,0 +1,104 @@
+"""
+测试后台任务
+包括：
+- BackgroundJobs: 同名同键任务排队期间合并
+- 审批预约后设备可用时间在后台合并计算
+"""
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from app.utils.background import BackgroundJobs, background_jobs
+from app.services.reservation_service import update_reservation_status
+from app.models.reservation import Reservation
+
+
+@pytest.fixture
+def local_jobs(app):
+    """使用进程内队列且不启动工作线程，由测试调用 drain() 执行任务"""
+    with patch.object(background_jobs, 'eager', False), \
+            patch.object(background_jobs, 'use_redis', False), \
+            patch.object(background_jobs, '_ensure_workers'):
+        yield background_jobs
+    background_jobs.drain()
+
+
+class TestBackgroundJobs:
+    """测试 BackgroundJobs"""
+
+    def test_same_key_is_coalesced(self, app):
+        """测试同一个键排队期间多次提交只执行一次，合并后负载为 None"""
+        jobs = BackgroundJobs()
+        jobs.init_app(app)
+        jobs.eager = False
+        jobs.use_redis = False
+        calls = []
+        jobs.job('demo')(lambda key, payload: calls.append((key, payload)))
+
+        with patch.object(jobs, '_ensure_workers'):
+            assert jobs.submit('demo', 1, {'n': 0}) is True
+            for i in range(1, 50):
+                assert jobs.submit('demo', 1, {'n': i}) is False
+            jobs.submit('demo', 2, {'n': 0})
+
+        assert jobs.drain() == 2
+        assert calls == [('1', None), ('2', {'n': 0})]
+        stats = jobs.snapshot()
+        assert stats['submitted'] == 51
+        assert stats['coalesced'] == 49
+        assert stats['executed'] == 2
+
+    def test_single_job_keeps_payload(self, app):
+        """测试未合并的任务保留负载，执行后可以再次入队"""
+        jobs = BackgroundJobs(app)
+        jobs.eager = False
+        jobs.use_redis = False
+        calls = []
+        jobs.job('demo')(lambda key, payload: calls.append(payload))
+
+        with patch.object(jobs, '_ensure_workers'):
+            jobs.submit('demo', 1, [1, 2])
+            jobs.drain()
+            jobs.submit('demo', 1, [3, 4])
+            jobs.drain()
+
+        assert calls == [[1, 2], [3, 4]]
+
+    def test_unknown_job(self, app):
+        """测试提交未注册的任务"""
+        with pytest.raises(KeyError):
+            BackgroundJobs(app).submit('missing', 1)
+
+
+class TestReservationBackgroundUpdates:
+    """测试审批预约时的后台更新"""
+
+    def test_burst_approvals_recompute_once(
+        self, app, db_session, sample_equipment, sample_student, sample_timeslot,
+        future_datetime, mock_redis, local_jobs
+    ):
+        """测试同一设备连续审批只触发一次完整的可用时间计算"""
+        reservations = []
+        for hour in (9, 11, 13):
+            reservation = Reservation(
+                equip_id=sample_equipment.id,
+                student_id=sample_student.id,
+                status=0,
+                apply_time=datetime.utcnow(),
+                start_time=future_datetime.replace(hour=hour, minute=0),
+                end_time=future_datetime.replace(hour=hour + 1, minute=0),
+                user_name=sample_student.name,
+                equip_name=sample_equipment.name
+            )
+            db_session.add(reservation)
+            reservations.append(reservation)
+        db_session.commit()
+
+        with patch('app.services.reservation_service._update_equipment_next_avail_time') as mock_update:
+            for reservation in reservations:
+                update_reservation_status(reservation.id, status=1, approver_id='A001')
+
+            # 响应返回前不执行重算
+            mock_update.assert_not_called()
+
+            local_jobs.drain()
+            mock_update.assert_called_once_with(sample_equipment.id, changed=None)
@@ -0,0 +1,110 @@
+"""
+测试缓存值编解码
+包括：
+- CacheCodec: 类型标记、压缩阈值、旧版本纯 JSON 值的兼容读取
+- RedisClient: 通过编解码器读写缓存
+"""
+import json
+import zlib
+import pytest
+from unittest.mock import MagicMock
+from app.utils.codec import CacheCodec, CodecError, MARKER
+from app.utils import codec as codec_module
+from app.utils.redis_client import RedisClient
+
+
+class TestCacheCodec:
+    """测试 CacheCodec"""
+
+    @pytest.mark.parametrize('value', [
+        {'items': [{'id': 1, 'name': '显微镜'}], 'total': 1},
+        [1, 2, 3],
+        3,
+        None,
+        True,
+    ])
+    def test_round_trip(self, value):
+        """测试常见类型编码后能还原"""
+        codec = CacheCodec()
+        data = codec.encode(value)
+        assert data.startswith(MARKER + b'J')
+        assert codec.decode(data) == value
+
+    def test_string_is_not_guessed(self):
+        """测试内容像 JSON 的字符串解码后仍是字符串"""
+        codec = CacheCodec()
+        data = codec.encode('123')
+        assert data == MARKER + b'S-123'
+        assert codec.decode(data) == '123'
+
+    def test_compress_over_threshold(self):
+        """测试超过阈值才压缩，压缩后仍能还原"""
+        codec = CacheCodec(compression='zlib', threshold=100)
+        small = codec.encode({'id': 1})
+        large_value = [{'id': i, 'name': '设备'} for i in range(100)]
+        large = codec.encode(large_value)
+
+        assert small[2:3] == b'-'
+        assert large[2:3] == b'z'
+        assert len(large) < len(json.dumps(large_value, ensure_ascii=False).encode('utf-8'))
+        assert codec.decode(large) == large_value
+
+    def test_decode_legacy_values(self):
+        """测试读取旧版本写入的纯 JSON 文本和普通字符串"""
+        codec = CacheCodec()
+        assert codec.decode(json.dumps({'id': 1}, ensure_ascii=False).encode('utf-8')) == {'id': 1}
+        assert codec.decode('{"id": 1}') == {'id': 1}
+        assert codec.decode(b'plain text') == 'plain text'
+
+    def test_other_codec_can_decode(self):
+        """测试按标记解码，不依赖读取方自己的配置"""
+        value = [{'id': i} for i in range(200)]
+        data = CacheCodec(serializer='orjson', compression='zlib', threshold=10).encode(value)
+        assert CacheCodec(serializer='json', compression='none').decode(data) == value
+
+    def test_unknown_marker(self):
+        """测试无法识别的标记抛出 CodecError"""
+        with pytest.raises(CodecError):
+            CacheCodec().decode(MARKER + b'X-abc')
+        with pytest.raises(CodecError):
+            CacheCodec().decode(MARKER + b'J?abc')
+
+    def test_missing_optional_dependency_falls_back(self, monkeypatch):
+        """测试可选依赖未安装时回退到 json / zlib"""
+        monkeypatch.setattr(codec_module, 'msgpack', None)
+        monkeypatch.setattr(codec_module, 'zstandard', None)
+        codec = CacheCodec(serializer='msgpack', compression='zstd')
+        assert codec.describe() == ('json', 'zlib', 1024)
+
+        with pytest.raises(CodecError):
+            codec.decode(MARKER + b'M-' + b'\x90')
+        with pytest.raises(CodecError):
+            codec.decode(MARKER + b'JZ' + zlib.compress(b'[]'))
+
+
+class TestRedisClientCodec:
+    """测试 RedisClient 通过编解码器读写"""
+
+    def _client(self):
+        client = RedisClient()
+        client.redis_client = client.raw_client = MagicMock()
+        client.codec = CacheCodec(threshold=10)
+        return client
+
+    def test_set_writes_encoded_bytes(self, app):
+        """测试写入的是带类型标记的字节串"""
+        client = self._client()
+        client.set('k', {'items': list(range(50))}, ex=60)
+
+        data = client.raw_client.set.call_args.args[1]
+        assert data.startswith(MARKER + b'Jz')
+        assert client.raw_client.set.call_args.kwargs['ex'] == 60
+
+    def test_get_decodes_and_undecodable_is_miss(self, app):
+        """测试读取时按标记解码，无法解码的值按未命中处理"""
+        client = self._client()
+        client.raw_client.get.return_value = client.codec.encode({'id': 1})
+        assert client.get('k') == {'id': 1}
+
+        client.raw_client.get.return_value = MARKER + b'X-abc'
+        assert client.get('k', default='missing') == 'missing'
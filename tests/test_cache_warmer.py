@@ -0,0 +1,116 @@
+"""
+测试缓存预热
+包括：
+- CacheWarmer.views(): 预热目标（设备列表页、热门设备的详情和时间段列表）
+- CacheWarmer.warm(): 写入的键与接口读取的一致、只预热即将过期的键、计算失败时跳过
+- 后台预热的跨进程锁、flask cache-warm 命令
+- CachePipeline.set(tags=...)
+"""
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import pytest
+from app.models.reservation import Reservation
+from app.utils.auth import generate_token
+from app.utils.cache_warmer import CacheWarmer
+from app.utils.redis_client import redis_client, equipment_tag
+
+
+@pytest.fixture
+def booked_equipment(db_session, sample_student, sample_timeslot):
+    """有一条近期已通过预约的设备"""
+    start = datetime.utcnow() + timedelta(days=1)
+    db_session.add(Reservation(
+        student_id=sample_student.id, equip_id=sample_timeslot.equip_id, status=1,
+        start_time=start, end_time=start + timedelta(hours=1)
+    ))
+    db_session.commit()
+    return sample_timeslot.equip_id
+
+
+class TestCacheWarmer:
+    """测试 CacheWarmer"""
+
+    @pytest.fixture(autouse=True)
+    def statistics(self):
+        """统计数据的每日趋势依赖 MySQL 的 DATE 类型，SQLite 下替换为固定值"""
+        with patch('app.services.statistics_service.get_all_statistics', return_value={'total': 1}):
+            yield
+
+    def test_views(self, app, booked_equipment):
+        """测试预热目标：没有数据的页不预热，热门设备预热详情和时间段列表"""
+        keys = [view.key for view in CacheWarmer(app).views(pages=3)]
+
+        assert sum(':p_' in key for key in keys) == 2  # 不筛选 + 实验室 1，各 1 页
+        assert f'api:equipment:detail:{booked_equipment}' in keys
+        assert f'timeslot:list:{booked_equipment}' in keys
+        assert not [view for view in CacheWarmer(app).views(hot_devices=0) if 'detail' in view.key]
+
+    def test_warm_then_endpoints_hit(self, app, client, booked_equipment):
+        """测试预热后接口直接命中缓存，不再查询"""
+        stats = CacheWarmer(app).warm()
+        assert stats['failed'] == 0
+        assert stats['warmed'] == stats['total']
+
+        headers = {'Authorization': f'Bearer {generate_token("S001", "student")}'}
+        with patch('app.services.equipment_service.get_equipment_list') as get_list, \
+                patch('app.services.equipment_service.get_equipment_by_id') as get_detail, \
+                patch('app.services.timeslot_service.get_timeslots_by_equipment') as get_slots:
+            listed = client.get('/api/v1/equipments/', headers=headers)
+            detail = client.get(f'/api/v1/equipments/{booked_equipment}', headers=headers)
+            slots = client.get(f'/api/v1/timeslots/equipment/{booked_equipment}', headers=headers)
+        for mock in (get_list, get_detail, get_slots):
+            mock.assert_not_called()
+        assert listed.get_json()['data']['items'][0]['id'] == booked_equipment
+        assert detail.get_json()['data']['id'] == booked_equipment
+        assert len(slots.get_json()['data']) == 1
+
+        # 预热写入的缓存同样登记到设备标签下
+        redis_client.invalidate_tags(equipment_tag(booked_equipment))
+        assert redis_client.get(f'timeslot:list:{booked_equipment}') is None
+
+    def test_warm_only_expiring(self, app, booked_equipment):
+        """测试 lead 模式只重新计算缺失或即将过期的键"""
+        warmer = CacheWarmer(app)
+        total = warmer.warm()['total']
+
+        stats = warmer.warm(lead=60)
+        assert (stats['warmed'], stats['skipped']) == (0, total)
+
+        redis_client.delete(f'timeslot:list:{booked_equipment}')
+        assert warmer.warm(lead=60)['warmed'] == 1
+        # 热门排行 10 分钟过期，统计数据 5 分钟过期
+        assert 0 < warmer.warm(lead=400)['warmed'] < total
+
+    def test_failed_view_is_skipped(self, app, sample_equipment):
+        """测试单个目标计算失败时其他目标仍然写入"""
+        with patch('app.services.lab_service.get_lab_list', side_effect=RuntimeError('db down')):
+            stats = CacheWarmer(app).warm(hot_devices=0)
+        assert stats['failed'] == 1
+        assert stats['warmed'] == stats['total'] - 1
+
+    def test_run_once_lock(self, app, sample_equipment):
+        """测试同一周期内只有一个进程执行后台预热"""
+        assert CacheWarmer(app).run_once() is not None
+        assert CacheWarmer(app).run_once() is None
+
+    def test_cli(self, app, sample_equipment):
+        """测试 flask cache-warm 命令"""
+        result = app.test_cli_runner().invoke(args=['cache-warm', '--pages', '1', '--hot-devices', '0'])
+        assert result.exit_code == 0
+        assert '[OK] 预热完成' in result.output
+
+
+class TestPipelineTags:
+    """测试流水线写入时登记标签"""
+
+    def test_set_with_tags(self, app):
+        """测试标签集合登记键且过期时间只延长不缩短"""
+        client = redis_client.get_client()
+        with redis_client.pipeline() as pipe:
+            pipe.set('k:long', 1, ex=600, tags=['tag:x'])
+            pipe.set('k:short', 2, ex=60, tags=['tag:x'])
+        assert client.smembers('tag:x') == {'k:long', 'k:short'}
+        assert client.ttl('tag:x') == 600
+
+        redis_client.invalidate_tags('tag:x')
+        assert redis_client.mget(['k:long', 'k:short']) == [None, None]
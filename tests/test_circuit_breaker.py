@@ -0,0 +1,123 @@
+"""
+测试 Redis 熔断器
+包括：
+- CircuitBreaker: 连续失败后熔断、熔断期间直接失败、后台探测后恢复
+- GuardedRedis: 单条命令和流水线都经过熔断器
+- /api/v1/health: 返回熔断器状态
+"""
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from redis.exceptions import ConnectionError as RedisConnectionError, ResponseError
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError, GuardedRedis
+from app.utils.redis_client import RedisClient, redis_client
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestCircuitBreaker:
+    """测试 CircuitBreaker"""
+
+    def test_trips_after_consecutive_failures(self):
+        """测试连续失败达到阈值后熔断，熔断期间不再调用"""
+        breaker = CircuitBreaker(failure_threshold=3, cooldown=60, probe=MagicMock(side_effect=OSError))
+        func = MagicMock(side_effect=RedisConnectionError('down'))
+
+        for _ in range(3):
+            with pytest.raises(RedisConnectionError):
+                breaker.call(func)
+        assert breaker.state == 'open'
+
+        with pytest.raises(CircuitOpenError):
+            breaker.call(func)
+        assert func.call_count == 3
+        stats = breaker.snapshot()
+        assert stats['trips'] == 1
+        assert stats['short_circuited'] == 1
+        assert stats['retry_in'] > 0
+
+    def test_success_resets_failures(self):
+        """测试成功调用清零连续失败次数，命令错误不计入失败"""
+        breaker = CircuitBreaker(failure_threshold=2)
+        with pytest.raises(RedisConnectionError):
+            breaker.call(MagicMock(side_effect=RedisConnectionError))
+        assert breaker.call(lambda: 'ok') == 'ok'
+        with pytest.raises(RedisConnectionError):
+            breaker.call(MagicMock(side_effect=RedisConnectionError))
+        with pytest.raises(ResponseError):
+            breaker.call(MagicMock(side_effect=ResponseError('WRONGTYPE')))
+
+        assert breaker.state == 'closed'
+        assert breaker.consecutive_failures == 1
+
+    def test_probe_recovers(self):
+        """测试冷却期结束后后台探测成功即恢复"""
+        probe = MagicMock(side_effect=[OSError('still down'), True])
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05, probe=probe)
+        with pytest.raises(RedisConnectionError):
+            breaker.call(MagicMock(side_effect=RedisConnectionError))
+
+        assert _wait_for(lambda: breaker.state == 'closed')
+        assert probe.call_count == 2
+        assert breaker.snapshot()['probe_failures'] == 1
+        assert breaker.call(lambda: 'ok') == 'ok'
+
+
+class TestGuardedRedis:
+    """测试 GuardedRedis"""
+
+    def test_commands_and_pipeline_short_circuit(self):
+        """测试熔断后单条命令和流水线都直接失败"""
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=60, probe=MagicMock(side_effect=OSError))
+        client = GuardedRedis(breaker=breaker)
+
+        with patch('redis.client.Redis.execute_command', side_effect=RedisConnectionError('down')) as execute:
+            with pytest.raises(RedisConnectionError):
+                client.get('k')
+            with pytest.raises(CircuitOpenError):
+                client.get('k')
+            assert execute.call_count == 1
+
+        with patch('redis.client.Pipeline.execute') as execute:
+            pipe = client.pipeline(transaction=False)
+            pipe.get('k')
+            with pytest.raises(CircuitOpenError):
+                pipe.execute()
+            execute.assert_not_called()
+
+    def test_redis_client_degrades_without_waiting(self, app):
+        """测试熔断期间 RedisClient 直接返回默认值"""
+        client = RedisClient()
+        client.breaker = CircuitBreaker(failure_threshold=1, cooldown=60, probe=MagicMock(side_effect=OSError))
+        client.redis_client = client.raw_client = GuardedRedis(breaker=client.breaker)
+        client.breaker.record_failure(RedisConnectionError('down'))
+
+        with patch('redis.client.Redis.execute_command') as execute:
+            assert client.get('k', default='fallback') == 'fallback'
+            assert client.set('k', 1) is False
+            assert client.get_or_compute('k', lambda: 42, ttl=60) == 42
+            execute.assert_not_called()
+
+
+class TestHealthCheck:
+    """测试健康检查端点"""
+
+    def test_health_reports_breaker_state(self, client):
+        """测试健康检查返回熔断器状态，熔断时为 degraded"""
+        redis_client.breaker.reset()
+        response = client.get('/api/v1/health')
+        assert response.status_code == 200
+        assert response.get_json()['redis']['state'] == 'closed'
+
+        with patch.object(redis_client.breaker, 'state', 'open'), \
+                patch.object(redis_client.breaker, 'opened_at', time.monotonic()):
+            data = client.get('/api/v1/health').get_json()
+        assert data['status'] == 'degraded'
+        assert data['redis']['state'] == 'open'
@@ -0,0 +1,98 @@
+"""
+测试条件请求（ETag / Last-Modified）
+包括：
+- success(): If-None-Match / If-Modified-Since 命中时返回 304
+- 设备详情、实验室列表、时间段列表接口
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+import pytest
+from app import db
+from app.models.laboratory import Laboratory
+from app.utils.auth import generate_token
+from app.utils.response import success, make_etag
+
+
+class TestSuccessConditional:
+    """测试 success() 的条件请求支持"""
+
+    def test_make_etag_is_stable(self):
+        """测试 ETag 与键顺序无关，数据变化时 ETag 变化"""
+        assert make_etag({'a': 1, 'b': [1, 2]}) == make_etag({'b': [1, 2], 'a': 1})
+        assert make_etag({'a': 1}) != make_etag({'a': 2})
+
+    def test_if_none_match(self, app):
+        """测试 ETag 匹配时返回 304 且不序列化数据"""
+        etag = make_etag([1, 2])
+        with app.test_request_context(headers={'If-None-Match': f'"{etag}"'}):
+            with patch('app.utils.response.jsonify') as jsonify:
+                response, status = success(data=[1, 2], etag=etag)
+            jsonify.assert_not_called()
+            assert status == 304
+            assert response.headers['ETag'] == f'"{etag}"'
+            assert response.get_data() == b''
+
+        with app.test_request_context(headers={'If-None-Match': '"other"'}):
+            response, status = success(data=[1, 2], etag=etag)
+            assert status == 200
+            assert response.get_json()['data'] == [1, 2]
+            assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    def test_if_modified_since(self, app):
+        """测试没有 If-None-Match 时按最后修改时间判断"""
+        modified = datetime(2030, 1, 1, 8, 0, 0, 500000, tzinfo=timezone.utc)
+        header = 'Tue, 01 Jan 2030 08:00:00 GMT'
+        with app.test_request_context(headers={'If-Modified-Since': header}):
+            assert success(data=1, last_modified=modified.timestamp())[1] == 304
+        with app.test_request_context(headers={'If-Modified-Since': header}):
+            assert success(data=1, last_modified=modified + timedelta(seconds=1))[1] == 200
+        # If-None-Match 优先
+        with app.test_request_context(headers={'If-Modified-Since': header, 'If-None-Match': '"x"'}):
+            assert success(data=1, etag='y', last_modified=modified)[1] == 200
+
+    def test_without_validators(self, app):
+        """测试不传 etag / last_modified 时行为不变"""
+        with app.test_request_context(headers={'If-None-Match': '*'}):
+            response, status = success(data=1)
+            assert status == 200
+            assert 'ETag' not in response.headers
+
+
+class TestConditionalEndpoints:
+    """测试接口的条件请求"""
+
+    @pytest.fixture
+    def auth_headers(self, app, sample_student):
+        return {'Authorization': f'Bearer {generate_token(sample_student.id, "student")}'}
+
+    def test_equipment_detail(self, client, auth_headers, sample_equipment):
+        """测试设备详情：同一数据返回同一 ETag，ETag 匹配时 304，设备变化后重新返回"""
+        first = client.get(f'/api/v1/equipments/{sample_equipment.id}', headers=auth_headers)
+        etag = first.headers['ETag']
+        assert first.status_code == 200
+        assert first.headers['Last-Modified']
+
+        second = client.get(f'/api/v1/equipments/{sample_equipment.id}', headers={**auth_headers, 'If-None-Match': etag})
+        assert second.status_code == 304
+        assert second.get_data() == b''
+
+        # 设备信息变化并失效缓存后 ETag 变化
+        from app.api.v1.admin import _clear_equipment_cache
+        sample_equipment.name = '改名后的设备'
+        db.session.commit()
+        _clear_equipment_cache(equip_id=sample_equipment.id)
+        third = client.get(f'/api/v1/equipments/{sample_equipment.id}', headers={**auth_headers, 'If-None-Match': etag})
+        assert third.status_code == 200
+        assert third.headers['ETag'] != etag
+
+    def test_lab_list_and_timeslots(self, client, db_session, auth_headers, sample_timeslot):
+        """测试实验室列表和时间段列表的 ETag"""
+        db_session.add(Laboratory(id=1, name='测试实验室'))
+        db_session.commit()
+
+        for url in ('/api/v1/laboratories/', f'/api/v1/timeslots/equipment/{sample_timeslot.equip_id}',
+                    f'/api/v1/timeslots/equipment/{sample_timeslot.equip_id}?only_active=true'):
+            first = client.get(url, headers=auth_headers)
+            assert first.status_code == 200
+            second = client.get(url, headers={**auth_headers, 'If-None-Match': first.headers['ETag']})
+            assert second.status_code == 304
@@ -0,0 +1,131 @@
+"""
+测试进程内缓存（L1）
+包括：
+- LocalCache: LRU 淘汰、过期时间、内存上限、epoch
+- RedisClient: L1 命中、删除时广播失效、处理其他进程的失效广播
+"""
+import json
+from unittest.mock import MagicMock, patch
+from app.utils.local_cache import LocalCache
+from app.utils.redis_client import RedisClient
+
+
+class TestLocalCache:
+    """测试 LocalCache"""
+
+    def test_lru_eviction_by_entries(self):
+        """测试超过条目数上限时淘汰最久未使用的条目"""
+        cache = LocalCache(max_entries=2, max_bytes=1000, default_ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('a') == (True, 1)
+        assert cache.get('b') == (False, None)
+        assert cache.get('c') == (True, 3)
+        assert cache.snapshot()['evictions'] == 1
+
+    def test_eviction_by_bytes(self):
+        """测试超过字节上限时淘汰，超大的值不缓存"""
+        cache = LocalCache(max_entries=10, max_bytes=100, default_ttl=60)
+        cache.set('a', 'x', size=60)
+        cache.set('b', 'y', size=60)
+
+        assert cache.get('a') == (False, None)
+        assert cache.get('b') == (True, 'y')
+        assert cache.set('c', 'z', size=101) is False
+        assert cache.snapshot()['bytes'] == 60
+
+    def test_ttl(self):
+        """测试条目过期，过期时间不超过默认值"""
+        cache = LocalCache(max_entries=10, default_ttl=30)
+        with patch('app.utils.local_cache.time.monotonic', return_value=1000.0):
+            cache.set('a', 1, ttl=300)
+        with patch('app.utils.local_cache.time.monotonic', return_value=1029.0):
+            assert cache.get('a') == (True, 1)
+        with patch('app.utils.local_cache.time.monotonic', return_value=1031.0):
+            assert cache.get('a') == (False, None)
+
+    def test_epoch_discards_stale_write(self):
+        """测试读取期间发生失效时放弃写入"""
+        cache = LocalCache()
+        epoch = cache.epoch
+        cache.delete('other')
+
+        assert cache.set('a', 1, epoch=epoch) is False
+        assert cache.set('a', 1, epoch=cache.epoch) is True
+
+
+class TestRedisClientL1:
+    """测试 RedisClient 的进程内缓存"""
+
+    def _client(self):
+        client = RedisClient()
+        client.redis_client = client.raw_client = MagicMock()
+        client._logger = MagicMock()
+        client.local = LocalCache(max_entries=10)
+        # 视为已订阅失效频道，不启动后台线程
+        client._subscriber = MagicMock()
+        client._subscribed.set()
+        return client
+
+    def test_get_hits_l1(self, app):
+        """测试第二次读取命中 L1，不访问 Redis"""
+        client = self._client()
+        client.redis_client.get.return_value = '{"id": 1}'
+
+        assert client.get('api:equipment:detail:1') == {'id': 1}
+        assert client.get('api:equipment:detail:1') == {'id': 1}
+        client.redis_client.get.assert_called_once()
+
+        tiers = client.tier_snapshot()
+        assert tiers['l1']['hits'] == 1
+        assert tiers['l2'] == {'hits': 1, 'misses': 0, 'hit_ratio': 1.0}
+
+    def test_not_cached_before_subscribed(self, app):
+        """测试未订阅失效频道时不写入 L1"""
+        client = self._client()
+        client._subscribed.clear()
+        client.redis_client.get.return_value = '1'
+
+        client.get('k')
+        client.get('k')
+        assert client.redis_client.get.call_count == 2
+
+    def test_delete_evicts_and_publishes(self, app):
+        """测试删除时清除本进程 L1 并广播"""
+        client = self._client()
+        client.set('api:equipment:detail:1', {'id': 1}, ex=600)
+
+        client.delete('api:equipment:detail:1')
+
+        assert client.local.get('api:equipment:detail:1') == (False, None)
+        channel, data = client.redis_client.publish.call_args.args
+        assert channel == 'cache:invalidate'
+        assert json.loads(data) == ['api:equipment:detail:1']
+
+    def test_handle_invalidation_from_other_process(self, app):
+        """测试收到其他进程的失效广播后清除 L1"""
+        client = self._client()
+        client.set('a', {'v': 1}, ex=60)
+        client.set('b', {'v': 2}, ex=60)
+
+        client._handle_invalidation(json.dumps(['a']))
+        assert client.local.get('a') == (False, None)
+        assert client.local.get('b')[0] is True
+
+        client._handle_invalidation(json.dumps('*'))
+        assert client.local.get('b') == (False, None)
+
+    def test_bump_namespace_evicts_version(self, app):
+        """测试命名空间版本号缓存在 L1 中，失效时同时清除"""
+        client = self._client()
+        client.redis_client.get.return_value = '2'
+        assert client.ns_key('api:lab:list', 'all') == 'api:lab:list:v2:all'
+        assert client.ns_key('api:lab:list', 'all') == 'api:lab:list:v2:all'
+        client.redis_client.get.assert_called_once()
+
+        client.redis_client.get.return_value = '3'
+        client.bump_namespace('api:lab:list')
+        assert client.ns_key('api:lab:list', 'all') == 'api:lab:list:v3:all'
@@ -0,0 +1,191 @@
+"""
+测试进程内 Redis 兼容后端
+包括：
+- MemoryRedis: 字符串与过期时间、INCR、哈希、列表、集合、流水线、pub/sub
+- Lua 脚本的 Python 等价实现：缓存标签、锁释放、后台任务提交
+- REDIS_BACKEND=memory 时 RedisClient 的真实缓存行为（测试配置默认使用该后端）
+"""
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+from redis.exceptions import ResponseError
+from app.utils.memory_redis import MemoryRedis, MemoryStore
+from app.utils.redis_client import redis_client, equipment_tag
+from app.utils.redis_lock import RedisLock, LockTimeoutError, LockUnavailableError
+from app.utils.background import BackgroundJobs, PENDING_KEY, QUEUE_KEY
+
+
+class TestMemoryRedis:
+    """测试 MemoryRedis 命令"""
+
+    def test_strings_and_ttl(self):
+        """测试字符串读写、NX、过期时间和 INCR"""
+        client = MemoryRedis(decode_responses=True)
+        with patch('app.utils.memory_redis.time.monotonic', return_value=1000.0):
+            assert client.set('k', 'v', ex=10) is True
+            assert client.set('k', 'other', nx=True) is None
+            assert client.set('lock', 'a', px=500) is True
+            assert client.get('k') == 'v'
+            assert client.ttl('k') == 10
+            assert client.ttl('missing') == -2
+            assert client.incr('counter') == 1
+            assert client.incr('counter') == 2
+            assert client.ttl('counter') == -1
+        with patch('app.utils.memory_redis.time.monotonic', return_value=1000.6):
+            assert client.get('lock') is None
+        with patch('app.utils.memory_redis.time.monotonic', return_value=1010.0):
+            assert client.get('k') is None
+            assert client.mget(['k', 'counter']) == [None, '2']
+
+    def test_decode_responses_share_store(self):
+        """测试解码和不解码响应的两个客户端共享同一份数据"""
+        store = MemoryStore()
+        text, raw = MemoryRedis(store, decode_responses=True), MemoryRedis(store)
+        raw.set('k', b'\x1eS-abc')
+        text.hset('h', 'f', 1)
+
+        assert raw.get('k') == b'\x1eS-abc'
+        assert raw.hgetall('h') == {b'f': b'1'}
+        assert text.hget('h', 'f') == '1'
+        assert text.delete('k', 'missing') == 1
+        assert raw.exists('k') == 0
+
+    def test_wrong_type(self):
+        """测试对错误类型的键执行命令时抛出 WRONGTYPE"""
+        client = MemoryRedis()
+        client.rpush('list', 'a')
+        with pytest.raises(ResponseError):
+            client.get('list')
+        with pytest.raises(ResponseError):
+            client.sadd('list', 'x')
+
+    def test_lists_and_blpop(self):
+        """测试列表操作和阻塞弹出"""
+        client = MemoryRedis(decode_responses=True)
+        client.rpush('q', 'a', 'b')
+        client.lpush('q', 'z')
+        assert client.lrange('q', 0, -1) == ['z', 'a', 'b']
+        assert client.blpop(['q'], timeout=1) == ('q', 'z')
+
+        client.delete('q')
+        assert client.blpop(['q'], timeout=0.05) is None
+        threading.Timer(0.05, lambda: client.rpush('q', 'late')).start()
+        assert client.blpop(['q'], timeout=2) == ('q', 'late')
+
+    def test_pipeline_and_sets(self):
+        """测试流水线按顺序返回结果"""
+        client = MemoryRedis(decode_responses=True)
+        pipe = client.pipeline(transaction=False)
+        pipe.sadd('tag', 'k1', 'k2')
+        pipe.smembers('tag')
+        pipe.unlink('tag')
+        pipe.incr('ns:a')
+        assert pipe.execute() == [2, {'k1', 'k2'}, 1, 1]
+        assert client.smembers('tag') == set()
+
+    def test_pubsub(self):
+        """测试订阅确认和消息投递"""
+        client = MemoryRedis(decode_responses=True)
+        pubsub = client.pubsub()
+        pubsub.subscribe('cache:invalidate')
+
+        assert pubsub.get_message(timeout=1)['type'] == 'subscribe'
+        assert client.publish('cache:invalidate', '["k"]') == 1
+        message = pubsub.get_message(timeout=1)
+        assert (message['type'], message['channel'], message['data']) == ('message', 'cache:invalidate', '["k"]')
+
+        pubsub.close()
+        assert client.publish('cache:invalidate', 'x') == 0
+
+    def test_unknown_script(self):
+        """测试没有 Python 实现的脚本抛出 NOSCRIPT"""
+        with pytest.raises(ResponseError):
+            MemoryRedis().register_script('return 1')(keys=[], args=[])
+
+
+class TestMemoryBackend:
+    """测试 REDIS_BACKEND=memory 时的缓存行为"""
+
+    def test_backend_selected(self, app):
+        """测试测试配置使用进程内后端"""
+        assert redis_client.backend == 'memory'
+        assert isinstance(redis_client.get_client(), MemoryRedis)
+
+    def test_get_or_compute_and_tags(self, app):
+        """测试缓存命中后不再计算，按标签失效后重新计算"""
+        compute = MagicMock(return_value={'id': 1})
+        tags = [equipment_tag(1)]
+
+        assert redis_client.get_or_compute('api:equipment:detail:1', compute, ttl=60, tags=tags) == {'id': 1}
+        assert redis_client.get_or_compute('api:equipment:detail:1', compute, ttl=60, tags=tags) == {'id': 1}
+        assert compute.call_count == 1
+        assert redis_client.get_client().ttl(equipment_tag(1)) == 60
+
+        redis_client.invalidate_tags(equipment_tag(1))
+        redis_client.get_or_compute('api:equipment:detail:1', compute, ttl=60, tags=tags)
+        assert compute.call_count == 2
+
+    def test_namespace_and_pipeline(self, app):
+        """测试流水线中的命名空间失效"""
+        key = redis_client.ns_key('api:lab:list', 'all')
+        redis_client.set(key, [1, 2], ex=60)
+        assert redis_client.mget([key, 'missing']) == [[1, 2], None]
+
+        with redis_client.pipeline() as pipe:
+            pipe.bump_namespace('api:lab:list')
+        assert redis_client.ns_key('api:lab:list', 'all') != key
+
+    def test_redis_lock(self, app):
+        """测试分布式锁的加锁、互斥和比较后释放"""
+        first, second = RedisLock('booking:equip:1'), RedisLock('booking:equip:1')
+        assert first.acquire(wait_ms=0) == 1
+        with pytest.raises(LockTimeoutError):
+            second.acquire(wait_ms=0)
+        assert first.release() is True
+        assert second.acquire(wait_ms=0) == 2
+        assert second.release() is True
+
+    def test_redis_lock_fence_seed(self, app):
+        """测试围栏计数器丢失时从已提交的令牌补种，回退时只能调大"""
+        client = redis_client.get_client()
+        client.delete('lock:fence:booking:equip:9')
+        lock = RedisLock('booking:equip:9')
+        assert lock.acquire(wait_ms=0, fence_floor=lambda: 41) == 42
+        lock.release()
+        assert lock.acquire(wait_ms=0, fence_floor=lambda: 100) == 43
+        lock.release()
+
+        assert lock.raise_fence(10) is False
+        assert lock.raise_fence(50) is True
+        assert lock.acquire(wait_ms=0) == 51
+        lock.release()
+
+    def test_redis_lock_released_when_fence_fails(self, app):
+        """测试加锁后发放令牌失败时立即删除锁，其他实例不需要等待 TTL"""
+        client = redis_client.get_client()
+        client.delete('lock:fence:booking:equip:8')
+
+        def fence_floor():
+            raise RuntimeError('db down')
+
+        with pytest.raises(LockUnavailableError):
+            RedisLock('booking:equip:8').acquire(wait_ms=0, fence_floor=fence_floor)
+        assert client.exists('lock:booking:equip:8') == 0
+        other = RedisLock('booking:equip:8')
+        assert other.acquire(wait_ms=0) == 1
+        other.release()
+
+    def test_background_submit_script(self, app):
+        """测试后台任务通过进程内后端排队和合并"""
+        jobs = BackgroundJobs(app)
+        jobs.eager = False
+        jobs.job('demo')(lambda key, payload: None)
+
+        with patch.object(jobs, '_ensure_workers'):
+            assert jobs.submit('demo', 1, {'n': 1}) is True
+            assert jobs.submit('demo', 1, {'n': 2}) is False
+
+        client = redis_client.get_client()
+        assert client.lrange(QUEUE_KEY, 0, -1) == ['demo|1']
+        assert client.hget(PENDING_KEY, 'demo|1') == 'null'
+        assert jobs._pop_redis(timeout=1) == ('demo|1', 'null')
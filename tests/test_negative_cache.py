@@ -0,0 +1,123 @@
+"""
+测试不存在 ID 的快速拒绝
+包括：
+- BloomFilter: 没有漏判、误判率
+- NegativeCache: 负缓存标记与删除、设备 ID 布隆过滤器的重建和版本号、查询到的 ID 不再读取 Redis
+- 设备、时间段、预约查询：不存在的 ID 第二次不再访问数据库，创建后立即可查
+"""
+from unittest.mock import patch
+import pytest
+from app.services import equipment_service, reservation_service, timeslot_service
+from app.utils.auth import generate_token
+from app.utils.exceptions import NotFoundError
+from app.utils.negative_cache import BloomFilter, negative_cache, EQUIPMENT_BLOOM_NAMESPACE
+from app.utils.redis_client import redis_client
+
+
+class TestBloomFilter:
+    """测试 BloomFilter"""
+
+    def test_no_false_negatives(self):
+        """测试加入的元素一定判定为存在，误判率接近设定值"""
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(i)
+        assert all(i in bloom for i in range(1000))
+        false_positives = sum(i in bloom for i in range(1000, 11000))
+        assert false_positives < 300
+
+
+class TestNegativeCache:
+    """测试 NegativeCache"""
+
+    def test_mark_and_forget(self, app):
+        """测试标记后判定不存在，删除标记后恢复"""
+        assert negative_cache.is_missing('reservation', 7) is False
+        negative_cache.mark('reservation', 7)
+        assert negative_cache.is_missing('reservation', 7) is True
+        assert redis_client.get_client().ttl('missing:reservation:7') == 30
+
+        negative_cache.forget('reservation', 7)
+        assert negative_cache.is_missing('reservation', 7) is False
+
+    def test_disabled(self, app):
+        """测试 NEGATIVE_CACHE_TTL 为 0 时不记录"""
+        negative_cache.ttl = 0
+        negative_cache.mark('equipment', 1)
+        assert negative_cache.is_missing('equipment', 1) is False
+
+    def test_bloom_filter(self, app, sample_equipment):
+        """测试布隆过滤器拒绝不存在的设备，新建设备后本进程不需要重建，其他进程新建后重建"""
+        negative_cache.use_bloom = True
+        assert negative_cache.equipment_missing(999) is True
+        assert negative_cache.equipment_missing(sample_equipment.id) is False
+        assert negative_cache.snapshot()['bloom_rebuilds'] == 1
+
+        negative_cache.equipment_added(1000)
+        assert negative_cache.equipment_missing(1000) is False
+        assert negative_cache.snapshot()['bloom_rebuilds'] == 1
+
+        # 其他进程新建设备
+        redis_client.bump_namespace(EQUIPMENT_BLOOM_NAMESPACE)
+        negative_cache.equipment_missing(sample_equipment.id)
+        assert negative_cache.snapshot()['bloom_rebuilds'] == 2
+        assert negative_cache.snapshot()['bloom_rejects'] == 1
+
+    def test_known_ids_skip_redis(self, app, db_session, sample_equipment):
+        """测试查询到的设备之后不再读取负缓存和布隆过滤器版本号，被删除后查询不到时恢复负缓存"""
+        negative_cache.use_bloom = True
+        equipment_service.get_equipment_by_id(sample_equipment.id)
+        with patch('app.utils.negative_cache.redis_client') as client:
+            for _ in range(3):
+                equipment_service.get_equipment_by_id(sample_equipment.id)
+                reservation_service._get_bookable_equipment(sample_equipment.id)
+                timeslot_service._check_equipment_exists(sample_equipment.id)
+        client.get.assert_not_called()
+        client.namespace_version.assert_not_called()
+        assert negative_cache.snapshot()['known_hits'] == 9
+
+        db_session.delete(sample_equipment)
+        db_session.commit()
+        with pytest.raises(NotFoundError):
+            equipment_service.get_equipment_by_id(1)
+        assert negative_cache.is_missing('equipment', 1) is True
+
+
+class TestServicesSkipDatabase:
+    """测试查询不存在的 ID 时第二次不再访问数据库"""
+
+    def test_equipment(self, app):
+        """测试设备详情和时间段查询共用设备的负缓存"""
+        with pytest.raises(NotFoundError):
+            equipment_service.get_equipment_by_id(404)
+
+        with patch('app.services.equipment_service.Equipment') as model, \
+                patch('app.services.timeslot_service.Equipment') as timeslot_model:
+            with pytest.raises(NotFoundError):
+                equipment_service.get_equipment_by_id(404)
+            with pytest.raises(NotFoundError):
+                timeslot_service.get_timeslots_by_equipment(404)
+        model.query.options.assert_not_called()
+        timeslot_model.query.get.assert_not_called()
+        assert negative_cache.snapshot()['negative_hits'] == 2
+
+    def test_reservation_created_after_miss(self, app, sample_timeslot, sample_student,
+                                            sample_reservation_data, sample_current_user_student):
+        """测试预约 ID 被记录为不存在后，创建该预约立即可以查询"""
+        with pytest.raises(NotFoundError):
+            reservation_service.get_reservation_by_id(1)
+        with patch('app.services.reservation_service.Reservation') as model:
+            with pytest.raises(NotFoundError):
+                reservation_service.get_reservation_by_id(1)
+        model.query.get.assert_not_called()
+
+        reservation = reservation_service.create_reservation(sample_reservation_data, sample_current_user_student)
+        assert reservation.id == 1
+        assert reservation_service.get_reservation_by_id(1).id == 1
+
+    def test_endpoint(self, client, sample_student):
+        """测试接口对不存在的设备返回 404"""
+        headers = {'Authorization': f'Bearer {generate_token(sample_student.id, "student")}'}
+        for _ in range(2):
+            assert client.get('/api/v1/equipments/404', headers=headers).status_code == 404
+        assert negative_cache.snapshot()['negative_hits'] == 1
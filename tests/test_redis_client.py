@@ -0,0 +1,274 @@
+"""
+测试 Redis 客户端封装
+包括：
+- 缓存命名空间: ns_key / bump_namespace
+- 缓存标签: set_tagged / invalidate_tags
+- 缓存命中统计
+- get_or_compute: 单飞、软过期、概率提前过期
+- 批量操作: mget / mset_with_ttl / unlink / pipeline
+"""
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from app.utils.local_cache import LocalCache
+from app.utils.redis_client import RedisClient, SET_TAGGED_SCRIPT, _CacheStats, reservation_user_tag
+
+
+class TestCacheNamespace:
+    """测试缓存命名空间"""
+
+    def test_ns_key_embeds_version(self, app):
+        """测试缓存键包含命名空间的当前版本号"""
+        client = RedisClient()
+        client.redis_client = client.raw_client = MagicMock()
+        client.redis_client.get.return_value = '3'
+
+        assert client.ns_key('api:reservation:list', 'user_1') == 'api:reservation:list:v3:user_1'
+        client.redis_client.get.assert_called_with('ns:api:reservation:list')
+
+    def test_ns_key_defaults_to_version_zero(self, app):
+        """测试从未失效过或 Redis 不可用时版本号为 0"""
+        client = RedisClient()
+        client.redis_client = client.raw_client = MagicMock()
+        client.redis_client.get.return_value = None
+        assert client.ns_key('api:lab:list', 'all') == 'api:lab:list:v0:all'
+
+        client.redis_client.get.side_effect = ConnectionError('down')
+        assert client.ns_key('api:lab:list', 'all') == 'api:lab:list:v0:all'
+
+    def test_bump_namespace(self, app):
+        """测试失效多个命名空间只需一次流水线 INCR"""
+        client = RedisClient()
+        client.redis_client = client.raw_client = MagicMock()
+        pipe = client.redis_client.pipeline.return_value
+
+        assert client.bump_namespace('api:reservation:list', 'api:admin:reservation:list') is True
+        assert [c.args for c in pipe.incr.call_args_list] == [
+            ('ns:api:reservation:list',), ('ns:api:admin:reservation:list',)
+        ]
+        pipe.execute.assert_called_once()
+        client.redis_client.keys.assert_not_called()
+
+
+class TestCacheTags:
+    """测试缓存标签"""
+
+    def test_set_tagged(self, app):
+        """测试写入缓存时把键登记到标签集合"""
+        client = RedisClient()
+        client.redis_client = client.raw_client = MagicMock()
+        tag = reservation_user_tag('student', 'S001')
+
+        assert client.set_tagged('api:reservation:list:v0:user_S001', [{'id': 1}], ex=300, tags=[tag]) is True
+        client.redis_client.register_script.assert_called_once_with(SET_TAGGED_SCRIPT)
+        script = client.redis_client.register_script.return_value
+        script.assert_called_once_with(
+            keys=['api:reservation:list:v0:user_S001', 'tag:reservation:user:student:S001'],
+            args=[client.codec.encode([{'id': 1}]), 300]
+        )
+
+    def test_invalidate_tags(self, app):
+        """测试只删除标签下登记的键和标签本身"""
+        client = RedisClient()
+        client.redis_client = client.raw_client = MagicMock()
+        pipe = client.redis_client.pipeline.return_value
+        pipe.execute.return_value = [{'k1', 'k2'}, set()]
+        client.redis_client.delete.return_value = 3
+
+        assert client.invalidate_tags('tag:a', 'tag:b') == 3
+        deleted = client.redis_client.delete.call_args.args
+        assert set(deleted) == {'k1', 'k2', 'tag:a', 'tag:b'}
+        client.redis_client.keys.assert_not_called()
+
+
+class TestCacheStats:
+    """测试缓存命中统计"""
+
+    def test_snapshot(self):
+        """测试按缓存名称统计命中率"""
+        stats = _CacheStats()
+        for hit in (True, True, True, False):
+            stats.record('reservation_list', hit)
+        stats.record('equipment_detail', False)
+
+        assert stats.snapshot() == {
+            'reservation_list': {'hits': 3, 'misses': 1, 'hit_ratio': 0.75},
+            'equipment_detail': {'hits': 0, 'misses': 1, 'hit_ratio': 0.0}
+        }
+
+
+class TestGetOrCompute:
+    """测试防击穿读取"""
+
+    def _client(self, cached=None, locked=True):
+        client = RedisClient()
+        client.redis_client = client.raw_client = MagicMock()
+        client.redis_client.get.return_value = client.codec.encode(cached) if cached is not None else None
+        client.redis_client.set.return_value = True if locked else None
+        return client
+
+    def _envelope(self, value, expires_in, delta=0.01):
+        return {'_swr': 1, 'v': value, 'expires': time.time() + expires_in, 'delta': delta}
+
+    def _stored(self, client):
+        """返回写入 Redis 的缓存（跳过 SET NX 加锁调用）"""
+        for call in client.redis_client.set.call_args_list:
+            if not call.kwargs.get('nx'):
+                return client.codec.decode(call.args[1]), call.kwargs['ex']
+        return None, None
+
+    def test_miss_computes_once_and_stores_envelope(self, app):
+        """测试未命中时获取锁后计算并写入带软过期时间的缓存"""
+        client = self._client()
+        compute = MagicMock(return_value={'total': 3})
+
+        assert client.get_or_compute('k', compute, ttl=300, stale_ttl=60) == {'total': 3}
+        compute.assert_called_once()
+        stored, ex = self._stored(client)
+        assert stored['v'] == {'total': 3}
+        assert ex == 360
+        assert stored['expires'] > time.time() + 290
+
+    def test_fresh_hit(self, app):
+        """测试新鲜缓存直接返回，不加锁也不计算"""
+        client = self._client(cached=self._envelope([1], expires_in=300))
+        compute = MagicMock()
+
+        assert client.get_or_compute('k', compute, ttl=300, beta=0) == [1]
+        compute.assert_not_called()
+        client.redis_client.set.assert_not_called()
+
+    def test_stale_refreshed_by_lock_holder(self, app):
+        """测试软过期后获得锁的请求刷新缓存"""
+        client = self._client(cached=self._envelope('old', expires_in=-5))
+        compute = MagicMock(return_value='new')
+
+        assert client.get_or_compute('k', compute, ttl=300, stale_ttl=60) == 'new'
+        compute.assert_called_once()
+        assert client.tier_snapshot()['compute']['stale'] == 1
+
+    def test_stale_served_while_other_worker_refreshes(self, app):
+        """测试其他请求持有锁时返回旧值"""
+        client = self._client(cached=self._envelope('old', expires_in=-5), locked=False)
+        compute = MagicMock()
+
+        assert client.get_or_compute('k', compute, ttl=300, stale_ttl=60) == 'old'
+        compute.assert_not_called()
+
+    def test_miss_waits_for_other_worker(self, app):
+        """测试没有旧值且其他请求持有锁时等待其结果"""
+        client = self._client(locked=False)
+        client.redis_client.get.side_effect = [None, None, client.codec.encode(self._envelope('fresh', 300))]
+        compute = MagicMock()
+
+        with patch('app.utils.redis_client.time.sleep'):
+            assert client.get_or_compute('k', compute, ttl=300) == 'fresh'
+        compute.assert_not_called()
+
+    def test_probabilistic_early_refresh(self, app):
+        """测试接近过期且计算较慢时提前刷新"""
+        client = self._client(cached=self._envelope('old', expires_in=1, delta=2.0))
+        compute = MagicMock(return_value='new')
+
+        # ln(0.1) ≈ -2.3，2 秒的计算时间使刷新提前约 4.6 秒
+        with patch('app.utils.redis_client.random.random', return_value=0.1):
+            assert client.get_or_compute('k', compute, ttl=300) == 'new'
+        assert client.tier_snapshot()['compute']['early_refresh'] == 1
+
+    def test_redis_unavailable(self, app):
+        """测试 Redis 不可用时直接计算"""
+        client = self._client()
+        client.redis_client.get.side_effect = ConnectionError('down')
+        client.redis_client.set.side_effect = ConnectionError('down')
+
+        assert client.get_or_compute('k', lambda: 42, ttl=300) == 42
+
+
+class TestBulkOperations:
+    """测试批量操作"""
+
+    def _client(self):
+        client = RedisClient()
+        client.redis_client = client.raw_client = MagicMock()
+        return client
+
+    def test_mget(self, app):
+        """测试一次往返读取多个键，缺失和无法解码的键返回默认值"""
+        client = self._client()
+        client.raw_client.mget.return_value = [client.codec.encode({'id': 1}), None, b'\x1eX-bad', '"text"']
+
+        assert client.mget(['a', 'b', 'c', 'd'], default=0) == [{'id': 1}, 0, 0, 'text']
+        client.raw_client.mget.assert_called_once_with(['a', 'b', 'c', 'd'])
+
+    def test_mget_skips_l1_hits(self, app):
+        """测试 L1 命中的键不再访问 Redis"""
+        client = self._client()
+        client._logger = MagicMock()
+        client.local = LocalCache(max_entries=10)
+        client._subscriber = MagicMock()
+        client._subscribed.set()
+        client.local.set('a', {'id': 1})
+        client.raw_client.mget.return_value = [client.codec.encode({'id': 2})]
+
+        assert client.mget(['a', 'b']) == [{'id': 1}, {'id': 2}]
+        client.raw_client.mget.assert_called_once_with(['b'])
+
+        client.mget(['a', 'b'])
+        client.raw_client.mget.assert_called_once()
+
+    def test_mset_with_ttl(self, app):
+        """测试流水线写入多个键，每个键都带过期时间并使用相同的编码"""
+        client = self._client()
+        pipe = client.raw_client.pipeline.return_value
+        pipe.execute.return_value = [True, True]
+
+        assert client.mset_with_ttl({'a': {'id': 1}, 'b': 'x'}, ex=60) is True
+        assert [(c.args, c.kwargs) for c in pipe.set.call_args_list] == [
+            (('a', client.codec.encode({'id': 1})), {'ex': 60}),
+            (('b', client.codec.encode('x')), {'ex': 60}),
+        ]
+        pipe.execute.assert_called_once()
+
+    def test_unlink_in_chunks(self, app):
+        """测试按批次发送 UNLINK，一次往返"""
+        client = self._client()
+        pipe = client.redis_client.pipeline.return_value
+        pipe.execute.return_value = [2, 1]
+
+        assert client.unlink('a', 'b', 'c', chunk_size=2) == 3
+        assert [c.args for c in pipe.unlink.call_args_list] == [('a', 'b'), ('c',)]
+        client.redis_client.delete.assert_not_called()
+
+    def test_pipeline(self, app):
+        """测试批量失效：先读取标签成员，再用一个流水线完成删除、版本号加一和写入"""
+        client = self._client()
+        pipe = client.redis_client.pipeline.return_value
+        pipe.execute.side_effect = [[{'k1', 'k2'}], [4, 1, True]]
+
+        with client.pipeline() as batch:
+            batch.delete('detail:1')
+            batch.invalidate_tags('tag:a')
+            batch.bump_namespace('api:list')
+            batch.set('warm', {'id': 1}, ex=60)
+
+        deleted = pipe.unlink.call_args.args
+        assert deleted[0] == 'detail:1'
+        assert set(deleted) == {'detail:1', 'k1', 'k2', 'tag:a'}
+        pipe.incr.assert_called_once_with('ns:api:list')
+        pipe.set.assert_called_once_with('warm', client.codec.encode({'id': 1}), ex=60)
+        assert pipe.execute.call_count == 2
+
+    def test_pipeline_not_executed_on_error(self, app):
+        """测试 with 块内抛出异常时不执行，Redis 异常只记录日志"""
+        client = self._client()
+        pipe = client.redis_client.pipeline.return_value
+
+        with pytest.raises(RuntimeError):
+            with client.pipeline() as batch:
+                batch.delete('a')
+                raise RuntimeError('boom')
+        pipe.execute.assert_not_called()
+
+        pipe.execute.side_effect = ConnectionError('down')
+        with client.pipeline() as batch:
+            batch.delete('a')
@@ -0,0 +1,151 @@
+"""
+测试预约冲突时的备选时间
+包括：
+- _suggest_alternatives: 离请求最近的可行时间
+- 冲突（lock / claim 模式）和不在时间段内时，错误信息附带备选时间
+- 查询次数：没有冲突时只读取重叠的预约；不在时间段内时只按时间段计算，不读取预约
+- RESERVATION_ALTERNATIVES = 0 时不计算；RESERVATION_ALTERNATIVES_SIBLINGS 推荐同类设备
+"""
+from datetime import datetime, timedelta, time
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models.equipment import Equipment
+from app.models.reservation import Reservation
+from app.models.timeslot import TimeSlot
+from app.services.reservation_service import (
+    create_reservation,
+    _check_reservation_conflict,
+    _check_timeslot_availability,
+    _suggest_alternatives
+)
+from app.utils.exceptions import ValidationError
+
+
+@pytest.fixture
+def day(db_session, sample_equipment, sample_timeslot, sample_student):
+    """设备 1（时间段 9-17）明天 10-11 已通过"""
+    day = datetime.combine(datetime.utcnow().date() + timedelta(days=1), time(0, 0))
+    db_session.add(Reservation(
+        equip_id=1, student_id=sample_student.id, status=1,
+        start_time=day.replace(hour=10), end_time=day.replace(hour=11)
+    ))
+    db_session.commit()
+    return day
+
+
+def _request(day, start, end):
+    return {'equip_id': 1, 'start_time': day + timedelta(hours=start), 'end_time': day + timedelta(hours=end)}
+
+
+def _starts(payload, key='alternatives'):
+    return [item['start_time'] for item in payload[key]]
+
+
+class TestSuggestAlternatives:
+    """测试 _suggest_alternatives"""
+
+    def test_nearest_first(self, app):
+        """测试按离请求开始时间的距离排序，每个空闲区间取最近的开始时间"""
+        day = datetime(2030, 1, 1)
+        slots = [TimeSlot(start_time=time(9, 0), end_time=time(17, 0))]
+        busy = [(day.replace(hour=10), day.replace(hour=11))]
+        result = _suggest_alternatives(slots, busy, day.replace(hour=10, minute=30), day.replace(hour=11, minute=30),
+                                       now=datetime(2029, 1, 1))
+        assert result == [
+            {'start_time': day.replace(hour=11).isoformat(), 'end_time': day.replace(hour=12).isoformat()},
+            {'start_time': day.replace(hour=9).isoformat(), 'end_time': day.replace(hour=10).isoformat()},
+            {'start_time': day.replace(day=2, hour=9).isoformat(), 'end_time': day.replace(day=2, hour=10).isoformat()},
+        ]
+
+    def test_skips_past_and_short_gaps(self, app):
+        """测试不推荐已经开始的时间和容纳不下时长的空隙"""
+        day = datetime(2030, 1, 1)
+        slots = [TimeSlot(start_time=time(9, 0), end_time=time(12, 0))]
+        busy = [(day.replace(hour=9, minute=30), day.replace(hour=11, minute=30))]
+        result = _suggest_alternatives(slots, busy, day.replace(hour=10), day.replace(hour=11),
+                                       now=day.replace(hour=9, minute=5))
+        assert result == [{'start_time': day.replace(day=2, hour=9).isoformat(),
+                           'end_time': day.replace(day=2, hour=10).isoformat()}]
+
+
+class TestConflictPayload:
+    """测试冲突错误中的备选时间"""
+
+    def test_lock_mode(self, app, day, sample_current_user_student):
+        """测试 lock 模式冲突时返回冲突详情和备选时间"""
+        with pytest.raises(ValidationError) as exc_info:
+            create_reservation(_request(day, 10.5, 11.5), sample_current_user_student)
+        payload = exc_info.value.payload
+        assert len(payload['conflicts']) == 1
+        assert _starts(payload)[:2] == [day.replace(hour=11).isoformat(), day.replace(hour=9).isoformat()]
+        assert 'sibling_alternatives' not in payload
+
+    def test_queries(self, app, day, sample_timeslot):
+        """测试没有冲突时只执行守卫行锁定和重叠预约查询，发现冲突后才多读取一次忙碌区间（只选两列）"""
+        time_slots = [sample_timeslot]
+        assert sample_timeslot.start_time == time(9, 0)  # 提前加载属性
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            _check_reservation_conflict(1, day.replace(hour=14), day.replace(hour=15), time_slots=time_slots)
+            assert len(statements) == 2
+            with pytest.raises(ValidationError) as exc_info:
+                _check_reservation_conflict(1, day.replace(hour=10), day.replace(hour=11), time_slots=time_slots)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        assert len(statements) == 5
+        assert statements[-1].startswith('SELECT reservation.start_time AS reservation_start_time, '
+                                         'reservation.end_time AS reservation_end_time \nFROM')
+        assert exc_info.value.payload['alternatives'][0]['start_time'] == day.replace(hour=9).isoformat()
+
+    def test_outside_timeslot(self, app, day, sample_timeslot):
+        """测试不在时间段内时只按时间段返回最近的可行时间，只执行读取时间段的一次查询"""
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            with pytest.raises(ValidationError) as exc_info:
+                _check_timeslot_availability(1, day.replace(hour=8), day.replace(hour=9, minute=30))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        assert '不在设备的可用时间段内' in exc_info.value.message
+        assert len(statements) == 1
+        assert _starts(exc_info.value.payload)[0] == day.replace(hour=9).isoformat()
+
+    def test_claim_mode(self, app, day, sample_current_user_student):
+        """测试 claim 模式唯一约束冲突时同样返回备选时间"""
+        app.config['RESERVATION_CONFLICT_MODE'] = 'claim'
+        try:
+            app.test_cli_runner().invoke(args=['rebuild-claims'])
+            with pytest.raises(ValidationError) as exc_info:
+                create_reservation(_request(day, 10, 11), sample_current_user_student)
+        finally:
+            app.config['RESERVATION_CONFLICT_MODE'] = 'lock'
+        assert _starts(exc_info.value.payload)[:2] == [day.replace(hour=9).isoformat(), day.replace(hour=11).isoformat()]
+
+    def test_disabled(self, app, day, sample_current_user_student):
+        """测试 RESERVATION_ALTERNATIVES = 0 时不计算备选时间"""
+        app.config['RESERVATION_ALTERNATIVES'] = 0
+        with pytest.raises(ValidationError) as exc_info:
+            create_reservation(_request(day, 10, 11), sample_current_user_student)
+        assert exc_info.value.payload['alternatives'] == []
+        assert len(exc_info.value.payload['conflicts']) == 1
+
+    def test_siblings(self, app, db_session, day, sample_current_user_student):
+        """测试启用后推荐同一实验室、同一类别的其他设备"""
+        db_session.add_all([
+            Equipment(id=2, name='设备2', lab_id=1, category=1, status=1),
+            Equipment(id=3, name='设备3', lab_id=1, category=2, status=1),
+            TimeSlot(equip_id=2, start_time=time(9, 0), end_time=time(17, 0), is_active=1),
+            TimeSlot(equip_id=3, start_time=time(9, 0), end_time=time(17, 0), is_active=1),
+        ])
+        db_session.commit()
+        app.config['RESERVATION_ALTERNATIVES_SIBLINGS'] = True
+        with pytest.raises(ValidationError) as exc_info:
+            create_reservation(_request(day, 10, 11), sample_current_user_student)
+        assert exc_info.value.payload['sibling_alternatives'] == [{
+            'equip_id': 2, 'equip_name': '设备2',
+            'start_time': day.replace(hour=10).isoformat(), 'end_time': day.replace(hour=11).isoformat()
+        }]
@@ -0,0 +1,170 @@
+"""
+测试批量审批
+包括：
+- bulk_update_reservation_status: 批量通过/拒绝、与已通过预约及本批预约之间的冲突、
+  不存在和状态无效的预约、每台设备只计算一次下次可用时间
+- PUT /api/v1/admin/reservations/batch/approve、/batch/reject 与审计日志批量写入
+"""
+from datetime import datetime, timedelta, time
+from unittest.mock import patch
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models.equipment import Equipment
+from app.models.reservation import Reservation
+from app.models.reservation_claim import ReservationClaim
+from app.services.reservation_service import (
+    bulk_update_reservation_status,
+    NEXT_AVAIL_TIME_JOB,
+    MAX_BULK_REVIEW
+)
+from app.utils.auth import generate_token
+from app.utils.exceptions import ValidationError
+
+
+@pytest.fixture
+def day():
+    return datetime.combine(datetime.utcnow().date() + timedelta(days=1), time(0, 0))
+
+
+@pytest.fixture
+def add(db_session, sample_equipment, sample_student):
+    """直接写入预约（绕过创建时的冲突检查，模拟历史数据中重叠的待审预约）"""
+    db_session.add(Equipment(id=2, name='设备2', lab_id=1, category=1, status=1))
+    db_session.commit()
+
+    def add(equip_id, start, end, status=0):
+        reservation = Reservation(equip_id=equip_id, student_id=sample_student.id, status=status,
+                                  start_time=start, end_time=end)
+        db_session.add(reservation)
+        db_session.commit()
+        return reservation.id
+    return add
+
+
+class TestBulkUpdateReservationStatus:
+    """测试 bulk_update_reservation_status 函数"""
+
+    def test_approve(self, app, add, day):
+        """测试批量通过，每台设备只提交一次下次可用时间的完整计算"""
+        ids = [add(1, day.replace(hour=9), day.replace(hour=10)),
+               add(2, day.replace(hour=9), day.replace(hour=10)),
+               add(1, day.replace(hour=14), day.replace(hour=15))]
+        with patch('app.services.reservation_service.background_jobs.submit') as submit:
+            result = bulk_update_reservation_status(ids, 1, approver_id='A001')
+
+        assert sorted(r.id for r in result['updated']) == sorted(ids)
+        assert result['failed'] == []
+        assert {r.status for r in Reservation.query} == {1}
+        assert all(r.approver_id == 'A001' and r.approve_time for r in Reservation.query)
+        assert {e.status for e in Equipment.query} == {2}
+        assert [c.args for c in submit.call_args_list] == [(NEXT_AVAIL_TIME_JOB, 1), (NEXT_AVAIL_TIME_JOB, 2)]
+
+    def test_conflicts(self, app, add, day):
+        """测试与已通过预约、本批更早通过的预约重叠的预约保持待审"""
+        approved = add(1, day.replace(hour=10), day.replace(hour=11), status=1)
+        overlaps_approved = add(1, day.replace(hour=10, minute=30), day.replace(hour=11, minute=30))
+        first = add(1, day.replace(hour=14), day.replace(hour=15))
+        overlaps_first = add(1, day.replace(hour=14, minute=30), day.replace(hour=15, minute=30))
+        adjacent = add(1, day.replace(hour=15, minute=30), day.replace(hour=16))
+
+        result = bulk_update_reservation_status([overlaps_first, overlaps_approved, first, adjacent], 1)
+
+        assert sorted(r.id for r in result['updated']) == [first, adjacent]
+        assert [(item['id'], [c['id'] for c in item['conflicts']]) for item in result['failed']] == [
+            (overlaps_first, [first]), (overlaps_approved, [approved])
+        ]
+        assert Reservation.query.get(overlaps_first).status == 0
+
+    def test_missing_and_invalid(self, app, add, day):
+        """测试不存在和非待审的预约按请求顺序报告，重复ID只处理一次"""
+        approved = add(1, day.replace(hour=10), day.replace(hour=11), status=1)
+        pending = add(1, day.replace(hour=14), day.replace(hour=15))
+        result = bulk_update_reservation_status([999, pending, approved, pending], 2, reason='维护')
+
+        assert [r.id for r in result['updated']] == [pending]
+        assert [item['id'] for item in result['failed']] == [999, approved]
+        assert result['failed'][0]['msg'] == '预约不存在'
+        assert Reservation.query.get(pending).reject_reason == '维护'
+
+    def test_reject_releases_claims(self, app, add, day):
+        """测试拒绝时释放占用记录，设备状态和下次可用时间不变"""
+        ids = [add(1, day.replace(hour=9), day.replace(hour=10)), add(1, day.replace(hour=14), day.replace(hour=15))]
+        db.session.execute(ReservationClaim.__table__.insert(), [
+            {'equip_id': 1, 'bucket_start': day.replace(hour=9), 'reservation_id': ids[0]},
+            {'equip_id': 1, 'bucket_start': day.replace(hour=14), 'reservation_id': ids[1]},
+        ])
+        db.session.commit()
+        with patch('app.services.reservation_service.background_jobs.submit') as submit:
+            bulk_update_reservation_status(ids, 2)
+        assert ReservationClaim.query.count() == 0
+        assert Equipment.query.get(1).status == 1
+        submit.assert_not_called()
+
+    def test_statements_per_equipment(self, app, add, day):
+        """测试 SQL 语句数量只与设备数量有关，与预约数量无关"""
+        counts = []
+        for hours in ((9,), (10, 11, 12, 13, 14)):
+            ids = [add(1, day.replace(hour=h), day.replace(hour=h, minute=30)) for h in hours]
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                bulk_update_reservation_status(ids, 1)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+            counts.append(len([s for s in statements if 'reservation' in s.lower()]))
+        assert counts[0] == counts[1]
+
+    def test_invalid_arguments(self, app):
+        """测试状态和ID列表的校验"""
+        for args, message in (
+            (([1], 3), '批量审批只支持通过(1)或拒绝(2)'),
+            (([], 1), '预约ID列表不能为空'),
+            ((list(range(1, MAX_BULK_REVIEW + 2)), 1), f'一次最多审批 {MAX_BULK_REVIEW} 个预约'),
+        ):
+            with pytest.raises(ValidationError) as exc_info:
+                bulk_update_reservation_status(*args)
+            assert exc_info.value.message == message
+
+
+class TestBulkReviewApi:
+    """测试批量审批接口"""
+
+    def test_approve_writes_audit_logs(self, app, client, add, day):
+        """测试成功更新的预约在一次批量写入中各记录一条审计日志"""
+        ids = [add(1, day.replace(hour=9), day.replace(hour=10)), add(2, day.replace(hour=9), day.replace(hour=10))]
+        headers = {'Authorization': f'Bearer {generate_token("A001", "admin")}'}
+        with patch('app.utils.audit.auditlog_service.create_audit_logs') as create_audit_logs:
+            body = client.put('/api/v1/admin/reservations/batch/approve', headers=headers,
+                              json={'ids': ids + [999]}).get_json()
+
+        assert body['code'] == 200
+        assert [item['id'] for item in body['data']['updated']] == ids
+        assert [item['id'] for item in body['data']['failed']] == [999]
+        create_audit_logs.assert_called_once()
+        kwargs = create_audit_logs.call_args.kwargs
+        assert (kwargs['operator_id'], kwargs['action_type']) == ('A001', 'approve_reservation')
+        assert kwargs['details'] == [f'{{"reservation_id": {i}}}' for i in ids]
+
+    def test_reject(self, app, client, add, day):
+        """测试批量拒绝保存理由，无效ID列表返回 422"""
+        pending = add(1, day.replace(hour=9), day.replace(hour=10))
+        headers = {'Authorization': f'Bearer {generate_token("A001", "admin")}'}
+        url = '/api/v1/admin/reservations/batch/reject'
+
+        assert client.put(url, headers=headers, json={'ids': 'x'}).get_json()['code'] == 422
+        with patch('app.utils.audit.auditlog_service.create_audit_logs') as create_audit_logs:
+            body = client.put(url, headers=headers, json={'ids': [pending], 'reason': '维护'}).get_json()
+        assert body['data']['updated'][0]['reject_reason'] == '维护'
+        assert create_audit_logs.call_args.kwargs['details'] == [
+            f'{{"reservation_id": {pending}, "reason": "维护"}}'
+        ]
+
+    def test_requires_admin(self, app, client, add, day):
+        """测试非管理员不能批量审批"""
+        pending = add(1, day.replace(hour=9), day.replace(hour=10))
+        headers = {'Authorization': f'Bearer {generate_token("S001", "student")}'}
+        body = client.put('/api/v1/admin/reservations/batch/approve', headers=headers, json={'ids': [pending]})
+        assert body.get_json()['code'] == 403
+        assert Reservation.query.get(pending).status == 0
@@ -0,0 +1,218 @@
+"""
+测试系列预约
+包括：
+- _expand_series: 重复规则展开与次数限制
+- _match_series_conflicts: 排序数组上的二分冲突查找
+- create_reservation_series: 全部创建、冲突时整体拒绝或跳过、claim 模式与占用表维护、查询次数不随次数增长、
+  redis_lock 模式下先推进围栏再读取冲突
+- POST /api/v1/reservations/series
+"""
+from datetime import datetime, date, timedelta, time
+from types import SimpleNamespace
+from unittest.mock import patch
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models.equipment import Equipment
+from app.models.reservation import Reservation
+from app.models.reservation_claim import ReservationClaim
+from app.models.slot_occupancy import SlotOccupancy
+from app.services import reservation_service
+from app.services.reservation_service import (
+    create_reservation,
+    create_reservation_series,
+    _expand_series,
+    _match_series_conflicts,
+    MAX_SERIES_OCCURRENCES
+)
+from app.utils.auth import generate_token
+from app.utils.exceptions import ValidationError
+
+
+@pytest.fixture
+def first(sample_equipment, sample_timeslot, sample_student):
+    """第一次预约：明天 10:00-11:00（设备 1 的时间段为 9-17）"""
+    return datetime.combine(datetime.utcnow().date() + timedelta(days=1), time(10, 0))
+
+
+def _series(first, **rule):
+    data = {'equip_id': 1, 'start_time': first, 'end_time': first + timedelta(hours=1)}
+    data.update(rule)
+    return data
+
+
+class TestExpandSeries:
+    """测试 _expand_series 函数"""
+
+    def test_weekly_count(self):
+        """测试每周重复指定次数"""
+        start = datetime(2030, 1, 7, 10)
+        occurrences = _expand_series(start, start + timedelta(hours=1), count=3)
+        assert [s for s, _ in occurrences] == [start, start + timedelta(days=7), start + timedelta(days=14)]
+        assert all(e - s == timedelta(hours=1) for s, e in occurrences)
+
+    def test_daily_interval_until(self):
+        """测试每隔一天重复到截止日期（包含）"""
+        start = datetime(2030, 1, 1, 10)
+        occurrences = _expand_series(start, start + timedelta(hours=1), frequency='daily', interval=2,
+                                     until=date(2030, 1, 5))
+        assert [s.day for s, _ in occurrences] == [1, 3, 5]
+
+    def test_invalid_rules(self):
+        """测试无效规则和超过最大次数"""
+        start = datetime(2030, 1, 1, 10)
+        end = start + timedelta(hours=1)
+        invalid = [
+            ({}, '重复次数和截止日期不能都为空'),
+            ({'until': date(2029, 12, 31)}, '截止日期早于第一次预约'),
+            ({'frequency': 'daily', 'count': MAX_SERIES_OCCURRENCES + 1}, f'系列预约最多 {MAX_SERIES_OCCURRENCES} 次'),
+            ({'frequency': 'daily', 'until': date(2031, 1, 1)}, f'系列预约最多 {MAX_SERIES_OCCURRENCES} 次'),
+            ({'frequency': 'monthly', 'count': 2}, '重复频率必须是 daily 或 weekly'),
+        ]
+        for rule, message in invalid:
+            with pytest.raises(ValidationError) as exc_info:
+                _expand_series(start, end, **rule)
+            assert exc_info.value.message == message
+
+
+class TestMatchSeriesConflicts:
+    """测试 _match_series_conflicts 函数"""
+
+    def test_overlap_and_boundaries(self):
+        """测试只匹配真正重叠的预约，边界相接不算冲突"""
+        day = datetime(2030, 1, 1)
+        existing = [
+            SimpleNamespace(id=1, start_time=day.replace(hour=9), end_time=day.replace(hour=10)),
+            SimpleNamespace(id=2, start_time=day.replace(hour=10, minute=30), end_time=day.replace(hour=12)),
+            SimpleNamespace(id=3, start_time=day.replace(day=8, hour=8), end_time=day.replace(day=8, hour=10, minute=1)),
+        ]
+        occurrences = [(day.replace(day=d, hour=10), day.replace(day=d, hour=11)) for d in (1, 8, 15)]
+        assert [[r.id for r in m] for m in _match_series_conflicts(occurrences, existing)] == [[2], [3], []]
+
+
+class TestCreateReservationSeries:
+    """测试 create_reservation_series 函数"""
+
+    def test_create_all(self, app, first, sample_current_user_student, mock_redis):
+        """测试一次创建全部预约"""
+        result = create_reservation_series(_series(first, count=4), sample_current_user_student)
+        reservations = result['reservations']
+        assert result['skipped'] == []
+        assert [r.start_time for r in reservations] == [first + timedelta(weeks=i) for i in range(4)]
+        assert len({r.id for r in reservations}) == 4
+        assert all(r.status == 0 and r.student_id == 'S001' and r.equip_name == '测试设备' for r in reservations)
+        assert Reservation.query.count() == 4
+
+    def test_queries_do_not_grow(self, app, first, sample_current_user_student, mock_redis):
+        """测试 SQL 语句数量与次数无关（一次读取、一条批量 INSERT）"""
+        counts = []
+        for offset, count in ((0, 1), (1, 2), (2, 12)):
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                create_reservation_series(_series(first + timedelta(days=offset), count=count),
+                                          sample_current_user_student)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+            counts.append(len(statements))
+        # 第一次调用会加载设备、学生等对象，只比较之后的两次
+        assert counts[1] == counts[2]
+
+    def test_conflict_rejects_whole_series(self, app, first, sample_current_user_student, mock_redis):
+        """测试默认有冲突时整体拒绝，并报告每次冲突"""
+        existing = create_reservation(
+            {'equip_id': 1, 'start_time': first + timedelta(weeks=1, minutes=30),
+             'end_time': first + timedelta(weeks=1, hours=2)}, sample_current_user_student
+        )
+        with pytest.raises(ValidationError) as exc_info:
+            create_reservation_series(_series(first, count=3), sample_current_user_student)
+        occurrences = exc_info.value.payload['occurrences']
+        assert [item['index'] for item in occurrences] == [1]
+        assert occurrences[0]['conflicts'][0]['id'] == existing.id
+        assert Reservation.query.count() == 1
+
+    def test_skip_conflicts(self, app, first, sample_current_user_student, mock_redis):
+        """测试 skip_conflicts 时只创建不冲突的预约"""
+        create_reservation({'equip_id': 1, 'start_time': first + timedelta(weeks=2),
+                            'end_time': first + timedelta(weeks=2, hours=1)}, sample_current_user_student)
+        result = create_reservation_series(_series(first, count=3, skip_conflicts=True), sample_current_user_student)
+        assert [r.start_time for r in result['reservations']] == [first, first + timedelta(weeks=1)]
+        assert [item['index'] for item in result['skipped']] == [2]
+
+    def test_outside_timeslot(self, app, first, sample_current_user_student, mock_redis):
+        """测试时间段外的系列预约被拒绝"""
+        with pytest.raises(ValidationError) as exc_info:
+            create_reservation_series(_series(first.replace(hour=17), count=2), sample_current_user_student)
+        assert '不在设备的可用时间段内' in exc_info.value.message
+
+    def test_claim_mode(self, app, first, sample_current_user_student, mock_redis):
+        """测试 claim 模式写入全部占用记录，之后的单次预约按唯一约束冲突"""
+        app.config['RESERVATION_CONFLICT_MODE'] = 'claim'
+        try:
+            create_reservation_series(_series(first, count=3), sample_current_user_student)
+            assert ReservationClaim.query.count() == 3 * 60
+            with pytest.raises(ValidationError) as exc_info:
+                create_reservation({'equip_id': 1, 'start_time': first + timedelta(weeks=2),
+                                    'end_time': first + timedelta(weeks=2, hours=1)}, sample_current_user_student)
+            assert exc_info.value.message == '预约时间与已有预约冲突'
+        finally:
+            app.config['RESERVATION_CONFLICT_MODE'] = 'lock'
+
+    def test_occupancy(self, app, first, sample_current_user_student, mock_redis):
+        """测试占用表模式下每个日期都写入占用"""
+        app.config['AVAILABILITY_READ_MODEL'] = 'occupancy'
+        try:
+            create_reservation_series(_series(first, count=3), sample_current_user_student)
+        finally:
+            app.config['AVAILABILITY_READ_MODEL'] = 'live'
+        assert sorted(row.date for row in SlotOccupancy.query) == [
+            (first + timedelta(weeks=i)).date() for i in range(3)
+        ]
+
+    def test_redis_lock_fence_before_read(self, app, first, sample_current_user_student, mock_redis):
+        """测试 redis_lock 模式下租约过期的旧持有者在围栏推进前提交的预约，新持有者读取冲突时能看到"""
+        advance = reservation_service._advance_booking_fence
+        
+        def interleaved_fence(equip_id, token):
+            if token == 2:
+                create_reservation({'equip_id': 1, 'start_time': first + timedelta(weeks=1),
+                                    'end_time': first + timedelta(weeks=1, hours=1)}, sample_current_user_student)
+            return advance(equip_id, token)
+        
+        app.config['RESERVATION_CONFLICT_MODE'] = 'redis_lock'
+        try:
+            with patch('app.services.reservation_service.RedisLock.acquire', side_effect=[2, 1]), \
+                    patch('app.services.reservation_service.RedisLock.release'), \
+                    patch('app.services.reservation_service._advance_booking_fence', side_effect=interleaved_fence):
+                result = create_reservation_series(_series(first, count=3, skip_conflicts=True),
+                                                   sample_current_user_student)
+        finally:
+            app.config['RESERVATION_CONFLICT_MODE'] = 'lock'
+        assert [item['index'] for item in result['skipped']] == [1]
+        assert Reservation.query.count() == 3
+        assert Equipment.query.get(1).booking_fence == 2
+
+
+class TestSeriesApi:
+    """测试 POST /api/v1/reservations/series"""
+
+    def test_create(self, app, client, first):
+        """测试接口返回创建的预约和跳过的预约"""
+        headers = {'Authorization': f'Bearer {generate_token("S001", "student")}'}
+        response = client.post('/api/v1/reservations/series', headers=headers, json={
+            'equip_id': 1, 'start_time': first.isoformat(), 'end_time': (first + timedelta(hours=1)).isoformat(),
+            'frequency': 'daily', 'count': 2
+        })
+        body = response.get_json()
+        assert body['code'] == 200
+        assert len(body['data']['reservations']) == 2
+        assert body['data']['skipped'] == []
+
+    def test_requires_rule(self, app, client, first):
+        """测试缺少重复次数和截止日期时返回 422"""
+        headers = {'Authorization': f'Bearer {generate_token("S001", "student")}'}
+        response = client.post('/api/v1/reservations/series', headers=headers, json={
+            'equip_id': 1, 'start_time': first.isoformat(), 'end_time': (first + timedelta(hours=1)).isoformat()
+        })
+        assert response.get_json()['code'] == 422
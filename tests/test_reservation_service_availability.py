@@ -14,6 +14,7 @@ from app.services.reservation_service import (
 from app.models.equipment import Equipment
 from app.models.timeslot import TimeSlot
 from app.models.reservation import Reservation
+from app.services.availability_service import BusyChange
 
 
 class TestCalculateNextAvailTime:
@@ -331,3 +332,33 @@ class TestUpdateEquipmentNextAvailTime:
         
         equipment = Equipment.query.get(sample_equipment.id)
         assert equipment.next_avail_time is not None
+    
+    def test_update_with_change_matches_full_calculation(
+        self, app, db_session, sample_equipment, sample_student, sample_timeslot, future_datetime, mock_redis
+    ):
+        """测试带预约变化的增量更新"""
+        _update_equipment_next_avail_time(sample_equipment.id)
+        
+        reservation = Reservation(
+            equip_id=sample_equipment.id,
+            student_id=sample_student.id,
+            status=1,
+            start_time=future_datetime.replace(hour=9, minute=0),
+            end_time=future_datetime.replace(hour=17, minute=0),
+            apply_time=datetime.utcnow(),
+            user_name=sample_student.name,
+            equip_name=sample_equipment.name
+        )
+        db_session.add(reservation)
+        db_session.commit()
+        
+        _update_equipment_next_avail_time(
+            sample_equipment.id,
+            changed=BusyChange(reservation.start_time, reservation.end_time, True)
+        )
+        
+        equipment = Equipment.query.get(sample_equipment.id)
+        db_session.refresh(equipment)
+        # 下次可用时间不能落在新占用的区间内
+        assert equipment.next_avail_time is not None
+        assert not (reservation.start_time <= equipment.next_avail_time < reservation.end_time)
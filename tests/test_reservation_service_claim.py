@@ -0,0 +1,169 @@
+"""
+测试预约服务的占用表模式（RESERVATION_CONFLICT_MODE = 'claim'）
+包括：
+- create_reservation: 通过唯一约束检测冲突，结束时间带秒时向上取整
+- update_reservation_status / delete_reservation: 释放占用记录
+- rebuild_reservation_claims: 重建占用表
+"""
+import pytest
+from datetime import datetime, timedelta
+from app.services.reservation_service import (
+    create_reservation,
+    update_reservation_status,
+    delete_reservation,
+    rebuild_reservation_claims
+)
+from app.utils.exceptions import ValidationError
+from app.models.reservation import Reservation
+from app.models.reservation_claim import ReservationClaim
+from config import Config
+
+
+@pytest.fixture
+def future_datetime():
+    """未来的整分钟时间：占用按分钟取整，结束时间带秒时会占用结束时间所在的桶"""
+    return datetime.utcnow().replace(second=0, microsecond=0) + timedelta(days=1)
+
+
+@pytest.fixture
+def claim_mode(app):
+    """切换到占用表模式"""
+    app.config['RESERVATION_CONFLICT_MODE'] = 'claim'
+    app.config['RESERVATION_CLAIM_BUCKET_MINUTES'] = 15
+    yield
+    app.config['RESERVATION_CONFLICT_MODE'] = 'lock'
+
+
+class TestClaimMode:
+    """测试占用表模式下的预约创建与释放"""
+    
+    def test_create_writes_claims(
+        self, app, db_session, claim_mode, sample_equipment, sample_timeslot,
+        sample_current_user_student, sample_reservation_data, mock_redis
+    ):
+        """测试创建预约时写入占用记录（1小时 = 4个15分钟时间桶）"""
+        reservation = create_reservation(sample_reservation_data, sample_current_user_student)
+        
+        claims = ReservationClaim.query.filter_by(reservation_id=reservation.id).all()
+        assert len(claims) == 4
+        assert claims[0].bucket_start == sample_reservation_data['start_time'].replace(second=0, microsecond=0)
+    
+    def test_overlapping_create_rejected(
+        self, app, db_session, claim_mode, sample_equipment, sample_timeslot,
+        sample_current_user_student, sample_reservation_data, mock_redis
+    ):
+        """测试重叠预约因唯一约束被拒绝，并返回冲突详情"""
+        first = create_reservation(dict(sample_reservation_data), sample_current_user_student)
+        
+        overlapping = dict(sample_reservation_data)
+        overlapping['start_time'] = sample_reservation_data['start_time'].replace(minute=30)
+        overlapping['end_time'] = sample_reservation_data['end_time'].replace(minute=30)
+        
+        with pytest.raises(ValidationError) as exc_info:
+            create_reservation(overlapping, sample_current_user_student)
+        
+        assert '预约时间与已有预约冲突' in exc_info.value.message
+        assert exc_info.value.payload['conflicts'][0]['id'] == first.id
+        assert Reservation.query.count() == 1
+    
+    def test_adjacent_create_allowed(
+        self, app, db_session, claim_mode, sample_equipment, sample_timeslot,
+        sample_current_user_student, sample_reservation_data, mock_redis
+    ):
+        """测试相邻预约不冲突"""
+        create_reservation(dict(sample_reservation_data), sample_current_user_student)
+        
+        adjacent = dict(sample_reservation_data)
+        adjacent['start_time'] = sample_reservation_data['end_time']
+        adjacent['end_time'] = sample_reservation_data['end_time'].replace(hour=12)
+        
+        create_reservation(adjacent, sample_current_user_student)
+        assert Reservation.query.count() == 2
+    
+    def test_unaligned_adjacent_create_allowed_with_default_bucket(
+        self, app, db_session, claim_mode, sample_equipment, sample_timeslot,
+        sample_current_user_student, sample_reservation_data, mock_redis
+    ):
+        """测试默认粒度下，不对齐 15 分钟的相邻预约（10:00-10:20 与 10:25-10:45）不冲突"""
+        app.config['RESERVATION_CLAIM_BUCKET_MINUTES'] = Config.RESERVATION_CLAIM_BUCKET_MINUTES
+        assert Config.RESERVATION_CLAIM_BUCKET_MINUTES == 1
+        day = sample_reservation_data['start_time']
+        
+        for start, end in ((0, 20), (25, 45)):
+            data = dict(sample_reservation_data)
+            data['start_time'] = day.replace(hour=10, minute=start)
+            data['end_time'] = day.replace(hour=10, minute=end)
+            create_reservation(data, sample_current_user_student)
+        
+        assert Reservation.query.count() == 2
+        assert ReservationClaim.query.count() == 40
+    
+    def test_end_seconds_claim_next_bucket(
+        self, app, db_session, claim_mode, sample_equipment, sample_timeslot,
+        sample_current_user_student, sample_reservation_data, mock_redis
+    ):
+        """测试结束时间带秒（10:00-10:30:30）时占用 10:30 的桶，10:30 开始的预约冲突"""
+        app.config['RESERVATION_CLAIM_BUCKET_MINUTES'] = 1
+        day = sample_reservation_data['start_time']
+        data = dict(sample_reservation_data)
+        data['start_time'] = day.replace(hour=10, minute=0)
+        data['end_time'] = day.replace(hour=10, minute=30, second=30)
+        create_reservation(data, sample_current_user_student)
+        assert ReservationClaim.query.count() == 31
+        
+        overlapping = dict(sample_reservation_data)
+        overlapping['start_time'] = day.replace(hour=10, minute=30)
+        overlapping['end_time'] = day.replace(hour=10, minute=45)
+        with pytest.raises(ValidationError) as exc_info:
+            create_reservation(overlapping, sample_current_user_student)
+        assert exc_info.value.message == '预约时间与已有预约冲突'
+        assert Reservation.query.count() == 1
+    
+    @pytest.mark.parametrize('status', [2, 3])
+    def test_reject_or_cancel_releases_claims(
+        self, app, db_session, claim_mode, sample_equipment, sample_timeslot,
+        sample_current_user_student, sample_reservation_data, mock_redis, status
+    ):
+        """测试拒绝/取消后释放占用，同一时间可以再次预约"""
+        reservation = create_reservation(dict(sample_reservation_data), sample_current_user_student)
+        
+        update_reservation_status(reservation.id, status=status, approver_id='A001')
+        
+        assert ReservationClaim.query.filter_by(reservation_id=reservation.id).count() == 0
+        create_reservation(dict(sample_reservation_data), sample_current_user_student)
+    
+    def test_delete_releases_claims(
+        self, app, db_session, claim_mode, sample_equipment, sample_timeslot,
+        sample_current_user_student, sample_reservation_data, mock_redis
+    ):
+        """测试删除预约时释放占用"""
+        reservation = create_reservation(dict(sample_reservation_data), sample_current_user_student)
+        
+        delete_reservation(reservation.id)
+        
+        assert ReservationClaim.query.count() == 0
+
+
+class TestRebuildReservationClaims:
+    """测试 rebuild_reservation_claims 函数"""
+    
+    def test_rebuild_from_active_reservations(
+        self, app, db_session, sample_equipment, sample_student, future_datetime
+    ):
+        """测试只为待审/已通过预约重建占用（15 分钟时间桶）"""
+        app.config['RESERVATION_CLAIM_BUCKET_MINUTES'] = 15
+        for status in (0, 1, 2, 3):
+            db_session.add(Reservation(
+                equip_id=sample_equipment.id,
+                student_id=sample_student.id,
+                status=status,
+                start_time=future_datetime.replace(hour=9 + status * 2, minute=0),
+                end_time=future_datetime.replace(hour=10 + status * 2, minute=0),
+                apply_time=datetime.utcnow()
+            ))
+        db_session.commit()
+        
+        count = rebuild_reservation_claims()
+        
+        assert count == 8
+        assert ReservationClaim.query.count() == 8
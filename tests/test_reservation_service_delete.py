@@ -8,6 +8,7 @@ from unittest.mock import patch
 from app.services.reservation_service import delete_reservation, get_reservation_by_id
 from app.utils.exceptions import NotFoundError, ValidationError
 from app.models.reservation import Reservation
+from app.services.availability_service import BusyChange
 
 
 class TestDeleteReservation:
@@ -69,7 +70,10 @@ class TestDeleteReservation:
             delete_reservation(reservation.id)
             
             # 验证更新可用时间的函数被调用
-            mock_update.assert_called_once_with(sample_equipment.id)
+            mock_update.assert_called_once_with(
+                sample_equipment.id,
+                changed=BusyChange(reservation.start_time, reservation.end_time, False)
+            )
     
     def test_delete_pending_reservation_no_update(
         self, app, db_session, sample_equipment, sample_student, future_datetime, mock_redis
@@ -107,11 +111,18 @@ class TestDeleteReservation:
         )
         db_session.add(reservation)
         db_session.commit()
+        reservation_id = reservation.id
         
-        delete_reservation(reservation.id)
+        delete_reservation(reservation_id)
         
-        # 验证缓存清除方法被调用
-        assert mock_redis.delete.called
+        # 验证缓存清除在一个流水线中执行
+        pipe = mock_redis.pipeline.return_value.__enter__.return_value
+        pipe.delete.assert_called_once_with(f'api:reservation:detail:{reservation_id}')
+        # 只失效该学生的预约列表缓存，不再使用 KEYS 遍历
+        pipe.invalidate_tags.assert_called_once_with(f'tag:reservation:user:student:{sample_student.id}')
+        # 管理员预约列表没有缓存，不需要递增命名空间版本号
+        pipe.bump_namespace.assert_not_called()
+        mock_redis.get_client.return_value.keys.assert_not_called()
     
     def test_delete_reservation_db_rollback_on_error(
         self, app, db_session, sample_equipment, sample_student, future_datetime, mock_redis
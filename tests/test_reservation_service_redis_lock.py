@@ -0,0 +1,176 @@
+"""
+测试预约服务的 Redis 分布式锁模式（RESERVATION_CONFLICT_MODE = 'redis_lock'）
+包括：
+- _advance_booking_fence: 围栏令牌校验
+- create_reservation: Redis 不可用时回退到数据库锁；租约过期的旧持有者与新持有者交错提交；
+  Redis 中的围栏计数器丢失或回退后从数据库中已提交的令牌恢复
+"""
+import pytest
+from unittest.mock import patch
+from app import db
+from app.services import reservation_service
+from app.services.reservation_service import create_reservation, _advance_booking_fence
+from app.models.reservation import Reservation
+from app.utils.exceptions import ValidationError
+from app.utils.redis_client import redis_client
+from app.utils.redis_lock import LockUnavailableError, LockTimeoutError, lock_metrics
+from app.models.equipment import Equipment
+
+
+@pytest.fixture
+def redis_lock_mode(app):
+    """切换到 Redis 分布式锁模式"""
+    app.config['RESERVATION_CONFLICT_MODE'] = 'redis_lock'
+    lock_metrics.reset()
+    yield
+    app.config['RESERVATION_CONFLICT_MODE'] = 'lock'
+
+
+class TestAdvanceBookingFence:
+    """测试 _advance_booking_fence 函数"""
+    
+    def test_newer_token_accepted(self, app, db_session, sample_equipment):
+        """测试更大的令牌可以推进围栏"""
+        _advance_booking_fence(sample_equipment.id, 5)
+        db_session.commit()
+        
+        _advance_booking_fence(sample_equipment.id, 6)
+        db_session.commit()
+        
+        assert Equipment.query.get(sample_equipment.id).booking_fence == 6
+    
+    def test_stale_token_rejected(self, app, db_session, sample_equipment):
+        """测试过期（更小）的令牌被拒绝"""
+        _advance_booking_fence(sample_equipment.id, 5)
+        db_session.commit()
+        
+        with pytest.raises(ValidationError) as exc_info:
+            _advance_booking_fence(sample_equipment.id, 4)
+        
+        assert '预约锁已失效' in exc_info.value.message
+
+
+class TestRedisLockMode:
+    """测试 Redis 锁模式下的预约创建"""
+    
+    def test_fallback_to_db_lock_when_redis_unavailable(
+        self, app, db_session, redis_lock_mode, sample_equipment, sample_timeslot,
+        sample_current_user_student, sample_reservation_data, mock_redis
+    ):
+        """测试 Redis 不可用时回退到数据库锁并记录回退次数"""
+        with patch('app.services.reservation_service.RedisLock.acquire', side_effect=LockUnavailableError('down')):
+            reservation = create_reservation(sample_reservation_data, sample_current_user_student)
+        
+        assert reservation.id is not None
+        assert lock_metrics.snapshot()['fallbacks'] == 1
+    
+    def test_lock_held_writes_fence(
+        self, app, db_session, redis_lock_mode, sample_equipment, sample_timeslot,
+        sample_current_user_student, sample_reservation_data, mock_redis
+    ):
+        """测试持有锁时插入预约并写入围栏令牌"""
+        with patch('app.services.reservation_service.RedisLock.acquire', return_value=7), \
+                patch('app.services.reservation_service.RedisLock.release') as mock_release:
+            create_reservation(sample_reservation_data, sample_current_user_student)
+        
+        assert Equipment.query.get(sample_equipment.id).booking_fence == 7
+        mock_release.assert_called_once()
+    
+    def test_lock_timeout_rejected(
+        self, app, db_session, redis_lock_mode, sample_equipment, sample_timeslot,
+        sample_current_user_student, sample_reservation_data, mock_redis
+    ):
+        """测试等待锁超时时快速返回错误"""
+        with patch('app.services.reservation_service.RedisLock.acquire', side_effect=LockTimeoutError('busy')):
+            with pytest.raises(ValidationError) as exc_info:
+                create_reservation(sample_reservation_data, sample_current_user_student)
+        
+        assert '正在被其他用户预约' in exc_info.value.message
+    
+    def test_expired_holder_commit_visible_to_newer_holder(
+        self, app, db_session, redis_lock_mode, sample_equipment, sample_timeslot,
+        sample_current_user_student, sample_reservation_data, mock_redis
+    ):
+        """
+        测试交错的两个持有者：A 的租约过期后 B 获得锁（令牌 2），
+        A（令牌 1）在 B 推进围栏之前提交了同一时间的预约，B 推进围栏后读取冲突时必须看到它
+        """
+        advance = reservation_service._advance_booking_fence
+        
+        def interleaved_fence(equip_id, token):
+            if token == 2:
+                create_reservation(dict(sample_reservation_data), sample_current_user_student)
+            return advance(equip_id, token)
+        
+        with patch('app.services.reservation_service.RedisLock.acquire', side_effect=[2, 1]), \
+                patch('app.services.reservation_service.RedisLock.release'), \
+                patch('app.services.reservation_service._advance_booking_fence', side_effect=interleaved_fence):
+            with pytest.raises(ValidationError) as exc_info:
+                create_reservation(dict(sample_reservation_data), sample_current_user_student)
+        
+        assert exc_info.value.message == '预约时间与已有预约冲突'
+        assert Reservation.query.count() == 1
+        assert Equipment.query.get(sample_equipment.id).booking_fence == 1
+    
+    def test_expired_holder_rejected_after_newer_commit(
+        self, app, db_session, redis_lock_mode, sample_equipment, sample_timeslot,
+        sample_current_user_student, sample_reservation_data, mock_redis
+    ):
+        """测试交错的另一种顺序：B（令牌 2）先提交后，租约过期的 A（令牌 1）在推进围栏时被拒绝"""
+        with patch('app.services.reservation_service.RedisLock.acquire', side_effect=[2, 1]), \
+                patch('app.services.reservation_service.RedisLock.release'):
+            create_reservation(dict(sample_reservation_data), sample_current_user_student)
+            with pytest.raises(ValidationError) as exc_info:
+                create_reservation(dict(sample_reservation_data), sample_current_user_student)
+        
+        assert '预约锁已失效' in exc_info.value.message
+        assert Reservation.query.count() == 1
+        assert Equipment.query.get(sample_equipment.id).booking_fence == 2
+    
+    def test_fence_counter_reset_seeded_from_db(
+        self, app, db_session, redis_lock_mode, sample_equipment, sample_timeslot,
+        sample_current_user_student, sample_reservation_data, mock_redis
+    ):
+        """测试 Redis 被清空、围栏计数器从头开始时，令牌从数据库中已提交的令牌继续，预约不会一直失败"""
+        sample_equipment.booking_fence = 40
+        db_session.commit()
+        redis_client.get_client().delete(f'lock:fence:booking:equip:{sample_equipment.id}')
+        
+        create_reservation(sample_reservation_data, sample_current_user_student)
+        
+        assert Equipment.query.get(sample_equipment.id).booking_fence == 41
+    
+    def test_fence_counter_regressed_recovers_on_retry(
+        self, app, db_session, redis_lock_mode, sample_equipment, sample_timeslot,
+        sample_current_user_student, sample_reservation_data, mock_redis
+    ):
+        """测试计数器回退到旧值（例如从旧快照恢复）时本次被拒绝，计数器被抬高到已提交的令牌，重试成功"""
+        sample_equipment.booking_fence = 40
+        db_session.commit()
+        redis_client.get_client().set(f'lock:fence:booking:equip:{sample_equipment.id}', 3)
+        
+        with pytest.raises(ValidationError) as exc_info:
+            create_reservation(dict(sample_reservation_data), sample_current_user_student)
+        assert '预约锁已失效' in exc_info.value.message
+        
+        create_reservation(dict(sample_reservation_data), sample_current_user_student)
+        assert Equipment.query.get(sample_equipment.id).booking_fence == 41
+        assert Reservation.query.count() == 1
+    
+    def test_unexpected_error_rolled_back_before_release(
+        self, app, db_session, redis_lock_mode, sample_equipment, sample_timeslot,
+        sample_current_user_student, sample_reservation_data, mock_redis
+    ):
+        """测试 INSERT 阶段的非验证错误也在释放锁之前回滚，会话中不留下未提交的写入"""
+        pending_at_release = []
+        with patch('app.services.reservation_service.RedisLock.acquire', return_value=3), \
+                patch('app.services.reservation_service.RedisLock.release',
+                      side_effect=lambda: pending_at_release.append(len(db.session.new))), \
+                patch('app.services.reservation_service._refresh_slot_occupancy', side_effect=RuntimeError('db')):
+            with pytest.raises(ValidationError) as exc_info:
+                create_reservation(sample_reservation_data, sample_current_user_student)
+        
+        assert '创建预约失败' in exc_info.value.message
+        assert pending_at_release == [0]
+        assert Reservation.query.count() == 0
+        assert Equipment.query.get(sample_equipment.id).booking_fence is None
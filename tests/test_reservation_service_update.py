@@ -8,6 +8,7 @@ from unittest.mock import patch
 from app.services.reservation_service import update_reservation_status
 from app.utils.exceptions import ValidationError, NotFoundError
 from app.models.reservation import Reservation
+from app.services.availability_service import BusyChange
 from app.models.equipment import Equipment
 
 
@@ -233,7 +234,10 @@ class TestUpdateReservationStatus:
             update_reservation_status(reservation.id, status=1, approver_id='A001')
             
             # 验证更新可用时间的函数被调用
-            mock_update.assert_called_once_with(sample_equipment.id)
+            mock_update.assert_called_once_with(
+                sample_equipment.id,
+                changed=BusyChange(reservation.start_time, reservation.end_time, True)
+            )
     
     def test_update_status_clears_cache(
         self, app, db_session, sample_equipment, sample_student, future_datetime, mock_redis
@@ -4,13 +4,15 @@
 - _validate_time_range: 验证时间范围
 - _check_timeslot_availability: 检查时间段可用性
 - _check_reservation_conflict: 检查预约冲突
+- _find_conflicting_reservations: 数据库端重叠查询
 """
 import pytest
 from datetime import datetime, timedelta, time
 from app.services.reservation_service import (
     _validate_time_range,
     _check_timeslot_availability,
-    _check_reservation_conflict
+    _check_reservation_conflict,
+    _find_conflicting_reservations
 )
 from app.utils.exceptions import ValidationError
 from app.models.equipment import Equipment
@@ -329,3 +331,53 @@ class TestCheckReservationConflict:
             
             with pytest.raises(ValidationError):
                 _check_reservation_conflict(sample_equipment.id, start_time, end_time)
+
+
+class TestFindConflictingReservations:
+    """测试 _find_conflicting_reservations 函数"""
+    
+    def test_only_overlapping_rows_returned(self, app, db_session, sample_equipment, sample_student, future_datetime):
+        """测试只返回与目标时间重叠的预约"""
+        reservations = [
+            Reservation(
+                equip_id=sample_equipment.id,
+                student_id=sample_student.id,
+                status=1,
+                start_time=future_datetime.replace(hour=hour, minute=0),
+                end_time=future_datetime.replace(hour=hour + 1, minute=0),
+                apply_time=datetime.utcnow()
+            )
+            for hour in (9, 10, 11, 14)
+        ]
+        db_session.add_all(reservations)
+        db_session.commit()
+        
+        result = _find_conflicting_reservations(
+            sample_equipment.id,
+            future_datetime.replace(hour=10, minute=30),
+            future_datetime.replace(hour=11, minute=30)
+        )
+        
+        assert [r.start_time.hour for r in result] == [10, 11]
+    
+    def test_previous_day_reservations_ignored(self, app, db_session, sample_equipment, sample_student, future_datetime):
+        """测试前一天的预约不会被读取"""
+        previous_day = future_datetime - timedelta(days=1)
+        reservation = Reservation(
+            equip_id=sample_equipment.id,
+            student_id=sample_student.id,
+            status=1,
+            start_time=previous_day.replace(hour=10, minute=0),
+            end_time=previous_day.replace(hour=11, minute=0),
+            apply_time=datetime.utcnow()
+        )
+        db_session.add(reservation)
+        db_session.commit()
+        
+        result = _find_conflicting_reservations(
+            sample_equipment.id,
+            future_datetime.replace(hour=10, minute=0),
+            future_datetime.replace(hour=11, minute=0)
+        )
+        
+        assert result == []
@@ -0,0 +1,154 @@
+"""
+测试响应缓存
+包括：
+- CacheCodec: 字节串、值为字节串的缓存结构
+- cached_success(): 命中时直接返回缓存的响应体、gzip 协商、按编码区分的 ETag、304、旧版本缓存兼容
+- 设备列表、预约列表接口
+"""
+import gzip
+import json
+from unittest.mock import MagicMock, patch
+import pytest
+from app.utils.auth import generate_token
+from app.utils.codec import CacheCodec
+from app.utils.redis_client import redis_client
+from app.utils.response import make_etag
+from app.utils.response_cache import cached_success
+
+
+class TestCodecBytes:
+    """测试字节串值的编码"""
+
+    def test_bytes_round_trip(self):
+        """测试字节串原样保存，不再压缩"""
+        codec = CacheCodec('json', 'zlib', threshold=16)
+        body = b'{"code":200}' * 100
+        data = codec.encode(body)
+        assert data[1:3] == b'B-'
+        assert codec.decode(data) == body
+
+    def test_envelope_with_bytes(self):
+        """测试值为字节串的缓存结构"""
+        codec = CacheCodec('json', 'zlib', threshold=16)
+        entry = {'_swr': 1, 'v': gzip.compress(b'x' * 2000), 'expires': 1.5, 'delta': 0.01, 'etag': 'abc', 'at': 1.0}
+        data = codec.encode(entry)
+        assert data[1:3] == b'E-'
+        assert codec.decode(data) == entry
+
+
+class TestCachedSuccess:
+    """测试 cached_success()"""
+
+    def test_hit_skips_load_and_jsonify(self, app):
+        """测试命中时不重新加载、不经过 jsonify，响应体与 success() 一致"""
+        load = MagicMock(return_value={'items': [1, 2], 'total': 2})
+        with app.test_request_context():
+            response, status = cached_success('test:resp:hit', load, ttl=60, msg='查询成功')
+            first = response.get_data()
+        assert status == 200
+        assert json.loads(first) == {'code': 200, 'msg': '查询成功', 'data': {'items': [1, 2], 'total': 2}}
+
+        with app.test_request_context():
+            with patch('app.utils.response_cache.jsonify') as jsonify, patch('app.utils.response.jsonify') as legacy:
+                response, status = cached_success('test:resp:hit', load, ttl=60, msg='查询成功')
+            jsonify.assert_not_called()
+            legacy.assert_not_called()
+            assert response.get_data() == first
+            assert response.headers['ETag'] == f'"{make_etag(first)}"'
+        assert load.call_count == 1
+
+    @pytest.mark.parametrize('accept, encoded', [('gzip, deflate', True), ('identity', False)])
+    def test_gzip_negotiation(self, app, accept, encoded):
+        """测试大响应体压缩保存，只对接受 gzip 的客户端直接返回压缩后的字节串"""
+        data = [{'name': f'设备{i}'} for i in range(200)]
+        with app.test_request_context(headers={'Accept-Encoding': accept}):
+            response, _ = cached_success('test:resp:gzip', lambda: data, ttl=60)
+            body = response.get_data()
+            assert response.headers['Vary'] == 'Accept-Encoding'
+            assert (response.headers.get('Content-Encoding') == 'gzip') is encoded
+        if encoded:
+            body = gzip.decompress(body)
+        assert json.loads(body)['data'] == data
+
+    def test_etag_per_coding(self, app):
+        """测试 gzip 和未压缩的响应体使用不同的 ETag，304 同样带 Vary，另一种编码的 ETag 不会命中"""
+        data = [{'name': f'设备{i}'} for i in range(200)]
+        etags = {}
+        for accept in ('gzip', 'identity'):
+            with app.test_request_context(headers={'Accept-Encoding': accept}):
+                etags[accept] = cached_success('test:resp:etag', lambda: data, ttl=60)[0].headers['ETag']
+        assert etags['gzip'] == etags['identity'][:-1] + '-gzip"'
+
+        with app.test_request_context(headers={'Accept-Encoding': 'gzip', 'If-None-Match': etags['gzip']}):
+            response, status = cached_success('test:resp:etag', lambda: data, ttl=60)
+        assert status == 304
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert response.headers['ETag'] == etags['gzip']
+
+        with app.test_request_context(headers={'Accept-Encoding': 'identity', 'If-None-Match': etags['gzip']}):
+            response, status = cached_success('test:resp:etag', lambda: data, ttl=60)
+        assert status == 200
+        assert 'Content-Encoding' not in response.headers
+
+    def test_small_body_and_disabled_gzip(self, app):
+        """测试小于阈值或关闭压缩时保存原始响应体"""
+        app.config['RESPONSE_CACHE_GZIP'] = False
+        data = ['x' * 2000]
+        with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+            response, _ = cached_success('test:resp:plain', lambda: data, ttl=60)
+            assert 'Content-Encoding' not in response.headers
+            assert json.loads(response.get_data())['data'] == data
+
+    def test_not_modified(self, app):
+        """测试 ETag 匹配时返回 304"""
+        with app.test_request_context():
+            etag = cached_success('test:resp:304', lambda: [1], ttl=60)[0].headers['ETag']
+        with app.test_request_context(headers={'If-None-Match': etag}):
+            response, status = cached_success('test:resp:304', lambda: [1], ttl=60)
+        assert status == 304
+        assert response.get_data() == b''
+
+    def test_legacy_value(self, app):
+        """测试旧版本缓存的是数据本身时仍按 success() 返回"""
+        redis_client.set('test:resp:legacy', {'_swr': 1, 'v': {'id': 1}, 'expires': 4102444800, 'delta': 0}, ex=60)
+        load = MagicMock()
+        with app.test_request_context():
+            response, status = cached_success('test:resp:legacy', load, ttl=60)
+        load.assert_not_called()
+        assert status == 200
+        assert response.get_json()['data'] == {'id': 1}
+
+
+class TestResponseCacheEndpoints:
+    """测试接口的响应缓存"""
+
+    @pytest.fixture
+    def auth_headers(self, app, sample_student):
+        return {'Authorization': f'Bearer {generate_token(sample_student.id, "student")}'}
+
+    def test_equipment_list(self, client, auth_headers, sample_equipment):
+        """测试设备列表第二次请求命中响应缓存"""
+        first = client.get('/api/v1/equipments/', headers=auth_headers)
+        assert first.status_code == 200
+        assert first.get_json()['data']['items'][0]['id'] == sample_equipment.id
+
+        with patch('app.services.equipment_service.get_equipment_list') as get_list:
+            second = client.get('/api/v1/equipments/', headers=auth_headers)
+        get_list.assert_not_called()
+        assert second.get_data() == first.get_data()
+
+    def test_reservation_detail_not_found(self, client, auth_headers):
+        """测试加载时抛出的 NotFoundError 仍返回 404"""
+        response = client.get('/api/v1/reservations/999999', headers=auth_headers)
+        assert response.status_code == 404
+
+    def test_my_reservations_tag_invalidation(self, client, auth_headers, sample_timeslot, sample_reservation_data):
+        """测试我的预约列表使用普通缓存键（不读取命名空间版本号），该用户的预约变化后按标签失效"""
+        with patch.object(redis_client, 'namespace_version', wraps=redis_client.namespace_version) as version:
+            assert client.get('/api/v1/reservations/', headers=auth_headers).get_json()['data'] == []
+        version.assert_not_called()
+
+        data = {key: value.isoformat() if hasattr(value, 'isoformat') else value
+                for key, value in sample_reservation_data.items()}
+        assert client.post('/api/v1/reservations/', headers=auth_headers, json=data).get_json()['code'] == 200
+        assert len(client.get('/api/v1/reservations/', headers=auth_headers).get_json()['data']) == 1
@@ -0,0 +1,181 @@
+"""
+测试时间段占用读模型（AVAILABILITY_READ_MODEL = 'occupancy'）
+包括：
+- compute_occupancy: 占用计算
+- 预约创建、审批、取消、删除，时间段新增、修改、删除时刷新占用表
+- get_available_timeslots / get_available_dates: 读取占用表的结果与实时计算一致
+- rebuild_occupancy / check_occupancy 以及对应的 CLI 命令
+"""
+from datetime import datetime, timedelta, time
+from types import SimpleNamespace
+import pytest
+from app.models.reservation import Reservation
+from app.models.slot_occupancy import SlotOccupancy
+from app.models.timeslot import TimeSlot
+from app.services import occupancy_service, reservation_service, timeslot_service
+
+
+@pytest.fixture
+def occupancy_mode(app):
+    """切换到占用表读模型"""
+    app.config['AVAILABILITY_READ_MODEL'] = 'occupancy'
+    yield
+    app.config['AVAILABILITY_READ_MODEL'] = 'live'
+
+
+@pytest.fixture
+def two_slots(db_session, sample_equipment):
+    """上午、下午两个时间段"""
+    slots = [
+        TimeSlot(equip_id=sample_equipment.id, start_time=time(9, 0), end_time=time(12, 0), is_active=1),
+        TimeSlot(equip_id=sample_equipment.id, start_time=time(14, 0), end_time=time(17, 0), is_active=1),
+    ]
+    db_session.add_all(slots)
+    db_session.commit()
+    return slots
+
+
+@pytest.fixture
+def tomorrow():
+    return datetime.utcnow().date() + timedelta(days=1)
+
+
+def _book(student, day, start_hour, end_hour):
+    """通过服务层创建预约"""
+    return reservation_service.create_reservation({
+        'equip_id': 1,
+        'start_time': datetime.combine(day, time(start_hour)),
+        'end_time': datetime.combine(day, time(end_hour)),
+    }, {'user_id': student.id, 'user_type': 'student'})
+
+
+def _occupancy():
+    return {(row.date, row.slot_id): row.state for row in SlotOccupancy.query.all()}
+
+
+class TestComputeOccupancy:
+    """测试占用计算"""
+
+    def test_state_and_overlap(self):
+        """测试已通过预约优先于待审预约，边界相接不算占用"""
+        day = datetime(2030, 1, 1)
+        slots = [SimpleNamespace(slot_id=1, start_time=time(9), end_time=time(12)),
+                 SimpleNamespace(slot_id=2, start_time=time(14), end_time=time(17))]
+        reservations = [
+            SimpleNamespace(start_time=day.replace(hour=10), end_time=day.replace(hour=11), status=0),
+            SimpleNamespace(start_time=day.replace(hour=11), end_time=day.replace(hour=14), status=1),
+        ]
+        assert occupancy_service.compute_occupancy(slots, reservations) == {(day.date(), 1): 2}
+
+
+class TestMaintenance:
+    """测试预约和时间段变更时刷新占用表"""
+
+    def test_reservation_lifecycle(self, app, occupancy_mode, two_slots, sample_student, tomorrow):
+        """测试创建写入待审占用，审批通过后变为已通过，取消后释放"""
+        morning, afternoon = two_slots
+        reservation = _book(sample_student, tomorrow, 10, 11)
+        assert _occupancy() == {(tomorrow, morning.slot_id): 1}
+        assert timeslot_service.get_available_timeslots(1, tomorrow) == [afternoon]
+
+        reservation_service.update_reservation_status(reservation.id, 1, approver_id='A001')
+        assert _occupancy() == {(tomorrow, morning.slot_id): 2}
+
+        reservation_service.update_reservation_status(reservation.id, 3)
+        assert _occupancy() == {}
+        assert timeslot_service.get_available_timeslots(1, tomorrow) == [morning, afternoon]
+
+    def test_delete_reservation(self, app, occupancy_mode, two_slots, sample_student, tomorrow):
+        """测试删除预约只释放自己的占用"""
+        first = _book(sample_student, tomorrow, 10, 11)
+        _book(sample_student, tomorrow, 15, 16)
+        reservation_service.delete_reservation(first.id)
+        assert _occupancy() == {(tomorrow, two_slots[1].slot_id): 1}
+
+    def test_timeslot_changes(self, app, occupancy_mode, two_slots, sample_student, tomorrow):
+        """测试时间段新增、修改时重新计算占用，删除时间段时删除其占用"""
+        morning = two_slots[0]
+        _book(sample_student, tomorrow, 10, 11)
+        timeslot_service.create_timeslot({'equip_id': 1, 'start_time': '08:00', 'end_time': '09:00'})
+        assert _occupancy() == {(tomorrow, morning.slot_id): 1}
+
+        timeslot_service.update_timeslot(morning.slot_id, {'start_time': '11:00'})
+        assert _occupancy() == {}
+
+        timeslot_service.update_timeslot(morning.slot_id, {'start_time': '09:00'})
+        assert _occupancy() == {(tomorrow, morning.slot_id): 1}
+
+        timeslot_service.delete_timeslot(morning.slot_id)
+        assert _occupancy() == {}
+
+    def test_live_mode_does_not_write(self, app, two_slots, sample_student, tomorrow):
+        """测试默认的实时计算模式不维护占用表"""
+        _book(sample_student, tomorrow, 10, 11)
+        assert SlotOccupancy.query.count() == 0
+
+
+class TestReads:
+    """测试读取占用表的可用性查询"""
+
+    def test_matches_live(self, app, occupancy_mode, two_slots, sample_student, tomorrow):
+        """测试可用日期、可用时间段与实时计算的结果一致"""
+        _book(sample_student, tomorrow, 10, 11)
+        _book(sample_student, tomorrow, 14, 15)
+        _book(sample_student, tomorrow + timedelta(days=2), 9, 10)
+
+        start = tomorrow - timedelta(days=1)
+        occupancy = [timeslot_service.get_available_dates(1, start, days=5)]
+        occupancy += [timeslot_service.get_available_timeslots(1, start + timedelta(days=i)) for i in range(5)]
+        app.config['AVAILABILITY_READ_MODEL'] = 'live'
+        live = [timeslot_service.get_available_dates(1, start, days=5)]
+        live += [timeslot_service.get_available_timeslots(1, start + timedelta(days=i)) for i in range(5)]
+
+        assert occupancy == live
+        assert tomorrow.isoformat() not in occupancy[0]
+        assert len(occupancy[0]) == 4
+
+    def test_inactive_slot_ignored(self, app, occupancy_mode, two_slots, sample_student, tomorrow):
+        """测试停用的时间段不影响可用日期的判断"""
+        _book(sample_student, tomorrow, 10, 11)
+        timeslot_service.update_timeslot(two_slots[1].slot_id, {'is_active': 0})
+        assert tomorrow.isoformat() not in timeslot_service.get_available_dates(1, tomorrow, days=1)
+
+
+class TestRebuildAndCheck:
+    """测试重建与一致性检查"""
+
+    @pytest.fixture
+    def imported(self, db_session, two_slots, sample_student, tomorrow):
+        """绕过服务层直接写入的预约（占用表中没有记录）"""
+        db_session.add(Reservation(
+            student_id=sample_student.id, equip_id=1, status=1,
+            start_time=datetime.combine(tomorrow, time(9)), end_time=datetime.combine(tomorrow, time(15))
+        ))
+        db_session.commit()
+
+    def test_check_and_repair(self, app, imported, two_slots, tomorrow):
+        """测试检查发现缺失的占用记录，修复后一致"""
+        result = occupancy_service.check_occupancy()
+        assert [(item['slot_id'], item['expected'], item['actual']) for item in result['mismatches']] == [
+            (two_slots[0].slot_id, 2, None), (two_slots[1].slot_id, 2, None)
+        ]
+
+        assert occupancy_service.check_occupancy(repair=True)['repaired'] == 1
+        assert occupancy_service.check_occupancy()['mismatches'] == []
+
+    def test_rebuild(self, app, imported):
+        """测试重建占用表"""
+        assert occupancy_service.rebuild_occupancy() == 2
+        assert occupancy_service.check_occupancy() == {'rows': 2, 'mismatches': [], 'repaired': 0}
+
+    def test_cli(self, app, imported):
+        """测试 flask check-occupancy 在不一致时以非零状态退出，flask rebuild-occupancy 重建"""
+        runner = app.test_cli_runner()
+        result = runner.invoke(args=['check-occupancy'])
+        assert result.exit_code == 1
+        assert '发现 2 处不一致' in result.output
+
+        assert '已写入 2 条占用记录' in runner.invoke(args=['rebuild-occupancy']).output
+        result = runner.invoke(args=['check-occupancy'])
+        assert result.exit_code == 0
+        assert '[OK] 占用表一致' in result.output